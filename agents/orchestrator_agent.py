@@ -8,16 +8,35 @@ of the Value Adders World multi-agent system.
 from __future__ import annotations
 
 import asyncio
-from typing import Iterable, Mapping, Optional, Sequence
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Coroutine, Iterable, Mapping, Optional, Sequence, TypeVar
 
 from autogen_agentchat.agents import AssistantAgent
 from autogen_agentchat.base import TaskResult
-from autogen_agentchat.messages import BaseAgentEvent, BaseChatMessage
+from autogen_agentchat.messages import (
+    BaseAgentEvent,
+    BaseChatMessage,
+    ModelClientStreamingChunkEvent,
+)
+from autogen_core import CancellationToken
 
 from integrations.notion_logger import NotionLogger
 from integrations.slack_notifier import SlackNotifier
 from outputs.deliverable_writer import DeliverableWriter
 
+T = TypeVar("T")
+
+# Upper bound on agents running at once; keeps a full sprint under model rate limits.
+DEFAULT_MAX_CONCURRENCY = 16
+# How often a streaming task pushes its buffered output to Notion.
+DEFAULT_STREAM_FLUSH_SECONDS = 10.0
+# Streamed text is appended to the deliverable once this much is buffered (or at a newline).
+_STREAM_FILE_BUFFER_CHARS = 512
+# Notion rejects rich-text values longer than this.
+_NOTION_SUMMARY_CHARS = 2000
+
 DEFAULT_SYSTEM_MESSAGE = (
     "You are OrchestratorAgent, the central coordinator of the Value Adders Way multi-agent "
     "system. You maintain a bird's-eye view of all tasks, agents, and timelines. Your role is "
@@ -29,6 +48,100 @@ DEFAULT_SYSTEM_MESSAGE = (
 )
 
 
+@dataclass
+class _TaskOutcome:
+    """Summary lines, Slack entries and result of one delegated assignment."""
+
+    lines: list[str] = field(default_factory=list)
+    slack_entries: list[str] = field(default_factory=list)
+    result: TaskResult | None = None
+    error: BaseException | None = None
+    duration: float | None = None
+
+
+class TaskAborted(RuntimeError):
+    """Recorded as a task's error when an operator aborts it with ``abort_task``."""
+
+
+class _TaskStream:
+    """Forward one agent's streamed output to its deliverable, the console and Notion."""
+
+    def __init__(
+        self,
+        orchestrator: OrchestratorAgent,
+        alias: str,
+        page_id: str | None,
+        deliverable_writer: DeliverableWriter | None,
+    ) -> None:
+        self.orchestrator = orchestrator
+        self.alias = alias
+        self.page_id = page_id
+        self.deliverable_writer = deliverable_writer
+        self.path: Path | None = None
+        self.chars = 0
+        self._file_buffer: list[str] = []
+        self._notion_text: list[str] = []
+        self._notion_chars = 0
+        self._notion_sent = ""
+        self._started = time.perf_counter()
+        self._last_flush = self._started
+
+    async def write(self, text: str) -> None:
+        if not text:
+            return
+        if not self.chars:
+            self._progress(f"first output after {time.perf_counter() - self._started:.1f}s")
+        self.chars += len(text)
+        self._file_buffer.append(text)
+        self._notion_text.append(text)
+        if "\n" in text or sum(map(len, self._file_buffer)) >= _STREAM_FILE_BUFFER_CHARS:
+            await self._flush_file()
+        if time.perf_counter() - self._last_flush >= self.orchestrator.stream_flush_seconds:
+            await self.flush()
+
+    async def flush(self) -> None:
+        """Append buffered text to the deliverable and send the output so far to Notion."""
+        await self._flush_file()
+        self._last_flush = time.perf_counter()
+        if self.chars == self._notion_chars:
+            return
+        self._notion_chars = self.chars
+        text = "".join(self._notion_text)
+        if len(text) > _NOTION_SUMMARY_CHARS:
+            text = text[: _NOTION_SUMMARY_CHARS - 1] + "…"
+        self._notion_text = [text]
+        self._progress(f"{self.chars} chars so far")
+        if text == self._notion_sent:
+            return
+        self._notion_sent = text
+        await asyncio.to_thread(
+            self.orchestrator._log_notion_update,
+            self.alias,
+            self.page_id,
+            status="Assigned",
+            summary=text,
+        )
+
+    async def close(self) -> None:
+        """Write out what is left for the deliverable; Notion gets the final status instead."""
+        await self._flush_file()
+        self._notion_text.clear()
+
+    async def _flush_file(self) -> None:
+        if not self._file_buffer or self.deliverable_writer is None:
+            self._file_buffer.clear()
+            return
+        text = "".join(self._file_buffer)
+        self._file_buffer.clear()
+        if self.path is None:
+            self.path = await asyncio.to_thread(self.deliverable_writer.start, self.alias)
+        await asyncio.to_thread(self.deliverable_writer.append, self.path, text)
+
+    def _progress(self, message: str) -> None:
+        if self.orchestrator.stream_progress is not None:
+            self.orchestrator.stream_progress(f"[stream] {self.alias}: {message}")
+
+
 class OrchestratorAgent(AssistantAgent):
     """Coordinates communication, task assignment, and progress tracking between agents."""
 
@@ -44,6 +157,11 @@ class OrchestratorAgent(AssistantAgent):
         notion_logger = kwargs.pop("notion_logger", None)
         slack_notifier = kwargs.pop("slack_notifier", None)
         review_aliases = kwargs.pop("review_aliases", None)
+        max_concurrency = kwargs.pop("max_concurrency", DEFAULT_MAX_CONCURRENCY)
+        stream = kwargs.pop("stream", False)
+        stream_flush_seconds = kwargs.pop("stream_flush_seconds", DEFAULT_STREAM_FLUSH_SECONDS)
+        stream_progress = kwargs.pop("stream_progress", print)
+        response_cache = kwargs.pop("response_cache", None)
 
         super().__init__(
             name=name,
@@ -55,12 +173,23 @@ class OrchestratorAgent(AssistantAgent):
         self.agents: list[AssistantAgent] = []
         self.last_task_results: dict[str, TaskResult] = {}
         self.last_task_errors: dict[str, BaseException] = {}
+        self.last_task_durations: dict[str, float] = {}
+        self.last_critical_path: list[str] = []
         self.last_plan_result: TaskResult | None = None
         self.last_plan_text: str | None = None
         self._notion_pages: dict[str, str] = {}
         self.notion_logger = notion_logger or NotionLogger()
         self.slack_notifier = slack_notifier or SlackNotifier()
         self.review_aliases: set[str] = set(review_aliases or [])
+        self.max_concurrency: int = max_concurrency
+        # Streaming consumes ``run_stream``: deliverables grow as text arrives, progress
+        # lines go to ``stream_progress`` and Notion gets the new text periodically.
+        self.stream: bool = stream
+        self.stream_flush_seconds: float = stream_flush_seconds
+        self.stream_progress: Callable[[str], None] | None = stream_progress
+        self._cancellation_tokens: dict[str, CancellationToken] = {}
+        # Optional model response cache (anything with ``stats()``); sprints report its hits.
+        self.response_cache = response_cache
 
         if agents:
             self.register_agents(*agents)
@@ -102,6 +231,23 @@ class OrchestratorAgent(AssistantAgent):
         """Retrieve a registered agent by alias or name."""
         return self._agents_by_alias.get(alias)
 
+    def abort_task(self, alias: str | None = None) -> list[str]:
+        """Abort the running task of ``alias`` (or every running task) and return the aliases.
+
+        An aborted task ends with a :class:`TaskAborted` error, so its
+        dependents are skipped and, when streaming, its partial deliverable
+        is kept. Call this from the event loop running the sprint (another
+        task, a signal handler or ``loop.call_soon_threadsafe``).
+        """
+        aliases = [alias] if alias is not None else list(self._cancellation_tokens)
+        aborted = []
+        for key in aliases:
+            token = self._cancellation_tokens.get(key)
+            if token is not None and not token.is_cancelled():
+                token.cancel()
+                aborted.append(key)
+        return aborted
+
     def delegate_tasks(
         self,
         assignments: Mapping[str, str],
@@ -110,113 +256,401 @@ class OrchestratorAgent(AssistantAgent):
         review_aliases: Sequence[str] | None = None,
         deliverable_writer: DeliverableWriter | None = None,
         slack_notifier: SlackNotifier | None = None,
+        max_concurrency: int | None = None,
+        prompts: Mapping[str, str] | None = None,
     ) -> str:
-        """Assign tasks and optionally execute them, returning a readable summary."""
-        lines: list[str] = []
-        slack_entries: list[str] = []
+        """Assign tasks and optionally execute them, returning a readable summary.
+
+        Synchronous wrapper around :meth:`delegate_tasks_async`.
+        """
+        return self._run_sync(
+            self.delegate_tasks_async(
+                assignments,
+                execute=execute,
+                review_aliases=review_aliases,
+                deliverable_writer=deliverable_writer,
+                slack_notifier=slack_notifier,
+                max_concurrency=max_concurrency,
+                prompts=prompts,
+            ),
+            "delegate_tasks",
+        )
+
+    async def delegate_tasks_async(
+        self,
+        assignments: Mapping[str, str],
+        *,
+        execute: bool = True,
+        review_aliases: Sequence[str] | None = None,
+        deliverable_writer: DeliverableWriter | None = None,
+        slack_notifier: SlackNotifier | None = None,
+        max_concurrency: int | None = None,
+        prompts: Mapping[str, str] | None = None,
+    ) -> str:
+        """Assign tasks and run the agents concurrently, returning a readable summary.
+
+        At most ``max_concurrency`` agents (default: the orchestrator's
+        ``max_concurrency``) run at once. Notion entries and deliverables are
+        written as each agent finishes, while the summary, the Slack message
+        and ``last_task_results``/``last_task_errors`` follow the order of
+        ``assignments`` whatever order the agents finish in. ``prompts`` can
+        replace the text an agent receives (for example with upstream
+        outputs) while summaries and Notion keep showing the assigned task.
+        """
+        limit = max_concurrency if max_concurrency is not None else self.max_concurrency
+        if limit < 1:
+            raise ValueError("max_concurrency must be at least 1.")
         self.last_task_results = {}
         self.last_task_errors = {}
+        self.last_task_durations = {}
 
-        review_set = set(self.review_aliases)
-        if review_aliases:
-            review_set.update(review_aliases)
+        review_set = self._review_set(review_aliases)
         notifier = slack_notifier or self.slack_notifier
+        semaphore = asyncio.Semaphore(limit)
+        prompts = prompts or {}
+
+        outcomes = await asyncio.gather(
+            *(
+                self._delegate_task(
+                    alias,
+                    task,
+                    prompt=prompts.get(alias, task),
+                    execute=execute,
+                    needs_review=alias in review_set,
+                    deliverable_writer=deliverable_writer,
+                    notify=bool(notifier and notifier.is_configured),
+                    semaphore=semaphore,
+                )
+                for alias, task in assignments.items()
+            )
+        )
 
-        for alias, task in assignments.items():
-            agent = self.get_agent(alias)
-            if agent is None:
-                warning = f"[warning] No registered agent named '{alias}' for task: {task}"
-                lines.append(warning)
-                if notifier and notifier.is_configured:
-                    slack_entries.append(warning)
-                continue
-
-            needs_review = alias in review_set
-            status = "Needs Review" if needs_review else "Assigned"
-            lines.append(f"[assign] {alias} - {agent.__class__.__name__}: {task}")
-            page_id = self._log_notion_assignment(alias, task, status=status)
-
-            if needs_review:
-                review_message = f"[review] {alias}: awaiting human approval before execution."
-                lines.append(review_message)
-                if notifier and notifier.is_configured:
-                    slack_entries.append(f"{alias} pending review: {task}")
-                continue
-
-            if not execute:
-                continue
-
-            try:
-                result = self._execute_agent_task(agent, task)
-            except BaseException as exc:  # noqa: BLE001
-                self.last_task_errors[alias] = exc
-                error_message = f"[error] {alias}: {exc}"
-                lines.append(error_message)
-                self._log_notion_update(alias, page_id, status="Blocked", summary=str(exc))
-                if notifier and notifier.is_configured:
-                    slack_entries.append(error_message)
-                continue
-
-            self.last_task_results[alias] = result
-            reply_text = self._extract_response_text(result)
-            if reply_text:
-                lines.append(f"[reply] {alias}: {reply_text}")
-                self._log_notion_update(alias, page_id, status="Completed", summary=reply_text)
-                if deliverable_writer:
-                    path = deliverable_writer.write(alias, reply_text)
-                    file_message = f"[file] {alias}: saved to {path}"
-                    lines.append(file_message)
-                    if notifier and notifier.is_configured:
-                        slack_entries.append(file_message)
-            else:
-                lines.append(f"[reply] {alias}: (no textual response)")
-                self._log_notion_update(alias, page_id, status="Completed", summary=None)
+        lines: list[str] = []
+        slack_entries: list[str] = []
+        for alias, outcome in zip(assignments, outcomes):
+            lines.extend(outcome.lines)
+            slack_entries.extend(outcome.slack_entries)
+            if outcome.result is not None:
+                self.last_task_results[alias] = outcome.result
+            if outcome.error is not None:
+                self.last_task_errors[alias] = outcome.error
+            if outcome.duration is not None:
+                self.last_task_durations[alias] = outcome.duration
 
         if notifier and notifier.is_configured and slack_entries:
-            notifier.send("Sprint updates:\n" + "\n".join(slack_entries))
+            await asyncio.to_thread(notifier.send, "Sprint updates:\n" + "\n".join(slack_entries))
 
         return "\n".join(lines)
 
+    async def _delegate_task(
+        self,
+        alias: str,
+        task: str,
+        *,
+        prompt: str,
+        execute: bool,
+        needs_review: bool,
+        deliverable_writer: DeliverableWriter | None,
+        notify: bool,
+        semaphore: asyncio.Semaphore,
+    ) -> _TaskOutcome:
+        """Assign, gate, run and record one task; blocking I/O runs in worker threads."""
+        outcome = _TaskOutcome()
+        lines, slack_entries = outcome.lines, outcome.slack_entries
+        agent = self.get_agent(alias)
+        if agent is None:
+            warning = f"[warning] No registered agent named '{alias}' for task: {task}"
+            lines.append(warning)
+            if notify:
+                slack_entries.append(warning)
+            return outcome
+
+        status = "Needs Review" if needs_review else "Assigned"
+        lines.append(f"[assign] {alias} - {agent.__class__.__name__}: {task}")
+        page_id = await asyncio.to_thread(self._log_notion_assignment, alias, task, status=status)
+
+        if needs_review:
+            lines.append(f"[review] {alias}: awaiting human approval before execution.")
+            if notify:
+                slack_entries.append(f"{alias} pending review: {task}")
+            return outcome
+
+        if not execute:
+            return outcome
+
+        stream = _TaskStream(self, alias, page_id, deliverable_writer) if self.stream else None
+        token = CancellationToken()
+        self._cancellation_tokens[alias] = token
+        error: BaseException | None = None
+        try:
+            async with semaphore:
+                started = time.perf_counter()
+                try:
+                    result = await self._execute_agent_task(agent, prompt, token, stream)
+                finally:
+                    outcome.duration = time.perf_counter() - started
+                    if stream is not None:
+                        await stream.close()
+        except asyncio.CancelledError:
+            if not token.is_cancelled():
+                raise
+            error = TaskAborted("aborted by operator")
+        except BaseException as exc:  # noqa: BLE001
+            error = exc
+        finally:
+            self._cancellation_tokens.pop(alias, None)
+
+        if error is not None:
+            outcome.error = error
+            error_message = f"[error] {alias}: {error}"
+            lines.append(error_message)
+            await asyncio.to_thread(
+                self._log_notion_update, alias, page_id, status="Blocked", summary=str(error)
+            )
+            if stream is not None and stream.path is not None:
+                lines.append(f"[file] {alias}: partial output saved to {stream.path}")
+            if notify:
+                slack_entries.append(error_message)
+            return outcome
+
+        outcome.result = result
+        reply_text = self._extract_response_text(result)
+        if reply_text:
+            lines.append(f"[reply] {alias}: {reply_text}")
+            await asyncio.to_thread(
+                self._log_notion_update, alias, page_id, status="Completed", summary=reply_text
+            )
+            if deliverable_writer:
+                if stream is not None and stream.path is not None:
+                    path = stream.path
+                else:
+                    path = await asyncio.to_thread(deliverable_writer.write, alias, reply_text)
+                file_message = f"[file] {alias}: saved to {path}"
+                lines.append(file_message)
+                if notify:
+                    slack_entries.append(file_message)
+        else:
+            lines.append(f"[reply] {alias}: (no textual response)")
+            await asyncio.to_thread(
+                self._log_notion_update, alias, page_id, status="Completed", summary=None
+            )
+        return outcome
+
     def run_sprint(
         self,
         assignments: Mapping[str, str],
         *,
+        dependencies: Mapping[str, Sequence[str]] | None = None,
         initiator_alias: str | None = "scrum_master",
         kickoff_task: str | None = None,
         execute: bool = True,
         review_aliases: Sequence[str] | None = None,
         deliverable_writer: DeliverableWriter | None = None,
         slack_notifier: SlackNotifier | None = None,
+        inject_outputs: bool = True,
     ) -> str:
-        """Kick off a sprint with an initiator before delegating the remaining work."""
-        sections: list[str] = []
-        remaining: dict[str, str] = dict(assignments)
-
-        if initiator_alias and initiator_alias in remaining:
-            kickoff_message = kickoff_task or remaining.pop(initiator_alias)
-            kickoff_summary = self.delegate_tasks(
-                {initiator_alias: kickoff_message},
+        """Run a sprint as waves of dependency-ordered tasks, returning a readable summary.
+
+        Synchronous wrapper around :meth:`run_sprint_async`.
+        """
+        return self._run_sync(
+            self.run_sprint_async(
+                assignments,
+                dependencies=dependencies,
+                initiator_alias=initiator_alias,
+                kickoff_task=kickoff_task,
                 execute=execute,
                 review_aliases=review_aliases,
                 deliverable_writer=deliverable_writer,
                 slack_notifier=slack_notifier,
-            )
-            sections.append("[sprint kickoff]\n" + kickoff_summary)
+                inject_outputs=inject_outputs,
+            ),
+            "run_sprint",
+        )
+
+    async def run_sprint_async(
+        self,
+        assignments: Mapping[str, str],
+        *,
+        dependencies: Mapping[str, Sequence[str]] | None = None,
+        initiator_alias: str | None = "scrum_master",
+        kickoff_task: str | None = None,
+        execute: bool = True,
+        review_aliases: Sequence[str] | None = None,
+        deliverable_writer: DeliverableWriter | None = None,
+        slack_notifier: SlackNotifier | None = None,
+        inject_outputs: bool = True,
+    ) -> str:
+        """Run a sprint as waves of dependency-ordered tasks, returning a readable summary.
+
+        ``dependencies`` maps an alias to the aliases whose tasks must finish
+        first; when ``initiator_alias`` has a task it runs before everything
+        else (with ``kickoff_task`` as its text, if given). Each wave holds
+        every task whose dependencies are done and runs concurrently through
+        :meth:`delegate_tasks_async`. With ``inject_outputs`` a task's prompt
+        gets the replies of its declared dependencies: in place of
+        ``{{alias}}`` placeholders, or appended under "Upstream outputs".
+        Tasks that declare a dependency which errored, awaits review, has no
+        agent or was itself skipped are skipped too; the kickoff only sets
+        the order. The summary ends with the critical path: the dependency
+        chain with the longest total agent run time, followed by the response
+        cache's hits and misses during the sprint when one is set. Afterwards
+        ``last_task_results``, ``last_task_errors`` and
+        ``last_task_durations`` cover the whole sprint.
+
+        Every wave runs on the caller's event loop, so an async host (a
+        FastAPI handler, a Jupyter cell) can ``await`` a whole sprint and the
+        agents keep reusing the model client's connection pool.
+        """
+        tasks: dict[str, str] = dict(assignments)
+        if initiator_alias and initiator_alias in tasks and kickoff_task:
+            tasks[initiator_alias] = kickoff_task
+        upstream = self._sprint_dependencies(tasks, dependencies, initiator_alias)
+        waves = self._sprint_waves(tasks, upstream)
+        cache_before = self.response_cache.stats() if self.response_cache else None
 
-        if remaining:
-            sections.append(
-                "[sprint execution]\n"
-                + self.delegate_tasks(
-                    remaining,
+        sections: list[str] = []
+        results: dict[str, TaskResult] = {}
+        errors: dict[str, BaseException] = {}
+        durations: dict[str, float] = {}
+        outputs: dict[str, str] = {}
+        held: set[str] = set()
+        for number, wave in enumerate(waves, start=1):
+            lines: list[str] = []
+            runnable: dict[str, str] = {}
+            prompts: dict[str, str] = {}
+            for alias in wave:
+                # Only declared dependencies block or feed a task; the kickoff just goes first.
+                declared = (dependencies or {}).get(alias, ())
+                blocked = [dep for dep in declared if dep in held]
+                if blocked:
+                    held.add(alias)
+                    lines.append(f"[skipped] {alias}: upstream {', '.join(blocked)} did not finish")
+                    await asyncio.to_thread(
+                        self._log_notion_assignment, alias, tasks[alias], status="Blocked"
+                    )
+                    continue
+                runnable[alias] = tasks[alias]
+                if inject_outputs and declared:
+                    prompts[alias] = self._with_upstream_outputs(
+                        tasks[alias], {dep: outputs[dep] for dep in declared if dep in outputs}
+                    )
+            if runnable:
+                summary = await self.delegate_tasks_async(
+                    runnable,
                     execute=execute,
                     review_aliases=review_aliases,
                     deliverable_writer=deliverable_writer,
                     slack_notifier=slack_notifier,
+                    prompts=prompts,
                 )
-            )
-
+                lines.insert(0, summary)
+                results.update(self.last_task_results)
+                errors.update(self.last_task_errors)
+                durations.update(self.last_task_durations)
+                for alias in runnable:
+                    if alias in self.last_task_results:
+                        outputs[alias] = self._extract_response_text(self.last_task_results[alias])
+                    elif execute:
+                        held.add(alias)
+            title = "[sprint kickoff]" if wave == [initiator_alias] else f"[sprint wave {number}]"
+            sections.append(title + "\n" + "\n".join(line for line in lines if line))
+
+        self.last_task_results = results
+        self.last_task_errors = errors
+        self.last_task_durations = durations
+        path, total = self._critical_path(waves, upstream, durations)
+        self.last_critical_path = path
+        if path:
+            sections.append(f"[critical path] {' -> '.join(path)} ({total:.1f}s)")
+        if cache_before is not None:
+            cache_after = self.response_cache.stats()
+            hits = cache_after["hits"] - cache_before["hits"]
+            misses = cache_after["misses"] - cache_before["misses"]
+            sections.append(f"[cache] {hits} hits, {misses} misses")
         return "\n\n".join(section for section in sections if section)
 
+    @staticmethod
+    def _sprint_dependencies(
+        tasks: Mapping[str, str],
+        dependencies: Mapping[str, Sequence[str]] | None,
+        initiator_alias: str | None,
+    ) -> dict[str, list[str]]:
+        """Return each task's upstream aliases, with the initiator ahead of every other task."""
+        upstream: dict[str, list[str]] = {alias: [] for alias in tasks}
+        for alias, required in (dependencies or {}).items():
+            if alias not in tasks:
+                raise ValueError(f"Dependencies given for '{alias}', which has no task.")
+            for dep in required:
+                if dep not in tasks:
+                    raise ValueError(f"'{alias}' depends on '{dep}', which has no task.")
+                if dep not in upstream[alias]:
+                    upstream[alias].append(dep)
+        if initiator_alias in tasks:
+            for alias, required in upstream.items():
+                if alias != initiator_alias and initiator_alias not in required:
+                    required.insert(0, initiator_alias)
+        return upstream
+
+    @staticmethod
+    def _sprint_waves(
+        tasks: Mapping[str, str], upstream: Mapping[str, Sequence[str]]
+    ) -> list[list[str]]:
+        """Group tasks into waves whose dependencies all sit in earlier waves."""
+        pending = {alias: set(upstream[alias]) for alias in tasks}
+        waves: list[list[str]] = []
+        while pending:
+            wave = [alias for alias in tasks if alias in pending and not pending[alias]]
+            if not wave:
+                raise ValueError(f"Task dependencies form a cycle among: {', '.join(pending)}")
+            waves.append(wave)
+            for alias in wave:
+                del pending[alias]
+            for required in pending.values():
+                required.difference_update(wave)
+        return waves
+
+    @staticmethod
+    def _with_upstream_outputs(task: str, outputs: Mapping[str, str]) -> str:
+        """Fill ``{{alias}}`` placeholders with upstream replies and append the rest."""
+        appended: list[str] = []
+        for alias, text in outputs.items():
+            placeholder = "{{" + alias + "}}"
+            if placeholder in task:
+                task = task.replace(placeholder, text)
+            else:
+                appended.append(f"[{alias}]\n{text}")
+        if appended:
+            task += "\n\nUpstream outputs:\n" + "\n\n".join(appended)
+        return task
+
+    @staticmethod
+    def _critical_path(
+        waves: Sequence[Sequence[str]],
+        upstream: Mapping[str, Sequence[str]],
+        durations: Mapping[str, float],
+    ) -> tuple[list[str], float]:
+        """Return the chain of executed tasks with the longest summed run time."""
+        finish: dict[str, float] = {}
+        previous: dict[str, str | None] = {}
+        for wave in waves:
+            for alias in wave:
+                if alias not in durations:
+                    continue
+                ran = [dep for dep in upstream[alias] if dep in finish]
+                before = max(ran, key=finish.__getitem__, default=None)
+                finish[alias] = durations[alias] + (finish[before] if before else 0.0)
+                previous[alias] = before
+        if not finish:
+            return [], 0.0
+        node: str | None = max(finish, key=finish.__getitem__)
+        total = finish[node]
+        path: list[str] = []
+        while node is not None:
+            path.append(node)
+            node = previous[node]
+        return path[::-1], total
+
     async def plan(self, user_request: str) -> str:
         """Generate an orchestration plan by engaging the underlying language model."""
         if not isinstance(user_request, str) or not user_request.strip():
@@ -234,25 +668,62 @@ class OrchestratorAgent(AssistantAgent):
         return plan_text
 
     def run(self, user_request: str) -> str:
-        try:
-            asyncio.get_running_loop()
-        except RuntimeError:
-            return asyncio.run(self.plan(user_request))
-        raise RuntimeError(
-            "OrchestratorAgent.run cannot be called while an event loop is running; use `await orchestrator.plan(...)` instead."
-        )
+        """Synchronous wrapper around :meth:`plan`."""
+        return self._run_sync(self.plan(user_request), "OrchestratorAgent.run", "plan")
+
+    def _review_set(self, review_aliases: Sequence[str] | None) -> set[str]:
+        review_set = set(self.review_aliases)
+        if review_aliases:
+            review_set.update(review_aliases)
+        return review_set
+
+    async def _execute_agent_task(
+        self,
+        agent: AssistantAgent,
+        task: str,
+        cancellation_token: CancellationToken,
+        stream: _TaskStream | None = None,
+    ) -> TaskResult:
+        if stream is None:
+            return await agent.run(
+                task=task, cancellation_token=cancellation_token, output_task_messages=False
+            )
 
-    def _execute_agent_task(self, agent: AssistantAgent, task: str) -> TaskResult:
-        async def _runner() -> TaskResult:
-            return await agent.run(task=task, output_task_messages=False)
+        result: TaskResult | None = None
+        chunked = False
+        async for item in agent.run_stream(
+            task=task, cancellation_token=cancellation_token, output_task_messages=False
+        ):
+            if isinstance(item, TaskResult):
+                result = item
+            elif isinstance(item, ModelClientStreamingChunkEvent):
+                chunked = True
+                await stream.write(item.content)
+            elif isinstance(item, BaseChatMessage):
+                # With model_client_stream the chunks already carried this message's text.
+                if not chunked:
+                    await stream.write(self._message_to_text(item))
+                await stream.write("\n\n")
+                chunked = False
+        if result is None:
+            raise RuntimeError(f"{agent.name} finished its stream without a result.")
+        return result
 
+    @staticmethod
+    def _run_sync(coro: Coroutine[Any, Any, T], name: str, async_name: str | None = None) -> T:
+        """Run ``coro`` on a fresh event loop, refusing when one is already running.
+
+        Each call owns one loop for its whole duration; async hosts should
+        await the ``*_async`` method instead.
+        """
         try:
             asyncio.get_running_loop()
         except RuntimeError:
-            return asyncio.run(_runner())
-
+            return asyncio.run(coro)
+        coro.close()
+        target = async_name or f"{name}_async"
         raise RuntimeError(
-            "delegate_tasks cannot execute while an event loop is already running; use the async APIs directly in that context."
+            f"{name} cannot be called while an event loop is running; use `await orchestrator.{target}(...)` instead."
         )
 
     @staticmethod
@@ -5,7 +5,7 @@ from __future__ import annotations
 import os
 from datetime import datetime
 from pathlib import Path
-from typing import Dict
+from typing import Dict, List, Mapping
 
 # Default fallback tasks identical to prior sprint configuration
 _DEFAULT_TASKS: Dict[str, str] = {
@@ -24,6 +24,14 @@ _DEFAULT_TASKS: Dict[str, str] = {
     "scrum_master": "Initiate Sprint 1 planning, announce assignments, and ensure ceremonies are on the calendar.",
 }
 
+# Aliases whose output each task builds on; run_sprint schedules them first.
+_DEFAULT_DEPENDENCIES: Dict[str, List[str]] = {
+    "product_manager": ["vision_strategy"],
+    "developer": ["product_manager", "technical_architect"],
+    "data_analytics": ["product_manager"],
+    "marketing_brand": ["vision_strategy"],
+}
+
 _WEEKLY_PLAYBOOK: Dict[int, Dict[str, str]] = {
     # Monday - research heavy
     0: {
@@ -75,4 +83,13 @@ def get_tasks_for_today(today: datetime | None = None) -> Dict[str, str]:
     return base_tasks
 
 
-__all__ = ["get_tasks_for_today"]
+def get_task_dependencies(tasks: Mapping[str, str]) -> Dict[str, List[str]]:
+    """Return the default dependencies between the aliases present in ``tasks``."""
+    return {
+        alias: [dep for dep in deps if dep in tasks]
+        for alias, deps in _DEFAULT_DEPENDENCIES.items()
+        if alias in tasks and any(dep in tasks for dep in deps)
+    }
+
+
+__all__ = ["get_task_dependencies", "get_tasks_for_today"]
@@ -1,10 +1,12 @@
 """Value Adders World integrations."""
 
 from integrations.notion_logger import NotionConfig, NotionLogger
+from integrations.response_cache import ResponseCache
 from integrations.slack_notifier import SlackNotifier
 
 __all__ = [
     "NotionConfig",
     "NotionLogger",
+    "ResponseCache",
     "SlackNotifier",
 ]
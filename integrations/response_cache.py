@@ -0,0 +1,211 @@
+"""Disk-backed cache for model responses.
+
+:class:`ResponseCache` is a store for autogen's ``ChatCompletionCache``
+wrapper. The wrapper keys each call on a hash of the messages it sends,
+which include the agent's system message and the task text. It also hashes
+the tool schemas and the output options. The cache adds the model name and
+``max_tokens`` to that key as a namespace. Repeated playbook tasks and
+reruns after a crash are then answered from disk instead of the API.
+
+Entries live in one SQLite file. They expire after ``ttl_seconds``. Once
+the file holds more than ``max_bytes`` of responses, the least recently
+used entries are evicted first. :meth:`ResponseCache.stats` reports hits
+and misses since the cache was opened.
+
+``ChatCompletionCache`` calls the store synchronously from agents running
+concurrently on one event loop, so the common path stays cheap. A hit is
+one indexed read: access times are kept in memory and written in one batch
+when entries are evicted, stats are read or the cache is closed. The stored
+size is tracked as a running total, so a write does not have to sum the
+table.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Optional
+
+from autogen_core import CacheStore
+from autogen_core.models import ChatCompletionClient
+from autogen_ext.models.cache import CHAT_CACHE_VALUE_TYPE, ChatCompletionCache
+
+LOGGER = logging.getLogger(__name__)
+
+DEFAULT_TTL_SECONDS = 7 * 24 * 3600
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    accessed_at REAL NOT NULL
+)
+"""
+
+
+class ResponseCache(CacheStore[CHAT_CACHE_VALUE_TYPE]):
+    """SQLite store with TTL and size-bounded LRU eviction for ``ChatCompletionCache``."""
+
+    def __init__(
+        self,
+        path: str | Path,
+        *,
+        namespace: str = "",
+        ttl_seconds: float | None = DEFAULT_TTL_SECONDS,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+    ) -> None:
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.namespace = namespace
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._touched: dict[str, float] = {}
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        # WAL with synchronous=NORMAL commits without an fsync per write.
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(_SCHEMA)
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed_at)"
+        )
+        self._conn.commit()
+        self._bytes = self._stored_bytes()
+
+    @classmethod
+    def for_model(
+        cls, path: str | Path, *, model: str, max_tokens: int | None, **kwargs: Any
+    ) -> "ResponseCache":
+        """Open a cache whose keys also depend on ``model`` and ``max_tokens``."""
+        namespace = hashlib.sha256(json.dumps([model, max_tokens]).encode("utf-8")).hexdigest()
+        return cls(path, namespace=namespace[:16], **kwargs)
+
+    def wrap(self, client: ChatCompletionClient) -> ChatCompletionCache:
+        """Return ``client`` wrapped so its responses are served from this cache."""
+        return ChatCompletionCache(client, self)
+
+    def get(
+        self, key: str, default: Optional[CHAT_CACHE_VALUE_TYPE] = None
+    ) -> Optional[CHAT_CACHE_VALUE_TYPE]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, created_at FROM responses WHERE key = ?", (self._key(key),)
+            ).fetchone()
+            if row is not None and self._expired(row[1], now):
+                self._remove(self._key(key))
+                self._conn.commit()
+                row = None
+            if row is None:
+                self.misses += 1
+                return default
+            self._touched[self._key(key)] = now
+            self.hits += 1
+        # ChatCompletionCache rebuilds CreateResult objects from the decoded JSON.
+        return json.loads(row[0])
+
+    def set(self, key: str, value: CHAT_CACHE_VALUE_TYPE) -> None:
+        try:
+            encoded = json.dumps(value, default=_to_json)
+        except (TypeError, ValueError) as exc:
+            LOGGER.warning("Not caching a response that cannot be serialised: %s", exc)
+            return
+        now = time.time()
+        size = len(encoded.encode("utf-8"))
+        with self._lock:
+            self._remove(self._key(key))
+            self._conn.execute(
+                "INSERT INTO responses (key, value, size, created_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (self._key(key), encoded, size, now, now),
+            )
+            self._touched.pop(self._key(key), None)
+            self._bytes += size
+            if self._bytes > self.max_bytes:
+                self._evict(now)
+            self._conn.commit()
+
+    def stats(self) -> dict[str, int]:
+        """Return hit and miss counts plus the number and size of stored entries."""
+        with self._lock:
+            self._write_touched()
+            self._conn.commit()
+            (entries,) = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "entries": entries,
+                "bytes": self._bytes,
+            }
+
+    def close(self) -> None:
+        with self._lock:
+            self._write_touched()
+            self._conn.commit()
+            self._conn.close()
+
+    # ------------------------------------------------------------------
+    def _key(self, key: str) -> str:
+        return f"{self.namespace}:{key}" if self.namespace else key
+
+    def _expired(self, created_at: float, now: float) -> bool:
+        return self.ttl_seconds is not None and now - created_at > self.ttl_seconds
+
+    def _stored_bytes(self) -> int:
+        (total,) = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()
+        return total
+
+    def _remove(self, key: str) -> None:
+        row = self._conn.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+        if row is not None:
+            self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            self._bytes -= row[0]
+
+    def _write_touched(self) -> None:
+        if self._touched:
+            self._conn.executemany(
+                "UPDATE responses SET accessed_at = ? WHERE key = ?",
+                [(accessed_at, key) for key, accessed_at in self._touched.items()],
+            )
+            self._touched.clear()
+
+    def _evict(self, now: float) -> None:
+        """Drop expired entries, then the least recently used, until under ``max_bytes``."""
+        self._write_touched()
+        if self.ttl_seconds is not None:
+            self._conn.execute(
+                "DELETE FROM responses WHERE created_at < ?", (now - self.ttl_seconds,)
+            )
+        # Re-count here, where it is rare, in case another process shares the file.
+        self._bytes = self._stored_bytes()
+        if self._bytes <= self.max_bytes:
+            return
+        # Walk from least to most recently used until enough has been freed.
+        excess = self._bytes - self.max_bytes
+        stale: list[str] = []
+        for key, size in self._conn.execute("SELECT key, size FROM responses ORDER BY accessed_at"):
+            if excess <= 0:
+                break
+            stale.append(key)
+            excess -= size
+            self._bytes -= size
+        self._conn.executemany("DELETE FROM responses WHERE key = ?", [(key,) for key in stale])
+
+
+def _to_json(value: Any) -> Any:
+    if hasattr(value, "model_dump"):
+        return value.model_dump(mode="json")
+    raise TypeError(f"{type(value).__name__} is not JSON serialisable")
+
+
+__all__ = ["DEFAULT_MAX_BYTES", "DEFAULT_TTL_SECONDS", "ResponseCache"]
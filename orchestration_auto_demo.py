@@ -7,10 +7,13 @@ and prints a delegation summary for each team member's initial task.
 
 from __future__ import annotations
 
+import asyncio
 import logging
 import os
+import signal
 from typing import Sequence
 
+from autogen_core.models import ChatCompletionClient
 from autogen_ext.models.openai import OpenAIChatCompletionClient
 from dotenv import load_dotenv
 
@@ -21,15 +24,16 @@ from agents.developer_agent import DeveloperAgent
 from agents.finance_funding_agent import FinanceFundingAgent
 from agents.legal_ethics_agent import LegalEthicsAgent
 from agents.marketing_brand_agent import MarketingBrandAgent
-from agents.orchestrator_agent import OrchestratorAgent
+from agents.orchestrator_agent import DEFAULT_MAX_CONCURRENCY, OrchestratorAgent
 from agents.product_manager_agent import ProductManagerAgent
 from agents.research_innovation_agent import ResearchInnovationAgent
 from agents.scrum_master_agent import ScrumMasterAgent
 from agents.spiritual_alignment_agent import SpiritualAlignmentAgent
 from agents.technical_architect_agent import TechnicalArchitectAgent
 from agents.vision_strategy_agent import VisionStrategyAgent
-from automation.playbook import get_tasks_for_today
+from automation.playbook import get_task_dependencies, get_tasks_for_today
 from integrations.notion_task_loader import NotionTaskLoader
+from integrations.response_cache import DEFAULT_MAX_BYTES, DEFAULT_TTL_SECONDS, ResponseCache
 from integrations.slack_notifier import SlackNotifier
 from outputs.deliverable_writer import DeliverableWriter
 from tools.web_fetch import WEB_FETCH_TOOL
@@ -83,55 +87,67 @@ def _resolve_active_tasks(
     return merged or base_tasks
 
 
-def run_auto_demo(
-    tasks: dict[str, str] | None = None, *, notion_loader: NotionTaskLoader | None = None
-) -> None:
-    load_dotenv()
-    model = os.getenv("OPENAI_MODEL", "gpt-4o")
-    max_tokens = _env_int("OPENAI_MAX_TOKENS", 600)
-    client_kwargs: dict[str, object] = {"model": model}
-    if max_tokens is not None:
-        client_kwargs["max_tokens"] = max_tokens
-    model_client = OpenAIChatCompletionClient(**client_kwargs)
+def _response_cache(model: str, max_tokens: int | None) -> ResponseCache | None:
+    """Open the model response cache when ``LLM_CACHE_PATH`` is set."""
+    path = os.getenv("LLM_CACHE_PATH")
+    if not path:
+        return None
+    ttl_hours = _env_int("LLM_CACHE_TTL_HOURS")
+    max_mb = _env_int("LLM_CACHE_MAX_MB")
+    return ResponseCache.for_model(
+        path,
+        model=model,
+        max_tokens=max_tokens,
+        ttl_seconds=ttl_hours * 3600 if ttl_hours is not None else DEFAULT_TTL_SECONDS,
+        max_bytes=max_mb * 1024 * 1024 if max_mb is not None else DEFAULT_MAX_BYTES,
+    )
+
 
-    # Instantiate agents with a shared model client
-    ceo = CEOAgent("ceo", model_client=model_client, tools=[WEB_FETCH_TOOL])
+def _build_orchestrator(
+    model_client: ChatCompletionClient,
+    *,
+    stream: bool = False,
+    response_cache: ResponseCache | None = None,
+) -> OrchestratorAgent:
+    # Instantiate agents with a shared model client; streaming agents emit token chunks
+    agent_kwargs = {"tools": [WEB_FETCH_TOOL], "model_client_stream": stream}
+    ceo = CEOAgent("ceo", model_client=model_client, **agent_kwargs)
     vision_strategy = VisionStrategyAgent(
-        "vision_strategy", model_client=model_client, tools=[WEB_FETCH_TOOL]
+        "vision_strategy", model_client=model_client, **agent_kwargs
     )
     product_manager = ProductManagerAgent(
-        "product_manager", model_client=model_client, tools=[WEB_FETCH_TOOL]
+        "product_manager", model_client=model_client, **agent_kwargs
     )
     technical_architect = TechnicalArchitectAgent(
-        "technical_architect", model_client=model_client, tools=[WEB_FETCH_TOOL]
-    )
-    developer = DeveloperAgent("developer", model_client=model_client, tools=[WEB_FETCH_TOOL])
-    data_analytics = DataAnalyticsAgent(
-        "data_analytics", model_client=model_client, tools=[WEB_FETCH_TOOL]
-    )
-    legal_ethics = LegalEthicsAgent(
-        "legal_ethics", model_client=model_client, tools=[WEB_FETCH_TOOL]
+        "technical_architect", model_client=model_client, **agent_kwargs
     )
+    developer = DeveloperAgent("developer", model_client=model_client, **agent_kwargs)
+    data_analytics = DataAnalyticsAgent("data_analytics", model_client=model_client, **agent_kwargs)
+    legal_ethics = LegalEthicsAgent("legal_ethics", model_client=model_client, **agent_kwargs)
     finance_funding = FinanceFundingAgent(
-        "finance_funding", model_client=model_client, tools=[WEB_FETCH_TOOL]
+        "finance_funding", model_client=model_client, **agent_kwargs
     )
     marketing_brand = MarketingBrandAgent(
-        "marketing_brand", model_client=model_client, tools=[WEB_FETCH_TOOL]
+        "marketing_brand", model_client=model_client, **agent_kwargs
     )
     community_partnerships = CommunityPartnershipsAgent(
-        "community_partnerships", model_client=model_client, tools=[WEB_FETCH_TOOL]
+        "community_partnerships", model_client=model_client, **agent_kwargs
     )
     spiritual_alignment = SpiritualAlignmentAgent(
-        "spiritual_alignment", model_client=model_client, tools=[WEB_FETCH_TOOL]
+        "spiritual_alignment", model_client=model_client, **agent_kwargs
     )
     research_innovation = ResearchInnovationAgent(
-        "research_innovation", model_client=model_client, tools=[WEB_FETCH_TOOL]
-    )
-    scrum_master = ScrumMasterAgent(
-        "scrum_master", model_client=model_client, tools=[WEB_FETCH_TOOL]
+        "research_innovation", model_client=model_client, **agent_kwargs
     )
+    scrum_master = ScrumMasterAgent("scrum_master", model_client=model_client, **agent_kwargs)
 
-    orchestrator = OrchestratorAgent("orchestrator", model_client=model_client)
+    orchestrator = OrchestratorAgent(
+        "orchestrator",
+        model_client=model_client,
+        max_concurrency=_env_int("AGENT_CONCURRENCY", DEFAULT_MAX_CONCURRENCY),
+        stream=stream,
+        response_cache=response_cache,
+    )
     orchestrator.register_agents(
         ceo,
         vision_strategy,
@@ -147,33 +163,101 @@ def run_auto_demo(
         research_innovation,
         scrum_master,
     )
+    return orchestrator
 
-    sprint_brief = "Plan Sprint 1 for the Value Adders World platform, ensuring every team functions under the CEO's direction."
-    print(orchestrator.run(sprint_brief))
 
-    base_tasks = get_tasks_for_today()
-    active_tasks = _resolve_active_tasks(
-        tasks_override=tasks,
-        notion_loader=notion_loader,
-        base_tasks=base_tasks,
-    )
-    review_aliases: Sequence[str] = _parse_aliases(os.getenv("REVIEW_REQUIRED_ALIASES", ""))
-    notifier = SlackNotifier()
-    deliverable_writer: DeliverableWriter | None = None
-    if _env_bool("WRITE_DELIVERABLES", True):
-        deliverable_writer = DeliverableWriter()
-
-    sprint_summary = orchestrator.run_sprint(
-        active_tasks,
-        initiator_alias=os.getenv("SPRINT_INITIATOR", "scrum_master"),
-        execute=_env_bool("AUTO_EXECUTE", True),
-        review_aliases=review_aliases,
-        deliverable_writer=deliverable_writer,
-        slack_notifier=notifier,
-    )
+def _abort_on_interrupt(loop: asyncio.AbstractEventLoop, orchestrator: OrchestratorAgent) -> bool:
+    """Route Ctrl+C to ``orchestrator.abort_task``; returns False where unsupported."""
+
+    def abort_running() -> None:
+        aborted = orchestrator.abort_task()
+        print(f"[abort] {', '.join(aborted) or 'no running agents'}")
+
+    try:
+        loop.add_signal_handler(signal.SIGINT, abort_running)
+    except (NotImplementedError, RuntimeError):
+        # Windows event loops and non-main threads cannot install signal handlers.
+        return False
+    return True
+
+
+async def run_auto_demo_async(
+    tasks: dict[str, str] | None = None, *, notion_loader: NotionTaskLoader | None = None
+) -> str:
+    """Run the kickoff plan and the daily sprint on the running event loop.
+
+    One model client, and so one HTTP connection pool, serves every agent for
+    the whole run and is closed at the end. Async hosts (FastAPI, Jupyter)
+    await this directly; :func:`run_auto_demo` wraps it for scripts.
+
+    With ``AGENT_STREAM`` enabled, replies stream into their deliverables as
+    they are generated and Ctrl+C aborts the agents running at that moment
+    (their dependents are skipped) instead of stopping the whole run. With
+    ``LLM_CACHE_PATH`` set, model responses are cached on disk and repeated
+    calls are answered from the cache.
+    """
+    load_dotenv()
+    model = os.getenv("OPENAI_MODEL", "gpt-4o")
+    max_tokens = _env_int("OPENAI_MAX_TOKENS", 600)
+    client_kwargs: dict[str, object] = {"model": model}
+    if max_tokens is not None:
+        client_kwargs["max_tokens"] = max_tokens
+    model_client: ChatCompletionClient = OpenAIChatCompletionClient(**client_kwargs)
+    response_cache = _response_cache(model, max_tokens)
+    if response_cache is not None:
+        model_client = response_cache.wrap(model_client)
+
+    stream = _env_bool("AGENT_STREAM", False)
+    loop = asyncio.get_running_loop()
+    abort_on_interrupt = False
+    try:
+        orchestrator = _build_orchestrator(
+            model_client, stream=stream, response_cache=response_cache
+        )
+        if stream:
+            abort_on_interrupt = _abort_on_interrupt(loop, orchestrator)
+
+        sprint_brief = "Plan Sprint 1 for the Value Adders World platform, ensuring every team functions under the CEO's direction."
+        print(await orchestrator.plan(sprint_brief))
+
+        base_tasks = get_tasks_for_today()
+        active_tasks = await asyncio.to_thread(
+            _resolve_active_tasks,
+            tasks_override=tasks,
+            notion_loader=notion_loader,
+            base_tasks=base_tasks,
+        )
+        review_aliases: Sequence[str] = _parse_aliases(os.getenv("REVIEW_REQUIRED_ALIASES", ""))
+        notifier = SlackNotifier()
+        deliverable_writer: DeliverableWriter | None = None
+        if _env_bool("WRITE_DELIVERABLES", True):
+            deliverable_writer = DeliverableWriter()
+
+        sprint_summary = await orchestrator.run_sprint_async(
+            active_tasks,
+            dependencies=get_task_dependencies(active_tasks),
+            initiator_alias=os.getenv("SPRINT_INITIATOR", "scrum_master"),
+            execute=_env_bool("AUTO_EXECUTE", True),
+            review_aliases=review_aliases,
+            deliverable_writer=deliverable_writer,
+            slack_notifier=notifier,
+        )
+    finally:
+        if abort_on_interrupt:
+            loop.remove_signal_handler(signal.SIGINT)
+        await model_client.close()
+        if response_cache is not None:
+            response_cache.close()
 
     print("\nSprint summary:\n")
     print(sprint_summary)
+    return sprint_summary
+
+
+def run_auto_demo(
+    tasks: dict[str, str] | None = None, *, notion_loader: NotionTaskLoader | None = None
+) -> None:
+    asyncio.run(run_auto_demo_async(tasks, notion_loader=notion_loader))
 
 
 if __name__ == "__main__":
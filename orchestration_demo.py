@@ -7,6 +7,7 @@ OrchestratorAgent so the organisation can coordinate work across teams.
 
 from __future__ import annotations
 
+import asyncio
 import os
 
 from autogen_ext.models.openai import OpenAIChatCompletionClient
@@ -26,7 +27,7 @@ from agents.scrum_master_agent import ScrumMasterAgent
 from agents.spiritual_alignment_agent import SpiritualAlignmentAgent
 from agents.technical_architect_agent import TechnicalArchitectAgent
 from agents.vision_strategy_agent import VisionStrategyAgent
-from automation.playbook import get_tasks_for_today
+from automation.playbook import get_task_dependencies, get_tasks_for_today
 from integrations.slack_notifier import SlackNotifier
 from outputs.deliverable_writer import DeliverableWriter
 from tools.web_fetch import WEB_FETCH_TOOL
@@ -55,16 +56,7 @@ def _env_int(name: str, default: int | None = None) -> int | None:
         return default
 
 
-def run_demo() -> None:
-    """Run a demonstration of the Value Adders multi-agent system."""
-    load_dotenv()
-    model = os.getenv("OPENAI_MODEL", "gpt-4o")
-    max_tokens = _env_int("OPENAI_MAX_TOKENS", 600)
-    client_kwargs: dict[str, object] = {"model": model}
-    if max_tokens is not None:
-        client_kwargs["max_tokens"] = max_tokens
-    model_client = OpenAIChatCompletionClient(**client_kwargs)
-
+def _build_orchestrator(model_client: OpenAIChatCompletionClient) -> OrchestratorAgent:
     # Instantiate each specialized agent with a unique name and model_client
     ceo = CEOAgent("ceo", model_client=model_client, tools=[WEB_FETCH_TOOL])
     scrum_master = ScrumMasterAgent(
@@ -118,34 +110,61 @@ def run_demo() -> None:
         spiritual_alignment,
         research_innovation,
     )
+    return orchestrator
 
-    user_request = (
-        "Plan Sprint 1 for the Value Adders World platform. "
-        "Produce a backlog for the AddValue App MVP including Activation Day, micro-act logging, "
-        "Weekly Wave, dashboards and community features. Assign tasks to each agent accordingly "
-        "and ensure alignment with our Living Constitution and ethical guidelines."
-    )
 
-    result = orchestrator.run(user_request)
-    print(result)
-
-    tasks = get_tasks_for_today()
-    review_aliases = _parse_aliases(os.getenv("REVIEW_REQUIRED_ALIASES", ""))
-    notifier = SlackNotifier()
-    deliverable_writer: DeliverableWriter | None = None
-    if _env_bool("WRITE_DELIVERABLES", True):
-        deliverable_writer = DeliverableWriter()
-
-    summary = orchestrator.run_sprint(
-        tasks,
-        initiator_alias=os.getenv("SPRINT_INITIATOR", "scrum_master"),
-        execute=_env_bool("AUTO_EXECUTE", True),
-        review_aliases=review_aliases,
-        deliverable_writer=deliverable_writer,
-        slack_notifier=notifier,
-    )
+async def run_demo_async() -> str:
+    """Run the demonstration on the running event loop and return the sprint summary.
+
+    All agents share one model client, closed once the sprint is done.
+    """
+    load_dotenv()
+    model = os.getenv("OPENAI_MODEL", "gpt-4o")
+    max_tokens = _env_int("OPENAI_MAX_TOKENS", 600)
+    client_kwargs: dict[str, object] = {"model": model}
+    if max_tokens is not None:
+        client_kwargs["max_tokens"] = max_tokens
+    model_client = OpenAIChatCompletionClient(**client_kwargs)
+
+    try:
+        orchestrator = _build_orchestrator(model_client)
+
+        user_request = (
+            "Plan Sprint 1 for the Value Adders World platform. "
+            "Produce a backlog for the AddValue App MVP including Activation Day, micro-act logging, "
+            "Weekly Wave, dashboards and community features. Assign tasks to each agent accordingly "
+            "and ensure alignment with our Living Constitution and ethical guidelines."
+        )
+
+        result = await orchestrator.plan(user_request)
+        print(result)
+
+        tasks = get_tasks_for_today()
+        review_aliases = _parse_aliases(os.getenv("REVIEW_REQUIRED_ALIASES", ""))
+        notifier = SlackNotifier()
+        deliverable_writer: DeliverableWriter | None = None
+        if _env_bool("WRITE_DELIVERABLES", True):
+            deliverable_writer = DeliverableWriter()
+
+        summary = await orchestrator.run_sprint_async(
+            tasks,
+            dependencies=get_task_dependencies(tasks),
+            initiator_alias=os.getenv("SPRINT_INITIATOR", "scrum_master"),
+            execute=_env_bool("AUTO_EXECUTE", True),
+            review_aliases=review_aliases,
+            deliverable_writer=deliverable_writer,
+            slack_notifier=notifier,
+        )
+    finally:
+        await model_client.close()
     print("\nSprint summary:\n")
     print(summary)
+    return summary
+
+
+def run_demo() -> None:
+    """Run a demonstration of the Value Adders multi-agent system."""
+    asyncio.run(run_demo_async())
 
 
 if __name__ == "__main__":
@@ -15,14 +15,29 @@ class DeliverableWriter:
         self.base_path.mkdir(parents=True, exist_ok=True)
 
     def write(self, agent_alias: str, content: str) -> Path:
+        filename, header = self._new_file(agent_alias)
+        filename.write_text(header + content, encoding="utf-8")
+        return filename
+
+    def start(self, agent_alias: str) -> Path:
+        """Create a deliverable holding only its header, for :meth:`append` to extend."""
+        filename, header = self._new_file(agent_alias)
+        filename.write_text(header, encoding="utf-8")
+        return filename
+
+    def append(self, path: Path, content: str) -> None:
+        """Append streamed output to a deliverable created by :meth:`start`."""
+        with path.open("a", encoding="utf-8") as handle:
+            handle.write(content)
+
+    def _new_file(self, agent_alias: str) -> tuple[Path, str]:
         timestamp = datetime.utcnow().strftime("%Y%m%d-%H%M%S")
         safe_alias = agent_alias.replace("/", "-")
         agent_dir = self.base_path / safe_alias
         agent_dir.mkdir(parents=True, exist_ok=True)
         filename = agent_dir / f"{timestamp}.md"
         header = f"# {agent_alias} deliverable\n\nGenerated at {timestamp} UTC\n\n"
-        filename.write_text(header + content, encoding="utf-8")
-        return filename
+        return filename, header
 
 
 __all__ = ["DeliverableWriter"]
@@ -1,38 +1,121 @@
-﻿"""FastAPI router exposing the PathLog prototype service."""
+﻿"""FastAPI router exposing the PathLog prototype service.
+
+Handlers are ``async``. CPU-heavy work (key derivation, unlocking, capture
+encryption, decrypting reads, exports and key rotation) is offloaded to a
+bounded :class:`~pathlog.offload.Offloader` that answers 503 once its queue
+is full; cheap calls run inline or on the default threadpool, so health
+checks and ``/connect`` stay responsive during a burst of unlocks.
+"""
 
 from __future__ import annotations
 
-from fastapi import FastAPI, HTTPException
+import asyncio
+import tempfile
+from contextlib import asynccontextmanager
+from datetime import date, datetime
+from typing import Any, AsyncIterator, Callable, Iterator, Literal, TypeVar
+
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 
 from .models import (
+    BackupChainResponse,
+    CaptureBatchRequest,
+    CaptureBatchResponse,
+    CaptureBatchResult,
     CaptureEventRequest,
     CaptureEventResponse,
     ConsentRequest,
     ConsentResponse,
     ConnectToolRequest,
     ConnectToolResponse,
+    DeleteEventResponse,
+    EvictSessionsRequest,
+    EvictSessionsResponse,
+    ExportRequest,
     ExportResponse,
+    FlushResponse,
     ImportRequest,
     ImportResponse,
+    LockRequest,
+    LockResponse,
+    OffloadMetricsResponse,
+    RecallResponse,
+    ReencryptRequest,
+    ReindexResponse,
     RotateKeyRequest,
     RotateKeyResponse,
+    RotationStatusResponse,
+    SearchHit,
+    SearchResponse,
     StatsResponse,
     TimelineEntry,
     TimelineResponse,
+    TrainDictionaryRequest,
+    TrainDictionaryResponse,
+    UnlockRequest,
+    UnlockResponse,
 )
-from .service import PathLogService
+from .bundle import BUNDLE_MEDIA_TYPE, SPOOL_MAX_BYTES
+from .ingest import IngestCommitError, IngestQueueFull
+from .offload import OffloadRejected, Offloader
+from .service import AccessDenied, PathLogService, ProfileConflict
+
+
+@asynccontextmanager
+async def _lifespan(_: FastAPI) -> AsyncIterator[None]:
+    yield
+    offloader.close()
+    # Commit anything still sitting in the write-behind queue before exiting.
+    service.close()
+
 
 app = FastAPI(
     title="PathLog Prototype",
     description="Encrypted memory kernel for Value Adders agents.",
     version="0.1.0",
+    lifespan=_lifespan,
 )
 
 service = PathLogService()
+offloader = Offloader(
+    workers=service.config.offload_workers, max_pending=service.config.offload_queue_size
+)
+
+R = TypeVar("R")
+
+
+async def _offload(func: Callable[..., R], /, *args: Any, **kwargs: Any) -> R:
+    """Run CPU-heavy service work on the bounded offload pool."""
+    try:
+        return await offloader.run(func, *args, **kwargs)
+    except OffloadRejected as exc:
+        raise HTTPException(status_code=503, detail=str(exc), headers={"Retry-After": "1"})
+
+
+async def _offload_chunks(chunks: Iterator[bytes]) -> AsyncIterator[bytes]:
+    """Produce each chunk of a streamed bundle on the offload pool.
+
+    Encrypting or decrypting the next chunk is as CPU-heavy as any other
+    vault read, so every ``next()`` goes through the offloader. The response
+    has already started, so a full queue delays the next chunk instead of
+    failing the download.
+    """
+    done = object()
+    while True:
+        try:
+            chunk = await offloader.run(next, chunks, done)
+        except OffloadRejected:
+            await asyncio.sleep(0.05)
+            continue
+        if chunk is done:
+            return
+        yield chunk
 
 
 @app.get("/")
-def root() -> dict[str, str]:
+async def root() -> dict[str, str]:
     return {
         "message": "PathLog prototype is running.",
         "docs": "/docs",
@@ -41,14 +124,21 @@ def root() -> dict[str, str]:
 
 
 @app.get("/healthz")
-def health() -> dict[str, str]:
+async def health() -> dict[str, str]:
     return {"status": "ok"}
 
 
+@app.get("/metrics/offload", response_model=OffloadMetricsResponse)
+async def offload_metrics() -> OffloadMetricsResponse:
+    """Queue depth and counters of the bounded crypto offload pool."""
+    return OffloadMetricsResponse(**offloader.metrics())
+
+
 @app.post("/consent", response_model=ConsentResponse)
-def consent(request: ConsentRequest) -> ConsentResponse:
+async def consent(request: ConsentRequest) -> ConsentResponse:
     try:
-        result = service.register_user(
+        result = await _offload(
+            service.register_user,
             email=request.email,
             accept_terms=request.accept_terms,
             passphrase=request.passphrase,
@@ -65,36 +155,139 @@ def consent(request: ConsentRequest) -> ConsentResponse:
 
 
 @app.post("/connect", response_model=ConnectToolResponse)
-def connect_tool(request: ConnectToolRequest) -> ConnectToolResponse:
+async def connect_tool(request: ConnectToolRequest) -> ConnectToolResponse:
     try:
-        tools = service.connect_tool(request.user_id, request.tool_name)
+        tools = await run_in_threadpool(service.connect_tool, request.user_id, request.tool_name)
     except FileNotFoundError:
         raise HTTPException(status_code=404, detail="User not found")
+    except ProfileConflict as exc:
+        raise HTTPException(status_code=409, detail=str(exc))
     return ConnectToolResponse(user_id=request.user_id, connected_tools=tools)
 
 
+@app.post("/unlock", response_model=UnlockResponse)
+async def unlock(request: UnlockRequest) -> UnlockResponse:
+    try:
+        result = await _offload(
+            service.unlock, request.user_id, request.passphrase, request.ttl_seconds
+        )
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="User not found")
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    return UnlockResponse(**result)
+
+
+@app.post("/lock", response_model=LockResponse)
+async def lock(request: LockRequest) -> LockResponse:
+    try:
+        locked = service.lock(request.user_id, request.session_token)
+    except AccessDenied as exc:
+        raise HTTPException(status_code=403, detail=str(exc))
+    return LockResponse(locked=locked)
+
+
+@app.post("/evict", response_model=EvictSessionsResponse)
+async def evict_sessions(request: EvictSessionsRequest) -> EvictSessionsResponse:
+    try:
+        evicted = await _offload(
+            service.evict_sessions, request.user_id, request.passphrase, request.session_token
+        )
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="User not found")
+    except AccessDenied as exc:
+        raise HTTPException(status_code=403, detail=str(exc))
+    return EvictSessionsResponse(user_id=request.user_id, evicted=evicted)
+
+
 @app.post("/capture", response_model=CaptureEventResponse)
-def capture_event(request: CaptureEventRequest) -> CaptureEventResponse:
+async def capture_event(request: CaptureEventRequest) -> CaptureEventResponse:
     try:
-        result = service.capture_event(
+        result = await _offload(
+            service.capture_event,
             user_id=request.user_id,
             tool_name=request.tool_name,
             prompt=request.prompt,
             response=request.response,
             metadata=request.metadata,
             passphrase=request.passphrase,
+            session_token=request.session_token,
+            wait_for_commit=request.wait_for_commit,
         )
     except FileNotFoundError:
         raise HTTPException(status_code=404, detail="User not found")
+    except (IngestQueueFull, IngestCommitError) as exc:
+        raise HTTPException(status_code=503, detail=str(exc))
     except ValueError as exc:
         raise HTTPException(status_code=400, detail=str(exc))
     return CaptureEventResponse(event_id=result["event_id"], stored_at=result["stored_at"])
 
 
+@app.post("/capture/batch", response_model=CaptureBatchResponse)
+async def capture_batch(request: CaptureBatchRequest) -> CaptureBatchResponse:
+    try:
+        results = await _offload(
+            service.capture_events,
+            user_id=request.user_id,
+            events=[item.model_dump() for item in request.events],
+            passphrase=request.passphrase,
+            session_token=request.session_token,
+            wait_for_commit=request.wait_for_commit,
+        )
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="User not found")
+    except (IngestQueueFull, IngestCommitError) as exc:
+        raise HTTPException(status_code=503, detail=str(exc))
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    failed = sum(1 for item in results if item.get("error"))
+    return CaptureBatchResponse(
+        user_id=request.user_id,
+        captured=len(results) - failed,
+        failed=failed,
+        results=[CaptureBatchResult(**item) for item in results],
+    )
+
+
+@app.post("/flush/{user_id}", response_model=FlushResponse)
+async def flush(user_id: str) -> FlushResponse:
+    """Wait until the user's queued captures are committed (read-your-writes barrier)."""
+    try:
+        await run_in_threadpool(service.flush, user_id)
+    except (RuntimeError, TimeoutError) as exc:
+        raise HTTPException(status_code=503, detail=str(exc))
+    return FlushResponse(user_id=user_id, flushed=True)
+
+
 @app.get("/timeline/{user_id}", response_model=TimelineResponse)
-def timeline(user_id: str, passphrase: str | None = None) -> TimelineResponse:
+async def timeline(
+    user_id: str,
+    passphrase: str | None = None,
+    limit: int | None = Query(None, ge=1, le=500),
+    cursor: str | None = None,
+    after_event_id: str | None = None,
+    since: datetime | None = None,
+    until: datetime | None = None,
+    tool_name: str | None = None,
+    channel: str | None = None,
+    order: Literal["asc", "desc"] = "asc",
+    session_token: str | None = None,
+) -> TimelineResponse:
     try:
-        events = service.fetch_timeline(user_id, passphrase)
+        page = await _offload(
+            service.fetch_timeline_page,
+            user_id,
+            passphrase,
+            limit=limit,
+            cursor=cursor,
+            after_event_id=after_event_id,
+            since=since,
+            until=until,
+            tool_name=tool_name,
+            channel=channel,
+            newest_first=order == "desc",
+            session_token=session_token,
+        )
     except FileNotFoundError:
         raise HTTPException(status_code=404, detail="User not found")
     except ValueError as exc:
@@ -108,15 +301,98 @@ def timeline(user_id: str, passphrase: str | None = None) -> TimelineResponse:
             response=item["response"],
             metadata=item.get("metadata", {}),
         )
-        for item in events
+        for item in page["events"]
+    ]
+    return TimelineResponse(user_id=user_id, events=entries, next_cursor=page["next_cursor"])
+
+
+@app.get("/search/{user_id}", response_model=SearchResponse)
+async def search(
+    user_id: str,
+    q: str = Query(..., min_length=1),
+    limit: int = Query(10, ge=1, le=100),
+    passphrase: str | None = None,
+    session_token: str | None = None,
+) -> SearchResponse:
+    """Full-text search ranked by BM25; only the returned hits are decrypted."""
+    try:
+        result = await _offload(
+            service.search, user_id, passphrase, q, limit=limit, session_token=session_token
+        )
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="User not found")
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    return SearchResponse(user_id=user_id, query=q, results=_search_hits(result["results"]))
+
+
+@app.get("/recall/{user_id}", response_model=RecallResponse)
+async def recall(
+    user_id: str,
+    q: str = Query(..., min_length=1),
+    limit: int = Query(10, ge=1, le=100),
+    mode: Literal["auto", "exact", "ivf"] = "auto",
+    nprobe: int | None = Query(None, ge=1),
+    passphrase: str | None = None,
+    session_token: str | None = None,
+) -> RecallResponse:
+    """Semantic recall by cosine similarity of local embeddings; only hits are decrypted."""
+    try:
+        result = await _offload(
+            service.recall,
+            user_id,
+            passphrase,
+            q,
+            limit=limit,
+            mode=mode,
+            nprobe=nprobe,
+            session_token=session_token,
+        )
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="User not found")
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    except RuntimeError as exc:
+        raise HTTPException(status_code=501, detail=str(exc))
+    return RecallResponse(
+        user_id=user_id, query=q, mode=mode, results=_search_hits(result["results"])
+    )
+
+
+def _search_hits(results: list[dict[str, Any]]) -> list[SearchHit]:
+    return [
+        SearchHit(
+            event_id=item["event_id"],
+            timestamp=item["timestamp"],
+            tool_name=item["tool_name"],
+            prompt=item["prompt"],
+            response=item["response"],
+            metadata=item.get("metadata", {}),
+            score=item["score"],
+        )
+        for item in results
     ]
-    return TimelineResponse(user_id=user_id, events=entries)
 
 
 @app.get("/stats/{user_id}", response_model=StatsResponse)
-def stats(user_id: str, passphrase: str | None = None) -> StatsResponse:
+async def stats(
+    user_id: str,
+    passphrase: str | None = None,
+    session_token: str | None = None,
+    tool_name: str | None = None,
+    channel: str | None = None,
+    day: date | None = None,
+) -> StatsResponse:
     try:
-        result = service.stats(user_id, passphrase)
+        result = await _offload(
+            service.stats,
+            user_id,
+            passphrase,
+            session_token,
+            tool_name=tool_name,
+            channel=channel,
+            day=day.isoformat() if day else None,
+        )
     except FileNotFoundError:
         raise HTTPException(status_code=404, detail="User not found")
     except ValueError as exc:
@@ -124,25 +400,114 @@ def stats(user_id: str, passphrase: str | None = None) -> StatsResponse:
     return StatsResponse(**result)
 
 
+@app.delete("/events/{user_id}/{event_id}", response_model=DeleteEventResponse)
+async def delete_event(
+    user_id: str,
+    event_id: str,
+    passphrase: str | None = None,
+    session_token: str | None = None,
+) -> DeleteEventResponse:
+    try:
+        result = await _offload(service.delete_event, user_id, event_id, passphrase, session_token)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="User not found")
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Event not found")
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    return DeleteEventResponse(**result)
+
+
 @app.post("/export", response_model=ExportResponse)
-def export_bundle(request: RotateKeyRequest) -> ExportResponse:
+async def export_bundle(request: ExportRequest) -> ExportResponse:
     try:
-        bundle = service.export_bundle(request.user_id)
+        bundle = await _offload(
+            service.export_bundle,
+            request.user_id,
+            decrypt=request.decrypt,
+            passphrase=request.passphrase,
+            session_token=request.session_token,
+        )
     except FileNotFoundError:
         raise HTTPException(status_code=404, detail="User not found")
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
     return ExportResponse(user_id=request.user_id, bundle=bundle)
 
 
+@app.get("/export/{user_id}/stream")
+async def export_stream(
+    user_id: str,
+    decrypt: bool = False,
+    passphrase: str | None = None,
+    session_token: str | None = None,
+) -> StreamingResponse:
+    """Stream the backup bundle as NDJSON with chunked transfer, in constant memory."""
+    try:
+        chunks = await _offload(
+            service.export_stream,
+            user_id,
+            decrypt=decrypt,
+            passphrase=passphrase,
+            session_token=session_token,
+        )
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="User not found")
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    return StreamingResponse(
+        _offload_chunks(chunks),
+        media_type=BUNDLE_MEDIA_TYPE,
+        headers={"Content-Disposition": f'attachment; filename="pathlog-{user_id}.ndjson"'},
+    )
+
+
+@app.post("/import/stream", response_model=ImportResponse)
+async def import_stream(request: Request, target_user_id: str | None = None) -> ImportResponse:
+    """Restore an NDJSON bundle sent as the raw request body (validated before writing).
+
+    Full bundles replace the vault; delta backups are applied on top of the
+    backup they follow, so a chain is restored by posting each bundle in order.
+    """
+    with tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES) as body:
+        async for chunk in request.stream():
+            await run_in_threadpool(body.write, chunk)
+        body.seek(0)
+        try:
+            result = await _offload(service.import_stream, body, target_user_id)
+        except FileNotFoundError:
+            raise HTTPException(status_code=404, detail="User not found")
+        except ValueError as exc:
+            raise HTTPException(status_code=400, detail=str(exc))
+    return ImportResponse(**result)
+
+
 @app.post("/import", response_model=ImportResponse)
-def import_bundle(request: ImportRequest) -> ImportResponse:
-    result = service.import_bundle(request.bundle, request.target_user_id)
+async def import_bundle(request: ImportRequest) -> ImportResponse:
+    result = await _offload(service.import_bundle, request.bundle, request.target_user_id)
     return ImportResponse(**result)
 
 
 @app.post("/rotate-key", response_model=RotateKeyResponse)
-def rotate_key(request: RotateKeyRequest) -> RotateKeyResponse:
+async def rotate_key(request: RotateKeyRequest) -> RotateKeyResponse:
+    try:
+        result = await _offload(
+            service.rotate_key, request.user_id, request.passphrase, reencrypt=request.reencrypt
+        )
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="User not found")
+    except ProfileConflict as exc:
+        raise HTTPException(status_code=409, detail=str(exc))
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    return RotateKeyResponse(**result)
+
+
+@app.post("/reencrypt", response_model=RotateKeyResponse)
+async def reencrypt_events(request: ReencryptRequest) -> RotateKeyResponse:
+    """Run (or resume) a full re-encryption of history under fresh data keys."""
     try:
-        result = service.rotate_key(request.user_id, request.passphrase)
+        result = await _offload(service.reencrypt_events, request.user_id, request.passphrase)
     except FileNotFoundError:
         raise HTTPException(status_code=404, detail="User not found")
     except ValueError as exc:
@@ -150,16 +515,96 @@ def rotate_key(request: RotateKeyRequest) -> RotateKeyResponse:
     return RotateKeyResponse(**result)
 
 
+@app.post("/reindex/{user_id}", response_model=ReindexResponse)
+async def reindex_events(user_id: str) -> ReindexResponse:
+    """Recompute event seek metadata once for a vault written before time-ordered ids."""
+    try:
+        result = await run_in_threadpool(service.reindex_events, user_id)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="User not found")
+    return ReindexResponse(**result)
+
+
+@app.get("/rotate-key/{user_id}/status", response_model=RotationStatusResponse)
+async def rotation_status(user_id: str) -> RotationStatusResponse:
+    try:
+        result = await run_in_threadpool(service.rotation_status, user_id)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="User not found")
+    return RotationStatusResponse(**result)
+
+
+@app.post("/compression/train", response_model=TrainDictionaryResponse)
+async def train_compression_dictionary(request: TrainDictionaryRequest) -> TrainDictionaryResponse:
+    """Train a per-user compression dictionary from recent events."""
+    try:
+        result = await _offload(
+            service.train_compression_dictionary,
+            request.user_id,
+            request.passphrase,
+            request.session_token,
+            samples=request.samples,
+        )
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="User not found")
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    return TrainDictionaryResponse(**result)
+
+
 @app.post("/backup", response_model=ExportResponse)
-def backup(request: RotateKeyRequest) -> ExportResponse:
+async def backup(request: ExportRequest) -> ExportResponse:
     """Alias for /export for clarity."""
-    return export_bundle(request)
+    return await export_bundle(request)
+
+
+@app.get("/backup/{user_id}/stream")
+async def backup_stream(
+    user_id: str,
+    since: str | None = None,
+    passphrase: str | None = None,
+    session_token: str | None = None,
+) -> StreamingResponse:
+    """Stream a full backup, or with ``since`` (a backup id or ``latest``) a delta."""
+    try:
+        backup, chunks = await _offload(
+            service.backup_stream,
+            user_id,
+            since=since,
+            passphrase=passphrase,
+            session_token=session_token,
+        )
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="User not found")
+    except AccessDenied as exc:
+        raise HTTPException(status_code=403, detail=str(exc))
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    filename = f"pathlog-{user_id}-{backup['backup_id']}.ndjson"
+    return StreamingResponse(
+        _offload_chunks(chunks),
+        media_type=BUNDLE_MEDIA_TYPE,
+        headers={
+            "Content-Disposition": f'attachment; filename="{filename}"',
+            "X-PathLog-Backup-Id": backup["backup_id"],
+            "X-PathLog-Backup-Kind": backup["kind"],
+        },
+    )
+
+
+@app.get("/backup/{user_id}/chain", response_model=BackupChainResponse)
+async def backup_chain(user_id: str) -> BackupChainResponse:
+    try:
+        result = await run_in_threadpool(service.backup_chain, user_id)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="User not found")
+    return BackupChainResponse(**result)
 
 
 @app.post("/restore", response_model=ImportResponse)
-def restore(request: ImportRequest) -> ImportResponse:
+async def restore(request: ImportRequest) -> ImportResponse:
     """Alias for /import."""
-    return import_bundle(request)
+    return await import_bundle(request)
 
 
 if __name__ == "__main__":  # pragma: no cover
@@ -0,0 +1,261 @@
+"""Micro-benchmarks for the PathLog prototype.
+
+Run ``python -m pathlog.bench ciphers`` to compare the payload cipher
+backends: encrypt and decrypt throughput plus the bytes each record costs
+on disk in a binary segment and in a JSON bundle.
+
+``python -m pathlog.bench compression`` does the same for the compression
+codecs (with and without a trained dictionary) on transcript-like payloads.
+
+``python -m pathlog.bench search --count 100000`` indexes that many synthetic
+events and compares encrypted-index query latency with decrypting and
+scanning every event.
+
+``python -m pathlog.bench recall --count 100000`` measures semantic recall
+latency (exact and IVF) against vault size, plus how many of the exact top
+10 the IVF mode finds.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import tempfile
+import time
+from typing import Any, Callable
+
+from .compression import (
+    CODEC_NONE,
+    CODEC_ZLIB,
+    CODEC_ZSTD,
+    CompressionPolicy,
+    train_dictionary,
+    zstd_available,
+)
+from .crypto import (
+    CIPHERS,
+    DEFAULT_CIPHER,
+    ciphertext_to_text,
+    decrypt_payload,
+    encrypt_payload,
+    generate_data_key,
+)
+from .search import SearchIndex, document_terms, tokenize
+from .storage import FileStorage
+from .vectors import HashingEmbedder, LoadedVectors
+
+_WORDS = (
+    "roadmap sprint review insight claude chatgpt prompt budget launch hiring design "
+    "customer churn pricing experiment metric retention onboarding latency outage "
+    "incident postmortem backlog estimate refactor migration database index cache "
+    "queue worker deploy rollback feature flag pilot partner contract invoice"
+).split()
+
+
+def _sample_payload(size: int) -> dict[str, Any]:
+    text = ("PathLog keeps a private record of every AI conversation. " * (size // 56 + 1))[:size]
+    return {
+        "event_id": "0190f6a2-0000-7000-8000-000000000000",
+        "tool_name": "ChatGPT",
+        "prompt": text[: size // 3],
+        "response": text[size // 3 :],
+        "metadata": {"channel": "web"},
+        "timestamp": "2025-05-01T10:00:00+00:00",
+    }
+
+
+def _rate(func: Callable[[], Any], count: int) -> float:
+    started = time.perf_counter()
+    for _ in range(count):
+        func()
+    return count / (time.perf_counter() - started)
+
+
+def bench_ciphers(*, count: int = 2000, payload_size: int = 1024) -> list[dict[str, Any]]:
+    """Return one result row per cipher backend."""
+    key = generate_data_key()
+    payload = _sample_payload(payload_size)
+    rows = []
+    for algorithm in CIPHERS:
+        token = encrypt_payload(key, payload, key_id="20250501-g1", algorithm=algorithm)
+        stored = token if isinstance(token, bytes) else token.encode("utf-8")
+        rows.append(
+            {
+                "cipher": algorithm,
+                "encrypt_per_s": _rate(
+                    lambda: encrypt_payload(
+                        key, payload, key_id="20250501-g1", algorithm=algorithm
+                    ),
+                    count,
+                ),
+                "decrypt_per_s": _rate(lambda: decrypt_payload(key, token), count),
+                "disk_bytes": len(stored),
+                "bundle_bytes": len(ciphertext_to_text(token)),
+            }
+        )
+    return rows
+
+
+def bench_compression(*, count: int = 2000, payload_size: int = 4096) -> list[dict[str, Any]]:
+    """Return one result row per compression setting for AES-256-GCM envelopes."""
+    key = generate_data_key()
+    payload = _sample_payload(payload_size)
+    samples = [
+        json.dumps(_sample_payload(payload_size + index)).encode("utf-8") for index in range(32)
+    ]
+    dictionary = train_dictionary(samples)
+    policies = {CODEC_NONE: None, CODEC_ZLIB: CompressionPolicy(codec=CODEC_ZLIB)}
+    if zstd_available():
+        policies[CODEC_ZSTD] = CompressionPolicy(codec=CODEC_ZSTD)
+    for codec in list(policies)[1:]:
+        policies[f"{codec}+dict"] = CompressionPolicy(
+            codec=codec, dictionary_id=1, dictionary=dictionary
+        )
+    dictionaries = {1: dictionary}
+    rows = []
+    for name, policy in policies.items():
+        token = encrypt_payload(key, payload, compression=policy)
+        rows.append(
+            {
+                "cipher": name,
+                "encrypt_per_s": _rate(
+                    lambda: encrypt_payload(key, payload, compression=policy), count
+                ),
+                "decrypt_per_s": _rate(lambda: decrypt_payload(key, token, dictionaries), count),
+                "disk_bytes": len(token),
+                "bundle_bytes": len(ciphertext_to_text(token)),
+            }
+        )
+    return rows
+
+
+def _synthetic_payload(rng: random.Random, index: int, payload_size: int) -> dict[str, Any]:
+    # Events stick to one topic (a slice of the vocabulary) with some noise.
+    start = index % (len(_WORDS) // 6) * 6
+    topic = _WORDS[start : start + 6]
+    length = max(payload_size // 8, 4)
+    words = rng.choices(topic, k=length) + rng.choices(_WORDS, k=length // 4)
+    text = " ".join(words) + f" note{index}"
+    return {
+        **_sample_payload(0),
+        "event_id": f"evt-{index:08d}",
+        "prompt": text[: len(text) // 3],
+        "response": text[len(text) // 3 :],
+    }
+
+
+def bench_search(*, count: int = 100_000, payload_size: int = 256) -> dict[str, Any]:
+    """Index ``count`` events, then time BM25 queries against a decrypt-and-scan."""
+    rng = random.Random(7)
+    key = generate_data_key()
+    payloads = [_synthetic_payload(rng, index, payload_size) for index in range(count)]
+    tokens = [encrypt_payload(key, payload) for payload in payloads]
+    queries = ["roadmap insight", "outage postmortem rollback", f"note{count // 2}"]
+    with tempfile.TemporaryDirectory() as data_dir:
+        index = SearchIndex(
+            FileStorage(data_dir), "bench", 1, generate_data_key(), algorithm=DEFAULT_CIPHER
+        )
+        started = time.perf_counter()
+        index.rebuild((payload["event_id"], document_terms(payload)) for payload in payloads)
+        build_s = time.perf_counter() - started
+
+        started = time.perf_counter()
+        for query in queries:
+            index.search(query, 10)
+        query_ms = (time.perf_counter() - started) * 1000 / len(queries)
+
+    started = time.perf_counter()
+    terms = set(tokenize(queries[-1]))
+    matches = [
+        payload["event_id"]
+        for payload in (decrypt_payload(key, token) for token in tokens)
+        if terms & set(document_terms(payload))
+    ]
+    scan_ms = (time.perf_counter() - started) * 1000
+    return {
+        "events": count,
+        "build_s": build_s,
+        "query_ms": query_ms,
+        "scan_ms": scan_ms,
+        "scan_matches": len(matches),
+    }
+
+
+def bench_recall(*, count: int = 100_000, payload_size: int = 256) -> list[dict[str, Any]]:
+    """Return recall latency rows for vault sizes growing tenfold up to ``count``."""
+    rng = random.Random(7)
+    embedder = HashingEmbedder()
+    queries = [embedder.embed_text(query) for query in ("pricing experiment", "outage rollback")]
+    loaded = LoadedVectors(embedder.dim, count)
+    rows = []
+    size = 1000
+    while True:
+        size = min(size, count)
+        payloads = [
+            _synthetic_payload(rng, index, payload_size) for index in range(loaded.rows, size)
+        ]
+        loaded.append(
+            [payload["event_id"] for payload in payloads],
+            [embedder.embed(payload) for payload in payloads],
+        )
+        timings = {}
+        found = {}
+        for mode in ("exact", "ivf"):
+            loaded.search(queries[0], 10, mode=mode)  # warm-up builds the IVF clusters
+            started = time.perf_counter()
+            found[mode] = [loaded.search(query, 10, mode=mode) for query in queries]
+            timings[mode] = (time.perf_counter() - started) * 1000 / len(queries)
+        overlap = sum(
+            len({hit for hit, _ in exact} & {hit for hit, _ in ivf})
+            for exact, ivf in zip(found["exact"], found["ivf"])
+        )
+        rows.append(
+            {
+                "events": size,
+                "exact_ms": timings["exact"],
+                "ivf_ms": timings["ivf"],
+                "ivf_recall": overlap / max(sum(len(hits) for hits in found["exact"]), 1),
+            }
+        )
+        if size >= count:
+            return rows
+        size *= 10
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="PathLog micro-benchmarks")
+    parser.add_argument("suite", choices=["ciphers", "compression", "search", "recall"])
+    parser.add_argument("--count", type=int, default=2000)
+    parser.add_argument("--payload-size", type=int, default=1024)
+    args = parser.parse_args(argv)
+
+    if args.suite == "recall":
+        print(f"{'events':>10}{'exact ms':>12}{'ivf ms':>12}{'ivf recall@10':>16}")
+        for row in bench_recall(count=args.count, payload_size=args.payload_size):
+            print(
+                f"{row['events']:>10}{row['exact_ms']:>12.2f}{row['ivf_ms']:>12.2f}"
+                f"{row['ivf_recall']:>16.2f}"
+            )
+        return
+    if args.suite == "search":
+        result = bench_search(count=args.count, payload_size=args.payload_size)
+        print(f"{result['events']} events, payload ~{args.payload_size} bytes")
+        print(f"index build      {result['build_s']:>10.2f} s")
+        print(f"indexed query    {result['query_ms']:>10.1f} ms")
+        print(f"decrypt + scan   {result['scan_ms']:>10.1f} ms")
+        return
+
+    suite = bench_ciphers if args.suite == "ciphers" else bench_compression
+    rows = suite(count=args.count, payload_size=args.payload_size)
+    print(f"payload ~{args.payload_size} bytes, {args.count} iterations")
+    print(f"{'setting':<20}{'encrypt/s':>12}{'decrypt/s':>12}{'disk B':>10}{'bundle B':>10}")
+    for row in rows:
+        print(
+            f"{row['cipher']:<20}{row['encrypt_per_s']:>12.0f}{row['decrypt_per_s']:>12.0f}"
+            f"{row['disk_bytes']:>10}{row['bundle_bytes']:>10}"
+        )
+
+
+if __name__ == "__main__":
+    main()
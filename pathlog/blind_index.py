@@ -0,0 +1,89 @@
+"""Blind index tags for filtering encrypted events without decrypting them.
+
+Each stored entry carries short keyed-HMAC tags over a few low-cardinality
+fields of its payload (tool name, ``metadata.channel`` and the UTC day). The
+HMAC key is a per-user index key, wrapped by the master key like the data
+keys, so storage can match a filter's tags against an entry's tags while
+learning nothing about the values themselves. Equal values do produce equal
+tags within one user's vault, which is what makes the index work; tags are
+never comparable across users or index-key generations.
+"""
+
+from __future__ import annotations
+
+import base64
+import hashlib
+import hmac
+import secrets
+from typing import Any, Iterable
+
+FIELD_TOOL = "tool"
+FIELD_CHANNEL = "channel"
+FIELD_DAY = "day"
+INDEXED_FIELDS = (FIELD_TOOL, FIELD_CHANNEL, FIELD_DAY)
+TAG_BYTES = 16
+
+
+def generate_index_key() -> bytes:
+    """Return a new per-user index key."""
+    return secrets.token_bytes(32)
+
+
+def sealing_key(index_key: bytes, purpose: str) -> bytes:
+    """Derive a payload key (see :func:`pathlog.crypto.encrypt_payload`) for index data."""
+    digest = hmac.new(index_key, f"pathlog-seal:{purpose}".encode("utf-8"), hashlib.sha256)
+    return base64.urlsafe_b64encode(digest.digest())
+
+
+def blind_tag(index_key: bytes, field: str, value: str) -> str:
+    """Return the tag for ``field == value`` under ``index_key``."""
+    message = f"{field}\x00{value}".encode("utf-8")
+    digest = hmac.new(index_key, message, hashlib.sha256).digest()[:TAG_BYTES]
+    return base64.urlsafe_b64encode(digest).decode("ascii").rstrip("=")
+
+
+def indexed_values(payload: dict[str, Any]) -> dict[str, str]:
+    """Return the indexed field values present in a decrypted payload."""
+    values = {}
+    if isinstance(payload.get("tool_name"), str):
+        values[FIELD_TOOL] = payload["tool_name"]
+    channel = (payload.get("metadata") or {}).get("channel")
+    if isinstance(channel, str):
+        values[FIELD_CHANNEL] = channel
+    timestamp = payload.get("timestamp")
+    if isinstance(timestamp, str) and timestamp:
+        values[FIELD_DAY] = timestamp[:10]
+    return values
+
+
+def event_tags(index_key: bytes, payload: dict[str, Any]) -> list[str]:
+    """Return the tags to store with an event's entry."""
+    return [blind_tag(index_key, field, value) for field, value in indexed_values(payload).items()]
+
+
+def tag_filter(
+    index_keys: Iterable[bytes], filters: dict[str, str | None]
+) -> list[frozenset[str]] | None:
+    """Translate field filters into storage tag groups (``None`` when unfiltered).
+
+    Each group holds one tag per index key so entries tagged under any live
+    generation match; an entry must match every group.
+    """
+    keys = list(index_keys)
+    groups = [
+        frozenset(blind_tag(key, field, value) for key in keys)
+        for field, value in filters.items()
+        if value is not None
+    ]
+    return groups or None
+
+
+__all__ = [
+    "INDEXED_FIELDS",
+    "blind_tag",
+    "event_tags",
+    "generate_index_key",
+    "indexed_values",
+    "sealing_key",
+    "tag_filter",
+]
@@ -0,0 +1,185 @@
+"""Streaming NDJSON backup bundles for the PathLog prototype.
+
+A streamed bundle is one JSON record per line, in a fixed order:
+
+1. ``manifest`` - format name, version, source user and export time, and
+   for backups the backup id, ``kind`` and watermark;
+2. ``profile`` - the vault profile (omitted by a delta whose profile did
+   not change);
+3. ``key`` - one line per wrapped key file;
+4. ``state`` - one line per sidecar record (aggregates, data keys, ...),
+   named like the fields of a JSON bundle;
+5. ``event`` - one line per stored entry, in log order, optionally with the
+   decrypted ``payload`` (import ignores it);
+6. ``end`` - the number of events and a SHA-256 over every earlier line.
+
+:func:`encode_bundle` turns records into byte chunks of roughly
+``BUNDLE_CHUNK_BYTES`` and appends the ``end`` trailer, so exports stream in
+constant memory. :func:`read_bundle` parses a bundle line by line, checks the
+order and the trailer, and raises :class:`ValueError` on anything malformed
+or truncated; importers read it once to validate and again to write.
+
+Backups form chains. A ``full`` bundle carries the whole vault; a ``delta``
+names its ``parent`` backup and carries only what was appended after the
+parent's ``watermark`` (last event ``seq``, profile version, key ids and
+history epoch): newer events, key files the parent lacked and the small
+state records. Restoring the full bundle and then each delta in order
+rebuilds the vault.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import shutil
+import tempfile
+from typing import Any, BinaryIO, Iterable, Iterator
+
+BUNDLE_FORMAT = "pathlog-ndjson"
+BUNDLE_VERSION = 1
+BUNDLE_MEDIA_TYPE = "application/x-ndjson"
+BUNDLE_CHUNK_BYTES = 64 * 1024
+KIND_FULL = "full"
+KIND_DELTA = "delta"
+# Bundles larger than this are spooled to disk instead of memory on import.
+SPOOL_MAX_BYTES = 8 * 1024 * 1024
+
+# Record types in the order they must appear (``key``, ``state`` and
+# ``event`` may repeat or be absent).
+RECORD_ORDER = ("manifest", "profile", "key", "state", "event", "end")
+_REQUIRED_FIELDS = {
+    "manifest": ("format", "version"),
+    "profile": ("profile",),
+    "key": ("key_id", "data"),
+    "state": ("name", "value"),
+    "event": ("event",),
+    "end": ("events", "sha256"),
+}
+_DELTA_FIELDS = ("backup_id", "parent", "watermark", "base")
+
+
+def manifest_record(
+    user_id: str, exported_at: str, *, decrypted: bool, backup: dict[str, Any] | None = None
+) -> dict[str, Any]:
+    """Return a manifest record; ``backup`` adds a backup's id, kind and watermarks."""
+    record = {
+        "type": "manifest",
+        "format": BUNDLE_FORMAT,
+        "version": BUNDLE_VERSION,
+        "kind": KIND_FULL,
+        "user_id": user_id,
+        "exported_at": exported_at,
+        "decrypted": decrypted,
+    }
+    record.update(backup or {})
+    return record
+
+
+def encode_bundle(records: Iterable[dict[str, Any]]) -> Iterator[bytes]:
+    """Serialise ``records`` as NDJSON chunks followed by the ``end`` trailer."""
+    digest = hashlib.sha256()
+    events = 0
+    chunk = bytearray()
+    for record in records:
+        line = json.dumps(record, separators=(",", ":"), sort_keys=True).encode("utf-8") + b"\n"
+        digest.update(line)
+        events += record["type"] == "event"
+        chunk += line
+        if len(chunk) >= BUNDLE_CHUNK_BYTES:
+            yield bytes(chunk)
+            chunk.clear()
+    trailer = {"type": "end", "events": events, "sha256": digest.hexdigest()}
+    yield bytes(chunk) + json.dumps(trailer, sort_keys=True).encode("utf-8") + b"\n"
+
+
+def read_bundle(handle: BinaryIO) -> Iterator[dict[str, Any]]:
+    """Yield the records of a streamed bundle, validating order and trailer.
+
+    The ``end`` trailer is checked but not yielded, so a caller that has
+    consumed the whole iterator without an error has seen a complete,
+    untampered-in-transit bundle.
+    """
+    digest = hashlib.sha256()
+    position = -1
+    events = 0
+    delta = False
+    for number, line in enumerate(handle, start=1):
+        if not line.strip():
+            continue
+        if position == len(RECORD_ORDER) - 1:
+            raise ValueError(f"Bundle line {number}: data after the end record.")
+        try:
+            record = json.loads(line)
+        except ValueError as exc:
+            raise ValueError(f"Bundle line {number}: invalid JSON ({exc}).") from None
+        record_type = record.get("type") if isinstance(record, dict) else None
+        if record_type not in RECORD_ORDER:
+            raise ValueError(f"Bundle line {number}: unknown record type {record_type!r}.")
+        order = RECORD_ORDER.index(record_type)
+        if order < position or (order == position and record_type in {"manifest", "profile"}):
+            raise ValueError(f"Bundle line {number}: {record_type} record out of order.")
+        if position < 0 and record_type != "manifest":
+            raise ValueError("Bundle must start with a manifest record.")
+        if position == 0 and record_type != "profile" and not delta:
+            raise ValueError(f"Bundle line {number}: expected the profile record.")
+        missing = [field for field in _REQUIRED_FIELDS[record_type] if field not in record]
+        if missing:
+            raise ValueError(f"Bundle line {number}: {record_type} record lacks {missing}.")
+        position = order
+        if record_type == "manifest":
+            _check_manifest(record)
+            delta = record.get("kind") == KIND_DELTA
+        elif record_type == "event":
+            _check_event(record["event"], number)
+            events += 1
+        if record_type == "end":
+            if record["events"] != events or record["sha256"] != digest.hexdigest():
+                raise ValueError("Bundle checksum or event count does not match its content.")
+            continue
+        digest.update(line if line.endswith(b"\n") else line + b"\n")
+        yield record
+    if position != len(RECORD_ORDER) - 1:
+        raise ValueError("Bundle is truncated: the end record is missing.")
+
+
+def spool(handle: BinaryIO) -> BinaryIO:
+    """Return a seekable copy of ``handle`` (or ``handle`` itself if seekable)."""
+    if handle.seekable():
+        return handle
+    copy = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES)
+    shutil.copyfileobj(handle, copy)
+    copy.seek(0)
+    return copy
+
+
+def _check_manifest(record: dict[str, Any]) -> None:
+    if record["format"] != BUNDLE_FORMAT:
+        raise ValueError(f"Not a PathLog bundle (format {record['format']!r}).")
+    if record["version"] != BUNDLE_VERSION:
+        raise ValueError(f"Unsupported bundle version {record['version']!r}.")
+    kind = record.get("kind", KIND_FULL)
+    if kind not in (KIND_FULL, KIND_DELTA):
+        raise ValueError(f"Unknown bundle kind {kind!r}.")
+    missing = [field for field in _DELTA_FIELDS if kind == KIND_DELTA and not record.get(field)]
+    if missing:
+        raise ValueError(f"Delta bundle manifest lacks {missing}.")
+
+
+def _check_event(event: Any, number: int) -> None:
+    if not isinstance(event, dict) or not event.get("event_id") or "ciphertext" not in event:
+        raise ValueError(f"Bundle line {number}: event lacks an event_id or ciphertext.")
+
+
+__all__ = [
+    "BUNDLE_CHUNK_BYTES",
+    "BUNDLE_FORMAT",
+    "BUNDLE_MEDIA_TYPE",
+    "BUNDLE_VERSION",
+    "KIND_DELTA",
+    "KIND_FULL",
+    "SPOOL_MAX_BYTES",
+    "encode_bundle",
+    "manifest_record",
+    "read_bundle",
+    "spool",
+]
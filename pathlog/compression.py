@@ -0,0 +1,158 @@
+"""Payload compression applied before encryption.
+
+Captured prompts and responses are long, repetitive text, so payloads are
+compressed before they are sealed (compressing ciphertext gains nothing).
+``zlib`` (raw deflate) is always available; ``zstd`` is used when the
+optional ``zstandard`` package is installed and otherwise falls back to
+``zlib``. Payloads shorter than ``min_bytes``, or that would not shrink, are
+stored uncompressed. A per-user dictionary primes the compressor with the
+phrasing a user repeats across events, which is what lets short events
+compress at all; every record names the dictionary it needs in its header.
+
+The flags returned by :func:`compress` are stored in the envelope header
+(see :mod:`pathlog.crypto`) and handed back to :func:`decompress`.
+"""
+
+from __future__ import annotations
+
+import logging
+import zlib
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Mapping, Sequence
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - optional dependency
+    zstandard = None
+
+LOGGER = logging.getLogger(__name__)
+
+CODEC_NONE = "none"
+CODEC_ZLIB = "zlib"
+CODEC_ZSTD = "zstd"
+CODECS = (CODEC_NONE, CODEC_ZLIB, CODEC_ZSTD)
+COMPRESS_MIN_BYTES = 512
+DICTIONARY_SIZE = 16 * 1024
+
+FLAG_ZLIB = 0x01
+FLAG_ZSTD = 0x02
+FLAG_DICTIONARY = 0x04
+_CODEC_FLAGS = FLAG_ZLIB | FLAG_ZSTD
+# Raw deflate: the AEAD tag already authenticates the data, so skip zlib's
+# own header and checksum.
+_WBITS = -15
+
+
+@dataclass(frozen=True, slots=True)
+class CompressionPolicy:
+    """How payloads are compressed before encryption."""
+
+    codec: str = CODEC_ZLIB
+    min_bytes: int = COMPRESS_MIN_BYTES
+    level: int = 6
+    dictionary_id: int | None = None
+    dictionary: bytes | None = None
+
+
+def zstd_available() -> bool:
+    return zstandard is not None
+
+
+def resolve_codec(codec: str) -> str:
+    """Validate ``codec``, falling back from ``zstd`` to ``zlib`` without ``zstandard``."""
+    if codec not in CODECS:
+        raise ValueError(f"Unknown PathLog compression codec: {codec}")
+    if codec == CODEC_ZSTD and not zstd_available():
+        LOGGER.warning("zstandard is not installed; PathLog falls back to zlib compression.")
+        return CODEC_ZLIB
+    return codec
+
+
+@lru_cache(maxsize=16)
+def _zstd_dictionary(dictionary: bytes) -> "zstandard.ZstdCompressionDict":
+    return zstandard.ZstdCompressionDict(dictionary)
+
+
+def compress(data: bytes, policy: CompressionPolicy | None) -> tuple[int, bytes]:
+    """Return ``(flags, body)``; ``flags`` is 0 when ``data`` is kept as-is."""
+    if policy is None or policy.codec == CODEC_NONE or len(data) < policy.min_bytes:
+        return 0, data
+    dictionary = policy.dictionary if policy.dictionary_id is not None else None
+    if policy.codec == CODEC_ZSTD and zstandard is not None:
+        compressor = zstandard.ZstdCompressor(
+            level=policy.level,
+            dict_data=_zstd_dictionary(dictionary) if dictionary else None,
+        )
+        flags, body = FLAG_ZSTD, compressor.compress(data)
+    else:
+        if dictionary:
+            compressor = zlib.compressobj(policy.level, zlib.DEFLATED, _WBITS, zdict=dictionary)
+        else:
+            compressor = zlib.compressobj(policy.level, zlib.DEFLATED, _WBITS)
+        flags, body = FLAG_ZLIB, compressor.compress(data) + compressor.flush()
+    if len(body) >= len(data):
+        return 0, data
+    return flags | (FLAG_DICTIONARY if dictionary else 0), body
+
+
+def decompress(
+    body: bytes,
+    flags: int,
+    dictionary_id: int | None = None,
+    dictionaries: Mapping[int, bytes] | None = None,
+) -> bytes:
+    """Undo :func:`compress` given the header ``flags`` and dictionary id."""
+    codec = flags & _CODEC_FLAGS
+    if not codec:
+        return body
+    dictionary = None
+    if flags & FLAG_DICTIONARY:
+        dictionary = (dictionaries or {}).get(dictionary_id)
+        if dictionary is None:
+            raise ValueError(f"Compression dictionary {dictionary_id} is not available.")
+    if codec == FLAG_ZSTD:
+        if zstandard is None:
+            raise RuntimeError(
+                "zstandard package is required to read zstd-compressed PathLog records.\n"
+                "Install with `pip install zstandard`."
+            )
+        decompressor = zstandard.ZstdDecompressor(
+            dict_data=_zstd_dictionary(dictionary) if dictionary else None
+        )
+        return decompressor.decompress(body)
+    if dictionary:
+        decompressor = zlib.decompressobj(_WBITS, zdict=dictionary)
+    else:
+        decompressor = zlib.decompressobj(_WBITS)
+    return decompressor.decompress(body) + decompressor.flush()
+
+
+def train_dictionary(samples: Sequence[bytes], size: int = DICTIONARY_SIZE) -> bytes:
+    """Build a compression dictionary of at most ``size`` bytes from sample payloads.
+
+    With ``zstandard`` installed this trains a proper zstd dictionary; otherwise
+    (or when training fails on too few samples) the dictionary is the most
+    recent sample content, which zlib and zstd both accept as raw content.
+    """
+    if not samples:
+        raise ValueError("At least one sample is required to train a dictionary.")
+    if zstandard is not None:
+        try:
+            return zstandard.train_dictionary(size, list(samples)).as_bytes()
+        except zstandard.ZstdError:
+            LOGGER.info("zstd dictionary training failed; using raw sample content.")
+    # zlib gives the end of the dictionary the shortest match distances.
+    return b"".join(samples)[-min(size, 32 * 1024) :]
+
+
+__all__ = [
+    "CODECS",
+    "COMPRESS_MIN_BYTES",
+    "CompressionPolicy",
+    "compress",
+    "decompress",
+    "resolve_codec",
+    "train_dictionary",
+    "zstd_available",
+]
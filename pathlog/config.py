@@ -0,0 +1,85 @@
+"""Runtime configuration for the PathLog prototype."""
+
+from __future__ import annotations
+
+import os
+from dataclasses import dataclass
+from pathlib import Path
+
+from .storage import BASE_DIR
+
+
+def _env_float(name: str, default: float) -> float:
+    value = os.getenv(name)
+    if value is None or not value.strip():
+        return default
+    try:
+        return float(value.strip())
+    except ValueError:
+        return default
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    value = os.getenv(name)
+    if value is None or not value.strip():
+        return default
+    return value.strip().lower() in {"1", "true", "yes", "on"}
+
+
+@dataclass(slots=True)
+class PathLogConfig:
+    """Settings that select and tune the PathLog storage backend and caches."""
+
+    storage_backend: str = "file"
+    data_dir: Path = BASE_DIR
+    sqlite_path: Path | None = None
+    session_ttl_seconds: float = 900
+    session_max_entries: int = 1024
+    write_behind: bool = False
+    ingest_shards: int = 4
+    ingest_batch_size: int = 256
+    ingest_flush_interval: float = 0.05
+    ingest_fsync_interval: float = 1.0
+    ingest_queue_size: int = 10_000
+    ingest_enqueue_timeout: float = 1.0
+    crypto_workers: int | None = None
+    crypto_executor: str = "process"
+    crypto_chunk_size: int = 64
+    cipher: str = "aes-256-gcm"
+    compression: str = "zlib"
+    compress_min_bytes: int = 512
+    vector_dim: int = 256
+    offload_workers: int | None = None
+    offload_queue_size: int = 64
+
+    @classmethod
+    def from_env(cls) -> "PathLogConfig":
+        """Build configuration from environment variables."""
+        sqlite_path = os.getenv("PATHLOG_SQLITE_PATH")
+        return cls(
+            storage_backend=os.getenv("PATHLOG_STORAGE", "file").strip().lower() or "file",
+            data_dir=Path(os.getenv("PATHLOG_DATA_DIR") or BASE_DIR),
+            sqlite_path=Path(sqlite_path) if sqlite_path else None,
+            session_ttl_seconds=_env_float("PATHLOG_SESSION_TTL", 900),
+            session_max_entries=int(_env_float("PATHLOG_SESSION_MAX", 1024)),
+            write_behind=_env_bool("PATHLOG_WRITE_BEHIND", False),
+            ingest_shards=int(_env_float("PATHLOG_INGEST_SHARDS", 4)),
+            ingest_batch_size=int(_env_float("PATHLOG_INGEST_BATCH_SIZE", 256)),
+            ingest_flush_interval=_env_float("PATHLOG_INGEST_FLUSH_INTERVAL", 0.05),
+            ingest_fsync_interval=_env_float("PATHLOG_INGEST_FSYNC_INTERVAL", 1.0),
+            ingest_queue_size=int(_env_float("PATHLOG_INGEST_QUEUE_SIZE", 10_000)),
+            ingest_enqueue_timeout=_env_float("PATHLOG_INGEST_ENQUEUE_TIMEOUT", 1.0),
+            crypto_workers=int(_env_float("PATHLOG_CRYPTO_WORKERS", 0)) or None,
+            crypto_executor=os.getenv("PATHLOG_CRYPTO_EXECUTOR", "process").strip().lower()
+            or "process",
+            crypto_chunk_size=int(_env_float("PATHLOG_CRYPTO_CHUNK", 64)),
+            cipher=os.getenv("PATHLOG_CIPHER", "aes-256-gcm").strip().lower() or "aes-256-gcm",
+            compression=os.getenv("PATHLOG_COMPRESSION", "zlib").strip().lower() or "zlib",
+            compress_min_bytes=int(_env_float("PATHLOG_COMPRESS_MIN_BYTES", 512)),
+            vector_dim=int(_env_float("PATHLOG_VECTOR_DIM", 256)),
+            offload_workers=int(_env_float("PATHLOG_OFFLOAD_WORKERS", 0)) or None,
+            offload_queue_size=int(_env_float("PATHLOG_OFFLOAD_QUEUE_SIZE", 64)),
+        )
+
+
+__all__ = ["PathLogConfig"]
@@ -1,4 +1,21 @@
-﻿"""Cryptographic utilities for the local PathLog prototype."""
+﻿"""Cryptographic utilities for the local PathLog prototype.
+
+Event payloads are sealed in a versioned binary envelope::
+
+    magic (3) | version (1) | algorithm (1) | flags (1) | key_id length (1) | key_id
+    | [dictionary id (4)] | nonce (12) | ciphertext + tag
+
+``flags`` records how the payload was compressed before encryption (see
+:mod:`pathlog.compression`); the dictionary id is present only for records
+compressed with a per-user dictionary. Version 1 envelopes have no flags
+byte and are still read. The header is authenticated as associated data, so
+a record cannot be moved to another key id, algorithm or dictionary without
+failing decryption. The AEAD key is
+derived from the (Fernet-format) data key with HKDF, one subkey per
+algorithm. Fernet tokens written before the envelope existed are plain ASCII
+and never start with the magic bytes, so :func:`decrypt_payload` tells the
+two apart and keeps old records readable.
+"""
 
 from __future__ import annotations
 
@@ -6,17 +23,40 @@ import base64
 import hashlib
 import json
 import secrets
+import struct
 from dataclasses import dataclass
-from typing import Any
+from functools import lru_cache
+from typing import Any, Mapping
+
+from .compression import FLAG_DICTIONARY, CompressionPolicy, compress, decompress
 
 try:
     from cryptography.fernet import Fernet
+    from cryptography.hazmat.primitives import hashes
+    from cryptography.hazmat.primitives.ciphers.aead import AESGCM, ChaCha20Poly1305
+    from cryptography.hazmat.primitives.kdf.hkdf import HKDF
 except ImportError as exc:  # pragma: no cover - handled at runtime
     raise RuntimeError(
         "cryptography package is required for PathLog encryption.\n"
         "Install with `pip install cryptography`."
     ) from exc
 
+CIPHER_AES_GCM = "aes-256-gcm"
+CIPHER_CHACHA20 = "chacha20-poly1305"
+CIPHER_FERNET = "fernet"
+CIPHERS = (CIPHER_AES_GCM, CIPHER_CHACHA20, CIPHER_FERNET)
+DEFAULT_CIPHER = CIPHER_AES_GCM
+
+ENVELOPE_MAGIC = b"\x89PL"
+ENVELOPE_VERSION = 2
+ENVELOPE_TEXT_PREFIX = "pl1:"
+NONCE_SIZE = 12
+_ALGORITHM_IDS = {CIPHER_AES_GCM: 1, CIPHER_CHACHA20: 2}
+_ALGORITHM_NAMES = {value: name for name, value in _ALGORITHM_IDS.items()}
+_HEADER = struct.Struct(">3sBBBB")
+_HEADER_V1 = struct.Struct(">3sBBB")
+_DICTIONARY_ID = struct.Struct(">I")
+
 
 @dataclass(slots=True)
 class PassphraseRecord:
@@ -102,24 +142,181 @@ def unwrap_master_key(
     return wrapped_key.encode("utf-8")
 
 
-def encrypt_payload(master_key: bytes, payload: dict[str, Any]) -> str:
-    """Encrypt a payload dictionary with the master key."""
+@lru_cache(maxsize=64)
+def _fernet(master_key: bytes) -> Fernet:
+    # Fernet objects are immutable and thread-safe; building one decodes and
+    # splits the key, so reuse them across payloads.
+    return Fernet(master_key)
+
+
+def generate_data_key() -> bytes:
+    """Return a new data-encryption key for one bucket of events."""
+    return Fernet.generate_key()
+
+
+def wrap_data_key(master_key: bytes, data_key: bytes) -> str:
+    """Encrypt a data key under the master key (envelope encryption)."""
+    return _fernet(master_key).encrypt(data_key).decode("utf-8")
+
+
+def unwrap_data_key(master_key: bytes, wrapped_key: str) -> bytes:
+    """Recover a data key wrapped by :func:`wrap_data_key`."""
+    return _fernet(master_key).decrypt(wrapped_key.encode("utf-8"))
+
+
+@lru_cache(maxsize=128)
+def _aead(key: bytes, algorithm: str) -> AESGCM | ChaCha20Poly1305:
+    subkey = HKDF(
+        algorithm=hashes.SHA256(),
+        length=32,
+        salt=None,
+        info=b"pathlog-envelope:" + algorithm.encode("ascii"),
+    ).derive(base64.urlsafe_b64decode(key))
+    return AESGCM(subkey) if algorithm == CIPHER_AES_GCM else ChaCha20Poly1305(subkey)
+
+
+def is_envelope(ciphertext: str | bytes) -> bool:
+    """Return True when ``ciphertext`` is a binary envelope rather than a Fernet token."""
+    return isinstance(ciphertext, bytes) and ciphertext.startswith(ENVELOPE_MAGIC)
+
+
+@dataclass(slots=True)
+class _Header:
+    algorithm: str
+    key_id: str
+    flags: int
+    dictionary_id: int | None
+    size: int
+
+
+def _parse_header(envelope: bytes) -> _Header:
+    version = envelope[len(ENVELOPE_MAGIC)] if len(envelope) > len(ENVELOPE_MAGIC) else None
+    if version == 1:
+        _, _, algorithm_id, key_id_length = _HEADER_V1.unpack_from(envelope)
+        flags, fixed_size = 0, _HEADER_V1.size
+    elif version == ENVELOPE_VERSION:
+        _, _, algorithm_id, flags, key_id_length = _HEADER.unpack_from(envelope)
+        fixed_size = _HEADER.size
+    else:
+        raise ValueError("Unsupported PathLog envelope version.")
+    algorithm = _ALGORITHM_NAMES.get(algorithm_id)
+    if algorithm is None:
+        raise ValueError(f"Unknown PathLog envelope algorithm: {algorithm_id}")
+    offset = fixed_size + key_id_length
+    key_id = envelope[fixed_size:offset].decode("utf-8")
+    dictionary_id = None
+    if flags & FLAG_DICTIONARY:
+        (dictionary_id,) = _DICTIONARY_ID.unpack_from(envelope, offset)
+        offset += _DICTIONARY_ID.size
+    return _Header(algorithm, key_id, flags, dictionary_id, offset + NONCE_SIZE)
+
+
+def envelope_key_id(envelope: bytes) -> str:
+    """Return the key id recorded in an envelope header."""
+    return _parse_header(envelope).key_id
+
+
+def encrypt_payload(
+    master_key: bytes,
+    payload: dict[str, Any],
+    *,
+    key_id: str = "",
+    algorithm: str = DEFAULT_CIPHER,
+    compression: CompressionPolicy | None = None,
+) -> str | bytes:
+    """Encrypt a payload dictionary with the master key.
+
+    Returns a binary envelope for the AEAD ciphers and a Fernet token (``str``)
+    when ``algorithm`` is ``"fernet"``. ``compression`` is applied to the
+    serialised payload first; Fernet tokens are never compressed.
+    """
     serialised = json.dumps(payload, separators=(",", ":")).encode("utf-8")
-    return Fernet(master_key).encrypt(serialised).decode("utf-8")
+    if algorithm == CIPHER_FERNET:
+        return _fernet(master_key).encrypt(serialised).decode("utf-8")
+    if algorithm not in _ALGORITHM_IDS:
+        raise ValueError(f"Unknown PathLog cipher: {algorithm}")
+    key_id_bytes = key_id.encode("utf-8")
+    if len(key_id_bytes) > 255:
+        raise ValueError("key_id must fit in 255 bytes.")
+    flags, body = compress(serialised, compression)
+    header = (
+        _HEADER.pack(
+            ENVELOPE_MAGIC, ENVELOPE_VERSION, _ALGORITHM_IDS[algorithm], flags, len(key_id_bytes)
+        )
+        + key_id_bytes
+    )
+    if flags & FLAG_DICTIONARY:
+        header += _DICTIONARY_ID.pack(compression.dictionary_id)
+    header += secrets.token_bytes(NONCE_SIZE)
+    return header + _aead(master_key, algorithm).encrypt(header[-NONCE_SIZE:], body, header)
 
 
-def decrypt_payload(master_key: bytes, token: str) -> dict[str, Any]:
-    """Decrypt an encrypted payload token."""
-    decoded = Fernet(master_key).decrypt(token.encode("utf-8"))
+def decrypt_payload(
+    master_key: bytes,
+    token: str | bytes,
+    dictionaries: Mapping[int, bytes] | None = None,
+) -> dict[str, Any]:
+    """Decrypt an envelope (raw or in its text form) or a legacy Fernet token.
+
+    ``dictionaries`` maps dictionary ids to compression dictionaries and is
+    only needed for records compressed with one.
+    """
+    if is_envelope(token):
+        header = _parse_header(token)
+        prefix = token[: header.size]
+        body = _aead(master_key, header.algorithm).decrypt(
+            prefix[-NONCE_SIZE:], token[header.size :], prefix
+        )
+        decoded = decompress(body, header.flags, header.dictionary_id, dictionaries)
+    elif isinstance(token, str) and token.startswith(ENVELOPE_TEXT_PREFIX):
+        return decrypt_payload(master_key, ciphertext_from_text(token), dictionaries)
+    else:
+        raw = token if isinstance(token, bytes) else token.encode("utf-8")
+        decoded = _fernet(master_key).decrypt(raw)
     return json.loads(decoded.decode("utf-8"))
 
 
+def ciphertext_to_bytes(ciphertext: str | bytes) -> bytes:
+    """Return the stored byte form of an envelope or Fernet token."""
+    return ciphertext if isinstance(ciphertext, bytes) else ciphertext.encode("utf-8")
+
+
+def ciphertext_from_bytes(raw: bytes) -> str | bytes:
+    """Inverse of :func:`ciphertext_to_bytes`; Fernet tokens come back as ``str``."""
+    return raw if raw.startswith(ENVELOPE_MAGIC) else raw.decode("utf-8")
+
+
+def ciphertext_to_text(ciphertext: str | bytes) -> str:
+    """Return a JSON-safe form: Fernet tokens as-is, envelopes base64 behind a prefix."""
+    if isinstance(ciphertext, bytes):
+        return ENVELOPE_TEXT_PREFIX + base64.urlsafe_b64encode(ciphertext).decode("ascii")
+    return ciphertext
+
+
+def ciphertext_from_text(text: str) -> str | bytes:
+    """Inverse of :func:`ciphertext_to_text`."""
+    if text.startswith(ENVELOPE_TEXT_PREFIX):
+        return base64.urlsafe_b64decode(text[len(ENVELOPE_TEXT_PREFIX) :].encode("ascii"))
+    return text
+
+
 __all__ = [
+    "CIPHERS",
+    "DEFAULT_CIPHER",
     "PassphraseRecord",
     "generate_master_key",
     "create_passphrase_record",
     "wrap_master_key",
     "unwrap_master_key",
+    "generate_data_key",
+    "wrap_data_key",
+    "unwrap_data_key",
+    "is_envelope",
+    "envelope_key_id",
     "encrypt_payload",
     "decrypt_payload",
+    "ciphertext_to_bytes",
+    "ciphertext_from_bytes",
+    "ciphertext_to_text",
+    "ciphertext_from_text",
 ]
@@ -0,0 +1,192 @@
+"""Batched, parallel payload encryption for the PathLog prototype.
+
+``CryptoEngine`` splits a stream of crypto jobs into fixed-size chunks, fans
+the chunks out over a worker pool and yields results in input order. Only a
+bounded number of chunks is in flight at once, so callers can stream a whole
+vault through it in constant memory. Small inputs, or an engine with a
+single worker, are processed inline without touching the pool.
+
+Fernet holds the GIL for most of its work, so the default pool is a process
+pool (``spawn`` context, safe next to the service's background threads); a
+thread pool is available for hosts where process start-up is unwelcome.
+New ciphertexts are sealed with the engine's ``algorithm`` and compressed
+per its ``compression`` policy unless a call passes a per-user one (see
+:mod:`pathlog.crypto`); decryption accepts every supported format.
+"""
+
+from __future__ import annotations
+
+import multiprocessing
+import os
+import threading
+from collections import deque
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from itertools import islice
+from typing import Any, Callable, Iterable, Iterator, Mapping, TypeVar
+
+from .compression import CompressionPolicy
+from .crypto import CIPHERS, DEFAULT_CIPHER, decrypt_payload, encrypt_payload
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+EXECUTOR_KINDS = ("process", "thread")
+
+
+Ciphertext = str | bytes
+
+
+def _decrypt_chunk(
+    items: list[tuple[bytes, Ciphertext]], dictionaries: Mapping[int, bytes] | None = None
+) -> list[dict[str, Any]]:
+    return [decrypt_payload(key, token, dictionaries) for key, token in items]
+
+
+def _encrypt_chunk(
+    items: list[tuple[bytes, str, dict[str, Any]]],
+    algorithm: str,
+    compression: CompressionPolicy | None,
+) -> list[Ciphertext]:
+    return [
+        encrypt_payload(key, payload, key_id=key_id, algorithm=algorithm, compression=compression)
+        for key, key_id, payload in items
+    ]
+
+
+def _reencrypt_chunk(
+    items: list[tuple[bytes, bytes, str, Ciphertext]],
+    algorithm: str,
+    compression: CompressionPolicy | None,
+    dictionaries: Mapping[int, bytes] | None = None,
+) -> list[Ciphertext]:
+    return [
+        encrypt_payload(
+            new_key,
+            decrypt_payload(old_key, token, dictionaries),
+            key_id=new_key_id,
+            algorithm=algorithm,
+            compression=compression,
+        )
+        for old_key, new_key, new_key_id, token in items
+    ]
+
+
+class CryptoEngine:
+    """Chunked, order-preserving fan-out of payload encryption work."""
+
+    def __init__(
+        self,
+        *,
+        workers: int | None = None,
+        executor: str = "process",
+        chunk_size: int = 64,
+        algorithm: str = DEFAULT_CIPHER,
+        compression: CompressionPolicy | None = None,
+    ) -> None:
+        if executor not in EXECUTOR_KINDS:
+            raise ValueError(f"Unknown crypto executor: {executor}")
+        if algorithm not in CIPHERS:
+            raise ValueError(f"Unknown PathLog cipher: {algorithm}")
+        if chunk_size < 1:
+            raise ValueError("chunk_size must be positive.")
+        self.workers = max(1, workers if workers is not None else os.cpu_count() or 1)
+        self.executor_kind = executor
+        self.chunk_size = chunk_size
+        self.algorithm = algorithm
+        self.compression = compression
+        self._executor: Executor | None = None
+        self._lock = threading.Lock()
+
+    @property
+    def batch_size(self) -> int:
+        """Number of items worth gathering before calling the engine."""
+        return self.chunk_size * self.workers * 2
+
+    def decrypt_many(
+        self,
+        items: Iterable[tuple[bytes, Ciphertext]],
+        *,
+        dictionaries: Mapping[int, bytes] | None = None,
+    ) -> Iterator[dict[str, Any]]:
+        """Decrypt ``(key, token)`` pairs, yielding payloads in input order."""
+        return self._map_chunks(partial(_decrypt_chunk, dictionaries=dictionaries), items)
+
+    def encrypt_many(
+        self,
+        items: Iterable[tuple[bytes, str, dict[str, Any]]],
+        *,
+        compression: CompressionPolicy | None = None,
+    ) -> Iterator[Ciphertext]:
+        """Encrypt ``(key, key_id, payload)`` triples, yielding tokens in input order."""
+        func = partial(
+            _encrypt_chunk,
+            algorithm=self.algorithm,
+            compression=compression or self.compression,
+        )
+        return self._map_chunks(func, items)
+
+    def reencrypt_many(
+        self,
+        items: Iterable[tuple[bytes, bytes, str, Ciphertext]],
+        *,
+        compression: CompressionPolicy | None = None,
+        dictionaries: Mapping[int, bytes] | None = None,
+    ) -> Iterator[Ciphertext]:
+        """Move ``(old_key, new_key, new_key_id, token)`` tokens to ``new_key``."""
+        func = partial(
+            _reencrypt_chunk,
+            algorithm=self.algorithm,
+            compression=compression or self.compression,
+            dictionaries=dictionaries,
+        )
+        return self._map_chunks(func, items)
+
+    def close(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+    # ------------------------------------------------------------------
+    def _pool(self) -> Executor:
+        with self._lock:
+            if self._executor is None:
+                if self.executor_kind == "process":
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.workers,
+                        mp_context=multiprocessing.get_context("spawn"),
+                    )
+                else:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.workers, thread_name_prefix="pathlog-crypto"
+                    )
+            return self._executor
+
+    def _map_chunks(self, func: Callable[[list[T]], list[R]], items: Iterable[T]) -> Iterator[R]:
+        iterator = iter(items)
+        first = list(islice(iterator, self.chunk_size))
+        second = list(islice(iterator, self.chunk_size))
+        if not second or self.workers == 1:
+            # Too little work (or no parallelism) to pay for the pool hand-off.
+            yield from func(first)
+            while second:
+                yield from func(second)
+                second = list(islice(iterator, self.chunk_size))
+            return
+
+        pool = self._pool()
+        pending: deque[Future[list[R]]] = deque(
+            [pool.submit(func, first), pool.submit(func, second)]
+        )
+        max_in_flight = self.workers * 2
+        while pending:
+            while len(pending) < max_in_flight:
+                chunk = list(islice(iterator, self.chunk_size))
+                if not chunk:
+                    break
+                pending.append(pool.submit(func, chunk))
+            yield from pending.popleft().result()
+
+
+__all__ = ["CryptoEngine", "EXECUTOR_KINDS"]
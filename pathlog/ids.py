@@ -0,0 +1,55 @@
+"""Time-ordered event identifiers for the PathLog prototype.
+
+New events get UUIDv7 ids (RFC 9562): a 48-bit Unix millisecond timestamp
+followed by random bits, so ids sort - as integers and as their canonical
+strings - in creation order and carry their creation time. Ids minted in the
+same millisecond by one process are kept strictly increasing by a counter in
+the ``rand_a`` field. Events captured before ids were time-ordered keep their
+random UUIDv4 ids; :func:`event_id_time` returns ``None`` for those.
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+
+_COUNTER_MAX = 0xFFF
+_lock = threading.Lock()
+_last_ms = 0
+_counter = 0
+
+
+def new_event_id() -> str:
+    """Return a new UUIDv7 string, greater than every id this process issued before."""
+    global _last_ms, _counter
+    with _lock:
+        now_ms = time.time_ns() // 1_000_000
+        if now_ms > _last_ms:
+            # Start low in the counter range so a burst has room before borrowing a tick.
+            _last_ms, _counter = now_ms, int.from_bytes(os.urandom(2), "big") & 0x1FF
+        elif _counter < _COUNTER_MAX:
+            _counter += 1
+        else:
+            # Counter exhausted (or the clock stepped back): borrow the next millisecond.
+            _last_ms, _counter = _last_ms + 1, 0
+        millis, counter = _last_ms, _counter
+    rand_b = int.from_bytes(os.urandom(8), "big") & ((1 << 62) - 1)
+    value = (millis << 80) | (0x7 << 76) | (counter << 64) | (0b10 << 62) | rand_b
+    return str(uuid.UUID(int=value))
+
+
+def event_id_time(event_id: str) -> datetime | None:
+    """Return the creation time embedded in a UUIDv7 event id, or ``None`` for other ids."""
+    try:
+        parsed = uuid.UUID(event_id)
+    except (TypeError, ValueError, AttributeError):
+        return None
+    if parsed.version != 7:
+        return None
+    return datetime.fromtimestamp((parsed.int >> 80) / 1000, timezone.utc)
+
+
+__all__ = ["event_id_time", "new_event_id"]
@@ -0,0 +1,240 @@
+"""Write-behind ingestion with group commit for PathLog event appends.
+
+``WriteBehindIngestor`` accepts submissions of already-encrypted entries into
+bounded per-shard queues. A background writer per shard drains its queue, groups the
+entries by user and appends each group with a single ``append_events`` call,
+so a burst of captures costs one segment open instead of one per event.
+Storage is fsynced at most once per ``fsync_interval``.
+
+Entries that are queued but not yet committed live only in memory and are
+lost if the process dies; callers that need durability or read-your-writes
+call :meth:`WriteBehindIngestor.flush`, which blocks until everything queued
+before it has been committed.
+
+A failed append is reported to exactly the submissions it covered: each
+:meth:`WriteBehindIngestor.submit` returns a future that fails with the
+storage error, and the failure is also kept for that user until their next
+:meth:`~WriteBehindIngestor.flush` raises it, so one user's flush never
+reports (or swallows) another user's lost entries.
+"""
+
+from __future__ import annotations
+
+import logging
+import queue
+import threading
+import time
+import zlib
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Any, Callable, Iterable
+
+from .storage import StorageBackend
+
+LOGGER = logging.getLogger(__name__)
+
+
+class IngestQueueFull(RuntimeError):
+    """Raised when a shard queue stays full for longer than the enqueue timeout."""
+
+
+class IngestCommitError(RuntimeError):
+    """Raised by ``flush`` when queued entries of the flushed user(s) failed to commit."""
+
+
+@dataclass(slots=True)
+class _Pending:
+    user_id: str
+    entries: list[dict[str, Any]]
+    context: Any = None
+    future: Future[None] = field(default_factory=Future)
+
+
+@dataclass(slots=True)
+class _Barrier:
+    done: threading.Event = field(default_factory=threading.Event)
+
+
+_STOP = object()
+
+
+def _batch_size(item: Any) -> int:
+    return len(item.entries) if isinstance(item, _Pending) else 0
+
+
+class _ShardWriter:
+    """Single background thread committing one shard's queue in groups."""
+
+    def __init__(self, ingestor: "WriteBehindIngestor", index: int) -> None:
+        self.ingestor = ingestor
+        self.queue: queue.Queue[Any] = queue.Queue(maxsize=ingestor.max_queue)
+        self.last_fsync = time.monotonic()
+        self.thread = threading.Thread(
+            target=self._run, name=f"pathlog-ingest-{index}", daemon=True
+        )
+        self.thread.start()
+
+    def _run(self) -> None:
+        ingestor = self.ingestor
+        while True:
+            item = self.queue.get()
+            if item is _STOP:
+                return
+            batch = [item]
+            deadline = time.monotonic() + ingestor.flush_interval
+            size = _batch_size(item)
+            while size < ingestor.batch_size and not isinstance(batch[-1], _Barrier):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    next_item = self.queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if next_item is _STOP:
+                    self._commit(batch)
+                    return
+                batch.append(next_item)
+                size += _batch_size(next_item)
+            self._commit(batch)
+
+    def _commit(self, batch: list[Any]) -> None:
+        ingestor = self.ingestor
+        grouped: dict[str, list[_Pending]] = {}
+        barriers: list[_Barrier] = []
+        for item in batch:
+            if isinstance(item, _Barrier):
+                barriers.append(item)
+            else:
+                grouped.setdefault(item.user_id, []).append(item)
+
+        now = time.monotonic()
+        fsync = ingestor.fsync_interval is not None and (
+            barriers or now - self.last_fsync >= ingestor.fsync_interval
+        )
+        for user_id, items in grouped.items():
+            try:
+                ingestor.storage.append_events(
+                    user_id,
+                    [entry for item in items for entry in item.entries],
+                    fsync=bool(fsync),
+                )
+            except Exception as exc:  # noqa: BLE001
+                LOGGER.error("PathLog group commit failed for %s: %s", user_id, exc)
+                ingestor._record_failure(user_id, exc, len(items))
+                for item in items:
+                    item.future.set_exception(exc)
+                continue
+            if ingestor.on_commit is not None:
+                try:
+                    ingestor.on_commit(user_id, [item.context for item in items])
+                except Exception as exc:  # noqa: BLE001
+                    LOGGER.warning("PathLog post-commit hook failed for %s: %s", user_id, exc)
+            for item in items:
+                item.future.set_result(None)
+        if fsync:
+            self.last_fsync = now
+        for barrier in barriers:
+            barrier.done.set()
+
+
+class WriteBehindIngestor:
+    """Bounded, sharded write-behind queue in front of a storage backend."""
+
+    def __init__(
+        self,
+        storage: StorageBackend,
+        *,
+        shards: int = 4,
+        batch_size: int = 256,
+        flush_interval: float = 0.05,
+        fsync_interval: float | None = 1.0,
+        max_queue: int = 10_000,
+        enqueue_timeout: float = 1.0,
+        on_commit: Callable[[str, list[Any]], None] | None = None,
+    ) -> None:
+        if shards < 1 or batch_size < 1 or max_queue < 1:
+            raise ValueError("shards, batch_size and max_queue must be positive.")
+        self.storage = storage
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.fsync_interval = fsync_interval
+        self.max_queue = max_queue
+        self.enqueue_timeout = enqueue_timeout
+        self.on_commit = on_commit
+        self._failures: dict[str, tuple[BaseException, int]] = {}
+        self._failures_lock = threading.Lock()
+        self._shards = [_ShardWriter(self, index) for index in range(shards)]
+        self._closed = False
+
+    def _shard(self, user_id: str) -> _ShardWriter:
+        return self._shards[zlib.crc32(user_id.encode("utf-8")) % len(self._shards)]
+
+    def submit(
+        self, user_id: str, entries: Iterable[dict[str, Any]], *, context: Any = None
+    ) -> Future[None]:
+        """Queue one submission for ``user_id``; raise when the queue stays full.
+
+        The submission is committed as a unit and ``context`` is handed back to
+        ``on_commit`` once it is stored. ``max_queue`` bounds the number of
+        pending submissions per shard. The returned future completes once the
+        submission is stored, or fails with the storage error that lost it.
+        """
+        if self._closed:
+            raise RuntimeError("Ingestor has been closed.")
+        pending = _Pending(user_id, list(entries), context)
+        try:
+            self._shard(user_id).queue.put(pending, timeout=self.enqueue_timeout)
+        except queue.Full as exc:
+            raise IngestQueueFull("PathLog ingestion queue is full; retry shortly.") from exc
+        return pending.future
+
+    def flush(self, user_id: str | None = None, timeout: float | None = None) -> None:
+        """Block until everything queued so far (for ``user_id`` or all users) is committed.
+
+        Raises :class:`IngestCommitError` if entries of the flushed user (or,
+        without ``user_id``, of any user) failed to commit since that user's
+        previous flush.
+        """
+        shards = [self._shard(user_id)] if user_id is not None else self._shards
+        barriers = []
+        for shard in shards:
+            barrier = _Barrier()
+            shard.queue.put(barrier)
+            barriers.append(barrier)
+        for barrier in barriers:
+            if not barrier.done.wait(timeout):
+                raise TimeoutError("Timed out waiting for PathLog ingestion flush.")
+        with self._failures_lock:
+            users = [user_id] if user_id is not None else list(self._failures)
+            failures = {user: self._failures.pop(user) for user in users if user in self._failures}
+        if failures:
+            error, _ = next(iter(failures.values()))
+            lost = ", ".join(f"{user} ({count})" for user, (_, count) in failures.items())
+            raise IngestCommitError(
+                f"PathLog group commit failed; submissions lost for {lost}."
+            ) from error
+
+    def _record_failure(self, user_id: str, error: BaseException, submissions: int) -> None:
+        with self._failures_lock:
+            _, earlier = self._failures.get(user_id, (error, 0))
+            self._failures[user_id] = (error, earlier + submissions)
+
+    def queue_depths(self) -> list[int]:
+        return [shard.queue.qsize() for shard in self._shards]
+
+    def close(self) -> None:
+        """Flush outstanding entries and stop the writer threads."""
+        if self._closed:
+            return
+        try:
+            self.flush()
+        finally:
+            self._closed = True
+            for shard in self._shards:
+                shard.queue.put(_STOP)
+            for shard in self._shards:
+                shard.thread.join()
+
+
+__all__ = ["IngestCommitError", "IngestQueueFull", "WriteBehindIngestor"]
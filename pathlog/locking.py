@@ -0,0 +1,92 @@
+"""Advisory per-user locks shared by every worker process on one host.
+
+Storage backends hand out one :class:`InterProcessLock` per user so that
+several API workers (``uvicorn --workers N``) serialise their
+read-modify-write cycles on the same vault. The lock is re-entrant within a
+thread; the outermost acquisition also takes an exclusive ``flock`` on a lock
+file, which other processes block on. ``fcntl`` is unavailable on Windows,
+where only the in-process lock applies.
+"""
+
+from __future__ import annotations
+
+import threading
+from pathlib import Path
+from types import TracebackType
+from typing import IO, Callable
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+
+
+def interprocess_locking_available() -> bool:
+    """Return whether locks also exclude other processes on this platform."""
+    return fcntl is not None
+
+
+class InterProcessLock:
+    """Re-entrant lock that also holds an exclusive ``flock`` on ``path``."""
+
+    def __init__(self, path: str | Path) -> None:
+        self.path = Path(path)
+        self._lock = threading.RLock()
+        self._depth = 0
+        self._handle: IO[bytes] | None = None
+
+    def acquire(self) -> None:
+        self._lock.acquire()
+        if self._depth == 0 and fcntl is not None:
+            try:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                handle = self.path.open("a+b")
+                try:
+                    fcntl.flock(handle.fileno(), fcntl.LOCK_EX)
+                except BaseException:
+                    handle.close()
+                    raise
+            except BaseException:
+                self._lock.release()
+                raise
+            self._handle = handle
+        self._depth += 1
+
+    def release(self) -> None:
+        self._depth -= 1
+        if self._depth == 0 and self._handle is not None:
+            handle, self._handle = self._handle, None
+            fcntl.flock(handle.fileno(), fcntl.LOCK_UN)
+            handle.close()
+        self._lock.release()
+
+    def __enter__(self) -> "InterProcessLock":
+        self.acquire()
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        self.release()
+
+
+class LockRegistry:
+    """Hand out one :class:`InterProcessLock` per key, creating them on demand."""
+
+    def __init__(self, path_for: Callable[[str], Path]) -> None:
+        self._path_for = path_for
+        self._locks: dict[str, InterProcessLock] = {}
+        self._guard = threading.Lock()
+
+    def get(self, key: str) -> InterProcessLock:
+        with self._guard:
+            lock = self._locks.get(key)
+            if lock is None:
+                lock = self._locks[key] = InterProcessLock(self._path_for(key))
+            return lock
+
+
+__all__ = ["InterProcessLock", "LockRegistry", "interprocess_locking_available"]
@@ -3,7 +3,7 @@
 from __future__ import annotations
 
 from datetime import datetime
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Literal, Optional
 
 from pydantic import BaseModel, Field, validator
 
@@ -45,6 +45,10 @@ class CaptureEventRequest(BaseModel):
     response: str
     metadata: Dict[str, Any] = Field(default_factory=dict)
     passphrase: Optional[str] = None
+    session_token: Optional[str] = Field(None, description="Token returned by /unlock")
+    wait_for_commit: bool = Field(
+        False, description="Block until the event is committed when write-behind is enabled"
+    )
 
 
 class CaptureEventResponse(BaseModel):
@@ -52,6 +56,37 @@ class CaptureEventResponse(BaseModel):
     stored_at: datetime
 
 
+class CaptureBatchItem(BaseModel):
+    tool_name: str
+    prompt: str
+    response: str
+    metadata: Dict[str, Any] = Field(default_factory=dict)
+
+
+class CaptureBatchRequest(BaseModel):
+    user_id: str
+    events: List[CaptureBatchItem] = Field(..., min_length=1, max_length=1000)
+    passphrase: Optional[str] = None
+    session_token: Optional[str] = Field(None, description="Token returned by /unlock")
+    wait_for_commit: bool = Field(
+        False, description="Block until the batch is committed when write-behind is enabled"
+    )
+
+
+class CaptureBatchResult(BaseModel):
+    index: int
+    event_id: Optional[str] = None
+    stored_at: Optional[datetime] = None
+    error: Optional[str] = None
+
+
+class CaptureBatchResponse(BaseModel):
+    user_id: str
+    captured: int
+    failed: int
+    results: List[CaptureBatchResult]
+
+
 class TimelineEntry(BaseModel):
     event_id: str
     timestamp: datetime
@@ -64,12 +99,38 @@ class TimelineEntry(BaseModel):
 class TimelineResponse(BaseModel):
     user_id: str
     events: List[TimelineEntry]
+    next_cursor: Optional[str] = Field(
+        None, description="Opaque cursor for the next page; absent on the last page"
+    )
+
+
+class SearchHit(TimelineEntry):
+    score: float = Field(..., description="BM25 relevance score")
+
+
+class SearchResponse(BaseModel):
+    user_id: str
+    query: str
+    results: List[SearchHit]
+
+
+class RecallResponse(BaseModel):
+    user_id: str
+    query: str
+    mode: Literal["auto", "exact", "ivf"]
+    results: List[SearchHit] = Field(..., description="Hits scored by cosine similarity")
 
 
 class StatsResponse(BaseModel):
     user_id: str
     total_events: int
     by_tool: Dict[str, int]
+    by_day: Dict[str, int] = Field(default_factory=dict)
+
+
+class DeleteEventResponse(BaseModel):
+    user_id: str
+    event_id: str
 
 
 class ExportResponse(BaseModel):
@@ -87,9 +148,101 @@ class ImportResponse(BaseModel):
     imported_events: int
 
 
+class BackupWatermark(BaseModel):
+    seq: int = Field(..., description="Sequence number of the last event included")
+    profile_version: int
+    key_ids: List[str]
+    epoch: int = Field(..., description="History epoch; deletes and re-encryption bump it")
+
+
+class BackupRecord(BaseModel):
+    backup_id: str
+    kind: Literal["full", "delta"]
+    parent: Optional[str] = None
+    created_at: datetime
+    watermark: BackupWatermark
+
+
+class BackupChainResponse(BaseModel):
+    user_id: str
+    backups: List[BackupRecord]
+
+
+class UnlockRequest(BaseModel):
+    user_id: str
+    passphrase: Optional[str] = None
+    ttl_seconds: Optional[float] = Field(
+        None, gt=0, description="Requested lifetime, capped by the server maximum"
+    )
+
+
+class UnlockResponse(BaseModel):
+    user_id: str
+    session_token: str
+    expires_at: datetime
+
+
+class LockRequest(BaseModel):
+    user_id: str
+    session_token: str
+
+
+class LockResponse(BaseModel):
+    locked: bool
+
+
+class EvictSessionsRequest(BaseModel):
+    user_id: str
+    passphrase: Optional[str] = None
+    session_token: Optional[str] = None
+
+
+class EvictSessionsResponse(BaseModel):
+    user_id: str
+    evicted: int
+
+
+class ExportRequest(BaseModel):
+    user_id: str
+    passphrase: Optional[str] = None
+    session_token: Optional[str] = Field(None, description="Token returned by /unlock")
+    decrypt: bool = Field(
+        False, description="Also return the plaintext history as bundle.decrypted_events"
+    )
+
+
+class FlushResponse(BaseModel):
+    user_id: str
+    flushed: bool
+
+
+class ReindexResponse(BaseModel):
+    user_id: str
+    segments: int
+
+
+class OffloadMetricsResponse(BaseModel):
+    workers: int
+    max_pending: int
+    running: int
+    queued: int
+    peak_queued: int
+    admitted: int
+    rejected: int
+    completed: int
+    mean_wait_ms: float
+    mean_run_ms: float
+
+
 class RotateKeyRequest(BaseModel):
     user_id: str
     passphrase: Optional[str] = None
+    reencrypt: bool = Field(False, description="Also re-encrypt every event under fresh data keys")
+
+
+class ReencryptRequest(BaseModel):
+    user_id: str
+    passphrase: Optional[str] = None
 
 
 class RotateKeyResponse(BaseModel):
@@ -98,6 +251,32 @@ class RotateKeyResponse(BaseModel):
     message: str
 
 
+class RotationStatusResponse(BaseModel):
+    user_id: str
+    status: Literal["idle", "running", "completed"]
+    key_id: Optional[str] = None
+    processed: int = 0
+    total: int = 0
+    checkpoint_seq: Optional[int] = None
+    started_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+    completed_at: Optional[datetime] = None
+
+
+class TrainDictionaryRequest(BaseModel):
+    user_id: str
+    passphrase: Optional[str] = None
+    session_token: Optional[str] = Field(None, description="Token returned by /unlock")
+    samples: int = Field(500, ge=1, le=10_000, description="Newest events to train on")
+
+
+class TrainDictionaryResponse(BaseModel):
+    user_id: str
+    dictionary_id: int
+    dictionary_bytes: int
+    samples: int
+
+
 __all__ = [
     "ConsentRequest",
     "ConsentResponse",
@@ -105,11 +284,36 @@ __all__ = [
     "ConnectToolResponse",
     "CaptureEventRequest",
     "CaptureEventResponse",
+    "CaptureBatchItem",
+    "CaptureBatchRequest",
+    "CaptureBatchResult",
+    "CaptureBatchResponse",
     "TimelineResponse",
+    "SearchHit",
+    "SearchResponse",
+    "RecallResponse",
     "StatsResponse",
+    "DeleteEventResponse",
+    "ExportRequest",
     "ExportResponse",
     "ImportRequest",
     "ImportResponse",
+    "BackupWatermark",
+    "BackupRecord",
+    "BackupChainResponse",
+    "UnlockRequest",
+    "UnlockResponse",
+    "LockRequest",
+    "LockResponse",
+    "EvictSessionsRequest",
+    "EvictSessionsResponse",
+    "FlushResponse",
+    "ReindexResponse",
+    "OffloadMetricsResponse",
     "RotateKeyRequest",
     "RotateKeyResponse",
+    "ReencryptRequest",
+    "RotationStatusResponse",
+    "TrainDictionaryRequest",
+    "TrainDictionaryResponse",
 ]
@@ -0,0 +1,136 @@
+"""Bounded executor that keeps CPU-heavy vault work off the request threadpool.
+
+Async API handlers hand unlocks, captures, decrypting reads and key rotation
+to an :class:`Offloader`: a small, dedicated thread pool sized for the CPU
+(scrypt and the AEAD ciphers release the GIL) behind an admission limit.
+Once ``max_pending`` calls are running or queued, further calls are refused
+with :class:`OffloadRejected` instead of piling up, so a storm of
+passphrase unlocks sheds load quickly while cheap endpoints, which never
+enter the pool, stay responsive. :meth:`Offloader.metrics` reports queue
+depth, throughput and queueing delay.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, TypeVar
+
+R = TypeVar("R")
+
+
+class OffloadRejected(RuntimeError):
+    """Raised when the offload queue is full; the caller should retry shortly."""
+
+
+class Offloader:
+    """Size-limited thread pool with admission control and queue-depth metrics."""
+
+    def __init__(
+        self,
+        workers: int | None = None,
+        max_pending: int = 64,
+        *,
+        thread_name_prefix: str = "pathlog-offload",
+    ) -> None:
+        self.workers = max(1, workers if workers is not None else os.cpu_count() or 1)
+        self.max_pending = max(max_pending, self.workers)
+        self.thread_name_prefix = thread_name_prefix
+        self._executor: ThreadPoolExecutor | None = None
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._running = 0
+        self._peak_queued = 0
+        self._admitted = 0
+        self._rejected = 0
+        self._completed = 0
+        self._wait_seconds = 0.0
+        self._run_seconds = 0.0
+
+    async def run(self, func: Callable[..., R], /, *args: Any, **kwargs: Any) -> R:
+        """Run ``func(*args, **kwargs)`` in the pool and await its result.
+
+        Raises :class:`OffloadRejected` without queueing when ``max_pending``
+        calls are already admitted. A call cancelled before it starts (for
+        example because the client went away) never runs.
+        """
+        future = self.submit(partial(func, *args, **kwargs))
+        return await asyncio.wrap_future(future)
+
+    def submit(self, func: Callable[[], R]) -> Future[R]:
+        """Admit ``func`` and schedule it; see :meth:`run`."""
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self._rejected += 1
+                raise OffloadRejected(
+                    f"PathLog is busy ({self._pending} crypto jobs queued); retry shortly."
+                )
+            self._pending += 1
+            self._admitted += 1
+            self._peak_queued = max(self._peak_queued, self._pending - self._running)
+        submitted = time.perf_counter()
+        try:
+            future = self._pool().submit(self._call, func, submitted)
+        except BaseException:
+            with self._lock:
+                self._pending -= 1
+            raise
+        future.add_done_callback(self._release)
+        return future
+
+    def metrics(self) -> dict[str, Any]:
+        """Return a snapshot of pool occupancy and counters since start-up."""
+        with self._lock:
+            finished = max(self._completed, 1)
+            return {
+                "workers": self.workers,
+                "max_pending": self.max_pending,
+                "running": self._running,
+                "queued": self._pending - self._running,
+                "peak_queued": self._peak_queued,
+                "admitted": self._admitted,
+                "rejected": self._rejected,
+                "completed": self._completed,
+                "mean_wait_ms": round(self._wait_seconds / finished * 1000, 3),
+                "mean_run_ms": round(self._run_seconds / finished * 1000, 3),
+            }
+
+    def close(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    # ------------------------------------------------------------------
+    def _pool(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.workers, thread_name_prefix=self.thread_name_prefix
+                )
+            return self._executor
+
+    def _call(self, func: Callable[[], R], submitted: float) -> R:
+        started = time.perf_counter()
+        with self._lock:
+            self._running += 1
+            self._wait_seconds += started - submitted
+        try:
+            return func()
+        finally:
+            with self._lock:
+                self._running -= 1
+                self._completed += 1
+                self._run_seconds += time.perf_counter() - started
+
+    def _release(self, _: Future[Any]) -> None:
+        # Runs on completion and on cancellation before start alike.
+        with self._lock:
+            self._pending -= 1
+
+
+__all__ = ["OffloadRejected", "Offloader"]
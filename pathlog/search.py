@@ -0,0 +1,392 @@
+"""Encrypted full-text search over a user's events.
+
+The index is a classic inverted index whose terms are blinded with the
+user's blind-index key (see :mod:`pathlog.blind_index`) and whose posting
+lists are sealed, so storage sees neither words nor which events contain
+them. Postings are packed ``(doc, tf, doc_length)`` ``uint32`` triples,
+grouped by blinded term into ``SEARCH_SHARDS`` sealed shard blobs. New
+documents land in a sealed pending buffer that is merged into the shards
+every ``SEARCH_MERGE_DOCS`` documents, so a capture rewrites one small blob
+instead of every shard its terms hash to. Queries open only the shards of
+their own terms and rank with BM25; the caller then decrypts just the top
+hits.
+
+Document numbers map back to event ids through sealed chunks of
+``SEARCH_DOC_CHUNK`` ids. Deleted documents are remembered by number and
+skipped at query time until the next rebuild. Everything is sealed with a
+key derived from the index key, so master-key rotation (which only re-wraps
+the index key) leaves the index alone, while re-encryption (which replaces
+the index key) invalidates it and it is rebuilt on next use.
+
+Scoring is vectorised with NumPy when it is installed and falls back to
+plain Python otherwise.
+"""
+
+from __future__ import annotations
+
+import base64
+import heapq
+import json
+import math
+import re
+from array import array
+from collections import Counter, defaultdict
+from typing import TYPE_CHECKING, Any, Iterable, Mapping, Sequence
+
+try:
+    import numpy
+except ImportError:  # pragma: no cover - optional dependency
+    numpy = None
+
+from .blind_index import blind_tag, sealing_key
+from .crypto import ciphertext_from_text, ciphertext_to_text, decrypt_payload, encrypt_payload
+
+if TYPE_CHECKING:  # pragma: no cover
+    from .storage import StorageBackend
+
+SEARCH_META_BLOB = "search_meta"
+SEARCH_PENDING_BLOB = "search_pending"
+SEARCH_SHARDS = 256
+SEARCH_MERGE_DOCS = 256
+SEARCH_DOC_CHUNK = 4096
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+_TERM_FIELD = "term"
+_TOKEN_PATTERN = re.compile(r"[^\W_]+")
+_POSTING_WIDTH = 3
+
+Postings = dict[str, array]
+
+
+def tokenize(text: str) -> list[str]:
+    """Split text into lowercase word tokens, dropping single characters."""
+    return [token for token in _TOKEN_PATTERN.findall(text.lower()) if len(token) > 1]
+
+
+def document_terms(payload: Mapping[str, Any]) -> Counter[str]:
+    """Return term frequencies for the searchable fields of a decrypted event."""
+    metadata = payload.get("metadata") or {}
+    fields = [payload.get("tool_name"), payload.get("prompt"), payload.get("response")]
+    fields.extend(value for value in metadata.values() if isinstance(value, str))
+    terms: Counter[str] = Counter()
+    for value in fields:
+        if isinstance(value, str):
+            terms.update(tokenize(value))
+    return terms
+
+
+def bm25(tf: int, df: int, doc_length: int, average_length: float, documents: int) -> float:
+    """Okapi BM25 weight of one term in one document."""
+    idf = math.log(1 + (documents - df + 0.5) / (df + 0.5))
+    norm = 1 - BM25_B + BM25_B * doc_length / average_length
+    return idf * tf * (BM25_K1 + 1) / (tf + BM25_K1 * norm)
+
+
+def _rank(
+    term_postings: Sequence[array],
+    next_doc: int,
+    documents: int,
+    average_length: float,
+    deleted: set[int],
+    limit: int,
+) -> list[tuple[int, float]]:
+    """Sum BM25 weights per document over every query term and keep the best ``limit``."""
+    if numpy is not None:
+        return _rank_numpy(term_postings, next_doc, documents, average_length, deleted, limit)
+    scores: dict[int, float] = defaultdict(float)
+    for postings in term_postings:
+        matches = [
+            (doc, tf, length)
+            for doc, tf, length in zip(
+                postings[0::_POSTING_WIDTH],
+                postings[1::_POSTING_WIDTH],
+                postings[2::_POSTING_WIDTH],
+            )
+            if doc not in deleted
+        ]
+        for doc, tf, length in matches:
+            scores[doc] += bm25(tf, len(matches), length, average_length, documents)
+    # Ties go to the older document so both scorers agree.
+    return heapq.nlargest(limit, scores.items(), key=lambda item: (item[1], -item[0]))
+
+
+def _rank_numpy(
+    term_postings: Sequence[array],
+    next_doc: int,
+    documents: int,
+    average_length: float,
+    deleted: set[int],
+    limit: int,
+) -> list[tuple[int, float]]:
+    scores = numpy.zeros(next_doc)
+    removed = numpy.fromiter(deleted, dtype=numpy.uint32, count=len(deleted))
+    for postings in term_postings:
+        triples = numpy.frombuffer(postings, dtype=numpy.uint32).reshape(-1, _POSTING_WIDTH)
+        if len(removed):
+            triples = triples[~numpy.isin(triples[:, 0], removed)]
+        if not len(triples):
+            continue
+        tf = triples[:, 1].astype(numpy.float64)
+        weights = bm25(tf, len(triples), triples[:, 2], average_length, documents)
+        scores += numpy.bincount(triples[:, 0], weights, minlength=next_doc)
+    candidates = numpy.flatnonzero(scores)
+    if len(candidates) > limit:
+        cut = len(candidates) - limit
+        threshold = numpy.partition(scores[candidates], cut)[cut]
+        candidates = candidates[scores[candidates] >= threshold]
+    ranked = sorted(candidates.tolist(), key=lambda doc: (-scores[doc], doc))[:limit]
+    return [(doc, float(scores[doc])) for doc in ranked]
+
+
+def _empty_meta(generation: int) -> dict[str, Any]:
+    return {
+        "generation": generation,
+        "documents": 0,
+        "next_doc": 0,
+        "total_length": 0,
+        "pending_docs": 0,
+        "deleted": [],
+    }
+
+
+def _shard_blob(shard: int) -> str:
+    return f"search_shard_{shard:03d}"
+
+
+def _docs_blob(chunk: int) -> str:
+    return f"search_docs_{chunk:05d}"
+
+
+def _shard_of(token: str) -> int:
+    raw = base64.urlsafe_b64decode(token[:4])
+    return int.from_bytes(raw[:2], "big") % SEARCH_SHARDS
+
+
+def _encode_postings(postings: Postings) -> dict[str, str]:
+    return {
+        token: base64.b64encode(values.tobytes()).decode("ascii")
+        for token, values in postings.items()
+    }
+
+
+def _decode_postings(record: Mapping[str, str] | None) -> Postings:
+    postings: Postings = {}
+    for token, data in (record or {}).items():
+        values = array("I")
+        values.frombytes(base64.b64decode(data))
+        postings[token] = values
+    return postings
+
+
+class SearchIndex:
+    """Sealed inverted index of one user's events under one index-key generation.
+
+    Instances are cheap and short-lived; callers serialise writers (and
+    readers that must not observe a half-applied merge) with their own lock.
+    """
+
+    def __init__(
+        self,
+        storage: "StorageBackend",
+        user_id: str,
+        generation: int,
+        index_key: bytes,
+        *,
+        algorithm: str,
+        meta: dict[str, Any] | None = None,
+    ) -> None:
+        self.storage = storage
+        self.user_id = user_id
+        self.generation = generation
+        self.index_key = index_key
+        self.algorithm = algorithm
+        self.meta = meta if meta is not None else _empty_meta(generation)
+        self._seal_key = sealing_key(index_key, "search")
+        self._key_id = f"search-{generation}"
+        self._tokens: dict[str, str] = {}
+
+    @classmethod
+    def open(
+        cls,
+        storage: "StorageBackend",
+        user_id: str,
+        index_keys: Mapping[int, bytes],
+        *,
+        algorithm: str,
+    ) -> "SearchIndex | None":
+        """Load the stored index, or ``None`` if it is missing or its key is gone."""
+        raw = storage.read_blob(user_id, SEARCH_META_BLOB)
+        if raw is None:
+            return None
+        record = json.loads(raw)
+        index_key = index_keys.get(record["generation"])
+        if index_key is None:
+            return None
+        index = cls(storage, user_id, record["generation"], index_key, algorithm=algorithm)
+        index.meta = index._unseal(ciphertext_from_text(record["ciphertext"]))
+        return index
+
+    # ------------------------------------------------------------------
+    def add(self, documents: Iterable[tuple[str, Counter[str]]]) -> None:
+        """Index ``(event_id, terms)`` pairs, merging the pending buffer when full."""
+        pending = _decode_postings(self._read(SEARCH_PENDING_BLOB))
+        chunks: dict[int, list[str]] = {}
+        for event_id, terms in documents:
+            doc = self._append_document(chunks, event_id)
+            self._post(pending, doc, terms)
+            self.meta["pending_docs"] += 1
+        if not chunks:
+            return
+        for chunk, event_ids in chunks.items():
+            self._write(_docs_blob(chunk), event_ids)
+        if self.meta["pending_docs"] >= SEARCH_MERGE_DOCS:
+            self._merge(pending)
+            pending = {}
+            self.meta["pending_docs"] = 0
+        self._write(SEARCH_PENDING_BLOB, _encode_postings(pending))
+        self._save_meta()
+
+    def remove(self, event_id: str, terms: Counter[str]) -> bool:
+        """Hide a deleted event from results; its postings go at the next rebuild."""
+        deleted = set(self.meta["deleted"])
+        last_chunk = (self.meta["next_doc"] - 1) // SEARCH_DOC_CHUNK
+        for chunk in range(last_chunk + 1):
+            event_ids = self._read(_docs_blob(chunk)) or []
+            if event_id not in event_ids:
+                continue
+            doc = chunk * SEARCH_DOC_CHUNK + event_ids.index(event_id)
+            if doc in deleted:
+                return False
+            self.meta["deleted"].append(doc)
+            self.meta["documents"] -= 1
+            self.meta["total_length"] -= sum(terms.values())
+            self._save_meta()
+            return True
+        return False
+
+    def rebuild(self, documents: Iterable[tuple[str, Counter[str]]]) -> None:
+        """Replace the index with ``documents``, writing every shard once."""
+        self.meta = _empty_meta(self.generation)
+        shards: dict[int, Postings] = defaultdict(dict)
+        chunks: dict[int, list[str]] = {}
+        for event_id, terms in documents:
+            doc = self._append_document(chunks, event_id)
+            for token, values in self._postings(doc, terms):
+                shards[_shard_of(token)].setdefault(token, array("I")).extend(values)
+        for chunk, event_ids in chunks.items():
+            self._write(_docs_blob(chunk), event_ids)
+        for shard in range(SEARCH_SHARDS):
+            self._write(_shard_blob(shard), _encode_postings(shards.get(shard, {})))
+        self._write(SEARCH_PENDING_BLOB, {})
+        self._save_meta()
+
+    def search(self, query: str, limit: int) -> list[tuple[str, float]]:
+        """Return up to ``limit`` ``(event_id, score)`` pairs, best first."""
+        documents = self.meta["documents"]
+        terms = set(tokenize(query))
+        if not terms or documents <= 0:
+            return []
+        average_length = max(self.meta["total_length"] / documents, 1.0)
+        deleted = set(self.meta["deleted"])
+        pending = self._read(SEARCH_PENDING_BLOB) or {}
+        shards: dict[int, dict[str, str]] = {}
+        term_postings = []
+        for term in terms:
+            token = self._token(term)
+            shard = _shard_of(token)
+            if shard not in shards:
+                shards[shard] = self._read(_shard_blob(shard)) or {}
+            postings = array("I")
+            for record in (shards[shard], pending):
+                if token in record:
+                    postings.frombytes(base64.b64decode(record[token]))
+            term_postings.append(postings)
+        best = _rank(
+            term_postings, self.meta["next_doc"], documents, average_length, deleted, limit
+        )
+        chunks: dict[int, list[str]] = {}
+        hits = []
+        for doc, score in best:
+            chunk = doc // SEARCH_DOC_CHUNK
+            if chunk not in chunks:
+                chunks[chunk] = self._read(_docs_blob(chunk)) or []
+            hits.append((chunks[chunk][doc % SEARCH_DOC_CHUNK], score))
+        return hits
+
+    # ------------------------------------------------------------------
+    def _append_document(self, chunks: dict[int, list[str]], event_id: str) -> int:
+        doc = self.meta["next_doc"]
+        chunk = doc // SEARCH_DOC_CHUNK
+        if chunk not in chunks:
+            # A chunk starting at this document is new; stale blobs are overwritten.
+            start = doc % SEARCH_DOC_CHUNK == 0
+            chunks[chunk] = [] if start else self._read(_docs_blob(chunk)) or []
+        chunks[chunk].append(event_id)
+        self.meta["next_doc"] += 1
+        self.meta["documents"] += 1
+        return doc
+
+    def _postings(self, doc: int, terms: Counter[str]) -> Iterable[tuple[str, tuple[int, ...]]]:
+        length = sum(terms.values())
+        self.meta["total_length"] += length
+        for term, tf in terms.items():
+            yield self._token(term), (doc, tf, length)
+
+    def _token(self, term: str) -> str:
+        # Vocabularies are small next to postings, so memoise the HMACs.
+        token = self._tokens.get(term)
+        if token is None:
+            token = self._tokens[term] = blind_tag(self.index_key, _TERM_FIELD, term)
+        return token
+
+    def _post(self, postings: Postings, doc: int, terms: Counter[str]) -> None:
+        for token, values in self._postings(doc, terms):
+            postings.setdefault(token, array("I")).extend(values)
+
+    def _merge(self, pending: Postings) -> None:
+        by_shard: dict[int, Postings] = defaultdict(dict)
+        for token, values in pending.items():
+            by_shard[_shard_of(token)][token] = values
+        for shard, additions in by_shard.items():
+            postings = _decode_postings(self._read(_shard_blob(shard)))
+            for token, values in additions.items():
+                postings.setdefault(token, array("I")).extend(values)
+            self._write(_shard_blob(shard), _encode_postings(postings))
+
+    def _seal(self, data: Any) -> str | bytes:
+        return encrypt_payload(
+            self._seal_key, {"data": data}, key_id=self._key_id, algorithm=self.algorithm
+        )
+
+    def _unseal(self, token: str | bytes) -> Any:
+        return decrypt_payload(self._seal_key, token)["data"]
+
+    def _read(self, name: str) -> Any:
+        raw = self.storage.read_blob(self.user_id, name)
+        if raw is None:
+            return None
+        return self._unseal(raw)
+
+    def _write(self, name: str, data: Any) -> None:
+        token = self._seal(data)
+        raw = token if isinstance(token, bytes) else token.encode("ascii")
+        self.storage.write_blob(self.user_id, name, raw)
+
+    def _save_meta(self) -> None:
+        # The generation stays readable so the right index key can be chosen.
+        record = {
+            "generation": self.generation,
+            "ciphertext": ciphertext_to_text(self._seal(self.meta)),
+        }
+        self.storage.write_blob(self.user_id, SEARCH_META_BLOB, json.dumps(record).encode("utf-8"))
+
+
+__all__ = [
+    "SEARCH_MERGE_DOCS",
+    "SEARCH_SHARDS",
+    "SearchIndex",
+    "bm25",
+    "document_terms",
+    "tokenize",
+]
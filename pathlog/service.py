@@ -3,34 +3,196 @@
 from __future__ import annotations
 
 import base64
+import json
+import random
+import threading
+import time
 import uuid
-from collections import Counter
+from collections import OrderedDict
 from datetime import datetime, timezone
-from typing import Any, Dict, Iterable, List
+from dataclasses import replace
+from itertools import chain, islice
+from typing import Any, BinaryIO, Callable, Dict, Iterable, Iterator, List, Sequence
 
-from . import storage
+from .blind_index import (
+    FIELD_CHANNEL,
+    FIELD_DAY,
+    FIELD_TOOL,
+    event_tags,
+    generate_index_key,
+    indexed_values,
+    tag_filter,
+)
+from .bundle import (
+    KIND_DELTA,
+    KIND_FULL,
+    encode_bundle,
+    manifest_record,
+    read_bundle,
+    spool,
+)
+from .compression import CompressionPolicy, resolve_codec, train_dictionary
+from .config import PathLogConfig
 from .crypto import (
     PassphraseRecord,
+    ciphertext_from_text,
+    ciphertext_to_text,
     create_passphrase_record,
     decrypt_payload,
     encrypt_payload,
+    envelope_key_id,
+    generate_data_key,
     generate_master_key,
     hash_passphrase,
+    is_envelope,
+    unwrap_data_key,
     unwrap_master_key,
+    wrap_data_key,
     wrap_master_key,
 )
+from .crypto_engine import CryptoEngine
+from .ids import new_event_id
+from .ingest import WriteBehindIngestor
+from .search import SEARCH_META_BLOB, SearchIndex, document_terms
+from .vectors import (
+    RECALL_MODES,
+    VECTORS_META_BLOB,
+    HashingEmbedder,
+    LoadedVectors,
+    VectorIndex,
+    numpy_available,
+)
+from .sessions import SessionCache
+from .storage import (
+    StorageBackend,
+    create_backend,
+    entry_from_json,
+    entry_to_json,
+    profile_version,
+)
+
+
+AGGREGATES_BLOB = "aggregates"
+ROTATION_BLOB = "rotation"
+DATA_KEYS_BLOB = "data_keys"
+DICTIONARIES_BLOB = "compression_dictionaries"
+INDEX_KEYS_BLOB = "index_keys"
+# Plain JSON: the backups taken of (or restored into) a vault, and a counter
+# bumped whenever stored events are rewritten or removed.
+BACKUP_CHAIN_BLOB = "backup_chain"
+HISTORY_EPOCH_BLOB = "history_epoch"
+# Sidecar records carried by backup bundles, by bundle field name.
+BUNDLE_BLOBS = (
+    ("aggregates", AGGREGATES_BLOB),
+    ("data_keys", DATA_KEYS_BLOB),
+    ("compression_dictionaries", DICTIONARIES_BLOB),
+    ("index_keys", INDEX_KEYS_BLOB),
+)
+# Users whose decrypted vectors stay mapped in memory between recalls.
+VECTOR_CACHE_USERS = 16
+PROFILE_UPDATE_RETRIES = 8
+
+
+class ProfileConflict(RuntimeError):
+    """Raised when a profile update keeps losing compare-and-swap races."""
+
+
+class AccessDenied(ValueError):
+    """Raised when a passphrase or session token does not open the requested vault."""
+
+
+def _import_target(profile: dict[str, Any], target_user_id: str | None) -> str:
+    """Pick the user id an imported profile lands under and stamp it into the profile."""
+    source_user_id = profile.get("user_id")
+    user_id = target_user_id or source_user_id or str(uuid.uuid4())
+    profile["user_id"] = user_id
+    return user_id
+
+
+def _empty_aggregates() -> dict[str, Any]:
+    return {"total": 0, "by_tool": {}, "by_day": {}}
+
+
+def _empty_data_keys() -> dict[str, Any]:
+    return {"generation": 1, "buckets": {}, "keys": {}}
+
+
+def _count_event(aggregates: dict[str, Any], payload: dict[str, Any], delta: int) -> None:
+    aggregates["total"] = max(aggregates["total"] + delta, 0)
+    buckets = (
+        ("by_tool", payload.get("tool_name", "unknown")),
+        ("by_day", str(payload.get("timestamp", ""))[:10] or "unknown"),
+    )
+    for field, bucket in buckets:
+        counts = aggregates[field]
+        counts[bucket] = counts.get(bucket, 0) + delta
+        if counts[bucket] <= 0:
+            del counts[bucket]
+
+
+def _matches(payload: dict[str, Any], filters: dict[str, str | None]) -> bool:
+    """Confirm a decrypted payload against the filters its blind-index tags matched."""
+    values = indexed_values(payload)
+    return all(value is None or values.get(field) == value for field, value in filters.items())
 
 
 class PathLogService:
     """Provide user-level operations for the PathLog prototype."""
 
     encryption_policy: Dict[str, Any] = {
-        "algorithm": "AES-256-GCM via Fernet",
-        "rotation": "Per-request manual rotation supported",
+        "algorithm": "AES-256-GCM or ChaCha20-Poly1305 binary envelopes; Fernet still readable",
+        "rotation": "Per-day data keys wrapped by the master key; rotation re-wraps them",
+        "blind_index": "HMAC-SHA256 tags under a per-user index key, renewed on re-encryption",
         "root_key": "Passphrase-wrapped optional",
         "notes": "Prototype implementation for local testing",
     }
 
+    def __init__(
+        self,
+        config: PathLogConfig | None = None,
+        *,
+        backend: StorageBackend | None = None,
+    ) -> None:
+        self.config = config or PathLogConfig.from_env()
+        self.storage: StorageBackend = backend or create_backend(self.config)
+        self.sessions = SessionCache(
+            ttl_seconds=self.config.session_ttl_seconds,
+            max_sessions=self.config.session_max_entries,
+        )
+        # Read-modify-write cycles on a user's sidecar blobs hold
+        # ``storage.user_lock``, which also excludes other worker processes.
+        self._search_lock = threading.Lock()
+        self._vectors_lock = threading.Lock()
+        # user_id -> (vector meta blob, decrypted vectors), least recently used first
+        self._vector_cache: OrderedDict[str, tuple[bytes, LoadedVectors]] = OrderedDict()
+        self.embedder = HashingEmbedder(self.config.vector_dim)
+        # user_id -> (sealed blob, current dictionary id, dictionaries by id)
+        self._dictionary_cache: Dict[str, tuple[bytes, int | None, Dict[int, bytes]]] = {}
+        self.compression = CompressionPolicy(
+            codec=resolve_codec(self.config.compression),
+            min_bytes=self.config.compress_min_bytes,
+        )
+        self.crypto = CryptoEngine(
+            workers=self.config.crypto_workers,
+            executor=self.config.crypto_executor,
+            chunk_size=self.config.crypto_chunk_size,
+            algorithm=self.config.cipher,
+            compression=self.compression,
+        )
+        self.ingestor: WriteBehindIngestor | None = None
+        if self.config.write_behind:
+            fsync_interval = self.config.ingest_fsync_interval
+            self.ingestor = WriteBehindIngestor(
+                self.storage,
+                shards=self.config.ingest_shards,
+                batch_size=self.config.ingest_batch_size,
+                flush_interval=self.config.ingest_flush_interval,
+                fsync_interval=fsync_interval if fsync_interval >= 0 else None,
+                max_queue=self.config.ingest_queue_size,
+                enqueue_timeout=self.config.ingest_enqueue_timeout,
+                on_commit=self._after_group_commit,
+            )
+
     def register_user(
         self,
         *,
@@ -74,7 +236,8 @@ class PathLogService:
                 "hash": passphrase_record.hash_b64,
             }
 
-        storage.save_profile(user_id, profile)
+        self.storage.save_profile(user_id, profile)
+        self._save_aggregates(user_id, key_id, master_key, _empty_aggregates())
         key_file = {
             "user_id": user_id,
             "key_id": key_id,
@@ -84,24 +247,24 @@ class PathLogService:
             "salt": key_record["salt"],
             "requires_passphrase": key_record["requires_passphrase"],
         }
-        key_file_path = storage.write_key_file(user_id, key_id, key_file)
+        key_file_path = self.storage.write_key_file(user_id, key_id, key_file)
 
         return {
             "user_id": user_id,
             "key_id": key_id,
-            "key_file_path": str(key_file_path),
+            "key_file_path": key_file_path,
         }
 
     # ---------------------------------------------------------------------
     def connect_tool(self, user_id: str, tool_name: str) -> List[str]:
-        profile = storage.load_profile(user_id)
-        tools: List[str] = list(profile.get("connected_tools", []))
-        if tool_name not in tools:
-            tools.append(tool_name)
-        profile["connected_tools"] = tools
-        profile["updated_at"] = datetime.now(timezone.utc).isoformat()
-        storage.save_profile(user_id, profile)
-        return tools
+        def add_tool(profile: Dict[str, Any]) -> None:
+            tools: List[str] = list(profile.get("connected_tools", []))
+            if tool_name not in tools:
+                tools.append(tool_name)
+            profile["connected_tools"] = tools
+            profile["updated_at"] = datetime.now(timezone.utc).isoformat()
+
+        return list(self._update_profile(user_id, add_tool)["connected_tools"])
 
     # ---------------------------------------------------------------------
     def capture_event(
@@ -113,14 +276,12 @@ class PathLogService:
         response: str,
         metadata: Dict[str, Any],
         passphrase: str | None,
+        session_token: str | None = None,
+        wait_for_commit: bool = False,
     ) -> dict[str, Any]:
-        profile = storage.load_profile(user_id)
-        self._validate_passphrase(profile, passphrase)
-        current_key_id = profile["current_key_id"]
-        key_record = profile["keys"][current_key_id]
-        master_key = self._unwrap_key_record(key_record, passphrase)
+        profile, get_key = self._open_vault(user_id, passphrase, session_token)
 
-        event_id = str(uuid.uuid4())
+        event_id = new_event_id()
         payload = {
             "event_id": event_id,
             "tool_name": tool_name,
@@ -129,82 +290,942 @@ class PathLogService:
             "metadata": metadata or {},
             "timestamp": datetime.now(timezone.utc).isoformat(),
         }
-        ciphertext = encrypt_payload(master_key, payload)
-        storage.append_event(
+        bucket = payload["timestamp"][:10]
+        data_key_id, data_key = self._data_keys_for(user_id, profile, get_key, [bucket])[bucket]
+        compression = self._compression_for(user_id, get_key)
+        ciphertext = self._encrypt(data_key_id, data_key, payload, compression)
+        index_generation, index_keys = self._index_keys(user_id, profile, get_key)
+        self._store_events(
             user_id,
-            {
-                "event_id": event_id,
-                "key_id": current_key_id,
-                "ciphertext": ciphertext,
-            },
+            [
+                {
+                    "event_id": event_id,
+                    "key_id": data_key_id,
+                    "ciphertext": ciphertext,
+                    "tags": event_tags(index_keys[index_generation], payload),
+                }
+            ],
+            profile,
+            get_key,
+            [payload],
+            wait_for_commit=wait_for_commit,
         )
         return {
             "event_id": event_id,
             "stored_at": payload["timestamp"],
         }
 
+    def capture_events(
+        self,
+        *,
+        user_id: str,
+        events: Sequence[Dict[str, Any]],
+        passphrase: str | None,
+        session_token: str | None = None,
+        wait_for_commit: bool = False,
+    ) -> List[dict[str, Any]]:
+        """Capture a burst of events with one key unwrap and one storage append.
+
+        Each item needs ``tool_name``, ``prompt`` and ``response`` and may carry
+        ``metadata``. The result list matches the input order and reports either
+        the stored ``event_id`` or the ``error`` that rejected the item.
+        """
+        profile, get_key = self._open_vault(user_id, passphrase, session_token)
+        data_keys: Dict[str, tuple[str, bytes]] = {}
+        compression = self._compression_for(user_id, get_key)
+        index_generation, index_keys = self._index_keys(user_id, profile, get_key)
+
+        results: List[dict[str, Any]] = []
+        entries: List[dict[str, Any]] = []
+        payloads: List[dict[str, Any]] = []
+        for index, item in enumerate(events):
+            timestamp = datetime.now(timezone.utc).isoformat()
+            bucket = timestamp[:10]
+            if bucket not in data_keys:
+                data_keys.update(self._data_keys_for(user_id, profile, get_key, [bucket]))
+            data_key_id, data_key = data_keys[bucket]
+            try:
+                for field in ("tool_name", "prompt", "response"):
+                    if not isinstance(item.get(field), str):
+                        raise ValueError(f"'{field}' must be a string.")
+                metadata = item.get("metadata") or {}
+                if not isinstance(metadata, dict):
+                    raise ValueError("'metadata' must be an object.")
+                event_id = new_event_id()
+                payload = {
+                    "event_id": event_id,
+                    "tool_name": item["tool_name"],
+                    "prompt": item["prompt"],
+                    "response": item["response"],
+                    "metadata": metadata,
+                    "timestamp": timestamp,
+                }
+                ciphertext = self._encrypt(data_key_id, data_key, payload, compression)
+            except (TypeError, ValueError, AttributeError) as exc:
+                results.append({"index": index, "event_id": None, "error": str(exc)})
+                continue
+            entries.append(
+                {
+                    "event_id": event_id,
+                    "key_id": data_key_id,
+                    "ciphertext": ciphertext,
+                    "tags": event_tags(index_keys[index_generation], payload),
+                }
+            )
+            payloads.append(payload)
+            results.append(
+                {"index": index, "event_id": event_id, "stored_at": payload["timestamp"]}
+            )
+
+        if entries:
+            self._store_events(
+                user_id, entries, profile, get_key, payloads, wait_for_commit=wait_for_commit
+            )
+        return results
+
+    def flush(self, user_id: str | None = None) -> None:
+        """Wait until queued captures (for ``user_id`` or everyone) are committed.
+
+        A no-op unless write-behind ingestion is enabled.
+        """
+        if self.ingestor is not None:
+            self.ingestor.flush(user_id)
+
+    def close(self) -> None:
+        """Commit queued captures and stop background writers and crypto workers."""
+        if self.ingestor is not None:
+            self.ingestor.close()
+        self.crypto.close()
+        with self._vectors_lock:
+            self._vector_cache.clear()
+
     # ---------------------------------------------------------------------
-    def fetch_timeline(self, user_id: str, passphrase: str | None) -> List[dict[str, Any]]:
-        profile = storage.load_profile(user_id)
-        self._validate_passphrase(profile, passphrase)
-        key_cache: Dict[str, bytes] = {}
+    def fetch_timeline(
+        self, user_id: str, passphrase: str | None, session_token: str | None = None
+    ) -> List[dict[str, Any]]:
+        return self.fetch_timeline_page(user_id, passphrase, session_token=session_token)["events"]
+
+    def fetch_timeline_page(
+        self,
+        user_id: str,
+        passphrase: str | None,
+        *,
+        limit: int | None = None,
+        cursor: str | None = None,
+        after_event_id: str | None = None,
+        since: datetime | None = None,
+        until: datetime | None = None,
+        tool_name: str | None = None,
+        channel: str | None = None,
+        newest_first: bool = False,
+        session_token: str | None = None,
+    ) -> dict[str, Any]:
+        """Return one page of decrypted events plus an opaque cursor for the next page.
+
+        Entries are read in storage order and only the returned page is
+        decrypted, in parallel batches. ``tool_name`` and ``channel`` filters
+        are matched against blind-index tags first, so only candidate events
+        are decrypted. ``after_event_id`` starts the page just past that event
+        (in the requested order), located by an index seek rather than a scan.
+        """
+        if limit is not None and limit < 1:
+            raise ValueError("limit must be a positive integer.")
+        if cursor and after_event_id:
+            raise ValueError("Pass either cursor or after_event_id, not both.")
+        profile, get_key = self._open_vault(user_id, passphrase, session_token)
+        filters = {FIELD_TOOL: tool_name, FIELD_CHANNEL: channel}
+        tags = None
+        if tool_name is not None or channel is not None:
+            tags = tag_filter(self._index_keys(user_id, profile, get_key)[1].values(), filters)
+
+        after_seq = before_seq = position = None
+        if cursor:
+            position = self._decode_cursor(cursor, newest_first=newest_first)
+        elif after_event_id:
+            anchor = self.storage.get_event_entry(user_id, after_event_id)
+            if anchor is None:
+                raise ValueError(f"Unknown event id {after_event_id!r}.")
+            position = anchor["seq"]
+        if newest_first:
+            before_seq = position
+        else:
+            after_seq = position
+        entries = self.storage.iter_event_entries(
+            user_id,
+            since=self._isoformat(since),
+            until=self._isoformat(until),
+            after_seq=after_seq,
+            before_seq=before_seq,
+            reverse=newest_first,
+            tags=tags,
+        )
+
         events: List[dict[str, Any]] = []
-        for entry in storage.iter_event_entries(user_id):
-            key_id = entry.get("key_id")
-            key_record = profile["keys"].get(key_id)
-            if not key_record:
-                continue
-            if key_id not in key_cache:
-                key_cache[key_id] = self._unwrap_key_record(
-                    key_record,
-                    passphrase if key_record.get("requires_passphrase") else None,
-                )
-            payload = decrypt_payload(key_cache[key_id], entry["ciphertext"])
-            events.append(payload)
-        events.sort(key=lambda item: item.get("timestamp", ""))
-        return events
+        last_seq: int | None = None
+        has_more = False
+        remaining = iter(entries)
+        _, dictionaries = self._dictionaries(user_id, get_key)
+        while True:
+            want = self.crypto.batch_size if limit is None else limit - len(events)
+            if want <= 0:
+                has_more = next(remaining, None) is not None
+                break
+            batch = list(islice(remaining, want))
+            if not batch:
+                break
+            last_seq = batch[-1]["seq"]
+            for payload in self._decrypt_entries(batch, get_key, dictionaries):
+                if payload is None or not _matches(payload, filters):
+                    continue
+                events.append(payload)
+
+        next_cursor = None
+        if has_more and last_seq is not None:
+            next_cursor = self._encode_cursor(last_seq, newest_first=newest_first)
+        return {"events": events, "next_cursor": next_cursor}
+
+    def reindex_events(self, user_id: str) -> dict[str, Any]:
+        """Rebuild the event seek metadata of a vault written before time-ordered ids.
+
+        A one-time step for older vaults; existing events keep their ids.
+        """
+        self.storage.load_profile(user_id)
+        self.flush(user_id)
+        return {"user_id": user_id, "segments": self.storage.reindex_events(user_id)}
 
     # ---------------------------------------------------------------------
-    def stats(self, user_id: str, passphrase: str | None) -> dict[str, Any]:
-        events = self.fetch_timeline(user_id, passphrase)
-        counter = Counter(event.get("tool_name", "unknown") for event in events)
+    def stats(
+        self,
+        user_id: str,
+        passphrase: str | None,
+        session_token: str | None = None,
+        *,
+        tool_name: str | None = None,
+        channel: str | None = None,
+        day: str | None = None,
+    ) -> dict[str, Any]:
+        """Return per-user counters from the encrypted aggregates sidecar.
+
+        Aggregates are kept current by capture, import and deletion, so this
+        decrypts one small record. They are rebuilt from the full history only
+        when missing, e.g. after importing a bundle that did not carry them.
+        Filtered stats select matching events by blind-index tags and decrypt
+        only those.
+        """
+        profile, get_key = self._open_vault(user_id, passphrase, session_token)
+        filters = {FIELD_TOOL: tool_name, FIELD_CHANNEL: channel, FIELD_DAY: day}
+        if any(value is not None for value in filters.values()):
+            aggregates = self._count_matching(user_id, profile, get_key, filters)
+        else:
+            aggregates = self._load_aggregates(user_id, get_key)
+        if aggregates is None:
+            aggregates = self._rebuild_aggregates(user_id, profile, get_key)
         return {
             "user_id": user_id,
-            "total_events": len(events),
-            "by_tool": dict(counter),
+            "total_events": aggregates["total"],
+            "by_tool": aggregates["by_tool"],
+            "by_day": aggregates["by_day"],
         }
 
     # ---------------------------------------------------------------------
-    def export_bundle(self, user_id: str) -> dict[str, Any]:
-        bundle = storage.export_bundle(user_id)
+    def search(
+        self,
+        user_id: str,
+        passphrase: str | None,
+        query: str,
+        *,
+        limit: int = 10,
+        session_token: str | None = None,
+    ) -> dict[str, Any]:
+        """Return the events best matching ``query``, ranked by BM25.
+
+        Only the blinded posting lists of the query terms are read and only
+        the top ``limit`` hits are decrypted. The index is built from the full
+        history on first use and kept current by capture and deletion.
+        """
+        if limit < 1:
+            raise ValueError("limit must be a positive integer.")
+        profile, get_key = self._open_vault(user_id, passphrase, session_token)
+        self.flush(user_id)
+        with self._search_lock:
+            generation, index_keys = self._index_keys(user_id, profile, get_key)
+            with self.storage.user_lock(user_id):
+                index = self._search_index(user_id, get_key, generation, index_keys)
+                hits = index.search(query, limit)
+        results = self._decrypt_hits(user_id, get_key, hits)
+        return {"user_id": user_id, "query": query, "results": results}
+
+    def recall(
+        self,
+        user_id: str,
+        passphrase: str | None,
+        query: str,
+        *,
+        limit: int = 10,
+        mode: str = "auto",
+        nprobe: int | None = None,
+        session_token: str | None = None,
+    ) -> dict[str, Any]:
+        """Return the events semantically closest to ``query`` by cosine similarity.
+
+        Vectors are decrypted into memory once per unlocked vault and scanned
+        in one matrix product (``exact``, which ``auto`` uses), or through IVF
+        clusters (``ivf``, faster but approximate). Only the hits are decrypted.
+        """
+        if limit < 1:
+            raise ValueError("limit must be a positive integer.")
+        if mode not in RECALL_MODES:
+            raise ValueError(f"mode must be one of {', '.join(RECALL_MODES)}.")
+        profile, get_key = self._open_vault(user_id, passphrase, session_token)
+        self.flush(user_id)
+        query_vector = self.embedder.embed_text(query)
+        with self._vectors_lock:
+            generation, index_keys = self._index_keys(user_id, profile, get_key)
+            with self.storage.user_lock(user_id):
+                loaded = self._loaded_vectors(user_id, get_key, generation, index_keys)
+            hits = loaded.search(query_vector, limit, mode=mode, nprobe=nprobe)
+        results = self._decrypt_hits(user_id, get_key, hits)
+        return {"user_id": user_id, "query": query, "mode": mode, "results": results}
+
+    # ---------------------------------------------------------------------
+    def delete_event(
+        self,
+        user_id: str,
+        event_id: str,
+        passphrase: str | None,
+        session_token: str | None = None,
+    ) -> dict[str, Any]:
+        profile, get_key = self._open_vault(user_id, passphrase, session_token)
+        self.flush(user_id)
+        entry = self.storage.delete_event(user_id, event_id)
+        if entry is None:
+            raise KeyError(event_id)
+        self._bump_history_epoch(user_id)
+        key = get_key(entry.get("key_id"))
+        if key is None:
+            self.storage.delete_blob(user_id, AGGREGATES_BLOB)
+            self.storage.delete_blob(user_id, SEARCH_META_BLOB)
+            self.storage.delete_blob(user_id, VECTORS_META_BLOB)
+        else:
+            _, dictionaries = self._dictionaries(user_id, get_key)
+            payload = decrypt_payload(key, entry["ciphertext"], dictionaries)
+            self._update_aggregates(user_id, profile, get_key, removed=[payload])
+            self._update_indexes(user_id, profile, get_key, removed=[payload])
+        return {"user_id": user_id, "event_id": event_id}
+
+    # ---------------------------------------------------------------------
+    def unlock(
+        self, user_id: str, passphrase: str | None, ttl_seconds: float | None = None
+    ) -> dict[str, Any]:
+        """Unwrap every vault key once and cache them behind a session token."""
+        profile = self.storage.load_profile(user_id)
+        self._validate_passphrase(profile, passphrase)
+        keys = {
+            key_id: self._unwrap_key_record(
+                key_record, passphrase if key_record.get("requires_passphrase") else None
+            )
+            for key_id, key_record in profile.get("keys", {}).items()
+        }
+        token, session = self.sessions.open(user_id, keys, ttl_seconds=ttl_seconds)
+        return {
+            "user_id": user_id,
+            "session_token": token,
+            "expires_at": session.expires_at_utc.isoformat(),
+        }
+
+    def lock(self, user_id: str, session_token: str) -> bool:
+        """End one session; the token must be live and belong to ``user_id``."""
+        if self.sessions.get(session_token, user_id) is None:
+            raise AccessDenied("Invalid or expired session token.")
+        return self.sessions.close(session_token)
+
+    def evict_sessions(
+        self, user_id: str, passphrase: str | None = None, session_token: str | None = None
+    ) -> int:
+        """Drop every session of ``user_id`` after checking its passphrase or a session token."""
+        self._open_vault(user_id, passphrase, session_token)
+        with self._vectors_lock:
+            self._vector_cache.pop(user_id, None)
+        return self.sessions.evict_user(user_id)
+
+    # ---------------------------------------------------------------------
+    def export_bundle(
+        self,
+        user_id: str,
+        *,
+        decrypt: bool = False,
+        passphrase: str | None = None,
+        session_token: str | None = None,
+    ) -> dict[str, Any]:
+        """Return the encrypted backup bundle.
+
+        With ``decrypt`` the vault is unlocked and the bundle also carries the
+        plaintext history as ``decrypted_events``; import ignores that field.
+        """
+        get_key = None
+        if decrypt:
+            _, get_key = self._open_vault(user_id, passphrase, session_token)
+        self.flush(user_id)
+        bundle = self.storage.export_bundle(user_id)
+        bundle.update(self._bundle_state(user_id))
+        if get_key is not None:
+            _, dictionaries = self._dictionaries(user_id, get_key)
+            bundle["decrypted_events"] = [
+                payload
+                for payload in self._decrypt_entries(bundle["events"], get_key, dictionaries)
+                if payload is not None
+            ]
         return {**bundle, "exported_at": datetime.now(timezone.utc).isoformat()}
 
+    def export_stream(
+        self,
+        user_id: str,
+        *,
+        decrypt: bool = False,
+        passphrase: str | None = None,
+        session_token: str | None = None,
+    ) -> Iterator[bytes]:
+        """Return the backup bundle as lazily produced NDJSON chunks.
+
+        See :mod:`pathlog.bundle` for the format. The vault is checked (and
+        unlocked with ``decrypt``) and the small records are read before this
+        returns; events are then streamed one crypto batch at a time, so
+        memory stays flat however large the vault is. Events captured after
+        the call are not included.
+        """
+        get_key = None
+        if decrypt:
+            _, get_key = self._open_vault(user_id, passphrase, session_token)
+        self.flush(user_id)
+        snapshot = self._bundle_snapshot(user_id)
+        manifest = manifest_record(
+            user_id, datetime.now(timezone.utc).isoformat(), decrypted=get_key is not None
+        )
+        return encode_bundle(self._bundle_records(user_id, manifest, snapshot, get_key))
+
+    def backup_stream(
+        self,
+        user_id: str,
+        *,
+        since: str | None = None,
+        passphrase: str | None = None,
+        session_token: str | None = None,
+    ) -> tuple[dict[str, Any], Iterator[bytes]]:
+        """Return a backup's chain entry and its NDJSON chunks.
+
+        Without ``since`` the backup is full. With ``since`` naming an earlier
+        backup of this vault (or ``"latest"``) it is a delta: only the events,
+        key files and profile changes made after that backup's watermark, plus
+        the small state records, so nightly backups move what changed rather
+        than the whole history. Deleting or re-encrypting events rewrites
+        history and starts a new epoch; a delta asked for across that
+        boundary, or with no earlier backup, is taken full instead. The backup
+        joins the vault's chain once its last chunk has been produced, so the
+        passphrase or a session token is required: a full backup resets it.
+        """
+        self._open_vault(user_id, passphrase, session_token)
+        self.flush(user_id)
+        snapshot = self._bundle_snapshot(user_id)
+        watermark = snapshot[0]
+        base = self._find_backup(user_id, since) if since is not None else None
+        if base is not None and base["watermark"]["epoch"] != watermark["epoch"]:
+            base = None
+        now = datetime.now(timezone.utc).isoformat()
+        backup = {
+            "backup_id": str(uuid.uuid4()),
+            "kind": KIND_DELTA if base else KIND_FULL,
+            "parent": base["backup_id"] if base else None,
+            "base": base["watermark"] if base else None,
+            "watermark": watermark,
+        }
+        manifest = manifest_record(user_id, now, decrypted=False, backup=backup)
+        records = self._bundle_records(
+            user_id, manifest, snapshot, None, base["watermark"] if base else None
+        )
+        entry = {**backup, "created_at": now}
+        del entry["base"]
+
+        def chunks() -> Iterator[bytes]:
+            yield from encode_bundle(records)
+            self._record_backup(user_id, entry)
+
+        return entry, chunks()
+
+    def backup_chain(self, user_id: str) -> dict[str, Any]:
+        """List the backups a delta can currently be based on, oldest first."""
+        self.storage.load_profile(user_id)
+        return {"user_id": user_id, "backups": self._load_backup_chain(user_id)}
+
+    def _bundle_snapshot(
+        self, user_id: str
+    ) -> tuple[dict[str, Any], dict[str, Any], dict[str, dict[str, Any]]]:
+        """Return the vault's watermark with the profile and key files it covers."""
+        # Bound the events first so every exported event's data key is in the state.
+        newest = next(self.storage.iter_event_entries(user_id, reverse=True), None)
+        profile = self.storage.load_profile(user_id)
+        keys = self.storage.load_key_files(user_id)
+        watermark = {
+            "seq": newest["seq"] if newest else 0,
+            "profile_version": profile_version(profile),
+            "key_ids": sorted(keys),
+            "epoch": self._history_epoch(user_id),
+        }
+        return watermark, profile, keys
+
+    def _bundle_records(
+        self,
+        user_id: str,
+        manifest: dict[str, Any],
+        snapshot: tuple[dict[str, Any], dict[str, Any], dict[str, dict[str, Any]]],
+        get_key: Callable[[str | None], bytes | None] | None,
+        base: dict[str, Any] | None = None,
+    ) -> Iterator[dict[str, Any]]:
+        """Read a bundle's small records now and chain its events lazily.
+
+        With a ``base`` watermark only what changed after it is included.
+        """
+        watermark, profile, keys = snapshot
+        head = [manifest]
+        if base is None or base["profile_version"] != watermark["profile_version"]:
+            head.append({"type": "profile", "profile": profile})
+        known = set(base["key_ids"]) if base else set()
+        head.extend(
+            {"type": "key", "key_id": key_id, "data": data}
+            for key_id, data in sorted(keys.items())
+            if key_id not in known
+        )
+        head.extend(
+            {"type": "state", "name": name, "value": value}
+            for name, value in self._bundle_state(user_id).items()
+        )
+        events = self._bundle_events(
+            user_id, get_key, watermark["seq"] + 1, after_seq=base["seq"] if base else None
+        )
+        return chain(head, events)
+
+    def _bundle_events(
+        self,
+        user_id: str,
+        get_key: Callable[[str | None], bytes | None] | None,
+        before_seq: int,
+        *,
+        after_seq: int | None = None,
+    ) -> Iterator[dict[str, Any]]:
+        # Each batch is its own bounded read: a streamed response may resume this
+        # generator on another thread, where a SQLite cursor left open cannot be used.
+        dictionaries = self._dictionaries(user_id, get_key)[1] if get_key is not None else None
+        while batch := list(
+            self.storage.iter_event_entries(
+                user_id, after_seq=after_seq, before_seq=before_seq, limit=self.crypto.batch_size
+            )
+        ):
+            after_seq = batch[-1]["seq"]
+            payloads: Sequence[dict[str, Any] | None] = [None] * len(batch)
+            if get_key is not None:
+                payloads = self._decrypt_entries(batch, get_key, dictionaries)
+            for entry, payload in zip(batch, payloads):
+                record = {"type": "event", "event": entry_to_json(entry)}
+                if payload is not None:
+                    record["payload"] = payload
+                yield record
+
+    def _bundle_state(self, user_id: str) -> dict[str, Any]:
+        """Return the exported sidecar records keyed by bundle field name."""
+        state: dict[str, Any] = {}
+        for field, blob_name in BUNDLE_BLOBS:
+            raw = self.storage.read_blob(user_id, blob_name)
+            if raw is not None:
+                state[field] = ciphertext_to_text(raw) if is_envelope(raw) else json.loads(raw)
+        return state
+
     # ---------------------------------------------------------------------
     def import_bundle(self, bundle: dict[str, Any], target_user_id: str | None = None) -> dict[str, Any]:
         profile = bundle.get("profile") or {}
-        source_user_id = profile.get("user_id")
-        user_id = target_user_id or source_user_id or str(uuid.uuid4())
-        if source_user_id and target_user_id and source_user_id != target_user_id:
-            profile["user_id"] = user_id
-        elif not source_user_id:
-            profile["user_id"] = user_id
+        user_id = _import_target(profile, target_user_id)
         bundle["profile"] = profile
-        storage.import_bundle(bundle, user_id)
+        self.flush(user_id)
+        self.storage.import_bundle(bundle, user_id)
+        self._restore_state(user_id, bundle)
+        self._restore_backup_chain(user_id, None)
         events = bundle.get("events") or []
         return {
             "user_id": user_id,
             "imported_events": len(events),
         }
 
+    def import_stream(self, source: BinaryIO, target_user_id: str | None = None) -> dict[str, Any]:
+        """Restore a streamed NDJSON bundle written by :meth:`export_stream`.
+
+        The bundle is read twice: once to validate record order, the event
+        count and the checksum, and again to write it straight to storage, so
+        a malformed or truncated upload changes nothing and memory stays
+        flat. Sources that cannot seek are spooled to a temporary file first.
+
+        A full bundle replaces the vault. A delta from :meth:`backup_stream`
+        is applied on top of it and must follow the last backup restored
+        there, so a chain is restored by importing the full backup and then
+        each delta in order.
+        """
+        source = spool(source)
+        start = source.tell()
+        for _ in read_bundle(source):
+            pass
+        source.seek(start)
+        records = read_bundle(source)
+        manifest = next(records)
+        if manifest.get("kind") == KIND_DELTA:
+            user_id = target_user_id or manifest["user_id"]
+            self.storage.load_profile(user_id)
+        else:
+            first = next(records)
+            user_id = _import_target(first["profile"], target_user_id)
+            records = chain([first], records)
+        self.flush(user_id)
+        with self.storage.user_lock(user_id):
+            if manifest.get("kind") == KIND_DELTA:
+                self._check_delta_base(user_id, manifest)
+            imported = self._write_bundle(
+                user_id, records, append=manifest.get("kind") == KIND_DELTA
+            )
+            self._restore_backup_chain(user_id, manifest)
+        return {"user_id": user_id, "imported_events": imported}
+
+    def _write_bundle(
+        self, user_id: str, records: Iterator[dict[str, Any]], *, append: bool
+    ) -> int:
+        """Write the records after a manifest; return how many events were written.
+
+        Events replace the stored log, or with ``append`` are added after it,
+        keeping their sequence numbers either way.
+        """
+        imported = 0
+        state: dict[str, Any] = {}
+        first_event = None
+        for record in records:
+            if record["type"] == "profile":
+                _import_target(record["profile"], user_id)
+                self.storage.save_profile(user_id, record["profile"])
+            elif record["type"] == "key":
+                self.storage.write_key_file(user_id, record["key_id"], record["data"])
+            elif record["type"] == "state":
+                state[record["name"]] = record["value"]
+            else:
+                first_event = record
+                break
+
+        def entries() -> Iterator[dict[str, Any]]:
+            nonlocal imported
+            for record in chain([first_event] if first_event else [], records):
+                imported += 1
+                yield entry_from_json(record["event"])
+
+        if append:
+            self.storage.append_events(user_id, entries(), preserve_seq=True)
+        else:
+            self.storage.write_events(user_id, entries())
+        self._restore_state(user_id, state)
+        return imported
+
+    def _check_delta_base(self, user_id: str, manifest: dict[str, Any]) -> None:
+        backups = self._load_backup_chain(user_id)
+        if not backups or backups[-1]["backup_id"] != manifest["parent"]:
+            raise ValueError(
+                f"Delta backup {manifest['backup_id']} does not follow the last backup "
+                f"restored into {user_id}; restore backup {manifest['parent']} first."
+            )
+        newest = next(self.storage.iter_event_entries(user_id, reverse=True), None)
+        if (newest["seq"] if newest else 0) != manifest["base"]["seq"]:
+            raise ValueError(f"Vault {user_id} has changed since its last restored backup.")
+
+    def _restore_state(self, user_id: str, bundle: dict[str, Any]) -> None:
+        """Write (or clear) the sidecar records of an imported bundle."""
+        aggregates = bundle.get("aggregates")
+        if isinstance(aggregates, str):
+            self.storage.write_blob(user_id, AGGREGATES_BLOB, ciphertext_from_text(aggregates))
+        elif aggregates:
+            self.storage.write_blob(
+                user_id, AGGREGATES_BLOB, json.dumps(aggregates).encode("utf-8")
+            )
+        else:
+            # Without the passphrase we cannot recount; stats rebuilds on next read.
+            self.storage.delete_blob(user_id, AGGREGATES_BLOB)
+        dictionaries = bundle.get("compression_dictionaries")
+        if isinstance(dictionaries, str):
+            self.storage.write_blob(user_id, DICTIONARIES_BLOB, ciphertext_from_text(dictionaries))
+        elif dictionaries:
+            self.storage.write_blob(
+                user_id, DICTIONARIES_BLOB, json.dumps(dictionaries).encode("utf-8")
+            )
+        else:
+            self.storage.delete_blob(user_id, DICTIONARIES_BLOB)
+        index_keys = bundle.get("index_keys")
+        if index_keys:
+            self.storage.write_blob(
+                user_id, INDEX_KEYS_BLOB, json.dumps(index_keys).encode("utf-8")
+            )
+        else:
+            # Events are retagged under a fresh index key on next use.
+            self.storage.delete_blob(user_id, INDEX_KEYS_BLOB)
+        # Search and vector indexes are not exported; they are rebuilt on first use.
+        self.storage.delete_blob(user_id, SEARCH_META_BLOB)
+        self.storage.delete_blob(user_id, VECTORS_META_BLOB)
+        data_keys = bundle.get("data_keys")
+        if data_keys:
+            self.storage.write_blob(user_id, DATA_KEYS_BLOB, json.dumps(data_keys).encode("utf-8"))
+        else:
+            self.storage.delete_blob(user_id, DATA_KEYS_BLOB)
+
+    def _find_backup(self, user_id: str, since: str) -> dict[str, Any] | None:
+        backups = self._load_backup_chain(user_id)
+        if since == "latest":
+            return backups[-1] if backups else None
+        for backup in backups:
+            if backup["backup_id"] == since:
+                return backup
+        raise ValueError(f"Unknown backup {since!r} for {user_id}; take a full backup.")
+
+    def _record_backup(self, user_id: str, backup: dict[str, Any]) -> None:
+        """Add ``backup`` to the chain; a full backup starts a new one."""
+        with self.storage.user_lock(user_id):
+            backups = self._load_backup_chain(user_id) if backup["kind"] == KIND_DELTA else []
+            backups.append(backup)
+            self.storage.write_blob(
+                user_id, BACKUP_CHAIN_BLOB, json.dumps({"backups": backups}).encode("utf-8")
+            )
+
+    def _restore_backup_chain(self, user_id: str, manifest: dict[str, Any] | None) -> None:
+        """Track the backup just restored so its deltas can follow, or forget the chain."""
+        if manifest is None or not manifest.get("backup_id"):
+            self.storage.delete_blob(user_id, BACKUP_CHAIN_BLOB)
+            return
+        watermark = manifest["watermark"]
+        self._record_backup(
+            user_id,
+            {
+                "backup_id": manifest["backup_id"],
+                "kind": manifest["kind"],
+                "parent": manifest.get("parent"),
+                "watermark": watermark,
+                "created_at": manifest["exported_at"],
+            },
+        )
+        self.storage.write_blob(
+            user_id, HISTORY_EPOCH_BLOB, json.dumps({"epoch": watermark["epoch"]}).encode("utf-8")
+        )
+
+    def _load_backup_chain(self, user_id: str) -> list[dict[str, Any]]:
+        raw = self.storage.read_blob(user_id, BACKUP_CHAIN_BLOB)
+        return json.loads(raw)["backups"] if raw is not None else []
+
+    def _history_epoch(self, user_id: str) -> int:
+        raw = self.storage.read_blob(user_id, HISTORY_EPOCH_BLOB)
+        return json.loads(raw)["epoch"] if raw is not None else 0
+
+    def _bump_history_epoch(self, user_id: str) -> None:
+        """Mark stored events as rewritten so the next backup is full."""
+        with self.storage.user_lock(user_id):
+            epoch = self._history_epoch(user_id) + 1
+            self.storage.write_blob(
+                user_id, HISTORY_EPOCH_BLOB, json.dumps({"epoch": epoch}).encode("utf-8")
+            )
+
     # ---------------------------------------------------------------------
-    def rotate_key(self, user_id: str, passphrase: str | None) -> dict[str, Any]:
-        profile = storage.load_profile(user_id)
+    def rotate_key(
+        self, user_id: str, passphrase: str | None, *, reencrypt: bool = False
+    ) -> dict[str, Any]:
+        """Rotate the master key by re-wrapping every data key under a new one.
+
+        Events are encrypted with per-day data keys, so rotation touches one
+        small record per data key instead of every event. Pass ``reencrypt``
+        to also run :meth:`reencrypt_events` afterwards.
+        """
+        profile = self.storage.load_profile(user_id)
         self._validate_passphrase(profile, passphrase)
-        current_key_id = profile["current_key_id"]
-        original_keys = dict(profile.get("keys", {}))
-        current_key_record = original_keys[current_key_id]
-        current_master = self._unwrap_key_record(current_key_record, passphrase)
+        self.flush(user_id)
+
+        # Held throughout so another worker cannot wrap new state under the old key.
+        with self.storage.user_lock(user_id):
+            profile, new_key_id, new_master = self._start_rotation(user_id, profile, passphrase)
+            get_key = self._key_resolver(
+                user_id, profile, passphrase, preloaded={new_key_id: new_master}
+            )
+            rewrapped = self._rewrap_data_keys(user_id, get_key, new_key_id, new_master)
+            self._rewrap_index_keys(user_id, get_key, new_key_id, new_master)
+            aggregates = self._load_aggregates(user_id, get_key)
+            if aggregates is not None:
+                self._save_aggregates(user_id, new_key_id, new_master, aggregates)
+            record = self._read_sealed_blob(user_id, DICTIONARIES_BLOB, get_key)
+            if record is not None:
+                self._write_sealed_blob(user_id, DICTIONARIES_BLOB, new_key_id, new_master, record)
+
+        message = f"Master key rotated and {rewrapped} data keys re-wrapped."
+        if reencrypt:
+            self.reencrypt_events(user_id, passphrase)
+            message = (
+                f"Master key rotated, {rewrapped} data keys re-wrapped and events re-encrypted."
+            )
+        return {"user_id": user_id, "key_id": new_key_id, "message": message}
+
+    def reencrypt_events(self, user_id: str, passphrase: str | None) -> dict[str, Any]:
+        """Move every event onto fresh data keys in streamed, checkpointed chunks.
 
+        Starting a run begins a new data-key generation and a new blind-index
+        key, so new captures and rewritten chunks share the fresh keys and
+        every event is retagged. Every chunk is swapped in
+        atomically and the rotation record tracks the last rewritten sequence
+        number; calling this again while a run is still marked ``running``
+        resumes it. Data keys no event references any more are dropped at the
+        end.
+        """
+        profile = self.storage.load_profile(user_id)
+        self._validate_passphrase(profile, passphrase)
+        self.flush(user_id)
+
+        state = self._load_rotation_state(user_id)
+        resumed = bool(
+            state and state.get("status") == "running" and state.get("generation") is not None
+        )
+        get_key = self._key_resolver(user_id, profile, passphrase)
+        if resumed:
+            generation = state["generation"]
+        else:
+            generation = self._start_data_key_generation(user_id)
+            self._start_index_generation(user_id, profile, get_key)
+            now = datetime.now(timezone.utc).isoformat()
+            state = {
+                "key_id": profile["current_key_id"],
+                "generation": generation,
+                "status": "running",
+                "started_at": now,
+                "updated_at": now,
+                "completed_at": None,
+                "processed": 0,
+                "total": self.storage.count_events(user_id),
+                "checkpoint_seq": None,
+            }
+            self._save_rotation_state(user_id, state)
+
+        index_generation, index_keys = self._index_keys(user_id, profile, get_key)
+        index_key = index_keys[index_generation]
+
+        def reencrypt(batch: List[dict[str, Any]]) -> List[dict[str, Any] | None]:
+            records = self._load_data_keys(user_id)["keys"]
+            replacements: List[dict[str, Any] | None] = [None] * len(batch)
+            jobs = []
+            for index, entry in enumerate(batch):
+                record = records.get(entry.get("key_id"))
+                if record is not None and record.get("generation") == generation:
+                    continue
+                key = get_key(entry.get("key_id"))
+                if key is not None:
+                    jobs.append((index, key, str(entry.get("created_at", ""))[:10]))
+            data_keys = self._data_keys_for(
+                user_id, profile, get_key, {bucket for _, _, bucket in jobs}
+            )
+            # Decrypt and encrypt separately: the payloads also feed the new tags.
+            payloads = list(
+                self.crypto.decrypt_many(
+                    ((key, batch[index]["ciphertext"]) for index, key, _ in jobs),
+                    dictionaries=self._dictionaries(user_id, get_key)[1],
+                )
+            )
+            tokens = self.crypto.encrypt_many(
+                (
+                    (data_keys[bucket][1], data_keys[bucket][0], payload)
+                    for (_, _, bucket), payload in zip(jobs, payloads)
+                ),
+                compression=self._compression_for(user_id, get_key),
+            )
+            for (index, _, bucket), payload, token in zip(jobs, payloads, tokens):
+                replacements[index] = {
+                    **batch[index],
+                    "key_id": data_keys[bucket][0],
+                    "ciphertext": token,
+                    "tags": event_tags(index_key, payload),
+                }
+            state["processed"] += len(jobs)
+            return replacements
+
+        # Bumped on both sides so no delta spans a partly rewritten history.
+        self._bump_history_epoch(user_id)
+        for last_seq in self.storage.rewrite_event_chunks(
+            user_id, reencrypt, after_seq=state["checkpoint_seq"]
+        ):
+            state["checkpoint_seq"] = last_seq
+            state["updated_at"] = datetime.now(timezone.utc).isoformat()
+            self._save_rotation_state(user_id, state)
+
+        self._prune_data_keys(user_id, generation)
+        self._prune_index_keys(user_id, index_generation)
+        self._bump_history_epoch(user_id)
+        state["status"] = "completed"
+        state["completed_at"] = state["updated_at"] = datetime.now(timezone.utc).isoformat()
+        self._save_rotation_state(user_id, state)
+
+        message = "Events re-encrypted under fresh data keys."
+        if resumed:
+            message = "Interrupted re-encryption resumed and completed."
+        return {"user_id": user_id, "key_id": profile["current_key_id"], "message": message}
+
+    def rotation_status(self, user_id: str) -> dict[str, Any]:
+        """Report progress of the latest full re-encryption (``idle`` if none has run)."""
+        self.storage.load_profile(user_id)
+        state = self._load_rotation_state(user_id) or {"status": "idle"}
+        return {"user_id": user_id, **state}
+
+    # ---------------------------------------------------------------------
+    def train_compression_dictionary(
+        self,
+        user_id: str,
+        passphrase: str | None,
+        session_token: str | None = None,
+        *,
+        samples: int = 500,
+    ) -> dict[str, Any]:
+        """Train a compression dictionary from the user's newest events.
+
+        The dictionary is stored encrypted next to earlier ones and becomes the
+        one new captures use; existing records keep naming the dictionary they
+        were compressed with, so older dictionaries are retained.
+        """
+        profile, get_key = self._open_vault(user_id, passphrase, session_token)
+        self.flush(user_id)
+        with self.storage.user_lock(user_id):
+            _, dictionaries = self._dictionaries(user_id, get_key)
+            entries = list(islice(self.storage.iter_event_entries(user_id, reverse=True), samples))
+            corpus = [
+                json.dumps(payload, separators=(",", ":")).encode("utf-8")
+                for payload in self._decrypt_entries(entries, get_key, dictionaries)
+                if payload is not None
+            ]
+            if not corpus:
+                raise ValueError("No events available to train a compression dictionary.")
+            dictionary = train_dictionary(corpus[::-1])
+            dictionary_id = max(dictionaries, default=0) + 1
+            record = {
+                "current": dictionary_id,
+                "dictionaries": {
+                    str(key): base64.b64encode(value).decode("ascii")
+                    for key, value in {**dictionaries, dictionary_id: dictionary}.items()
+                },
+            }
+            current_key_id = profile["current_key_id"]
+            key = self._require_key(get_key, current_key_id)
+            self._write_sealed_blob(user_id, DICTIONARIES_BLOB, current_key_id, key, record)
+        return {
+            "user_id": user_id,
+            "dictionary_id": dictionary_id,
+            "dictionary_bytes": len(dictionary),
+            "samples": len(corpus),
+        }
+
+    def _start_rotation(
+        self, user_id: str, profile: Dict[str, Any], passphrase: str | None
+    ) -> tuple[Dict[str, Any], str, bytes]:
+        """Create a new master key, make it current and publish it to open sessions.
+
+        Returns the updated profile along with the new key id and key.
+        """
         new_master = generate_master_key()
         new_key_id = str(uuid.uuid4())
         wrapped = wrap_master_key(new_master, passphrase if profile.get("passphrase") else None)
@@ -215,34 +1236,7 @@ class PathLogService:
             "requires_passphrase": wrapped["requires_passphrase"],
             "created_at": datetime.now(timezone.utc).isoformat(),
         }
-        profile.setdefault("keys", {})[new_key_id] = new_key_record
-        profile["current_key_id"] = new_key_id
-        profile.setdefault("key_history", []).append(
-            {"key_id": new_key_id, "created_at": new_key_record["created_at"]}
-        )
-
-        # Re-encrypt existing events with the new key
-        key_cache: Dict[str, bytes] = {current_key_id: current_master}
-        new_events = []
-        for entry in storage.iter_event_entries(user_id):
-            key_id = entry.get("key_id", current_key_id)
-            key_record = original_keys.get(key_id)
-            if not key_record:
-                continue
-            if key_id not in key_cache:
-                key_cache[key_id] = self._unwrap_key_record(
-                    key_record,
-                    passphrase if key_record.get("requires_passphrase") else None,
-                )
-            payload = decrypt_payload(key_cache[key_id], entry["ciphertext"])
-            ciphertext = encrypt_payload(new_master, payload)
-            new_entry = dict(entry)
-            new_entry["ciphertext"] = ciphertext
-            new_entry["key_id"] = new_key_id
-            new_events.append(new_entry)
-        storage.write_events(user_id, new_events)
-        storage.save_profile(user_id, profile)
-        storage.write_key_file(
+        self.storage.write_key_file(
             user_id,
             new_key_id,
             {
@@ -256,22 +1250,732 @@ class PathLogService:
             },
         )
 
-        return {
-            "user_id": user_id,
-            "key_id": new_key_id,
-            "message": "Master key rotated and existing events re-encrypted.",
-        }
+        def make_current(current: Dict[str, Any]) -> None:
+            current.setdefault("keys", {})[new_key_id] = new_key_record
+            current["current_key_id"] = new_key_id
+            current.setdefault("key_history", []).append(
+                {"key_id": new_key_id, "created_at": new_key_record["created_at"]}
+            )
+
+        profile = self._update_profile(user_id, make_current)
+        self.sessions.add_key(user_id, new_key_id, new_master)
+        return profile, new_key_id, new_master
+
+    def _update_profile(
+        self, user_id: str, mutate: Callable[[Dict[str, Any]], None]
+    ) -> Dict[str, Any]:
+        """Apply ``mutate`` to the stored profile and compare-and-swap the result in.
+
+        When another worker saves the profile in between, the swap fails and
+        ``mutate`` is re-applied to the newer profile after a short, jittered
+        backoff, up to ``PROFILE_UPDATE_RETRIES`` times.
+        """
+        for attempt in range(PROFILE_UPDATE_RETRIES):
+            profile = self.storage.load_profile(user_id)
+            expected_version = profile_version(profile)
+            mutate(profile)
+            if self.storage.swap_profile(user_id, profile, expected_version):
+                return profile
+            time.sleep(random.uniform(0, 0.005 * 2**attempt))
+        raise ProfileConflict(f"Profile of user {user_id} is changing too quickly; retry shortly.")
 
     # ------------------------------------------------------------------
+    def _open_vault(
+        self, user_id: str, passphrase: str | None, session_token: str | None
+    ) -> tuple[Dict[str, Any], Callable[[str | None], bytes | None]]:
+        """Load the profile and a key lookup from a session token or the passphrase."""
+        profile = self.storage.load_profile(user_id)
+        if session_token:
+            keys = self.sessions.get(session_token, user_id)
+            if keys is None:
+                raise AccessDenied("Invalid or expired session token.")
+            return profile, self._key_resolver(
+                user_id, profile, None, preloaded=keys, unwrap_masters=False
+            )
+        self._validate_passphrase(profile, passphrase)
+        return profile, self._key_resolver(user_id, profile, passphrase)
+
+    @staticmethod
+    def _require_key(get_key: Callable[[str | None], bytes | None], key_id: str) -> bytes:
+        key = get_key(key_id)
+        if key is None:
+            raise ValueError("Vault key is unavailable; unlock the vault again.")
+        return key
+
     def _validate_passphrase(self, profile: Dict[str, Any], passphrase: str | None) -> None:
         record = profile.get("passphrase")
         if not record:
             return
         if not passphrase:
-            raise ValueError("Passphrase is required for this vault.")
+            raise AccessDenied("Passphrase is required for this vault.")
         salt = base64.urlsafe_b64decode(record["salt"].encode("utf-8"))
         if record["hash"] != hash_passphrase(passphrase, salt):
-            raise ValueError("Invalid passphrase provided.")
+            raise AccessDenied("Invalid passphrase provided.")
+
+    def _key_resolver(
+        self,
+        user_id: str,
+        profile: Dict[str, Any],
+        passphrase: str | None,
+        *,
+        preloaded: Dict[str, bytes] | None = None,
+        unwrap_masters: bool = True,
+    ) -> Callable[[str | None], bytes | None]:
+        """Return a lookup that resolves master and data key ids, unwrapping each once.
+
+        Master keys come from ``preloaded`` or are unwrapped from the profile
+        (unless ``unwrap_masters`` is off, as for session tokens); data keys
+        are unwrapped with the master key that wraps them.
+        """
+        key_cache: Dict[str, bytes] = dict(preloaded or {})
+        data_keys: Dict[str, Any] | None = None
+
+        def get_key(key_id: str | None) -> bytes | None:
+            nonlocal data_keys
+            if key_id is None:
+                return None
+            if key_id in key_cache:
+                return key_cache[key_id]
+            key_record = profile["keys"].get(key_id)
+            if key_record is not None:
+                if not unwrap_masters:
+                    return None
+                key_cache[key_id] = self._unwrap_key_record(
+                    key_record,
+                    passphrase if key_record.get("requires_passphrase") else None,
+                )
+                return key_cache[key_id]
+            if data_keys is None:
+                data_keys = self._load_data_keys(user_id)["keys"]
+            data_key_record = data_keys.get(key_id)
+            if data_key_record is None:
+                return None
+            master = get_key(data_key_record["master_key_id"])
+            if master is None:
+                return None
+            key_cache[key_id] = unwrap_data_key(master, data_key_record["wrapped_key"])
+            return key_cache[key_id]
+
+        return get_key
+
+    # ------------------------------------------------------------------
+    def _store_events(
+        self,
+        user_id: str,
+        entries: List[dict[str, Any]],
+        profile: Dict[str, Any],
+        get_key: Callable[[str | None], bytes | None],
+        payloads: List[dict[str, Any]],
+        *,
+        wait_for_commit: bool = False,
+    ) -> None:
+        """Append encrypted entries directly or hand them to the write-behind queue."""
+        if self.ingestor is None:
+            self.storage.append_events(user_id, entries)
+            self._update_aggregates(user_id, profile, get_key, added=payloads)
+            self._update_indexes(user_id, profile, get_key, added=payloads)
+            return
+        self.ingestor.submit(user_id, entries, context=(profile, get_key, payloads))
+        if wait_for_commit:
+            self.ingestor.flush(user_id)
+
+    def _after_group_commit(self, user_id: str, contexts: List[Any]) -> None:
+        """Fold the payloads of one group commit into the aggregates and indexes."""
+        contexts = [context for context in contexts if context is not None]
+        if not contexts:
+            return
+        profile, get_key, _ = contexts[-1]
+        payloads = [payload for _, _, items in contexts for payload in items]
+        self._update_aggregates(user_id, profile, get_key, added=payloads)
+        self._update_indexes(user_id, profile, get_key, added=payloads)
+
+    def _encrypt(
+        self,
+        key_id: str,
+        key: bytes,
+        payload: dict[str, Any],
+        compression: CompressionPolicy | None = None,
+    ) -> str | bytes:
+        return encrypt_payload(
+            key,
+            payload,
+            key_id=key_id,
+            algorithm=self.config.cipher,
+            compression=compression or self.compression,
+        )
+
+    def _decrypt_entries(
+        self,
+        entries: Sequence[dict[str, Any]],
+        get_key: Callable[[str | None], bytes | None],
+        dictionaries: Dict[int, bytes] | None = None,
+    ) -> List[dict[str, Any] | None]:
+        """Decrypt a batch of stored entries; ``None`` marks entries whose key is gone."""
+        keys = [get_key(entry.get("key_id")) for entry in entries]
+        payloads = iter(
+            self.crypto.decrypt_many(
+                (
+                    (key, entry["ciphertext"])
+                    for key, entry in zip(keys, entries)
+                    if key is not None
+                ),
+                dictionaries=dictionaries,
+            )
+        )
+        return [next(payloads) if key is not None else None for key in keys]
+
+    def _load_data_keys(self, user_id: str) -> dict[str, Any]:
+        raw = self.storage.read_blob(user_id, DATA_KEYS_BLOB)
+        return json.loads(raw) if raw is not None else _empty_data_keys()
+
+    def _save_data_keys(self, user_id: str, record: dict[str, Any]) -> None:
+        self.storage.write_blob(user_id, DATA_KEYS_BLOB, json.dumps(record).encode("utf-8"))
+
+    def _data_keys_for(
+        self,
+        user_id: str,
+        profile: Dict[str, Any],
+        get_key: Callable[[str | None], bytes | None],
+        buckets: Iterable[str],
+    ) -> Dict[str, tuple[str, bytes]]:
+        """Return ``(data_key_id, data_key)`` per day bucket, creating missing keys.
+
+        New data keys are wrapped by the current master key and tagged with the
+        current generation.
+        """
+        result: Dict[str, tuple[str, bytes]] = {}
+        with self.storage.user_lock(user_id):
+            record = self._load_data_keys(user_id)
+            created = False
+            for bucket in buckets:
+                data_key_id = record["buckets"].get(bucket)
+                data_key = None
+                if data_key_id in record["keys"]:
+                    existing = record["keys"][data_key_id]
+                    master = get_key(existing["master_key_id"])
+                    if master is not None:
+                        data_key = unwrap_data_key(master, existing["wrapped_key"])
+                if data_key is None:
+                    master_key_id = profile["current_key_id"]
+                    master = self._require_key(get_key, master_key_id)
+                    data_key = generate_data_key()
+                    data_key_id = str(uuid.uuid4())
+                    record["keys"][data_key_id] = {
+                        "wrapped_key": wrap_data_key(master, data_key),
+                        "master_key_id": master_key_id,
+                        "bucket": bucket,
+                        "generation": record["generation"],
+                        "created_at": datetime.now(timezone.utc).isoformat(),
+                    }
+                    record["buckets"][bucket] = data_key_id
+                    created = True
+                result[bucket] = (data_key_id, data_key)
+            if created:
+                self._save_data_keys(user_id, record)
+        return result
+
+    def _rewrap_data_keys(
+        self,
+        user_id: str,
+        get_key: Callable[[str | None], bytes | None],
+        new_key_id: str,
+        new_master: bytes,
+    ) -> int:
+        """Re-wrap every data key under ``new_master``; return how many moved."""
+        with self.storage.user_lock(user_id):
+            record = self._load_data_keys(user_id)
+            rewrapped = 0
+            for data_key_record in record["keys"].values():
+                if data_key_record["master_key_id"] == new_key_id:
+                    continue
+                master = get_key(data_key_record["master_key_id"])
+                if master is None:
+                    continue
+                data_key = unwrap_data_key(master, data_key_record["wrapped_key"])
+                data_key_record["wrapped_key"] = wrap_data_key(new_master, data_key)
+                data_key_record["master_key_id"] = new_key_id
+                rewrapped += 1
+            if rewrapped:
+                self._save_data_keys(user_id, record)
+        return rewrapped
+
+    def _start_data_key_generation(self, user_id: str) -> int:
+        """Retire the current per-day data keys so new writes get fresh ones."""
+        with self.storage.user_lock(user_id):
+            record = self._load_data_keys(user_id)
+            record["generation"] += 1
+            record["buckets"] = {}
+            self._save_data_keys(user_id, record)
+            return record["generation"]
+
+    def _prune_data_keys(self, user_id: str, generation: int) -> None:
+        """Drop data keys from older generations that no stored event still uses."""
+        referenced = {entry.get("key_id") for entry in self.storage.iter_event_entries(user_id)}
+        with self.storage.user_lock(user_id):
+            record = self._load_data_keys(user_id)
+            record["keys"] = {
+                data_key_id: item
+                for data_key_id, item in record["keys"].items()
+                if item.get("generation", 0) >= generation or data_key_id in referenced
+            }
+            self._save_data_keys(user_id, record)
+
+    def _load_index_keys(self, user_id: str) -> dict[str, Any] | None:
+        raw = self.storage.read_blob(user_id, INDEX_KEYS_BLOB)
+        return json.loads(raw) if raw is not None else None
+
+    def _save_index_keys(self, user_id: str, record: dict[str, Any]) -> None:
+        self.storage.write_blob(user_id, INDEX_KEYS_BLOB, json.dumps(record).encode("utf-8"))
+
+    def _index_keys(
+        self,
+        user_id: str,
+        profile: Dict[str, Any],
+        get_key: Callable[[str | None], bytes | None],
+    ) -> tuple[int, Dict[int, bytes]]:
+        """Return the current index generation and every unwrappable index key.
+
+        The first index key is created lazily; events stored before it existed
+        (older vaults, or bundles imported without index keys) are retagged
+        under it straight away so filters never miss them.
+        """
+        with self.storage.user_lock(user_id):
+            record = self._load_index_keys(user_id)
+            created = record is None
+            if created:
+                record = {"generation": 0, "keys": {}}
+                self._add_index_key(record, profile, get_key)
+                self._save_index_keys(user_id, record)
+            keys: Dict[int, bytes] = {}
+            for generation, item in record["keys"].items():
+                master = get_key(item["master_key_id"])
+                if master is not None:
+                    keys[int(generation)] = unwrap_data_key(master, item["wrapped_key"])
+        if created and self.storage.count_events(user_id):
+            self._retag_events(user_id, get_key, keys[record["generation"]])
+        return record["generation"], keys
+
+    def _add_index_key(
+        self,
+        record: dict[str, Any],
+        profile: Dict[str, Any],
+        get_key: Callable[[str | None], bytes | None],
+    ) -> None:
+        master_key_id = profile["current_key_id"]
+        master = self._require_key(get_key, master_key_id)
+        record["generation"] += 1
+        record["keys"][str(record["generation"])] = {
+            "wrapped_key": wrap_data_key(master, generate_index_key()),
+            "master_key_id": master_key_id,
+            "created_at": datetime.now(timezone.utc).isoformat(),
+        }
+
+    def _start_index_generation(
+        self,
+        user_id: str,
+        profile: Dict[str, Any],
+        get_key: Callable[[str | None], bytes | None],
+    ) -> None:
+        """Begin a new index key; tags under older keys still match until pruned."""
+        with self.storage.user_lock(user_id):
+            record = self._load_index_keys(user_id) or {"generation": 0, "keys": {}}
+            self._add_index_key(record, profile, get_key)
+            self._save_index_keys(user_id, record)
+
+    def _rewrap_index_keys(
+        self,
+        user_id: str,
+        get_key: Callable[[str | None], bytes | None],
+        new_key_id: str,
+        new_master: bytes,
+    ) -> None:
+        with self.storage.user_lock(user_id):
+            record = self._load_index_keys(user_id)
+            if record is None:
+                return
+            for item in record["keys"].values():
+                master = get_key(item["master_key_id"])
+                if item["master_key_id"] == new_key_id or master is None:
+                    continue
+                index_key = unwrap_data_key(master, item["wrapped_key"])
+                item["wrapped_key"] = wrap_data_key(new_master, index_key)
+                item["master_key_id"] = new_key_id
+            self._save_index_keys(user_id, record)
+
+    def _prune_index_keys(self, user_id: str, generation: int) -> None:
+        """Drop index keys older than ``generation`` once every event is retagged."""
+        with self.storage.user_lock(user_id):
+            record = self._load_index_keys(user_id)
+            if record is None:
+                return
+            record["keys"] = {
+                key_generation: item
+                for key_generation, item in record["keys"].items()
+                if int(key_generation) >= generation
+            }
+            self._save_index_keys(user_id, record)
+
+    def _retag_events(
+        self,
+        user_id: str,
+        get_key: Callable[[str | None], bytes | None],
+        index_key: bytes,
+    ) -> None:
+        """Rewrite every entry's tags under ``index_key``; ciphertext is unchanged."""
+        self.flush(user_id)
+        _, dictionaries = self._dictionaries(user_id, get_key)
+
+        def retag(batch: List[dict[str, Any]]) -> List[dict[str, Any] | None]:
+            payloads = self._decrypt_entries(batch, get_key, dictionaries)
+            return [
+                {**entry, "tags": event_tags(index_key, payload)} if payload is not None else None
+                for entry, payload in zip(batch, payloads)
+            ]
+
+        self._bump_history_epoch(user_id)
+        for _ in self.storage.rewrite_event_chunks(user_id, retag):
+            pass
+        self._bump_history_epoch(user_id)
+
+    def _count_matching(
+        self,
+        user_id: str,
+        profile: Dict[str, Any],
+        get_key: Callable[[str | None], bytes | None],
+        filters: dict[str, str | None],
+    ) -> dict[str, Any]:
+        """Count only the events whose blind-index tags match ``filters``."""
+        aggregates = _empty_aggregates()
+        _, index_keys = self._index_keys(user_id, profile, get_key)
+        _, dictionaries = self._dictionaries(user_id, get_key)
+        entries = self.storage.iter_event_entries(
+            user_id, tags=tag_filter(index_keys.values(), filters)
+        )
+        while batch := list(islice(entries, self.crypto.batch_size)):
+            for payload in self._decrypt_entries(batch, get_key, dictionaries):
+                if payload is not None and _matches(payload, filters):
+                    _count_event(aggregates, payload, 1)
+        return aggregates
+
+    def _search_index(
+        self,
+        user_id: str,
+        get_key: Callable[[str | None], bytes | None],
+        generation: int,
+        index_keys: Dict[int, bytes],
+    ) -> SearchIndex:
+        """Open the search index, rebuilding it if missing or sealed under a retired key.
+
+        Callers hold ``_search_lock`` and the user's storage lock.
+        """
+        index = SearchIndex.open(self.storage, user_id, index_keys, algorithm=self.config.cipher)
+        if index is not None:
+            return index
+        index = SearchIndex(
+            self.storage,
+            user_id,
+            generation,
+            index_keys[generation],
+            algorithm=self.config.cipher,
+        )
+        index.rebuild(
+            (payload["event_id"], document_terms(payload))
+            for payload in self._iter_payloads(user_id, get_key)
+        )
+        return index
+
+    def _loaded_vectors(
+        self,
+        user_id: str,
+        get_key: Callable[[str | None], bytes | None],
+        generation: int,
+        index_keys: Dict[int, bytes],
+    ) -> LoadedVectors:
+        """Return the user's decrypted vectors, rebuilding the stored index if needed.
+
+        Callers hold ``_vectors_lock`` and the user's storage lock. The mapped
+        vectors are reused while the stored index is unchanged, so another
+        worker's writes are seen.
+        """
+        index = VectorIndex.open(
+            self.storage,
+            user_id,
+            index_keys,
+            algorithm=self.config.cipher,
+            dim=self.embedder.dim,
+        )
+        if index is None:
+            index = VectorIndex(
+                self.storage,
+                user_id,
+                generation,
+                index_keys[generation],
+                algorithm=self.config.cipher,
+                dim=self.embedder.dim,
+            )
+            index.rebuild(
+                (payload["event_id"], self.embedder.embed(payload))
+                for payload in self._iter_payloads(user_id, get_key)
+            )
+        cached = self._vector_cache.get(user_id)
+        if cached is not None and cached[0] == index.meta_raw:
+            self._vector_cache.move_to_end(user_id)
+            return cached[1]
+        loaded = index.load()
+        self._cache_vectors(user_id, index.meta_raw, loaded)
+        return loaded
+
+    def _cache_vectors(self, user_id: str, meta_raw: bytes, loaded: LoadedVectors) -> None:
+        self._vector_cache[user_id] = (meta_raw, loaded)
+        self._vector_cache.move_to_end(user_id)
+        while len(self._vector_cache) > VECTOR_CACHE_USERS:
+            self._vector_cache.popitem(last=False)
+
+    def _update_indexes(
+        self,
+        user_id: str,
+        profile: Dict[str, Any],
+        get_key: Callable[[str | None], bytes | None],
+        *,
+        added: Sequence[dict[str, Any]] = (),
+        removed: Sequence[dict[str, Any]] = (),
+    ) -> None:
+        self._update_search(user_id, profile, get_key, added=added, removed=removed)
+        self._update_vectors(user_id, profile, get_key, added=added, removed=removed)
+
+    def _update_search(
+        self,
+        user_id: str,
+        profile: Dict[str, Any],
+        get_key: Callable[[str | None], bytes | None],
+        *,
+        added: Iterable[dict[str, Any]] = (),
+        removed: Iterable[dict[str, Any]] = (),
+    ) -> None:
+        """Apply event deltas to the search index, if it has been built."""
+        with self._search_lock:
+            if self.storage.read_blob(user_id, SEARCH_META_BLOB) is None:
+                return
+            _, index_keys = self._index_keys(user_id, profile, get_key)
+            with self.storage.user_lock(user_id):
+                index = SearchIndex.open(
+                    self.storage, user_id, index_keys, algorithm=self.config.cipher
+                )
+                if index is None:
+                    return
+                index.add((payload["event_id"], document_terms(payload)) for payload in added)
+                for payload in removed:
+                    index.remove(payload["event_id"], document_terms(payload))
+
+    def _update_vectors(
+        self,
+        user_id: str,
+        profile: Dict[str, Any],
+        get_key: Callable[[str | None], bytes | None],
+        *,
+        added: Sequence[dict[str, Any]] = (),
+        removed: Sequence[dict[str, Any]] = (),
+    ) -> None:
+        """Embed new events into the vector index, if it has been built."""
+        if not numpy_available():
+            return
+        with self._vectors_lock:
+            if self.storage.read_blob(user_id, VECTORS_META_BLOB) is None:
+                return
+            _, index_keys = self._index_keys(user_id, profile, get_key)
+            with self.storage.user_lock(user_id):
+                index = VectorIndex.open(
+                    self.storage,
+                    user_id,
+                    index_keys,
+                    algorithm=self.config.cipher,
+                    dim=self.embedder.dim,
+                )
+                if index is None:
+                    return
+                cached = self._vector_cache.get(user_id)
+                loaded = cached[1] if cached is not None and cached[0] == index.meta_raw else None
+                if removed and loaded is None:
+                    loaded = index.load()
+                index.add(
+                    ((payload["event_id"], self.embedder.embed(payload)) for payload in added),
+                    loaded,
+                )
+                for payload in removed:
+                    index.remove(payload["event_id"], loaded)
+                if loaded is not None:
+                    self._cache_vectors(user_id, index.meta_raw, loaded)
+
+    def _iter_payloads(
+        self, user_id: str, get_key: Callable[[str | None], bytes | None]
+    ) -> Iterator[dict[str, Any]]:
+        """Decrypt the whole history in crypto-engine batches."""
+        _, dictionaries = self._dictionaries(user_id, get_key)
+        entries = self.storage.iter_event_entries(user_id)
+        while batch := list(islice(entries, self.crypto.batch_size)):
+            for payload in self._decrypt_entries(batch, get_key, dictionaries):
+                if payload is not None:
+                    yield payload
+
+    def _decrypt_hits(
+        self,
+        user_id: str,
+        get_key: Callable[[str | None], bytes | None],
+        hits: Sequence[tuple[str, float]],
+    ) -> List[dict[str, Any]]:
+        """Decrypt ranked ``(event_id, score)`` hits, skipping events deleted meanwhile."""
+        entries = [self.storage.get_event_entry(user_id, event_id) for event_id, _ in hits]
+        found = [(entry, score) for entry, (_, score) in zip(entries, hits) if entry is not None]
+        _, dictionaries = self._dictionaries(user_id, get_key)
+        payloads = self._decrypt_entries([entry for entry, _ in found], get_key, dictionaries)
+        return [
+            {**payload, "score": round(score, 4)}
+            for payload, (_, score) in zip(payloads, found)
+            if payload is not None
+        ]
+
+    def _load_rotation_state(self, user_id: str) -> dict[str, Any] | None:
+        raw = self.storage.read_blob(user_id, ROTATION_BLOB)
+        return json.loads(raw) if raw is not None else None
+
+    def _save_rotation_state(self, user_id: str, state: dict[str, Any]) -> None:
+        self.storage.write_blob(user_id, ROTATION_BLOB, json.dumps(state).encode("utf-8"))
+
+    def _load_aggregates(
+        self, user_id: str, get_key: Callable[[str | None], bytes | None]
+    ) -> dict[str, Any] | None:
+        return self._read_sealed_blob(user_id, AGGREGATES_BLOB, get_key)
+
+    def _save_aggregates(
+        self, user_id: str, key_id: str, key: bytes, aggregates: dict[str, Any]
+    ) -> None:
+        self._write_sealed_blob(user_id, AGGREGATES_BLOB, key_id, key, aggregates)
+
+    def _read_sealed_blob(
+        self, user_id: str, name: str, get_key: Callable[[str | None], bytes | None]
+    ) -> dict[str, Any] | None:
+        """Decrypt a blob written by :meth:`_write_sealed_blob`; ``None`` if absent or locked."""
+        raw = self.storage.read_blob(user_id, name)
+        if raw is None:
+            return None
+        if is_envelope(raw):
+            key_id, ciphertext = envelope_key_id(raw), raw
+        else:
+            record = json.loads(raw)
+            key_id, ciphertext = record.get("key_id"), record["ciphertext"]
+        key = get_key(key_id)
+        if key is None:
+            return None
+        return decrypt_payload(key, ciphertext)
+
+    def _write_sealed_blob(
+        self, user_id: str, name: str, key_id: str, key: bytes, data: dict[str, Any]
+    ) -> None:
+        ciphertext = self._encrypt(key_id, key, data)
+        if isinstance(ciphertext, bytes):
+            # The envelope header already names the key, so store it as-is.
+            self.storage.write_blob(user_id, name, ciphertext)
+            return
+        record = {"key_id": key_id, "ciphertext": ciphertext}
+        self.storage.write_blob(user_id, name, json.dumps(record).encode("utf-8"))
+
+    def _dictionaries(
+        self, user_id: str, get_key: Callable[[str | None], bytes | None]
+    ) -> tuple[int | None, Dict[int, bytes]]:
+        """Return the current compression dictionary id and every dictionary by id.
+
+        The decrypted record is cached against the sealed blob it came from,
+        so a dictionary trained by another worker is picked up on next use.
+        """
+        raw = self.storage.read_blob(user_id, DICTIONARIES_BLOB)
+        if raw is None:
+            return None, {}
+        cached = self._dictionary_cache.get(user_id)
+        if cached is not None and cached[0] == raw:
+            return cached[1], cached[2]
+        record = self._read_sealed_blob(user_id, DICTIONARIES_BLOB, get_key)
+        if record is None:
+            return None, {}
+        dictionaries = {
+            int(dictionary_id): base64.b64decode(data)
+            for dictionary_id, data in record["dictionaries"].items()
+        }
+        self._dictionary_cache[user_id] = (raw, record["current"], dictionaries)
+        return record["current"], dictionaries
+
+    def _compression_for(
+        self, user_id: str, get_key: Callable[[str | None], bytes | None]
+    ) -> CompressionPolicy:
+        current, dictionaries = self._dictionaries(user_id, get_key)
+        if current is None:
+            return self.compression
+        return replace(self.compression, dictionary_id=current, dictionary=dictionaries[current])
+
+    def _update_aggregates(
+        self,
+        user_id: str,
+        profile: Dict[str, Any],
+        get_key: Callable[[str | None], bytes | None],
+        *,
+        added: Iterable[dict[str, Any]] = (),
+        removed: Iterable[dict[str, Any]] = (),
+    ) -> None:
+        """Apply event deltas to the stored aggregates, if they exist yet."""
+        with self.storage.user_lock(user_id):
+            aggregates = self._load_aggregates(user_id, get_key)
+            if aggregates is None:
+                return
+            for payload in added:
+                _count_event(aggregates, payload, 1)
+            for payload in removed:
+                _count_event(aggregates, payload, -1)
+            current_key_id = profile["current_key_id"]
+            key = self._require_key(get_key, current_key_id)
+            self._save_aggregates(user_id, current_key_id, key, aggregates)
+
+    def _rebuild_aggregates(
+        self,
+        user_id: str,
+        profile: Dict[str, Any],
+        get_key: Callable[[str | None], bytes | None],
+    ) -> dict[str, Any]:
+        aggregates = _empty_aggregates()
+        _, dictionaries = self._dictionaries(user_id, get_key)
+        entries = self.storage.iter_event_entries(user_id)
+        while batch := list(islice(entries, self.crypto.batch_size)):
+            for payload in self._decrypt_entries(batch, get_key, dictionaries):
+                if payload is not None:
+                    _count_event(aggregates, payload, 1)
+        current_key_id = profile["current_key_id"]
+        key = self._require_key(get_key, current_key_id)
+        self._save_aggregates(user_id, current_key_id, key, aggregates)
+        return aggregates
+
+    @staticmethod
+    def _encode_cursor(seq: int, *, newest_first: bool) -> str:
+        raw = json.dumps({"seq": seq, "desc": newest_first}, separators=(",", ":"))
+        return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("utf-8").rstrip("=")
+
+    @staticmethod
+    def _decode_cursor(cursor: str, *, newest_first: bool) -> int:
+        try:
+            padded = cursor + "=" * (-len(cursor) % 4)
+            data = json.loads(base64.urlsafe_b64decode(padded.encode("utf-8")))
+            seq = int(data["seq"])
+            desc = bool(data["desc"])
+        except (ValueError, KeyError, TypeError) as exc:
+            raise ValueError("Invalid timeline cursor.") from exc
+        if desc != newest_first:
+            raise ValueError("Timeline cursor does not match the requested order.")
+        return seq
+
+    @staticmethod
+    def _isoformat(value: datetime | None) -> str | None:
+        if value is None:
+            return None
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return value.astimezone(timezone.utc).isoformat()
 
     def _unwrap_key_record(self, key_record: Dict[str, Any], passphrase: str | None) -> bytes:
         return unwrap_master_key(
@@ -282,4 +1986,4 @@ class PathLogService:
         )
 
 
-__all__ = ["PathLogService"]
+__all__ = ["AccessDenied", "PathLogService", "ProfileConflict"]
@@ -0,0 +1,106 @@
+"""In-process cache of unlocked vault keys for the PathLog prototype.
+
+Unlocking a vault costs a PBKDF2 passphrase check plus one scrypt unwrap per
+key. ``SessionCache`` keeps the unwrapped keys behind an opaque token so
+follow-up calls can skip both KDFs. Entries expire after a TTL and the cache
+holds at most ``max_sessions`` tokens, evicting the least recently used.
+"""
+
+from __future__ import annotations
+
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+
+
+@dataclass(slots=True)
+class VaultSession:
+    """Unwrapped keys for one user, valid until ``expires_at`` (monotonic seconds)."""
+
+    user_id: str
+    keys: dict[str, bytes]
+    expires_at: float
+    expires_at_utc: datetime = field(compare=False)
+
+
+class SessionCache:
+    """TTL- and size-bounded map of session tokens to unwrapped vault keys."""
+
+    def __init__(self, *, ttl_seconds: float = 900, max_sessions: int = 1024) -> None:
+        if max_sessions < 1:
+            raise ValueError("max_sessions must be at least 1.")
+        self.ttl_seconds = ttl_seconds
+        self.max_sessions = max_sessions
+        self._sessions: OrderedDict[str, VaultSession] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._purge_expired(time.monotonic())
+            return len(self._sessions)
+
+    def open(
+        self, user_id: str, keys: dict[str, bytes], *, ttl_seconds: float | None = None
+    ) -> tuple[str, VaultSession]:
+        """Store ``keys`` for ``user_id`` and return a new token and its session."""
+        ttl = self.ttl_seconds if ttl_seconds is None else min(ttl_seconds, self.ttl_seconds)
+        now = time.monotonic()
+        session = VaultSession(
+            user_id=user_id,
+            keys=dict(keys),
+            expires_at=now + ttl,
+            expires_at_utc=datetime.now(timezone.utc) + timedelta(seconds=ttl),
+        )
+        token = secrets.token_urlsafe(32)
+        with self._lock:
+            self._purge_expired(now)
+            self._sessions[token] = session
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+        return token, session
+
+    def get(self, token: str, user_id: str) -> dict[str, bytes] | None:
+        """Return the keys behind ``token`` if it is live and belongs to ``user_id``."""
+        now = time.monotonic()
+        with self._lock:
+            session = self._sessions.get(token)
+            if session is None:
+                return None
+            if session.expires_at <= now:
+                del self._sessions[token]
+                return None
+            if not secrets.compare_digest(session.user_id, user_id):
+                return None
+            self._sessions.move_to_end(token)
+            return session.keys
+
+    def add_key(self, user_id: str, key_id: str, key: bytes) -> None:
+        """Make a newly created key available to every open session of ``user_id``."""
+        with self._lock:
+            for session in self._sessions.values():
+                if session.user_id == user_id:
+                    session.keys[key_id] = key
+
+    def close(self, token: str) -> bool:
+        """Drop a single session; return whether it existed."""
+        with self._lock:
+            return self._sessions.pop(token, None) is not None
+
+    def evict_user(self, user_id: str) -> int:
+        """Drop every session belonging to ``user_id`` and return how many were removed."""
+        with self._lock:
+            tokens = [token for token, item in self._sessions.items() if item.user_id == user_id]
+            for token in tokens:
+                del self._sessions[token]
+            return len(tokens)
+
+    def _purge_expired(self, now: float) -> None:
+        expired = [token for token, item in self._sessions.items() if item.expires_at <= now]
+        for token in expired:
+            del self._sessions[token]
+
+
+__all__ = ["SessionCache", "VaultSession"]
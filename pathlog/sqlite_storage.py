@@ -0,0 +1,444 @@
+"""SQLite storage backend for the PathLog prototype.
+
+The database runs in WAL mode so timeline readers do not block the capture
+writer, and events are indexed on ``user_id``, ``event_id``, ``key_id`` and
+``created_at`` for point lookups and range scans. Ciphertext is stored as a
+BLOB: binary envelopes as-is, legacy Fernet tokens as their ASCII bytes.
+Blind-index tags are kept in ``event_tags`` so tag filters become indexed
+lookups. Bulk rewrites (imports, key rotation) run inside a single transaction.
+Profile compare-and-swap runs inside a ``BEGIN IMMEDIATE`` transaction, and
+per-user locks live as files in a ``<database>.locks`` directory beside it.
+"""
+
+from __future__ import annotations
+
+import json
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Collection, Iterable, Iterator, Sequence
+
+from .crypto import ciphertext_from_bytes, ciphertext_to_bytes
+from .locking import InterProcessLock, LockRegistry
+from .storage import entry_from_json, entry_to_json, profile_version
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS profiles (
+    user_id TEXT PRIMARY KEY,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS key_files (
+    user_id TEXT NOT NULL,
+    key_id TEXT NOT NULL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (user_id, key_id)
+);
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    event_id TEXT NOT NULL,
+    key_id TEXT,
+    created_at TEXT NOT NULL,
+    ciphertext BLOB NOT NULL,
+    extra TEXT
+);
+CREATE TABLE IF NOT EXISTS blobs (
+    user_id TEXT NOT NULL,
+    name TEXT NOT NULL,
+    data BLOB NOT NULL,
+    PRIMARY KEY (user_id, name)
+);
+CREATE TABLE IF NOT EXISTS event_tags (
+    user_id TEXT NOT NULL,
+    tag TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    PRIMARY KEY (user_id, tag, seq)
+) WITHOUT ROWID;
+CREATE UNIQUE INDEX IF NOT EXISTS idx_events_user_seq ON events (user_id, seq);
+CREATE INDEX IF NOT EXISTS idx_events_user_created ON events (user_id, created_at);
+CREATE INDEX IF NOT EXISTS idx_events_user_event ON events (user_id, event_id);
+CREATE INDEX IF NOT EXISTS idx_events_user_key ON events (user_id, key_id);
+"""
+
+_EVENT_COLUMNS = {"id", "seq", "user_id", "event_id", "key_id", "created_at", "ciphertext"}
+
+
+class SQLiteStorage:
+    """Single-file SQLite backend; connections are kept per thread."""
+
+    def __init__(self, db_path: str | Path) -> None:
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        self._connection().executescript(_SCHEMA)
+        locks_dir = self.db_path.with_name(self.db_path.name + ".locks")
+        self._locks = LockRegistry(lambda user_id: locks_dir / f"{user_id}.lock")
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.row_factory = sqlite3.Row
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    # ------------------------------------------------------------------
+    def user_lock(self, user_id: str) -> InterProcessLock:
+        """Serialise writers of one user's vault across threads and processes."""
+        return self._locks.get(user_id)
+
+    def save_profile(self, user_id: str, profile: dict[str, Any]) -> None:
+        with self._transaction() as conn:
+            self._write_profile(conn, user_id, profile, self._stored_version(conn, user_id))
+
+    def swap_profile(self, user_id: str, profile: dict[str, Any], expected_version: int) -> bool:
+        """Save ``profile`` only if the stored version is still ``expected_version``."""
+        with self._transaction() as conn:
+            if self._stored_version(conn, user_id) != expected_version:
+                return False
+            self._write_profile(conn, user_id, profile, expected_version)
+        return True
+
+    @staticmethod
+    def _stored_version(conn: sqlite3.Connection, user_id: str) -> int:
+        row = conn.execute("SELECT data FROM profiles WHERE user_id = ?", (user_id,)).fetchone()
+        return profile_version(json.loads(row["data"]) if row else None)
+
+    @staticmethod
+    def _write_profile(
+        conn: sqlite3.Connection, user_id: str, profile: dict[str, Any], stored_version: int
+    ) -> None:
+        profile["version"] = stored_version + 1
+        conn.execute(
+            "INSERT INTO profiles (user_id, data) VALUES (?, ?) "
+            "ON CONFLICT(user_id) DO UPDATE SET data = excluded.data",
+            (user_id, json.dumps(profile, sort_keys=True)),
+        )
+
+    def load_profile(self, user_id: str) -> dict[str, Any]:
+        row = (
+            self._connection()
+            .execute("SELECT data FROM profiles WHERE user_id = ?", (user_id,))
+            .fetchone()
+        )
+        if row is None:
+            raise FileNotFoundError(f"No PathLog profile found for user {user_id}")
+        return json.loads(row["data"])
+
+    def write_key_file(self, user_id: str, key_id: str, data: dict[str, Any]) -> str:
+        with self._transaction() as conn:
+            conn.execute(
+                "INSERT INTO key_files (user_id, key_id, data) VALUES (?, ?, ?) "
+                "ON CONFLICT(user_id, key_id) DO UPDATE SET data = excluded.data",
+                (user_id, key_id, json.dumps(data, sort_keys=True)),
+            )
+        return f"{self.db_path}#key_files/{user_id}/{key_id}"
+
+    def load_key_files(self, user_id: str) -> dict[str, dict[str, Any]]:
+        rows = self._connection().execute(
+            "SELECT key_id, data FROM key_files WHERE user_id = ?", (user_id,)
+        )
+        return {row["key_id"]: json.loads(row["data"]) for row in rows}
+
+    # ------------------------------------------------------------------
+    @staticmethod
+    def _event_params(user_id: str, seq: int, entry: dict[str, Any]) -> tuple[Any, ...]:
+        created_at = entry.get("created_at") or datetime.now(timezone.utc).isoformat()
+        extra = {key: value for key, value in entry.items() if key not in _EVENT_COLUMNS}
+        ciphertext = ciphertext_to_bytes(entry["ciphertext"])
+        return (
+            user_id,
+            seq,
+            entry.get("event_id"),
+            entry.get("key_id"),
+            created_at,
+            ciphertext,
+            json.dumps(extra, separators=(",", ":")) if extra else None,
+        )
+
+    @staticmethod
+    def _row_to_entry(row: sqlite3.Row) -> dict[str, Any]:
+        entry: dict[str, Any] = json.loads(row["extra"]) if row["extra"] else {}
+        entry.update(
+            {
+                "seq": row["seq"],
+                "event_id": row["event_id"],
+                "key_id": row["key_id"],
+                "created_at": row["created_at"],
+                "ciphertext": ciphertext_from_bytes(bytes(row["ciphertext"])),
+            }
+        )
+        return entry
+
+    def _insert_events(
+        self,
+        conn: sqlite3.Connection,
+        user_id: str,
+        entries: Iterable[dict[str, Any]],
+        *,
+        preserve_seq: bool = False,
+    ) -> None:
+        """Insert entries with per-user sequence numbers.
+
+        With ``preserve_seq`` entries that already carry a sequence number keep
+        it, so rewrites (rotation, restores) do not invalidate timeline cursors.
+        """
+        row = conn.execute(
+            "SELECT COALESCE(MAX(seq), 0) FROM events WHERE user_id = ?", (user_id,)
+        ).fetchone()
+        next_seq = row[0] + 1
+        tag_rows: list[tuple[str, str, int]] = []
+
+        def _params() -> Iterator[tuple[Any, ...]]:
+            nonlocal next_seq
+            for entry in entries:
+                seq = next_seq
+                if preserve_seq and entry.get("seq", 0) >= seq:
+                    seq = entry["seq"]
+                next_seq = seq + 1
+                tag_rows.extend((user_id, tag, seq) for tag in entry.get("tags") or ())
+                yield self._event_params(user_id, seq, entry)
+
+        conn.executemany(
+            "INSERT INTO events "
+            "(user_id, seq, event_id, key_id, created_at, ciphertext, extra) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            _params(),
+        )
+        self._insert_tags(conn, tag_rows)
+
+    @staticmethod
+    def _insert_tags(conn: sqlite3.Connection, tag_rows: Iterable[tuple[str, str, int]]) -> None:
+        conn.executemany(
+            "INSERT OR IGNORE INTO event_tags (user_id, tag, seq) VALUES (?, ?, ?)", tag_rows
+        )
+
+    def append_event(self, user_id: str, entry: dict[str, Any]) -> None:
+        self.append_events(user_id, [entry])
+
+    def append_events(
+        self,
+        user_id: str,
+        entries: Iterable[dict[str, Any]],
+        *,
+        fsync: bool = False,
+        preserve_seq: bool = False,
+    ) -> None:
+        with self._transaction() as conn:
+            self._insert_events(conn, user_id, entries, preserve_seq=preserve_seq)
+        if fsync:
+            # WAL commits under synchronous=NORMAL are durable once checkpointed.
+            self._connection().execute("PRAGMA wal_checkpoint(PASSIVE)")
+
+    def write_events(self, user_id: str, entries: Iterable[dict[str, Any]]) -> None:
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM events WHERE user_id = ?", (user_id,))
+            conn.execute("DELETE FROM event_tags WHERE user_id = ?", (user_id,))
+            self._insert_events(conn, user_id, entries, preserve_seq=True)
+
+    def rewrite_event_chunks(
+        self,
+        user_id: str,
+        transform: Callable[[list[dict[str, Any]]], list[dict[str, Any] | None]],
+        *,
+        after_seq: int | None = None,
+        chunk_size: int = 500,
+    ) -> Iterator[int]:
+        """Rewrite events in ``chunk_size`` transactions, yielding the last seq of each.
+
+        ``transform`` receives each chunk's entries and returns, per entry, a
+        replacement or ``None`` to keep the original. Sequence numbers never
+        change, so callers can resume after the last yielded value.
+        """
+        position = after_seq or 0
+        while True:
+            rows = (
+                self._connection()
+                .execute(
+                    "SELECT * FROM events WHERE user_id = ? AND seq > ? ORDER BY seq LIMIT ?",
+                    (user_id, position, chunk_size),
+                )
+                .fetchall()
+            )
+            if not rows:
+                return
+            # The transform may itself write (e.g. new key records), so it runs
+            # before the chunk's write transaction is opened.
+            updates = []
+            rewritten = []
+            tag_rows = []
+            replacements = transform([self._row_to_entry(row) for row in rows])
+            for row, replacement in zip(rows, replacements):
+                if replacement is not None:
+                    params = self._event_params(user_id, row["seq"], replacement)
+                    updates.append((*params[2:], row["id"]))
+                    rewritten.append((user_id, row["seq"]))
+                    tag_rows.extend(
+                        (user_id, tag, row["seq"]) for tag in replacement.get("tags") or ()
+                    )
+            with self._transaction() as conn:
+                conn.executemany(
+                    "UPDATE events SET event_id = ?, key_id = ?, created_at = ?, "
+                    "ciphertext = ?, extra = ? WHERE id = ?",
+                    updates,
+                )
+                conn.executemany("DELETE FROM event_tags WHERE user_id = ? AND seq = ?", rewritten)
+                self._insert_tags(conn, tag_rows)
+                position = rows[-1]["seq"]
+            yield position
+
+    def count_events(self, user_id: str) -> int:
+        row = (
+            self._connection()
+            .execute("SELECT COUNT(*) FROM events WHERE user_id = ?", (user_id,))
+            .fetchone()
+        )
+        return row[0]
+
+    def iter_event_entries(
+        self,
+        user_id: str,
+        *,
+        since: str | None = None,
+        until: str | None = None,
+        after_seq: int | None = None,
+        before_seq: int | None = None,
+        reverse: bool = False,
+        tags: Sequence[Collection[str]] | None = None,
+        limit: int | None = None,
+    ) -> Iterator[dict[str, Any]]:
+        """Yield stored entries in append order, optionally bounded.
+
+        ``since``/``until`` are inclusive ``created_at`` bounds and
+        ``after_seq``/``before_seq`` are exclusive sequence bounds. With
+        ``tags`` only entries holding at least one tag of every group match;
+        ``limit`` caps the number of rows returned.
+        """
+        query = "SELECT * FROM events WHERE user_id = ?"
+        params: list[Any] = [user_id]
+        if since is not None:
+            query += " AND created_at >= ?"
+            params.append(since)
+        if until is not None:
+            query += " AND created_at <= ?"
+            params.append(until)
+        if after_seq is not None:
+            query += " AND seq > ?"
+            params.append(after_seq)
+        if before_seq is not None:
+            query += " AND seq < ?"
+            params.append(before_seq)
+        for group in tags or ():
+            query += (
+                " AND seq IN (SELECT seq FROM event_tags WHERE user_id = ? AND tag IN ("
+                + ", ".join("?" * len(group))
+                + "))"
+            )
+            params.extend([user_id, *group])
+        query += " ORDER BY seq DESC" if reverse else " ORDER BY seq"
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(limit)
+        for row in self._connection().execute(query, params):
+            yield self._row_to_entry(row)
+
+    def get_event_entry(self, user_id: str, event_id: str) -> dict[str, Any] | None:
+        row = (
+            self._connection()
+            .execute("SELECT * FROM events WHERE user_id = ? AND event_id = ?", (user_id, event_id))
+            .fetchone()
+        )
+        return self._row_to_entry(row) if row else None
+
+    def delete_event(self, user_id: str, event_id: str) -> dict[str, Any] | None:
+        with self._transaction() as conn:
+            row = conn.execute(
+                "SELECT * FROM events WHERE user_id = ? AND event_id = ?", (user_id, event_id)
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute("DELETE FROM events WHERE id = ?", (row["id"],))
+            conn.execute(
+                "DELETE FROM event_tags WHERE user_id = ? AND seq = ?", (user_id, row["seq"])
+            )
+        return self._row_to_entry(row)
+
+    def reindex_events(self, user_id: str) -> int:
+        """Nothing to rebuild: ``event_id`` and ``created_at`` are B-tree indexed."""
+        return 0
+
+    # ------------------------------------------------------------------
+    def read_blob(self, user_id: str, name: str) -> bytes | None:
+        row = (
+            self._connection()
+            .execute("SELECT data FROM blobs WHERE user_id = ? AND name = ?", (user_id, name))
+            .fetchone()
+        )
+        return bytes(row["data"]) if row else None
+
+    def write_blob(self, user_id: str, name: str, data: bytes) -> None:
+        with self._transaction() as conn:
+            conn.execute(
+                "INSERT INTO blobs (user_id, name, data) VALUES (?, ?, ?) "
+                "ON CONFLICT(user_id, name) DO UPDATE SET data = excluded.data",
+                (user_id, name, data),
+            )
+
+    def delete_blob(self, user_id: str, name: str) -> None:
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM blobs WHERE user_id = ? AND name = ?", (user_id, name))
+
+    # ------------------------------------------------------------------
+    def export_bundle(self, user_id: str) -> dict[str, Any]:
+        profile = self.load_profile(user_id)
+        return {
+            "version": "1.0",
+            "profile": profile,
+            "events": [entry_to_json(entry) for entry in self.iter_event_entries(user_id)],
+            "keys": self.load_key_files(user_id),
+        }
+
+    def import_bundle(self, bundle: dict[str, Any], target_user_id: str) -> None:
+        profile = bundle.get("profile") or {}
+        events = bundle.get("events") or []
+        keys = bundle.get("keys") or {}
+
+        with self._transaction() as conn:
+            self._write_profile(
+                conn, target_user_id, profile, self._stored_version(conn, target_user_id)
+            )
+            conn.executemany(
+                "INSERT INTO key_files (user_id, key_id, data) VALUES (?, ?, ?) "
+                "ON CONFLICT(user_id, key_id) DO UPDATE SET data = excluded.data",
+                (
+                    (target_user_id, key_id, json.dumps(data, sort_keys=True))
+                    for key_id, data in keys.items()
+                ),
+            )
+            conn.execute("DELETE FROM events WHERE user_id = ?", (target_user_id,))
+            conn.execute("DELETE FROM event_tags WHERE user_id = ?", (target_user_id,))
+            self._insert_events(
+                conn,
+                target_user_id,
+                (entry_from_json(entry) for entry in events),
+                preserve_seq=True,
+            )
+
+
+__all__ = ["SQLiteStorage"]
@@ -1,130 +1,987 @@
-﻿"""File-system storage helpers for the PathLog prototype."""
+"""Storage backends for the PathLog prototype.
+
+``StorageBackend`` describes the persistence operations the service relies on.
+``FileStorage`` is the JSON-file implementation: events are kept in a
+segmented log where each user owns a ``segments`` directory holding size- or
+time-bounded ``NNNNNNNN.seg`` segment files. Every segment has a sidecar
+``.idx`` file with one row per event (sequence number, event id,
+``created_at`` and byte offset) and the directory carries a small
+``manifest.json`` describing each segment's bounds. Readers use the manifest
+and sidecar indexes to open only the segments (and offsets) they need.
+Appends only rewrite the manifest when they roll over to a new segment; the
+rows appended to the active segment since then are folded back in from its
+index whenever the manifest is loaded.
+Index rows are in sequence order, so sequence bounds are found by bisection;
+the manifest also records each segment's event-id range and whether its
+``created_at`` values and event ids follow append order (they do for
+time-ordered ids, see :mod:`pathlog.ids`), which lets id lookups skip every
+other segment and bisect within one, and time bounds bisect too. Segments
+written before those fields existed are scanned until ``reindex_events``
+has recomputed them from their indexes.
+Entries may carry blind-index ``tags`` (see :mod:`pathlog.blind_index`);
+they are copied into the sidecar rows so tag filters are answered from the
+index before any record is read.
+
+Segment records are length-prefixed: a ``>II`` header with the sizes of a
+compact JSON metadata object and of the raw ciphertext, followed by both, so
+binary envelopes are stored without base64. Segments written before that
+format (``NNNNNNNN.jsonl``, one JSON object per line) are marked ``jsonl`` in
+the manifest, stay readable and keep their format when rewritten; appends
+always go to a binary segment.
+
+Every backend hands out a per-user :class:`~pathlog.locking.InterProcessLock`
+through ``user_lock`` so several worker processes can share one vault: the
+file backend takes it around every log write, and the service takes it around
+its read-modify-write cycles on sidecar blobs. Profiles carry a ``version``
+counter; ``save_profile`` writes atomically (temporary file and rename) and
+bumps it, and ``swap_profile`` only writes when the stored version still
+matches, so concurrent updates retry instead of overwriting each other.
+
+The SQLite implementation lives in :mod:`pathlog.sqlite_storage`; use
+:func:`create_backend` to pick one from configuration.
+"""
 
 from __future__ import annotations
 
 import json
-from datetime import datetime, timezone
+import os
+import struct
+import threading
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+from itertools import islice
+from operator import itemgetter
 from pathlib import Path
-from typing import Any, Iterable
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Collection,
+    ContextManager,
+    Iterable,
+    Iterator,
+    Protocol,
+    Sequence,
+)
+
+from .crypto import (
+    ciphertext_from_bytes,
+    ciphertext_from_text,
+    ciphertext_to_bytes,
+    ciphertext_to_text,
+)
+from .locking import InterProcessLock, LockRegistry
+
+if TYPE_CHECKING:
+    from .config import PathLogConfig
 
 BASE_DIR = Path(__file__).resolve().parent.parent / "pathlog_data"
 PROFILE_FILENAME = "profile.json"
 EVENTS_FILENAME = "events.jsonl"
 KEYS_DIRNAME = "keys"
+SEGMENTS_DIRNAME = "segments"
+BLOBS_DIRNAME = "blobs"
+MANIFEST_FILENAME = "manifest.json"
+LOCK_FILENAME = ".lock"
+SEGMENT_SUFFIX = ".seg"
+JSONL_SEGMENT_SUFFIX = ".jsonl"
+INDEX_SUFFIX = ".idx"
+FORMAT_BINARY = "binary"
+FORMAT_JSONL = "jsonl"
 
+SEGMENT_MAX_BYTES = 8 * 1024 * 1024
+SEGMENT_MAX_AGE = timedelta(days=1)
+REWRITE_BATCH = 256
+_RECORD_HEADER = struct.Struct(">II")
 
-def _ensure_base_dir() -> None:
-    BASE_DIR.mkdir(parents=True, exist_ok=True)
 
+class StorageBackend(Protocol):
+    """Persistence operations required by :class:`~pathlog.service.PathLogService`."""
 
-def _user_dir(user_id: str) -> Path:
-    _ensure_base_dir()
-    return BASE_DIR / user_id
+    def user_lock(self, user_id: str) -> ContextManager[Any]: ...
 
+    def save_profile(self, user_id: str, profile: dict[str, Any]) -> None: ...
 
-def ensure_user_dirs(user_id: str) -> Path:
-    """Create the user directory structure if it does not already exist."""
-    user_dir = _user_dir(user_id)
-    user_dir.mkdir(parents=True, exist_ok=True)
-    (user_dir / KEYS_DIRNAME).mkdir(parents=True, exist_ok=True)
-    (user_dir / EVENTS_FILENAME).touch(exist_ok=True)
-    return user_dir
+    def swap_profile(
+        self, user_id: str, profile: dict[str, Any], expected_version: int
+    ) -> bool: ...
 
+    def load_profile(self, user_id: str) -> dict[str, Any]: ...
 
-def profile_path(user_id: str) -> Path:
-    return ensure_user_dirs(user_id) / PROFILE_FILENAME
+    def write_key_file(self, user_id: str, key_id: str, data: dict[str, Any]) -> str: ...
 
+    def load_key_files(self, user_id: str) -> dict[str, dict[str, Any]]: ...
 
-def key_path(user_id: str, key_id: str) -> Path:
-    return ensure_user_dirs(user_id) / KEYS_DIRNAME / f"{key_id}.json"
+    def append_event(self, user_id: str, entry: dict[str, Any]) -> None: ...
 
+    def append_events(
+        self,
+        user_id: str,
+        entries: Iterable[dict[str, Any]],
+        *,
+        fsync: bool = False,
+        preserve_seq: bool = False,
+    ) -> None: ...
 
-def events_path(user_id: str) -> Path:
-    return ensure_user_dirs(user_id) / EVENTS_FILENAME
+    def write_events(self, user_id: str, entries: Iterable[dict[str, Any]]) -> None: ...
 
+    def rewrite_event_chunks(
+        self,
+        user_id: str,
+        transform: Callable[[list[dict[str, Any]]], list[dict[str, Any] | None]],
+        *,
+        after_seq: int | None = None,
+    ) -> Iterator[int]: ...
 
-def save_profile(user_id: str, profile: dict[str, Any]) -> None:
-    path = profile_path(user_id)
-    path.write_text(json.dumps(profile, indent=2, sort_keys=True), encoding="utf-8")
+    def count_events(self, user_id: str) -> int: ...
 
+    def iter_event_entries(
+        self,
+        user_id: str,
+        *,
+        since: str | None = None,
+        until: str | None = None,
+        after_seq: int | None = None,
+        before_seq: int | None = None,
+        reverse: bool = False,
+        tags: Sequence[Collection[str]] | None = None,
+        limit: int | None = None,
+    ) -> Iterator[dict[str, Any]]: ...
 
-def load_profile(user_id: str) -> dict[str, Any]:
-    path = profile_path(user_id)
-    if not path.exists():
-        raise FileNotFoundError(f"No PathLog profile found for user {user_id}")
-    return json.loads(path.read_text(encoding="utf-8"))
+    def get_event_entry(self, user_id: str, event_id: str) -> dict[str, Any] | None: ...
 
+    def delete_event(self, user_id: str, event_id: str) -> dict[str, Any] | None: ...
 
-def write_key_file(user_id: str, key_id: str, data: dict[str, Any]) -> Path:
-    path = key_path(user_id, key_id)
-    path.write_text(json.dumps(data, indent=2, sort_keys=True), encoding="utf-8")
-    return path
+    def reindex_events(self, user_id: str) -> int: ...
 
+    def read_blob(self, user_id: str, name: str) -> bytes | None: ...
 
-def write_events(user_id: str, entries: Iterable[dict[str, Any]]) -> None:
-    path = events_path(user_id)
-    with path.open("w", encoding="utf-8") as handle:
-        for entry in entries:
-            handle.write(json.dumps(entry, separators=(",", ":")))
-            handle.write("\n")
+    def write_blob(self, user_id: str, name: str, data: bytes) -> None: ...
 
+    def delete_blob(self, user_id: str, name: str) -> None: ...
 
-def append_event(user_id: str, entry: dict[str, Any]) -> None:
-    entry = dict(entry)
-    entry.setdefault("created_at", datetime.now(timezone.utc).isoformat())
-    path = events_path(user_id)
-    with path.open("a", encoding="utf-8") as handle:
-        handle.write(json.dumps(entry, separators=(",", ":")))
-        handle.write("\n")
+    def export_bundle(self, user_id: str) -> dict[str, Any]: ...
 
+    def import_bundle(self, bundle: dict[str, Any], target_user_id: str) -> None: ...
 
-def iter_event_entries(user_id: str) -> Iterable[dict[str, Any]]:
-    path = events_path(user_id)
-    if not path.exists():
-        return []
-    with path.open("r", encoding="utf-8") as handle:
-        for line in handle:
-            line = line.strip()
-            if not line:
-                continue
-            yield json.loads(line)
 
+def create_backend(config: "PathLogConfig") -> StorageBackend:
+    """Instantiate the storage backend named in ``config.storage_backend``."""
+    if config.storage_backend == "file":
+        return FileStorage(config.data_dir)
+    if config.storage_backend == "sqlite":
+        from .sqlite_storage import SQLiteStorage
 
-def export_bundle(user_id: str) -> dict[str, Any]:
-    profile = load_profile(user_id)
-    events = list(iter_event_entries(user_id))
-    keys_dir = ensure_user_dirs(user_id) / KEYS_DIRNAME
-    key_files = {
-        path.stem: json.loads(path.read_text(encoding="utf-8"))
-        for path in keys_dir.glob("*.json")
-    }
-    return {
-        "version": "1.0",
-        "profile": profile,
-        "events": events,
-        "keys": key_files,
-    }
+        return SQLiteStorage(config.sqlite_path or Path(config.data_dir) / "pathlog.db")
+    raise ValueError(f"Unknown PathLog storage backend: {config.storage_backend}")
+
+
+def profile_version(profile: dict[str, Any] | None) -> int:
+    """Return a stored profile's version counter; profiles predating it are version 0."""
+    return int((profile or {}).get("version", 0))
+
+
+def _tmp_path(path: Path) -> Path:
+    # Unique per process and thread so concurrent writers never share a temp file.
+    return path.with_name(f"{path.name}.{os.getpid()}-{threading.get_ident()}.tmp")
+
+
+def _write_json_atomic(path: Path, data: Any, *, fsync: bool = False) -> None:
+    tmp_path = _tmp_path(path)
+    with tmp_path.open("w", encoding="utf-8") as handle:
+        handle.write(json.dumps(data, indent=2, sort_keys=True))
+        if fsync:
+            handle.flush()
+            os.fsync(handle.fileno())
+    os.replace(tmp_path, path)
+
+
+@lru_cache(maxsize=256)
+def _read_index(path: str, size: int, mtime_ns: int) -> tuple[dict[str, Any], ...]:
+    # ``size`` and ``mtime_ns`` only key the cache so appends invalidate it. A
+    # final row without its newline was torn by a crash and is ignored.
+    with open(path, "r", encoding="utf-8") as handle:
+        return tuple(json.loads(line) for line in handle if line.endswith("\n") and line.strip())
+
+
+def _open_index_for_append(path: Path) -> Any:
+    """Open a sidecar index for appending, first dropping a row torn by a crash."""
+    handle = path.open("a+b")
+    size = handle.seek(0, os.SEEK_END)
+    if size:
+        handle.seek(max(0, size - 4096))
+        tail = handle.read()
+        if not tail.endswith(b"\n"):
+            handle.truncate(size - len(tail) + tail.rfind(b"\n") + 1)
+    handle.close()
+    return path.open("a", encoding="utf-8")
+
+
+def _segment_name(segment_id: int) -> str:
+    return f"{segment_id:08d}"
 
 
-def import_bundle(bundle: dict[str, Any], target_user_id: str) -> None:
-    profile = bundle.get("profile") or {}
-    events = bundle.get("events") or []
-    keys = bundle.get("keys") or {}
+def _segment_format(segment: dict[str, Any]) -> str:
+    # Manifests written before binary segments carry no format field.
+    return segment.get("format", FORMAT_JSONL)
 
-    save_profile(target_user_id, profile)
-    for key_id, data in keys.items():
-        write_key_file(target_user_id, key_id, data)
-    write_events(target_user_id, events)
+
+def _data_path(seg_dir: Path, segment: dict[str, Any]) -> Path:
+    suffix = SEGMENT_SUFFIX if _segment_format(segment) == FORMAT_BINARY else JSONL_SEGMENT_SUFFIX
+    return seg_dir / (segment["name"] + suffix)
+
+
+def _encode_record(entry: dict[str, Any], fmt: str) -> bytes:
+    ciphertext = entry.get("ciphertext")
+    if fmt == FORMAT_JSONL:
+        line = json.dumps(entry_to_json(entry), separators=(",", ":")) + "\n"
+        return line.encode("utf-8")
+    raw = b""
+    if isinstance(ciphertext, (str, bytes)):
+        entry = {key: value for key, value in entry.items() if key != "ciphertext"}
+        raw = ciphertext_to_bytes(ciphertext)
+    meta = json.dumps(entry, separators=(",", ":")).encode("utf-8")
+    return _RECORD_HEADER.pack(len(meta), len(raw)) + meta + raw
+
+
+def _decode_record(record: bytes, fmt: str) -> dict[str, Any]:
+    if fmt == FORMAT_JSONL:
+        return entry_from_json(json.loads(record))
+    meta_length, raw_length = _RECORD_HEADER.unpack_from(record)
+    start = _RECORD_HEADER.size + meta_length
+    entry = json.loads(record[_RECORD_HEADER.size : start])
+    if raw_length:
+        entry["ciphertext"] = ciphertext_from_bytes(record[start : start + raw_length])
+    return entry
+
+
+def entry_to_json(entry: dict[str, Any]) -> dict[str, Any]:
+    """Return ``entry`` with binary ciphertext in its JSON-safe text form (for bundles)."""
+    if isinstance(entry.get("ciphertext"), bytes):
+        return {**entry, "ciphertext": ciphertext_to_text(entry["ciphertext"])}
+    return entry
+
+
+def entry_from_json(entry: dict[str, Any]) -> dict[str, Any]:
+    """Inverse of :func:`entry_to_json`."""
+    if isinstance(entry.get("ciphertext"), str):
+        return {**entry, "ciphertext": ciphertext_from_text(entry["ciphertext"])}
+    return entry
+
+
+def _iter_records(handle: Any, fmt: str, end: int) -> Iterator[dict[str, Any]]:
+    """Yield the records of an open segment file in order, up to byte ``end``.
+
+    ``end`` is the segment's indexed length, so a tail torn by a crash
+    before its index row was written is never decoded.
+    """
+    remaining = end
+    if fmt == FORMAT_JSONL:
+        for line in handle:
+            remaining -= len(line)
+            if remaining < 0:
+                return
+            if line.strip():
+                yield _decode_record(line, fmt)
+        return
+    while remaining >= _RECORD_HEADER.size:
+        header = handle.read(_RECORD_HEADER.size)
+        meta_length, raw_length = _RECORD_HEADER.unpack(header)
+        remaining -= _RECORD_HEADER.size + meta_length + raw_length
+        if remaining < 0:
+            return
+        yield _decode_record(header + handle.read(meta_length + raw_length), fmt)
+
+
+def _empty_manifest() -> dict[str, Any]:
+    return {"version": 1, "next_seq": 1, "segments": []}
+
+
+def _row_matches(
+    row: dict[str, Any],
+    since: str | None,
+    until: str | None,
+    after_seq: int | None,
+    before_seq: int | None,
+) -> bool:
+    if since is not None and row["created_at"] < since:
+        return False
+    if until is not None and row["created_at"] > until:
+        return False
+    if after_seq is not None and row["seq"] <= after_seq:
+        return False
+    if before_seq is not None and row["seq"] >= before_seq:
+        return False
+    return True
+
+
+_row_seq = itemgetter("seq")
+_row_time = itemgetter("created_at")
+
+
+def _row_event_id(row: dict[str, Any]) -> str:
+    return row["event_id"] or ""
+
+
+def _row_span(
+    segment: dict[str, Any],
+    rows: Sequence[dict[str, Any]],
+    since: str | None,
+    until: str | None,
+    after_seq: int | None,
+    before_seq: int | None,
+) -> tuple[int, int]:
+    """Bisect the slice of ``rows`` the bounds can match; rows are still checked."""
+    start, stop = 0, len(rows)
+    if after_seq is not None:
+        start = bisect_right(rows, after_seq, key=_row_seq)
+    if before_seq is not None:
+        stop = bisect_left(rows, before_seq, key=_row_seq)
+    if segment.get("time_ordered"):
+        if since is not None:
+            start = max(start, bisect_left(rows, since, key=_row_time))
+        if until is not None:
+            stop = min(stop, bisect_right(rows, until, key=_row_time))
+    return start, max(start, stop)
+
+
+def _has_tags(row: dict[str, Any], tags: Sequence[Collection[str]]) -> bool:
+    row_tags = row.get("tags") or ()
+    return all(any(tag in group for tag in row_tags) for group in tags)
+
+
+def _overlaps(
+    segment: dict[str, Any],
+    since: str | None,
+    until: str | None,
+    after_seq: int | None,
+    before_seq: int | None,
+) -> bool:
+    if not segment["count"]:
+        return False
+    if since is not None and segment["max_created_at"] < since:
+        return False
+    if until is not None and segment["min_created_at"] > until:
+        return False
+    if after_seq is not None and segment["last_seq"] <= after_seq:
+        return False
+    if before_seq is not None and segment["first_seq"] >= before_seq:
+        return False
+    return True
+
+
+def _contained(
+    segment: dict[str, Any],
+    since: str | None,
+    until: str | None,
+    after_seq: int | None,
+    before_seq: int | None,
+) -> bool:
+    return (
+        (since is None or segment["min_created_at"] >= since)
+        and (until is None or segment["max_created_at"] <= until)
+        and (after_seq is None or segment["first_seq"] > after_seq)
+        and (before_seq is None or segment["last_seq"] < before_seq)
+    )
+
+
+def _reset_segment_stats(segment: dict[str, Any]) -> None:
+    segment.update(
+        count=0,
+        bytes=0,
+        first_seq=None,
+        last_seq=None,
+        min_created_at=None,
+        max_created_at=None,
+        min_event_id=None,
+        max_event_id=None,
+        time_ordered=True,
+        id_ordered=True,
+    )
+
+
+def _track_row(segment: dict[str, Any], row: dict[str, Any]) -> None:
+    """Fold one index row into its segment's manifest bounds and ordering flags."""
+    seq, created_at, event_id = row["seq"], row["created_at"], _row_event_id(row)
+    if not segment["count"]:
+        segment.update(
+            first_seq=seq,
+            min_created_at=created_at,
+            max_created_at=created_at,
+            min_event_id=event_id,
+            max_event_id=event_id,
+            time_ordered=True,
+            id_ordered=True,
+        )
+    else:
+        # Missing flags mean the segment predates them: nothing is known until a reindex.
+        segment["time_ordered"] = bool(
+            segment.get("time_ordered") and created_at >= segment["max_created_at"]
+        )
+        segment["min_created_at"] = min(segment["min_created_at"], created_at)
+        segment["max_created_at"] = max(segment["max_created_at"], created_at)
+        if segment.get("min_event_id") is not None:
+            segment["id_ordered"] = bool(
+                segment.get("id_ordered") and event_id >= segment["max_event_id"]
+            )
+            segment["min_event_id"] = min(segment["min_event_id"], event_id)
+            segment["max_event_id"] = max(segment["max_event_id"], event_id)
+    segment["count"] += 1
+    segment["last_seq"] = seq
+
+
+def _transform_batches(
+    entries: Iterable[dict[str, Any]],
+    transform: Callable[[list[dict[str, Any]]], list[dict[str, Any] | None]],
+    size: int = REWRITE_BATCH,
+) -> Iterator[dict[str, Any]]:
+    iterator = iter(entries)
+    while batch := list(islice(iterator, size)):
+        for entry, replacement in zip(batch, transform(batch)):
+            yield entry if replacement is None else replacement
+
+
+def _close_handles(data_handle: Any, index_handle: Any, *, fsync: bool = False) -> None:
+    for handle in (data_handle, index_handle):
+        if fsync:
+            handle.flush()
+            os.fsync(handle.fileno())
+        handle.close()
+
+
+def _write_record(
+    data_handle: Any, index_handle: Any, segment: dict[str, Any], entry: dict[str, Any]
+) -> None:
+    """Write one entry and its index row, updating the segment's manifest stats."""
+    seq = entry["seq"]
+    created_at = entry["created_at"]
+    line = _encode_record(entry, _segment_format(segment))
+    offset = data_handle.tell()
+    data_handle.write(line)
+    row = {
+        "seq": seq,
+        "event_id": entry.get("event_id"),
+        "created_at": created_at,
+        "offset": offset,
+        "length": len(line),
+    }
+    if entry.get("tags"):
+        row["tags"] = entry["tags"]
+    index_handle.write(json.dumps(row, separators=(",", ":")) + "\n")
+    _track_row(segment, row)
+    segment["bytes"] = offset + len(line)
+
+
+class FileStorage:
+    """JSON-file backend storing each user's vault in its own directory."""
+
+    def __init__(
+        self,
+        base_dir: str | Path | None = None,
+        *,
+        segment_max_bytes: int = SEGMENT_MAX_BYTES,
+        segment_max_age: timedelta = SEGMENT_MAX_AGE,
+    ) -> None:
+        self.base_dir = Path(base_dir) if base_dir else BASE_DIR
+        self.segment_max_bytes = segment_max_bytes
+        self.segment_max_age = segment_max_age
+        self._locks = LockRegistry(lambda user_id: self.ensure_user_dirs(user_id) / LOCK_FILENAME)
+        # Active segment rebuilt from its index, keyed on the index file's state.
+        self._recovered: dict[str, tuple[tuple[Any, ...], dict[str, Any]]] = {}
+
+    def user_lock(self, user_id: str) -> InterProcessLock:
+        """Serialise writers of one user's vault across threads and processes."""
+        return self._locks.get(user_id)
+
+    def _user_dir(self, user_id: str) -> Path:
+        self.base_dir.mkdir(parents=True, exist_ok=True)
+        return self.base_dir / user_id
+
+    def ensure_user_dirs(self, user_id: str) -> Path:
+        """Create the user directory structure if it does not already exist."""
+        user_dir = self._user_dir(user_id)
+        user_dir.mkdir(parents=True, exist_ok=True)
+        (user_dir / KEYS_DIRNAME).mkdir(parents=True, exist_ok=True)
+        (user_dir / SEGMENTS_DIRNAME).mkdir(parents=True, exist_ok=True)
+        return user_dir
+
+    def profile_path(self, user_id: str) -> Path:
+        return self.ensure_user_dirs(user_id) / PROFILE_FILENAME
+
+    def key_path(self, user_id: str, key_id: str) -> Path:
+        return self.ensure_user_dirs(user_id) / KEYS_DIRNAME / f"{key_id}.json"
+
+    def segments_path(self, user_id: str) -> Path:
+        return self.ensure_user_dirs(user_id) / SEGMENTS_DIRNAME
+
+    # ------------------------------------------------------------------
+    def save_profile(self, user_id: str, profile: dict[str, Any]) -> None:
+        """Atomically replace the profile, setting ``profile["version"]`` past the stored one."""
+        with self.user_lock(user_id):
+            path = self.profile_path(user_id)
+            stored = json.loads(path.read_text(encoding="utf-8")) if path.exists() else None
+            profile["version"] = profile_version(stored) + 1
+            _write_json_atomic(path, profile, fsync=True)
+
+    def swap_profile(self, user_id: str, profile: dict[str, Any], expected_version: int) -> bool:
+        """Save ``profile`` only if the stored version is still ``expected_version``."""
+        with self.user_lock(user_id):
+            path = self.profile_path(user_id)
+            stored = json.loads(path.read_text(encoding="utf-8")) if path.exists() else None
+            if profile_version(stored) != expected_version:
+                return False
+            self.save_profile(user_id, profile)
+            return True
+
+    def load_profile(self, user_id: str) -> dict[str, Any]:
+        path = self.profile_path(user_id)
+        if not path.exists():
+            raise FileNotFoundError(f"No PathLog profile found for user {user_id}")
+        return json.loads(path.read_text(encoding="utf-8"))
+
+    def write_key_file(self, user_id: str, key_id: str, data: dict[str, Any]) -> str:
+        path = self.key_path(user_id, key_id)
+        _write_json_atomic(path, data, fsync=True)
+        return str(path)
+
+    def load_key_files(self, user_id: str) -> dict[str, dict[str, Any]]:
+        keys_dir = self.ensure_user_dirs(user_id) / KEYS_DIRNAME
+        return {
+            path.stem: json.loads(path.read_text(encoding="utf-8"))
+            for path in keys_dir.glob("*.json")
+        }
+
+    # ------------------------------------------------------------------
+    # Segment manifest and sidecar indexes
+
+    def _load_manifest(self, user_id: str) -> dict[str, Any]:
+        path = self.segments_path(user_id) / MANIFEST_FILENAME
+        if path.exists():
+            manifest = json.loads(path.read_text(encoding="utf-8"))
+            return self._recover_active_segment(user_id, manifest)
+        manifest = _empty_manifest()
+        legacy_path = self._user_dir(user_id) / EVENTS_FILENAME
+        if legacy_path.exists():
+            manifest = self._migrate_legacy_log(user_id, legacy_path, manifest)
+        return manifest
+
+    def _save_manifest(
+        self, user_id: str, manifest: dict[str, Any], *, fsync: bool = False
+    ) -> None:
+        _write_json_atomic(self.segments_path(user_id) / MANIFEST_FILENAME, manifest, fsync=fsync)
+
+    def _recover_active_segment(self, user_id: str, manifest: dict[str, Any]) -> dict[str, Any]:
+        """Fold index rows appended since the manifest was written into its last segment."""
+        segments = manifest["segments"]
+        if not segments:
+            return manifest
+        segment = segments[-1]
+        path = self.segments_path(user_id) / (segment["name"] + INDEX_SUFFIX)
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            return manifest
+        key = (str(path), stat.st_size, stat.st_mtime_ns, segment["count"], segment["last_seq"])
+        cached = self._recovered.get(user_id)
+        if cached is None or cached[0] != key:
+            rows = _read_index(str(path), stat.st_size, stat.st_mtime_ns)[segment["count"] :]
+            if not rows:
+                return manifest
+            recovered = dict(segment)
+            for row in rows:
+                _track_row(recovered, row)
+            recovered["bytes"] = rows[-1]["offset"] + rows[-1]["length"]
+            cached = self._recovered[user_id] = (key, recovered)
+        segments[-1] = dict(cached[1])
+        manifest["next_seq"] = max(manifest["next_seq"], segments[-1]["last_seq"] + 1)
+        return manifest
+
+    def _migrate_legacy_log(
+        self, user_id: str, legacy_path: Path, manifest: dict[str, Any]
+    ) -> dict[str, Any]:
+        """Move a pre-segmentation ``events.jsonl`` into the segmented layout once."""
+        with legacy_path.open("r", encoding="utf-8") as handle:
+            entries = (json.loads(line) for line in handle if line.strip())
+            manifest = self._append_entries(user_id, manifest, entries)
+        self._save_manifest(user_id, manifest)
+        legacy_path.rename(legacy_path.with_name(EVENTS_FILENAME + ".migrated"))
+        return manifest
+
+    def _segment_index(self, seg_dir: Path, segment: dict[str, Any]) -> tuple[dict[str, Any], ...]:
+        path = seg_dir / (segment["name"] + INDEX_SUFFIX)
+        if not path.exists():
+            return ()
+        stat = path.stat()
+        return _read_index(str(path), stat.st_size, stat.st_mtime_ns)
+
+    def _segment_is_full(self, segment: dict[str, Any], created_at: str) -> bool:
+        if segment["bytes"] >= self.segment_max_bytes:
+            return True
+        opened = datetime.fromisoformat(segment["opened_at"])
+        return datetime.fromisoformat(created_at) - opened >= self.segment_max_age
+
+    @staticmethod
+    def _open_segment(manifest: dict[str, Any], created_at: str) -> dict[str, Any]:
+        segments = manifest["segments"]
+        segment_id = segments[-1]["id"] + 1 if segments else 1
+        segment = {
+            "id": segment_id,
+            "name": _segment_name(segment_id),
+            "format": FORMAT_BINARY,
+            "opened_at": created_at,
+            "count": 0,
+            "bytes": 0,
+            "first_seq": None,
+            "last_seq": None,
+            "min_created_at": None,
+            "max_created_at": None,
+            "min_event_id": None,
+            "max_event_id": None,
+            "time_ordered": True,
+            "id_ordered": True,
+        }
+        segments.append(segment)
+        return segment
+
+    def _append_entries(
+        self,
+        user_id: str,
+        manifest: dict[str, Any],
+        entries: Iterable[dict[str, Any]],
+        *,
+        preserve_seq: bool = False,
+        fsync: bool = False,
+    ) -> dict[str, Any]:
+        """Append entries to the active segment, rolling segments as bounds are hit.
+
+        With ``preserve_seq`` entries that already carry a sequence number keep
+        it, so rewrites (rotation, restores) do not invalidate timeline cursors.
+        With ``fsync`` every touched segment is flushed to disk before closing.
+        The manifest is saved whenever a new segment is opened, before anything
+        is written to it; rows appended to the active segment are recovered
+        from its index instead.
+        """
+        seg_dir = self.segments_path(user_id)
+        segment: dict[str, Any] | None = None
+        data_handle = index_handle = None
+        try:
+            for entry in entries:
+                entry = dict(entry)
+                entry.setdefault("created_at", datetime.now(timezone.utc).isoformat())
+                created_at = entry["created_at"]
+                if segment is None:
+                    segments = manifest["segments"]
+                    segment = segments[-1] if segments else None
+                if (
+                    segment is None
+                    or _segment_format(segment) != FORMAT_BINARY
+                    or self._segment_is_full(segment, created_at)
+                ):
+                    if data_handle is not None:
+                        _close_handles(data_handle, index_handle, fsync=fsync)
+                        data_handle = index_handle = None
+                    segment = self._open_segment(manifest, created_at)
+                    self._save_manifest(user_id, manifest, fsync=fsync)
+                if data_handle is None:
+                    data_handle = _data_path(seg_dir, segment).open("ab")
+                    if data_handle.tell() > segment["bytes"]:
+                        # A crash between the record and its index row left a torn tail.
+                        data_handle.truncate(segment["bytes"])
+                        data_handle.seek(segment["bytes"])
+                    index_handle = _open_index_for_append(
+                        seg_dir / (segment["name"] + INDEX_SUFFIX)
+                    )
+
+                seq = manifest["next_seq"]
+                if preserve_seq and entry.get("seq", 0) >= seq:
+                    seq = entry["seq"]
+                manifest["next_seq"] = seq + 1
+                entry["seq"] = seq
+                _write_record(data_handle, index_handle, segment, entry)
+        finally:
+            if data_handle is not None:
+                _close_handles(data_handle, index_handle, fsync=fsync)
+        return manifest
+
+    def _rewrite_segment(
+        self, user_id: str, segment: dict[str, Any], entries: Iterable[dict[str, Any]]
+    ) -> None:
+        """Replace a segment's contents, keeping each entry's sequence number.
+
+        The new data and index are written to temporary files, flushed to disk
+        and swapped in with atomic renames. The caller saves the manifest.
+        """
+        seg_dir = self.segments_path(user_id)
+        data_path = _data_path(seg_dir, segment)
+        index_path = seg_dir / (segment["name"] + INDEX_SUFFIX)
+        data_tmp = data_path.with_name(data_path.name + ".tmp")
+        index_tmp = index_path.with_name(index_path.name + ".tmp")
+        _reset_segment_stats(segment)
+        with (
+            data_tmp.open("wb") as data_handle,
+            index_tmp.open("w", encoding="utf-8") as index_handle,
+        ):
+            for entry in entries:
+                _write_record(data_handle, index_handle, segment, entry)
+            for handle in (data_handle, index_handle):
+                handle.flush()
+                os.fsync(handle.fileno())
+        os.replace(index_tmp, index_path)
+        os.replace(data_tmp, data_path)
+
+    def list_segments(self, user_id: str) -> list[dict[str, Any]]:
+        """Return manifest metadata for each segment of the user's event log."""
+        return list(self._load_manifest(user_id)["segments"])
+
+    # ------------------------------------------------------------------
+    # Event log API
+
+    def write_events(self, user_id: str, entries: Iterable[dict[str, Any]]) -> None:
+        with self.user_lock(user_id):
+            seg_dir = self.segments_path(user_id)
+            for path in seg_dir.iterdir():
+                if path.suffix in {SEGMENT_SUFFIX, JSONL_SEGMENT_SUFFIX, INDEX_SUFFIX}:
+                    path.unlink()
+            manifest = self._append_entries(user_id, _empty_manifest(), entries, preserve_seq=True)
+            self._save_manifest(user_id, manifest)
+
+    def rewrite_event_chunks(
+        self,
+        user_id: str,
+        transform: Callable[[list[dict[str, Any]]], list[dict[str, Any] | None]],
+        *,
+        after_seq: int | None = None,
+    ) -> Iterator[int]:
+        """Rewrite the log one segment at a time, yielding each segment's last seq.
+
+        ``transform`` receives entries in batches of up to ``REWRITE_BATCH`` and
+        returns, per entry, a replacement or ``None`` to keep the original, so
+        it can fan the work out to a worker pool. Each segment is streamed
+        into a temporary file, fsynced and renamed over the original, so a
+        crash leaves every segment either fully old or fully rewritten;
+        sequence numbers never change. Segments ending at or before
+        ``after_seq`` are skipped, which lets callers resume from the last
+        yielded value.
+        """
+        seg_dir = self.segments_path(user_id)
+        names = [segment["name"] for segment in self._load_manifest(user_id)["segments"]]
+        for name in names:
+            with self.user_lock(user_id):
+                manifest = self._load_manifest(user_id)
+                segment = next(
+                    (item for item in manifest["segments"] if item["name"] == name), None
+                )
+                if segment is None or not segment["count"]:
+                    continue
+                if after_seq is not None and segment["last_seq"] <= after_seq:
+                    continue
+                with _data_path(seg_dir, segment).open("rb") as handle:
+                    entries = _iter_records(handle, _segment_format(segment), segment["bytes"])
+                    self._rewrite_segment(user_id, segment, _transform_batches(entries, transform))
+                self._save_manifest(user_id, manifest, fsync=True)
+                last_seq = segment["last_seq"]
+            yield last_seq
+
+    def count_events(self, user_id: str) -> int:
+        return sum(segment["count"] for segment in self._load_manifest(user_id)["segments"])
+
+    def append_event(self, user_id: str, entry: dict[str, Any]) -> None:
+        self.append_events(user_id, [entry])
+
+    def append_events(
+        self,
+        user_id: str,
+        entries: Iterable[dict[str, Any]],
+        *,
+        fsync: bool = False,
+        preserve_seq: bool = False,
+    ) -> None:
+        """Append entries with one open of the active segment.
+
+        The manifest is only rewritten when the append rolls over to a new
+        segment, so a steady stream of small appends touches just the active
+        segment and its index.
+        """
+        with self.user_lock(user_id):
+            self._append_entries(
+                user_id,
+                self._load_manifest(user_id),
+                entries,
+                preserve_seq=preserve_seq,
+                fsync=fsync,
+            )
+
+    def iter_event_entries(
+        self,
+        user_id: str,
+        *,
+        since: str | None = None,
+        until: str | None = None,
+        after_seq: int | None = None,
+        before_seq: int | None = None,
+        reverse: bool = False,
+        tags: Sequence[Collection[str]] | None = None,
+        limit: int | None = None,
+    ) -> Iterator[dict[str, Any]]:
+        """Yield stored entries in append order, optionally bounded.
+
+        ``since``/``until`` are inclusive ISO-8601 ``created_at`` bounds and
+        ``after_seq``/``before_seq`` are exclusive sequence bounds. Segments
+        outside the bounds are skipped without being opened, and within a
+        partially matching segment only the matching offsets are read.
+        ``reverse`` yields newest entries first. With ``tags`` only entries
+        holding at least one tag of every group are read, chosen from the
+        sidecar index. ``limit`` caps the number of entries yielded.
+        """
+        entries = self._iter_entries(user_id, (since, until, after_seq, before_seq), reverse, tags)
+        return entries if limit is None else islice(entries, limit)
+
+    def _iter_entries(
+        self,
+        user_id: str,
+        bounds: tuple[str | None, str | None, int | None, int | None],
+        reverse: bool,
+        tags: Sequence[Collection[str]] | None,
+    ) -> Iterator[dict[str, Any]]:
+        manifest = self._load_manifest(user_id)
+        seg_dir = self.segments_path(user_id)
+        segments = manifest["segments"]
+        for segment in reversed(segments) if reverse else segments:
+            if not _overlaps(segment, *bounds):
+                continue
+            fmt = _segment_format(segment)
+            with _data_path(seg_dir, segment).open("rb") as handle:
+                if not reverse and not tags and _contained(segment, *bounds):
+                    yield from _iter_records(handle, fmt, segment["bytes"])
+                    continue
+                rows = self._segment_index(seg_dir, segment)
+                start, stop = _row_span(segment, rows, *bounds)
+                rows = rows[start:stop]
+                for row in reversed(rows) if reverse else rows:
+                    if not _row_matches(row, *bounds):
+                        continue
+                    if tags and not _has_tags(row, tags):
+                        continue
+                    handle.seek(row["offset"])
+                    yield _decode_record(handle.read(row["length"]), fmt)
+
+    def get_event_entry(self, user_id: str, event_id: str) -> dict[str, Any] | None:
+        """Return a single stored entry by id, reading only its segment slice."""
+        manifest = self._load_manifest(user_id)
+        seg_dir = self.segments_path(user_id)
+        for segment in reversed(manifest["segments"]):
+            row = self._find_row(seg_dir, segment, event_id)
+            if row is None:
+                continue
+            with _data_path(seg_dir, segment).open("rb") as handle:
+                handle.seek(row["offset"])
+                return _decode_record(handle.read(row["length"]), _segment_format(segment))
+        return None
+
+    def _find_row(
+        self, seg_dir: Path, segment: dict[str, Any], event_id: str
+    ) -> dict[str, Any] | None:
+        """Return ``event_id``'s index row in ``segment``, skipping segments outside its range."""
+        low, high = segment.get("min_event_id"), segment.get("max_event_id")
+        if not segment["count"] or (low is not None and not low <= event_id <= high):
+            return None
+        rows = self._segment_index(seg_dir, segment)
+        if segment.get("id_ordered"):
+            index = bisect_left(rows, event_id, key=_row_event_id)
+            rows = rows[index : index + 1]
+        return next((row for row in rows if row["event_id"] == event_id), None)
+
+    def delete_event(self, user_id: str, event_id: str) -> dict[str, Any] | None:
+        """Remove an entry by id, rewriting only the segment that holds it."""
+        with self.user_lock(user_id):
+            manifest = self._load_manifest(user_id)
+            seg_dir = self.segments_path(user_id)
+            for segment in reversed(manifest["segments"]):
+                if self._find_row(seg_dir, segment, event_id) is None:
+                    continue
+                with _data_path(seg_dir, segment).open("rb") as handle:
+                    entries = list(
+                        _iter_records(handle, _segment_format(segment), segment["bytes"])
+                    )
+                removed = next(entry for entry in entries if entry.get("event_id") == event_id)
+                self._rewrite_segment(
+                    user_id, segment, (entry for entry in entries if entry is not removed)
+                )
+                self._save_manifest(user_id, manifest)
+                return removed
+        return None
+
+    def reindex_events(self, user_id: str) -> int:
+        """Recompute every segment's id range and ordering flags from its index.
+
+        Run once on a vault whose segments predate those manifest fields (for
+        example one holding random UUIDv4 ids) so time seeks bisect and id
+        lookups skip segments there too. Only the sidecar indexes are read;
+        returns the number of segments reindexed.
+        """
+        with self.user_lock(user_id):
+            manifest = self._load_manifest(user_id)
+            seg_dir = self.segments_path(user_id)
+            for segment in manifest["segments"]:
+                size = segment["bytes"]
+                rows = self._segment_index(seg_dir, segment)
+                _reset_segment_stats(segment)
+                for row in rows:
+                    _track_row(segment, row)
+                segment["bytes"] = size
+            self._save_manifest(user_id, manifest)
+            return len(manifest["segments"])
+
+    # ------------------------------------------------------------------
+    # Encrypted sidecar blobs (aggregates and other derived state)
+
+    def _blob_path(self, user_id: str, name: str) -> Path:
+        blobs_dir = self.ensure_user_dirs(user_id) / BLOBS_DIRNAME
+        blobs_dir.mkdir(exist_ok=True)
+        return blobs_dir / f"{name}.bin"
+
+    def read_blob(self, user_id: str, name: str) -> bytes | None:
+        path = self._blob_path(user_id, name)
+        return path.read_bytes() if path.exists() else None
+
+    def write_blob(self, user_id: str, name: str, data: bytes) -> None:
+        path = self._blob_path(user_id, name)
+        tmp_path = _tmp_path(path)
+        tmp_path.write_bytes(data)
+        os.replace(tmp_path, path)
+
+    def delete_blob(self, user_id: str, name: str) -> None:
+        self._blob_path(user_id, name).unlink(missing_ok=True)
+
+    # ------------------------------------------------------------------
+    def export_bundle(self, user_id: str) -> dict[str, Any]:
+        profile = self.load_profile(user_id)
+        events = [entry_to_json(entry) for entry in self.iter_event_entries(user_id)]
+        return {
+            "version": "1.0",
+            "profile": profile,
+            "events": events,
+            "keys": self.load_key_files(user_id),
+        }
+
+    def import_bundle(self, bundle: dict[str, Any], target_user_id: str) -> None:
+        profile = bundle.get("profile") or {}
+        events = bundle.get("events") or []
+        keys = bundle.get("keys") or {}
+
+        self.save_profile(target_user_id, profile)
+        for key_id, data in keys.items():
+            self.write_key_file(target_user_id, key_id, data)
+        self.write_events(target_user_id, (entry_from_json(entry) for entry in events))
 
 
 __all__ = [
     "BASE_DIR",
-    "save_profile",
-    "load_profile",
-    "write_key_file",
-    "write_events",
-    "append_event",
-    "iter_event_entries",
-    "export_bundle",
-    "import_bundle",
+    "StorageBackend",
+    "FileStorage",
+    "create_backend",
+    "entry_from_json",
+    "entry_to_json",
+    "profile_version",
 ]
@@ -0,0 +1,376 @@
+"""Local embeddings and an encrypted vector index for semantic recall.
+
+Events are embedded at capture time by :class:`HashingEmbedder`, a
+feature-hashing vectorizer over word unigrams and bigrams that needs no
+model download or network. The unit-length ``float32`` vectors are stored
+per user in sealed blocks of ``VECTOR_BLOCK`` rows, encrypted under a key
+derived from the blind-index key (so, like the search index, the vectors
+survive master-key rotation and are rebuilt after re-encryption).
+
+Once a vault is unlocked for recall, :meth:`VectorIndex.load` decrypts the
+blocks into an anonymous memory map, so plaintext vectors never touch the
+disk, and queries are one matrix-vector product over it. Callers can opt
+into an inverted-file (IVF) mode: spherical k-means clusters the rows and a
+query only scores the members of its ``nprobe`` nearest clusters, plus any
+rows captured since the clustering was built. IVF trades recall for speed,
+so ``auto`` keeps to the exact scan.
+
+NumPy is required for the vector index; without it captures skip the
+embedding stage and recall raises :class:`RuntimeError`.
+"""
+
+from __future__ import annotations
+
+import base64
+import hashlib
+import json
+import math
+import mmap
+from collections import Counter
+from typing import TYPE_CHECKING, Any, Iterable, Mapping
+
+try:
+    import numpy
+except ImportError:  # pragma: no cover - optional dependency
+    numpy = None
+
+from .blind_index import sealing_key
+from .crypto import ciphertext_from_text, ciphertext_to_text, decrypt_payload, encrypt_payload
+from .search import tokenize
+
+if TYPE_CHECKING:  # pragma: no cover
+    from .storage import StorageBackend
+
+VECTOR_DIM = 256
+VECTOR_BLOCK = 1024
+VECTORS_META_BLOB = "vectors_meta"
+RECALL_MODES = ("auto", "exact", "ivf")
+IVF_ITERATIONS = 8
+# Rebuild the clustering once this share of rows was added after it.
+IVF_STALE_RATIO = 0.1
+_KMEANS_CHUNK = 16_384
+# Function words carry no topic, and shared ones would dominate short texts.
+_STOPWORDS = frozenset(
+    "a an and are as at be but by for from has have how i in is it its me my of on or so "
+    "that the their this to was we were what when where which who why will with you your".split()
+)
+
+
+def numpy_available() -> bool:
+    return numpy is not None
+
+
+def _require_numpy() -> None:
+    if numpy is None:
+        raise RuntimeError(
+            "numpy package is required for PathLog semantic recall.\n"
+            "Install with `pip install numpy`."
+        )
+
+
+def _event_text(payload: Mapping[str, Any]) -> str:
+    metadata = payload.get("metadata") or {}
+    fields = [payload.get("tool_name"), payload.get("prompt"), payload.get("response")]
+    fields.extend(value for value in metadata.values() if isinstance(value, str))
+    return " ".join(value for value in fields if isinstance(value, str))
+
+
+def _block_blob(block: int) -> str:
+    return f"vectors_{block:05d}"
+
+
+class HashingEmbedder:
+    """Embed text by hashing word unigrams and bigrams into ``dim`` signed buckets.
+
+    Stop words are dropped first, so bigrams join the surrounding content words.
+    """
+
+    def __init__(self, dim: int = VECTOR_DIM) -> None:
+        if dim < 8:
+            raise ValueError("Vector dimension must be at least 8.")
+        self.dim = dim
+
+    def features(self, text: str) -> Counter[str]:
+        tokens = [token for token in tokenize(text) if token not in _STOPWORDS]
+        features = Counter(tokens)
+        features.update(f"{left} {right}" for left, right in zip(tokens, tokens[1:]))
+        return features
+
+    def embed_text(self, text: str) -> "numpy.ndarray":
+        """Return a unit-length ``float32`` vector (all zeros for text without words)."""
+        _require_numpy()
+        vector = numpy.zeros(self.dim, dtype=numpy.float32)
+        for feature, count in self.features(text).items():
+            digest = hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest()
+            value = int.from_bytes(digest, "big")
+            sign = 1.0 if value >> 63 else -1.0
+            vector[value % self.dim] += sign * (1.0 + math.log(count))
+        norm = numpy.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def embed(self, payload: Mapping[str, Any]) -> "numpy.ndarray":
+        """Embed the searchable fields of a decrypted event."""
+        return self.embed_text(_event_text(payload))
+
+
+class LoadedVectors:
+    """Decrypted vectors of one user held in an anonymous memory map."""
+
+    def __init__(self, dim: int, capacity: int = VECTOR_BLOCK) -> None:
+        self.dim = dim
+        self.rows = 0
+        self.event_ids: list[str] = []
+        self.deleted: set[int] = set()
+        self._allocate(max(capacity, 1))
+        self._centroids: "numpy.ndarray | None" = None
+        self._lists: list["numpy.ndarray"] = []
+        self._clustered_rows = 0
+
+    def _allocate(self, capacity: int) -> None:
+        buffer = mmap.mmap(-1, capacity * self.dim * 4)
+        matrix = numpy.frombuffer(buffer, dtype=numpy.float32).reshape(capacity, self.dim)
+        if self.rows:
+            matrix[: self.rows] = self._matrix[: self.rows]
+        # The previous map is released once no view of it is left.
+        self._buffer, self._matrix = buffer, matrix
+
+    @property
+    def matrix(self) -> "numpy.ndarray":
+        return self._matrix[: self.rows]
+
+    def append(self, event_ids: list[str], vectors: "numpy.ndarray") -> None:
+        needed = self.rows + len(event_ids)
+        if needed > len(self._matrix):
+            self._allocate(max(needed, 2 * len(self._matrix)))
+        self._matrix[self.rows : needed] = vectors
+        self.event_ids.extend(event_ids)
+        self.rows = needed
+
+    def search(
+        self, query: "numpy.ndarray", limit: int, *, mode: str = "auto", nprobe: int | None = None
+    ) -> list[tuple[str, float]]:
+        """Return up to ``limit`` ``(event_id, cosine)`` pairs with a positive score.
+
+        ``auto`` means ``exact``. On ``python -m pathlog.bench recall`` the
+        default IVF probe (``nlist // 16`` clusters) scores only 0.60-0.70
+        recall@10 at 20k-100k rows. Reaching 0.9 takes about
+        ``nlist // 5`` probes, which is no faster than the exact scan, so IVF
+        is only used when asked for.
+        """
+        if mode not in RECALL_MODES:
+            raise ValueError(f"Unknown recall mode: {mode}")
+        if not self.rows or not query.any():
+            return []
+        if mode == "ivf":
+            rows = self._ivf_candidates(query, nprobe)
+            scores = self.matrix[rows] @ query
+        else:
+            rows = None
+            scores = self.matrix @ query
+        if self.deleted:
+            removed = numpy.fromiter(self.deleted, dtype=numpy.int64, count=len(self.deleted))
+            mask = numpy.isin(rows, removed) if rows is not None else removed
+            scores[mask] = -1.0
+        if len(scores) > limit:
+            best = numpy.argpartition(-scores, limit - 1)[:limit]
+        else:
+            best = numpy.arange(len(scores))
+        best = best[numpy.argsort(-scores[best], kind="stable")]
+        return [
+            (self.event_ids[int(rows[i]) if rows is not None else int(i)], float(scores[i]))
+            for i in best
+            if scores[i] > 0
+        ]
+
+    # ------------------------------------------------------------------
+    def _ivf_candidates(self, query: "numpy.ndarray", nprobe: int | None) -> "numpy.ndarray":
+        stale = self.rows - self._clustered_rows
+        if self._centroids is None or stale > IVF_STALE_RATIO * self._clustered_rows:
+            self._cluster()
+        nlist = len(self._centroids)
+        nprobe = min(nprobe or max(1, nlist // 16), nlist)
+        nearest = numpy.argpartition(-(self._centroids @ query), nprobe - 1)[:nprobe]
+        tail = numpy.arange(self._clustered_rows, self.rows)
+        return numpy.concatenate([*(self._lists[i] for i in nearest), tail])
+
+    def _cluster(self) -> None:
+        """Spherical k-means over the current rows, with ``sqrt(rows)`` clusters."""
+        matrix = self.matrix
+        nlist = min(max(int(math.sqrt(self.rows)), 1), 1024)
+        rng = numpy.random.default_rng(0)
+        centroids = matrix[rng.choice(self.rows, size=nlist, replace=False)].copy()
+        assignments = numpy.zeros(self.rows, dtype=numpy.int64)
+        for _ in range(IVF_ITERATIONS):
+            for start in range(0, self.rows, _KMEANS_CHUNK):
+                chunk = matrix[start : start + _KMEANS_CHUNK]
+                assignments[start : start + len(chunk)] = numpy.argmax(chunk @ centroids.T, axis=1)
+            order = numpy.argsort(assignments, kind="stable")
+            counts = numpy.bincount(assignments, minlength=nlist)
+            starts = numpy.cumsum(counts) - counts
+            sums = numpy.zeros_like(centroids)
+            sums[counts > 0] = numpy.add.reduceat(matrix[order], starts[counts > 0])
+            norms = numpy.linalg.norm(sums, axis=1, keepdims=True)
+            # Clusters that lost every member keep their previous centroid.
+            centroids = numpy.where(norms > 0, sums / numpy.maximum(norms, 1e-12), centroids)
+        order = numpy.argsort(assignments, kind="stable")
+        bounds = numpy.cumsum(numpy.bincount(assignments, minlength=nlist))
+        self._lists = numpy.split(order, bounds[:-1])
+        self._centroids = centroids.astype(numpy.float32)
+        self._clustered_rows = self.rows
+
+
+class VectorIndex:
+    """Sealed per-user vector blocks under one index-key generation.
+
+    Like :class:`pathlog.search.SearchIndex`, instances are short-lived and
+    callers serialise access with their own lock.
+    """
+
+    def __init__(
+        self,
+        storage: "StorageBackend",
+        user_id: str,
+        generation: int,
+        index_key: bytes,
+        *,
+        algorithm: str,
+        dim: int,
+    ) -> None:
+        self.storage = storage
+        self.user_id = user_id
+        self.generation = generation
+        self.algorithm = algorithm
+        self.meta: dict[str, Any] = {"dim": dim, "rows": 0, "deleted": []}
+        self.meta_raw: bytes | None = None
+        self._seal_key = sealing_key(index_key, "vectors")
+        self._key_id = f"vectors-{generation}"
+
+    @classmethod
+    def open(
+        cls,
+        storage: "StorageBackend",
+        user_id: str,
+        index_keys: Mapping[int, bytes],
+        *,
+        algorithm: str,
+        dim: int,
+    ) -> "VectorIndex | None":
+        """Load the stored index; ``None`` if missing, its key is gone or ``dim`` changed."""
+        raw = storage.read_blob(user_id, VECTORS_META_BLOB)
+        if raw is None:
+            return None
+        record = json.loads(raw)
+        index_key = index_keys.get(record["generation"])
+        if index_key is None or record.get("dim") != dim:
+            return None
+        index = cls(storage, user_id, record["generation"], index_key, algorithm=algorithm, dim=dim)
+        index.meta = index._unseal(ciphertext_from_text(record["ciphertext"]))
+        index.meta_raw = raw
+        return index
+
+    def load(self) -> LoadedVectors:
+        """Decrypt every block into an anonymous memory map."""
+        _require_numpy()
+        loaded = LoadedVectors(self.meta["dim"], self.meta["rows"])
+        for block in range(math.ceil(self.meta["rows"] / VECTOR_BLOCK)):
+            event_ids, vectors = self._read_block(block)
+            loaded.append(event_ids, vectors)
+        loaded.deleted = set(self.meta["deleted"])
+        return loaded
+
+    def add(
+        self, items: Iterable[tuple[str, "numpy.ndarray"]], loaded: LoadedVectors | None = None
+    ) -> None:
+        """Append ``(event_id, vector)`` rows, rewriting only the blocks they land in."""
+        items = list(items)
+        if not items:
+            return
+        rows = self.meta["rows"]
+        block = rows // VECTOR_BLOCK
+        if rows % VECTOR_BLOCK:
+            event_ids, vectors = self._read_block(block)
+        else:
+            event_ids, vectors = [], numpy.zeros((0, self.meta["dim"]), dtype=numpy.float32)
+        new_ids = [event_id for event_id, _ in items]
+        new_vectors = numpy.stack([vector for _, vector in items]).astype(numpy.float32)
+        event_ids = event_ids + new_ids
+        vectors = numpy.concatenate([vectors, new_vectors])
+        for start in range(0, len(event_ids), VECTOR_BLOCK):
+            stop = start + VECTOR_BLOCK
+            self._write_block(block, event_ids[start:stop], vectors[start:stop])
+            block += 1
+        self.meta["rows"] = rows + len(items)
+        self._save_meta()
+        if loaded is not None:
+            loaded.append(new_ids, new_vectors)
+
+    def remove(self, event_id: str, loaded: LoadedVectors) -> bool:
+        """Exclude a deleted event from recall; its row is dropped at the next rebuild."""
+        try:
+            row = loaded.event_ids.index(event_id)
+        except ValueError:
+            return False
+        if row in loaded.deleted:
+            return False
+        loaded.deleted.add(row)
+        self.meta["deleted"].append(row)
+        self._save_meta()
+        return True
+
+    def rebuild(self, items: Iterable[tuple[str, "numpy.ndarray"]]) -> None:
+        """Replace the stored vectors with ``items``."""
+        self.meta = {"dim": self.meta["dim"], "rows": 0, "deleted": []}
+        batch: list[tuple[str, numpy.ndarray]] = []
+        for item in items:
+            batch.append(item)
+            if len(batch) == VECTOR_BLOCK:
+                self.add(batch)
+                batch = []
+        if batch:
+            self.add(batch)
+        if not self.meta["rows"]:
+            self._save_meta()
+
+    # ------------------------------------------------------------------
+    def _read_block(self, block: int) -> tuple[list[str], "numpy.ndarray"]:
+        raw = self.storage.read_blob(self.user_id, _block_blob(block))
+        record = self._unseal(raw)
+        vectors = numpy.frombuffer(base64.b64decode(record["vectors"]), dtype=numpy.float32)
+        return record["event_ids"], vectors.reshape(-1, self.meta["dim"])
+
+    def _write_block(self, block: int, event_ids: list[str], vectors: "numpy.ndarray") -> None:
+        record = {
+            "event_ids": event_ids,
+            "vectors": base64.b64encode(vectors.astype("<f4").tobytes()).decode("ascii"),
+        }
+        token = self._seal(record)
+        raw = token if isinstance(token, bytes) else token.encode("ascii")
+        self.storage.write_blob(self.user_id, _block_blob(block), raw)
+
+    def _seal(self, data: Any) -> str | bytes:
+        return encrypt_payload(
+            self._seal_key, {"data": data}, key_id=self._key_id, algorithm=self.algorithm
+        )
+
+    def _unseal(self, token: str | bytes) -> Any:
+        return decrypt_payload(self._seal_key, token)["data"]
+
+    def _save_meta(self) -> None:
+        # Generation and dimension stay readable so a stale index is spotted unsealed.
+        record = {
+            "generation": self.generation,
+            "dim": self.meta["dim"],
+            "ciphertext": ciphertext_to_text(self._seal(self.meta)),
+        }
+        self.meta_raw = json.dumps(record).encode("utf-8")
+        self.storage.write_blob(self.user_id, VECTORS_META_BLOB, self.meta_raw)
+
+
+__all__ = [
+    "RECALL_MODES",
+    "VECTOR_DIM",
+    "HashingEmbedder",
+    "LoadedVectors",
+    "VectorIndex",
+    "numpy_available",
+]
@@ -1,11 +1,15 @@
 """Unit tests for OrchestratorAgent."""
 
+import asyncio
 from unittest.mock import AsyncMock, MagicMock, Mock, patch
 
 import pytest
 from autogen_agentchat.agents import AssistantAgent
+from autogen_agentchat.base import TaskResult
+from autogen_agentchat.messages import ModelClientStreamingChunkEvent, TextMessage
 
-from agents.orchestrator_agent import DEFAULT_SYSTEM_MESSAGE, OrchestratorAgent
+from agents.orchestrator_agent import DEFAULT_SYSTEM_MESSAGE, OrchestratorAgent, TaskAborted
+from outputs.deliverable_writer import DeliverableWriter
 
 
 class TestOrchestratorAgentInit:
@@ -286,3 +290,335 @@ class TestOrchestratorSystemMessage:
                 concept in DEFAULT_SYSTEM_MESSAGE
                 or concept.lower() in DEFAULT_SYSTEM_MESSAGE.lower()
             )
+
+
+def _timed_agent(name, delay, tracker):
+    agent = Mock(spec=AssistantAgent)
+    agent.name = name
+
+    async def run(task, **kwargs):
+        tracker["active"] += 1
+        tracker["peak"] = max(tracker["peak"], tracker["active"])
+        await asyncio.sleep(delay)
+        tracker["active"] -= 1
+        tracker["finished"].append(name)
+        return TaskResult(messages=[TextMessage(content=f"{name} done", source=name)])
+
+    agent.run = AsyncMock(side_effect=run)
+    return agent
+
+
+def _orchestrator(*agents, **kwargs):
+    orchestrator = OrchestratorAgent(
+        model_client=Mock(), notion_logger=Mock(is_configured=False), **kwargs
+    )
+    orchestrator.register_agents(*agents)
+    return orchestrator
+
+
+class TestConcurrentDelegation:
+    """Test agents run concurrently while summaries stay in assignment order."""
+
+    def test_agents_overlap_up_to_the_limit(self):
+        """Test at most max_concurrency agents run at once and lines keep task order."""
+        tracker = {"active": 0, "peak": 0, "finished": []}
+        delays = {"a": 0.08, "b": 0.06, "c": 0.04, "d": 0.02}
+        orchestrator = _orchestrator(
+            *(_timed_agent(name, delay, tracker) for name, delay in delays.items()),
+            slack_notifier=Mock(is_configured=False),
+        )
+
+        summary = asyncio.run(
+            orchestrator.delegate_tasks_async(
+                {name: f"task {name}" for name in delays}, max_concurrency=2
+            )
+        )
+
+        assert tracker["peak"] == 2
+        assert tracker["finished"] != list(delays)
+        assert [line for line in summary.splitlines() if line.startswith("[reply]")] == [
+            f"[reply] {name}: {name} done" for name in delays
+        ]
+        assert list(orchestrator.last_task_results) == list(delays)
+
+    def test_sync_wrapper_keeps_review_errors_and_deliverables(self):
+        """Test review gating, error bookkeeping, deliverables and Slack order are kept."""
+        tracker = {"active": 0, "peak": 0, "finished": []}
+        slow = _timed_agent("slow", 0.05, tracker)
+        gated = _timed_agent("gated", 0, tracker)
+        broken = Mock(spec=AssistantAgent)
+        broken.name = "broken"
+        broken.run = AsyncMock(side_effect=RuntimeError("model unavailable"))
+        slack = Mock(is_configured=True)
+        writer = Mock()
+        writer.write.side_effect = lambda alias, text: f"outputs/{alias}.md"
+        orchestrator = _orchestrator(slow, gated, broken, slack_notifier=slack)
+
+        summary = orchestrator.delegate_tasks(
+            {"slow": "write", "gated": "ship", "broken": "fail", "missing": "?"},
+            review_aliases=["gated"],
+            deliverable_writer=writer,
+        )
+
+        gated.run.assert_not_called()
+        assert "[review] gated: awaiting human approval before execution." in summary
+        assert str(orchestrator.last_task_errors["broken"]) == "model unavailable"
+        assert list(orchestrator.last_task_results) == ["slow"]
+        writer.write.assert_called_once_with("slow", "slow done")
+        slack.send.assert_called_once_with(
+            "Sprint updates:\n"
+            "[file] slow: saved to outputs/slow.md\n"
+            "gated pending review: ship\n"
+            "[error] broken: model unavailable\n"
+            "[warning] No registered agent named 'missing' for task: ?"
+        )
+
+    def test_sync_wrapper_refuses_a_running_loop(self):
+        """Test delegate_tasks points to the async API inside an event loop."""
+        orchestrator = _orchestrator()
+
+        async def call_sync():
+            orchestrator.delegate_tasks({})
+
+        with pytest.raises(RuntimeError, match="delegate_tasks_async"):
+            asyncio.run(call_sync())
+
+
+class TestSprintWaves:
+    """Test run_sprint schedules tasks in dependency waves."""
+
+    def test_waves_inject_upstream_outputs_and_report_critical_path(self):
+        """Test ready tasks share a wave, replies reach dependents and the longest chain is named."""
+        tracker = {"active": 0, "peak": 0, "finished": []}
+        delays = {"scrum": 0, "pm": 0.02, "arch": 0.06, "dev": 0.01, "ops": 0}
+        orchestrator = _orchestrator(
+            *(_timed_agent(name, delay, tracker) for name, delay in delays.items()),
+            slack_notifier=Mock(is_configured=False),
+        )
+        agents = {agent.name: agent for agent in orchestrator.agents}
+
+        summary = orchestrator.run_sprint(
+            {name: f"task {name}" for name in delays} | {"ops": "Deploy {{dev}}"},
+            dependencies={"dev": ["pm", "arch"], "ops": ["dev"]},
+            initiator_alias="scrum",
+            kickoff_task="kick off",
+        )
+
+        assert tracker["finished"] == ["scrum", "pm", "arch", "dev", "ops"]
+        assert tracker["peak"] == 2
+        assert agents["scrum"].run.call_args.kwargs["task"] == "kick off"
+        assert agents["dev"].run.call_args.kwargs["task"] == (
+            "task dev\n\nUpstream outputs:\n[pm]\npm done\n\n[arch]\narch done"
+        )
+        assert agents["ops"].run.call_args.kwargs["task"].startswith("Deploy dev done")
+        assert "[assign] ops - AssistantAgent: Deploy {{dev}}" in summary
+        assert summary.index("[sprint kickoff]") < summary.index("[sprint wave 2]")
+        assert orchestrator.last_critical_path == ["scrum", "arch", "dev", "ops"]
+        assert "[critical path] scrum -> arch -> dev -> ops" in summary
+        assert list(orchestrator.last_task_results) == list(delays)
+
+    def test_failed_or_held_tasks_skip_their_dependents(self):
+        """Test dependents of an error or a review hold are skipped, transitively."""
+        tracker = {"active": 0, "peak": 0, "finished": []}
+        broken = Mock(spec=AssistantAgent)
+        broken.name = "broken"
+        broken.run = AsyncMock(side_effect=RuntimeError("model unavailable"))
+        agents = [_timed_agent(name, 0, tracker) for name in ("gated", "after", "last", "free")]
+        orchestrator = _orchestrator(broken, *agents, slack_notifier=Mock(is_configured=False))
+
+        summary = orchestrator.run_sprint(
+            {name: "work" for name in ("broken", "gated", "after", "last", "free")},
+            dependencies={"after": ["broken", "gated"], "last": ["after"]},
+            review_aliases=["gated"],
+        )
+
+        assert tracker["finished"] == ["free"]
+        assert "[skipped] after: upstream broken, gated did not finish" in summary
+        assert "[skipped] last: upstream after did not finish" in summary
+        assert list(orchestrator.last_task_errors) == ["broken"]
+        assert orchestrator.last_critical_path == ["free"]
+
+    def test_summary_reports_response_cache_hits(self):
+        """Test the sprint summary counts cache hits and misses made during the sprint."""
+        tracker = {"active": 0, "peak": 0, "finished": []}
+        cache = Mock()
+        cache.stats.side_effect = [{"hits": 4, "misses": 1}, {"hits": 7, "misses": 3}]
+        orchestrator = _orchestrator(
+            _timed_agent("a", 0, tracker),
+            slack_notifier=Mock(is_configured=False),
+            response_cache=cache,
+        )
+
+        summary = orchestrator.run_sprint({"a": "x"})
+
+        assert summary.endswith("[cache] 3 hits, 2 misses")
+
+    def test_invalid_dependencies_are_rejected(self):
+        """Test unknown aliases and cycles raise ValueError before any agent runs."""
+        orchestrator = _orchestrator()
+        tasks = {"a": "x", "b": "y"}
+
+        with pytest.raises(ValueError, match="cycle"):
+            orchestrator.run_sprint(tasks, dependencies={"a": ["b"], "b": ["a"]})
+        with pytest.raises(ValueError, match="'a' depends on 'c'"):
+            orchestrator.run_sprint(tasks, dependencies={"a": ["c"]})
+
+
+class TestAsyncApi:
+    """Test the async entry points and their synchronous adapters."""
+
+    def test_sprint_runs_on_the_callers_loop(self):
+        """Test run_sprint_async awaits every agent on the loop of the async host."""
+        loops = []
+
+        def agent(name):
+            worker = Mock(spec=AssistantAgent)
+            worker.name = name
+
+            async def run(task, **kwargs):
+                loops.append(asyncio.get_running_loop())
+                return TaskResult(messages=[TextMessage(content="ok", source=name)])
+
+            worker.run = AsyncMock(side_effect=run)
+            return worker
+
+        orchestrator = _orchestrator(agent("a"), agent("b"), agent("c"))
+
+        async def host():
+            summary = await orchestrator.run_sprint_async(
+                {"a": "x", "b": "y", "c": "z"}, dependencies={"c": ["a", "b"]}
+            )
+            return summary, asyncio.get_running_loop()
+
+        summary, host_loop = asyncio.run(host())
+
+        assert loops == [host_loop] * 3
+        assert "[reply] c: ok" in summary
+
+    def test_sync_adapters_point_to_their_async_methods(self):
+        """Test run and run_sprint refuse a running loop and name the method to await."""
+        orchestrator = _orchestrator()
+
+        async def call(adapter):
+            adapter()
+
+        with pytest.raises(RuntimeError, match="await orchestrator.plan"):
+            asyncio.run(call(lambda: orchestrator.run("plan the sprint")))
+        with pytest.raises(RuntimeError, match="await orchestrator.run_sprint_async"):
+            asyncio.run(call(lambda: orchestrator.run_sprint({})))
+
+
+def _streaming_agent(name, chunks, *, observe=None, hang=False):
+    agent = Mock(spec=AssistantAgent)
+    agent.name = name
+
+    async def run_stream(task, cancellation_token=None, **kwargs):
+        for chunk in chunks:
+            yield ModelClientStreamingChunkEvent(content=chunk, source=name)
+            await asyncio.sleep(0)
+        if observe:
+            observe()
+        if hang:
+            waiter = asyncio.get_running_loop().create_future()
+            cancellation_token.link_future(waiter)
+            await waiter
+        message = TextMessage(content="".join(chunks), source=name)
+        yield message
+        yield TaskResult(messages=[message])
+
+    agent.run_stream = run_stream
+    return agent
+
+
+class TestStreamingOutput:
+    """Test streamed agent output reaches deliverables, the console and Notion early."""
+
+    def test_stream_appends_deliverable_and_buffers_notion(self, tmp_path):
+        """Test chunks land in the file before the reply ends and Notion gets periodic updates."""
+        writer = DeliverableWriter(tmp_path)
+        seen_mid_run = []
+        agent = _streaming_agent(
+            "writer",
+            ["# Report\n", "Line one\n", "Line two"],
+            observe=lambda: seen_mid_run.extend(
+                path.read_text() for path in tmp_path.glob("writer/*.md")
+            ),
+        )
+        notion = Mock(is_configured=True)
+        notion.create_task_entry.return_value = "page-1"
+        progress = []
+        orchestrator = OrchestratorAgent(
+            model_client=Mock(),
+            notion_logger=notion,
+            slack_notifier=Mock(is_configured=False),
+            stream=True,
+            stream_flush_seconds=0,
+            stream_progress=progress.append,
+        )
+        orchestrator.register_agent(agent)
+
+        summary = orchestrator.delegate_tasks({"writer": "report"}, deliverable_writer=writer)
+
+        (path,) = tmp_path.glob("writer/*.md")
+        assert seen_mid_run and seen_mid_run[0].endswith("# Report\nLine one\nLine two")
+        assert path.read_text().endswith("# Report\nLine one\nLine two\n\n")
+        assert f"[file] writer: saved to {path}" in summary
+        statuses = [call.kwargs["status"] for call in notion.update_task_entry.call_args_list]
+        assert statuses[-1] == "Completed" and set(statuses[:-1]) == {"Assigned"}
+        assert progress[0].startswith("[stream] writer: first output after")
+
+    def test_notion_updates_carry_the_output_so_far(self):
+        """Test each Assigned update repeats earlier chunks and stays within Notion's limit."""
+        agent = _streaming_agent("writer", ["# Report\n", "Line one\n", "x" * 3000])
+        notion = Mock(is_configured=True)
+        notion.create_task_entry.return_value = "page-1"
+        orchestrator = _orchestrator(
+            agent,
+            slack_notifier=Mock(is_configured=False),
+            stream=True,
+            stream_flush_seconds=0,
+        )
+        orchestrator.notion_logger = notion
+        orchestrator.stream_progress = None
+
+        orchestrator.delegate_tasks({"writer": "report"})
+
+        summaries = [
+            call.kwargs["summary"]
+            for call in notion.update_task_entry.call_args_list
+            if call.kwargs["status"] == "Assigned"
+        ]
+        assert summaries[0] == "# Report\n"
+        assert summaries[1] == "# Report\nLine one\n"
+        assert summaries[2].startswith("# Report\nLine one\nxxx")
+        assert len(summaries[2]) == 2000
+
+    def test_operator_abort_keeps_partial_output_and_skips_dependents(self, tmp_path):
+        """Test abort_task stops a runaway agent, records TaskAborted and blocks its dependents."""
+        writer = DeliverableWriter(tmp_path)
+        slow = _streaming_agent("slow", ["partial draft\n"], hang=True)
+        after = _streaming_agent("after", ["never"])
+        orchestrator = _orchestrator(
+            slow, after, slack_notifier=Mock(is_configured=False), stream=True
+        )
+        orchestrator.stream_progress = None
+
+        async def sprint():
+            running = asyncio.ensure_future(
+                orchestrator.run_sprint_async(
+                    {"slow": "write", "after": "edit"},
+                    dependencies={"after": ["slow"]},
+                    deliverable_writer=writer,
+                )
+            )
+            while not orchestrator.abort_task("slow"):
+                await asyncio.sleep(0.01)
+            return await running
+
+        summary = asyncio.run(sprint())
+
+        (path,) = tmp_path.glob("slow/*.md")
+        assert isinstance(orchestrator.last_task_errors["slow"], TaskAborted)
+        assert f"[file] slow: partial output saved to {path}" in summary
+        assert "[skipped] after: upstream slow did not finish" in summary
+        assert path.read_text().endswith("partial draft\n")
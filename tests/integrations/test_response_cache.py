@@ -0,0 +1,101 @@
+"""Unit tests for the disk-backed model response cache."""
+
+import asyncio
+import sqlite3
+import time
+
+from autogen_core.models import SystemMessage, UserMessage
+from autogen_ext.models.replay import ReplayChatCompletionClient
+
+from integrations.response_cache import ResponseCache
+
+
+def _messages(task):
+    return [SystemMessage(content="You are the CEO."), UserMessage(content=task, source="user")]
+
+
+def _ask(client, task, *, stream=False):
+    async def call():
+        if stream:
+            return [item async for item in client.create_stream(_messages(task))][-1]
+        return await client.create(_messages(task))
+
+    return asyncio.run(call()).content
+
+
+class TestResponseCache:
+    """Test cached responses, key scoping, expiry and eviction."""
+
+    def test_repeated_calls_are_served_from_disk(self, tmp_path):
+        """Test a repeated task hits the cache, also after reopening it, while new tasks miss."""
+        path = tmp_path / "responses.sqlite3"
+        cache = ResponseCache.for_model(path, model="gpt-4o", max_tokens=600)
+        client = cache.wrap(ReplayChatCompletionClient(["first", "second", "third"]))
+
+        replies = [_ask(client, "plan"), _ask(client, "plan"), _ask(client, "budget")]
+        streamed = [_ask(client, "launch", stream=True), _ask(client, "launch", stream=True)]
+        cache.close()
+        reopened = ResponseCache.for_model(path, model="gpt-4o", max_tokens=600)
+        again = _ask(reopened.wrap(ReplayChatCompletionClient(["fresh"])), "plan")
+
+        assert replies == ["first", "first", "second"]
+        assert streamed == ["third", "third"]
+        assert again == "first"
+        assert (cache.hits, cache.misses) == (2, 3)
+        assert reopened.stats()["hits"] == 1 and reopened.stats()["entries"] == 3
+
+    def test_model_and_max_tokens_scope_the_keys(self, tmp_path):
+        """Test the same task is not shared between models or token limits."""
+        path = tmp_path / "responses.sqlite3"
+        base = ResponseCache.for_model(path, model="gpt-4o", max_tokens=600)
+        _ask(base.wrap(ReplayChatCompletionClient(["gpt-4o"])), "plan")
+
+        for model, max_tokens in (("gpt-4o-mini", 600), ("gpt-4o", 1200)):
+            other = ResponseCache.for_model(path, model=model, max_tokens=max_tokens)
+            assert _ask(other.wrap(ReplayChatCompletionClient(["other"])), "plan") == "other"
+
+    def test_least_recently_used_entries_are_evicted_first(self, tmp_path):
+        """Test filling the cache past max_bytes drops the entry read longest ago."""
+        cache = ResponseCache(tmp_path / "responses.sqlite3", ttl_seconds=None, max_bytes=150)
+        for key in ("a", "b"):
+            cache.set(key, {"content": key * 50})
+            time.sleep(0.01)
+        cache.get("a")
+        time.sleep(0.01)
+        cache.set("c", {"content": "c" * 50})
+
+        assert [key for key in "abc" if cache.get(key)] == ["a", "c"]
+        assert cache.stats()["bytes"] <= 150
+
+    def test_hits_defer_access_time_writes(self, tmp_path):
+        """Test hits only touch memory until stats or close write the access times in one batch."""
+        path = tmp_path / "responses.sqlite3"
+        cache = ResponseCache(path, ttl_seconds=None)
+        for key in ("a", "b"):
+            cache.set(key, {"content": key})
+        reader = sqlite3.connect(path)
+        stored = dict(reader.execute("SELECT key, accessed_at FROM responses"))
+        time.sleep(0.01)
+
+        cache.get("a")
+        cache.get("b")
+        after_hits = dict(reader.execute("SELECT key, accessed_at FROM responses"))
+        cache.set("a", {"content": "again"})
+        stats = cache.stats()
+        cache.close()
+        written = dict(reader.execute("SELECT key, accessed_at FROM responses"))
+        reader.close()
+
+        assert after_hits == stored
+        assert written["b"] > stored["b"]
+        assert stats["bytes"] == len('{"content": "again"}') + len('{"content": "b"}')
+
+    def test_entries_expire_after_the_ttl(self, tmp_path):
+        """Test an expired entry counts as a miss and is removed."""
+        cache = ResponseCache(tmp_path / "responses.sqlite3", ttl_seconds=0.05)
+        cache.set("a", {"content": "a"})
+
+        assert cache.get("a") == {"content": "a"}
+        time.sleep(0.1)
+        assert cache.get("a") is None
+        assert cache.stats() == {"hits": 1, "misses": 1, "entries": 0, "bytes": 0}
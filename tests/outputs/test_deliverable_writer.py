@@ -65,3 +65,19 @@ class TestDeliverableWriterIntegration:
         
         assert Writer is not None
         assert Writer == DeliverableWriter
+
+
+class TestDeliverableWriterStreaming:
+    """Test deliverables that grow while an agent streams."""
+
+    def test_start_then_append(self, tmp_path):
+        """Test start writes the header and append extends the same file."""
+        writer = DeliverableWriter(tmp_path)
+
+        path = writer.start("agent")
+        writer.append(path, "first ")
+        writer.append(path, "second")
+
+        assert path.parent == tmp_path / "agent"
+        assert path.read_text(encoding="utf-8").startswith("# agent deliverable")
+        assert path.read_text(encoding="utf-8").endswith("\n\nfirst second")
@@ -0,0 +1,95 @@
+"""Unit tests for streamed NDJSON bundles."""
+
+import io
+import json
+
+import pytest
+
+from pathlog import bundle
+from pathlog.bundle import encode_bundle, manifest_record, read_bundle
+
+
+def _records(events=3):
+    yield manifest_record("user", "2025-05-01T00:00:00+00:00", decrypted=False)
+    yield {"type": "profile", "profile": {"user_id": "user"}}
+    yield {"type": "key", "key_id": "key-1", "data": {"key_id": "key-1"}}
+    yield {"type": "state", "name": "data_keys", "value": {"generation": 1}}
+    for index in range(events):
+        yield {"type": "event", "event": {"event_id": f"evt-{index}", "ciphertext": "x"}}
+
+
+def _encoded(records):
+    return b"".join(encode_bundle(records))
+
+
+class TestBundle:
+    """Test encoding, chunking and validation of streamed bundles."""
+
+    def test_round_trip_in_chunks(self, monkeypatch):
+        """Test records survive encoding split over several chunks."""
+        monkeypatch.setattr(bundle, "BUNDLE_CHUNK_BYTES", 100)
+        chunks = list(encode_bundle(_records(20)))
+
+        records = list(read_bundle(io.BytesIO(b"".join(chunks))))
+
+        assert len(chunks) > 5
+        assert [record["type"] for record in records[:4]] == ["manifest", "profile", "key", "state"]
+        assert [record["event"]["event_id"] for record in records[4:]] == [
+            f"evt-{index}" for index in range(20)
+        ]
+
+    def test_truncated_or_tampered_bundles_are_rejected(self):
+        """Test a missing trailer or a modified line fails validation."""
+        data = _encoded(_records())
+        lines = data.splitlines(keepends=True)
+        tampered = data.replace(b"evt-1", b"evt-9")
+
+        with pytest.raises(ValueError, match="truncated"):
+            list(read_bundle(io.BytesIO(b"".join(lines[:-1]))))
+        with pytest.raises(ValueError, match="checksum"):
+            list(read_bundle(io.BytesIO(tampered)))
+        with pytest.raises(ValueError, match="after the end"):
+            list(read_bundle(io.BytesIO(data + lines[-2])))
+
+    def test_structure_is_validated(self):
+        """Test record order, known types, versions and event fields are enforced."""
+        records = list(_records(1))
+        out_of_order = [records[0], records[1], records[4], records[2]]
+        unknown = [records[0], records[1], {"type": "blob"}]
+        future = [{**records[0], "version": 99}, records[1]]
+        no_profile = [records[0], records[2]]
+        bad_event = [records[0], records[1], {"type": "event", "event": {"ciphertext": "x"}}]
+
+        for broken, message in (
+            (out_of_order, "out of order"),
+            (unknown, "unknown record type"),
+            (future, "Unsupported bundle version"),
+            (no_profile, "expected the profile"),
+            (bad_event, "event_id"),
+        ):
+            with pytest.raises(ValueError, match=message):
+                list(read_bundle(io.BytesIO(_encoded(broken))))
+        with pytest.raises(ValueError, match="invalid JSON"):
+            list(read_bundle(io.BytesIO(b"{not json\n")))
+        assert json.loads(_encoded([]).splitlines()[-1])["events"] == 0
+
+    def test_delta_manifests(self):
+        """Test a delta may omit the profile but must name its parent and watermarks."""
+        watermark = {"seq": 3, "profile_version": 1, "key_ids": ["key-1"], "epoch": 0}
+        backup = {
+            "backup_id": "b2",
+            "kind": "delta",
+            "parent": "b1",
+            "base": watermark,
+            "watermark": watermark,
+        }
+        delta = manifest_record("user", "2025-05-02T00:00:00+00:00", decrypted=False, backup=backup)
+        event = {"type": "event", "event": {"event_id": "evt-4", "ciphertext": "x"}}
+
+        records = list(read_bundle(io.BytesIO(_encoded([delta, event]))))
+
+        assert [record["type"] for record in records] == ["manifest", "event"]
+        with pytest.raises(ValueError, match="lacks \\['parent'\\]"):
+            list(read_bundle(io.BytesIO(_encoded([{**delta, "parent": None}, event]))))
+        with pytest.raises(ValueError, match="Unknown bundle kind"):
+            list(read_bundle(io.BytesIO(_encoded([{**delta, "kind": "partial"}, event]))))
@@ -0,0 +1,82 @@
+"""Unit tests for compress-then-encrypt payloads."""
+
+import json
+import os
+import struct
+
+import pytest
+from cryptography.exceptions import InvalidTag
+
+from pathlog import compression
+from pathlog.compression import CompressionPolicy, compress, decompress, train_dictionary
+from pathlog.crypto import decrypt_payload, encrypt_payload, generate_master_key
+
+
+def _transcript(words=400):
+    return {"prompt": "Summarise the sprint notes. " * (words // 4), "response": "Done. " * words}
+
+
+class TestCompression:
+    """Test codec selection, skipping and dictionaries."""
+
+    def test_small_payloads_skip_compression(self):
+        """Test data below the threshold is stored as-is with no flags."""
+        flags, body = compress(b"short", CompressionPolicy(min_bytes=64))
+
+        assert (flags, body) == (0, b"short")
+
+    def test_incompressible_payloads_are_kept(self):
+        """Test compression is dropped when it would not shrink the data."""
+        data = os.urandom(512)
+
+        assert compress(data, CompressionPolicy(min_bytes=0))[0] == 0
+
+    def test_compressed_envelope_round_trip(self):
+        """Test a long payload is compressed before encryption and restored on decrypt."""
+        key = generate_master_key()
+        payload = _transcript()
+
+        sealed = encrypt_payload(key, payload, compression=CompressionPolicy())
+        plain = encrypt_payload(key, payload, compression=None)
+
+        assert len(sealed) * 4 < len(plain)
+        assert decrypt_payload(key, sealed) == payload
+
+    def test_dictionary_round_trip(self):
+        """Test dictionary-compressed records need their dictionary to decrypt."""
+        key = generate_master_key()
+        samples = [json.dumps(_transcript(40)).encode() for _ in range(5)]
+        policy = CompressionPolicy(
+            min_bytes=0, dictionary_id=7, dictionary=train_dictionary(samples)
+        )
+        payload = _transcript(40)
+
+        sealed = encrypt_payload(key, payload, compression=policy)
+
+        assert decrypt_payload(key, sealed, {7: policy.dictionary}) == payload
+        with pytest.raises(ValueError):
+            decrypt_payload(key, sealed)
+
+    def test_dictionary_id_is_authenticated(self):
+        """Test a record cannot be pointed at another dictionary."""
+        key = generate_master_key()
+        dictionary = b"Summarise the sprint notes. " * 20
+        policy = CompressionPolicy(min_bytes=0, dictionary_id=1, dictionary=dictionary)
+        sealed = encrypt_payload(key, _transcript(40), compression=policy)
+        # magic (3) | version | algorithm | flags | key_id length (0) | dictionary id
+        tampered = sealed[:7] + struct.pack(">I", 2) + sealed[11:]
+
+        with pytest.raises(InvalidTag):
+            decrypt_payload(key, tampered, {1: dictionary, 2: dictionary})
+
+    def test_decompress_passes_through_uncompressed_bodies(self):
+        """Test records without codec flags are returned untouched."""
+        assert decompress(b"raw", 0) == b"raw"
+
+    def test_zstd_falls_back_to_zlib(self, monkeypatch):
+        """Test zstd is only used when the zstandard package is importable."""
+        monkeypatch.setattr(compression, "zstandard", None)
+
+        assert compression.resolve_codec("zstd") == "zlib"
+        with pytest.raises(ValueError):
+            compression.resolve_codec("lz4")
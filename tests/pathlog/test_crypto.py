@@ -0,0 +1,75 @@
+"""Unit tests for PathLog payload encryption."""
+
+import json
+
+import pytest
+from cryptography.exceptions import InvalidTag
+from cryptography.fernet import Fernet
+
+from pathlog.crypto import (
+    ciphertext_from_text,
+    ciphertext_to_text,
+    decrypt_payload,
+    encrypt_payload,
+    envelope_key_id,
+    generate_master_key,
+    is_envelope,
+)
+
+
+@pytest.fixture
+def key():
+    """Return a fresh master key."""
+    return generate_master_key()
+
+
+class TestEnvelope:
+    """Test the binary AEAD envelope and Fernet compatibility."""
+
+    @pytest.mark.parametrize("algorithm", ["aes-256-gcm", "chacha20-poly1305"])
+    def test_round_trip(self, key, algorithm):
+        """Test each AEAD backend seals and opens a payload."""
+        envelope = encrypt_payload(key, {"prompt": "hi"}, key_id="dk-1", algorithm=algorithm)
+
+        assert is_envelope(envelope)
+        assert envelope_key_id(envelope) == "dk-1"
+        assert decrypt_payload(key, envelope) == {"prompt": "hi"}
+
+    def test_header_is_authenticated(self, key):
+        """Test rewriting the key id in the header breaks decryption."""
+        envelope = encrypt_payload(key, {"prompt": "hi"}, key_id="dk-1")
+        tampered = envelope.replace(b"dk-1", b"dk-2", 1)
+
+        with pytest.raises(InvalidTag):
+            decrypt_payload(key, tampered)
+
+    def test_envelope_is_smaller_than_fernet(self, key):
+        """Test the raw envelope costs fewer bytes than a base64 Fernet token."""
+        payload = {"prompt": "x" * 500}
+
+        envelope = encrypt_payload(key, payload, key_id="dk-1")
+        token = encrypt_payload(key, payload, algorithm="fernet")
+
+        assert len(envelope) < len(token)
+
+    def test_legacy_fernet_tokens_stay_readable(self, key):
+        """Test tokens written before the envelope still decrypt."""
+        token = Fernet(key).encrypt(json.dumps({"prompt": "old"}).encode()).decode()
+
+        assert not is_envelope(token)
+        assert decrypt_payload(key, token) == {"prompt": "old"}
+        assert decrypt_payload(key, token.encode()) == {"prompt": "old"}
+
+    def test_text_form_round_trip(self, key):
+        """Test the JSON-safe text form maps back to the same envelope."""
+        envelope = encrypt_payload(key, {"prompt": "hi"})
+        text = ciphertext_to_text(envelope)
+
+        assert ciphertext_from_text(text) == envelope
+        assert decrypt_payload(key, text) == {"prompt": "hi"}
+        assert ciphertext_to_text("gAAAAtoken") == "gAAAAtoken"
+
+    def test_rejects_unknown_cipher(self, key):
+        """Test an unsupported algorithm name is reported."""
+        with pytest.raises(ValueError):
+            encrypt_payload(key, {}, algorithm="rot13")
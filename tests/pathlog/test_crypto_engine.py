@@ -0,0 +1,62 @@
+"""Unit tests for the batched crypto engine."""
+
+import pytest
+
+from pathlog.crypto import decrypt_payload, encrypt_payload, generate_master_key
+from pathlog.crypto_engine import CryptoEngine
+
+
+@pytest.fixture
+def keys():
+    """Return two independent master keys."""
+    return generate_master_key(), generate_master_key()
+
+
+class TestCryptoEngine:
+    """Test chunked fan-out and ordered reassembly."""
+
+    @pytest.mark.parametrize("executor", ["thread", "process"])
+    def test_round_trip_preserves_order(self, keys, executor):
+        """Test results come back in input order across many chunks."""
+        engine = CryptoEngine(workers=3, executor=executor, chunk_size=2)
+        payloads = [{"index": index} for index in range(25)]
+        try:
+            tokens = list(
+                engine.encrypt_many((keys[index % 2], "k", p) for index, p in enumerate(payloads))
+            )
+            decrypted = list(
+                engine.decrypt_many((keys[index % 2], t) for index, t in enumerate(tokens))
+            )
+        finally:
+            engine.close()
+
+        assert decrypted == payloads
+
+    def test_reencrypt_moves_tokens_to_new_key(self, keys):
+        """Test re-encryption yields tokens readable only with the new key."""
+        old_key, new_key = keys
+        engine = CryptoEngine(workers=2, executor="thread", chunk_size=1)
+        tokens = [encrypt_payload(old_key, {"index": index}) for index in range(5)]
+        try:
+            moved = list(
+                engine.reencrypt_many((old_key, new_key, "new", token) for token in tokens)
+            )
+        finally:
+            engine.close()
+
+        assert [decrypt_payload(new_key, token)["index"] for token in moved] == list(range(5))
+
+    def test_single_worker_runs_inline(self, keys):
+        """Test a one-worker engine never starts a pool."""
+        engine = CryptoEngine(workers=1, chunk_size=2)
+        tokens = [encrypt_payload(keys[0], {"index": index}) for index in range(7)]
+
+        decrypted = list(engine.decrypt_many((keys[0], token) for token in tokens))
+
+        assert [item["index"] for item in decrypted] == list(range(7))
+        assert engine._executor is None
+
+    def test_rejects_unknown_executor(self):
+        """Test configuration errors are reported early."""
+        with pytest.raises(ValueError):
+            CryptoEngine(executor="gpu")
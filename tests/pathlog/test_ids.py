@@ -0,0 +1,27 @@
+"""Unit tests for time-ordered event ids."""
+
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from pathlog.ids import event_id_time, new_event_id
+
+
+class TestEventIds:
+    """Test UUIDv7 generation and timestamp extraction."""
+
+    def test_ids_are_unique_and_increasing(self):
+        """Test a burst of ids within the same milliseconds stays strictly ordered."""
+        ids = [new_event_id() for _ in range(5000)]
+
+        assert ids == sorted(ids)
+        assert len(set(ids)) == len(ids)
+        assert {uuid.UUID(event_id).version for event_id in ids} == {7}
+
+    def test_embedded_time(self):
+        """Test the creation time is read back from v7 ids and not invented for others."""
+        before = datetime.now(timezone.utc) - timedelta(milliseconds=1)
+        created = event_id_time(new_event_id())
+
+        assert before <= created <= datetime.now(timezone.utc) + timedelta(seconds=1)
+        assert event_id_time(str(uuid.uuid4())) is None
+        assert event_id_time("evt-1") is None
@@ -0,0 +1,172 @@
+"""Unit tests for write-behind ingestion."""
+
+import threading
+
+import pytest
+
+from pathlog.config import PathLogConfig
+from pathlog.ingest import IngestCommitError, IngestQueueFull, WriteBehindIngestor
+from pathlog.service import PathLogService
+from pathlog.storage import FileStorage
+
+
+class _RecordingStorage:
+    """Storage stub that records append calls and can be made to block or fail."""
+
+    def __init__(self):
+        self.calls = []
+        self.release = threading.Event()
+        self.release.set()
+        self.error = None
+        self.failing_users = set()
+
+    def append_events(self, user_id, entries, *, fsync=False):
+        self.release.wait()
+        if self.error is not None:
+            raise self.error
+        if user_id in self.failing_users:
+            raise OSError(f"disk full for {user_id}")
+        self.calls.append((user_id, list(entries), fsync))
+
+
+@pytest.fixture
+def storage():
+    """Return a recording storage stub."""
+    return _RecordingStorage()
+
+
+class TestWriteBehindIngestor:
+    """Test queueing, group commit and backpressure."""
+
+    def test_group_commit_batches_per_user(self, storage):
+        """Test queued submissions land in one append per user."""
+        storage.release.clear()
+        ingestor = WriteBehindIngestor(storage, shards=1, flush_interval=0.5)
+        ingestor.submit("warmup", [{"event_id": "w"}])
+        for index in range(5):
+            ingestor.submit("alice", [{"event_id": str(index)}])
+        ingestor.submit("bob", [{"event_id": "b"}])
+        storage.release.set()
+
+        ingestor.flush()
+        ingestor.close()
+
+        by_user = {
+            user_id: [entry["event_id"] for entry in entries]
+            for user_id, entries, _ in storage.calls
+        }
+        assert by_user["alice"] == ["0", "1", "2", "3", "4"]
+        assert by_user["bob"] == ["b"]
+        assert len(storage.calls) == 3
+
+    def test_flush_fsyncs(self, storage):
+        """Test a flush barrier forces the commit to be fsynced."""
+        ingestor = WriteBehindIngestor(storage, fsync_interval=3600)
+        ingestor.submit("alice", [{"event_id": "1"}])
+
+        ingestor.flush("alice")
+        ingestor.close()
+
+        assert storage.calls[-1][2] is True
+
+    def test_full_queue_raises(self, storage):
+        """Test submissions beyond the queue bound fail fast instead of growing memory."""
+        storage.release.clear()
+        ingestor = WriteBehindIngestor(
+            storage, shards=1, flush_interval=0, max_queue=1, enqueue_timeout=0.01
+        )
+        ingestor.submit("alice", [{"event_id": "1"}])
+
+        with pytest.raises(IngestQueueFull):
+            for index in range(3):
+                ingestor.submit("alice", [{"event_id": str(index)}])
+        storage.release.set()
+        ingestor.close()
+
+    def test_commit_failure_surfaces_on_flush(self, storage):
+        """Test a failed group commit is reported to the next flush caller."""
+        storage.error = OSError("disk full")
+        ingestor = WriteBehindIngestor(storage)
+        ingestor.submit("alice", [{"event_id": "1"}])
+
+        with pytest.raises(RuntimeError):
+            ingestor.flush("alice")
+        storage.error = None
+        ingestor.close()
+
+    def test_commit_failure_is_reported_to_the_affected_submission(self, storage):
+        """Test a failure inside a group commit reaches only the failed user's futures and flush."""
+        storage.release.clear()
+        storage.failing_users.add("alice")
+        ingestor = WriteBehindIngestor(storage, shards=1, flush_interval=0.5)
+        ingestor.submit("warmup", [{"event_id": "w"}])
+        alice = [ingestor.submit("alice", [{"event_id": str(index)}]) for index in range(2)]
+        bob = ingestor.submit("bob", [{"event_id": "b"}])
+        storage.release.set()
+
+        ingestor.flush("bob")
+        assert bob.result(timeout=5) is None
+        for future in alice:
+            assert isinstance(future.exception(timeout=5), OSError)
+        with pytest.raises(IngestCommitError, match=r"alice \(2\)"):
+            ingestor.flush("alice")
+        ingestor.flush("alice")
+
+        storage.failing_users.clear()
+        ingestor.submit("alice", [{"event_id": "3"}]).result(timeout=5)
+        ingestor.close()
+        assert [user_id for user_id, _, _ in storage.calls] == ["warmup", "bob", "alice"]
+
+    def test_commits_to_file_storage(self, tmp_path):
+        """Test entries reach a real backend in submission order."""
+        backend = FileStorage(tmp_path)
+        ingestor = WriteBehindIngestor(backend)
+        for index in range(3):
+            ingestor.submit("alice", [{"event_id": str(index), "ciphertext": "x"}])
+
+        ingestor.close()
+
+        stored = [entry["event_id"] for entry in backend.iter_event_entries("alice")]
+        assert stored == ["0", "1", "2"]
+
+
+class TestWriteBehindService:
+    """Test PathLogService with write-behind ingestion enabled."""
+
+    @pytest.fixture(params=["file", "sqlite"])
+    def service(self, request, tmp_path):
+        """Yield a write-behind service for each backend and close it afterwards."""
+        service = PathLogService(
+            PathLogConfig(storage_backend=request.param, data_dir=tmp_path, write_behind=True)
+        )
+        yield service
+        service.close()
+
+    def test_flush_gives_read_your_writes(self, service):
+        """Test captured events and aggregates are visible after a flush."""
+        user_id = service.register_user(email="a@b.c", accept_terms=True, passphrase="pw")[
+            "user_id"
+        ]
+        ids = [
+            service.capture_event(
+                user_id=user_id,
+                tool_name="Claude",
+                prompt=str(index),
+                response="",
+                metadata={},
+                passphrase="pw",
+            )["event_id"]
+            for index in range(3)
+        ]
+        service.capture_events(
+            user_id=user_id,
+            events=[{"tool_name": "ChatGPT", "prompt": "x", "response": "y"}],
+            passphrase="pw",
+            wait_for_commit=True,
+        )
+
+        service.flush(user_id)
+
+        events = service.fetch_timeline(user_id, "pw")
+        assert [event["event_id"] for event in events][:3] == ids
+        assert service.stats(user_id, "pw")["by_tool"] == {"Claude": 3, "ChatGPT": 1}
@@ -0,0 +1,64 @@
+"""Unit tests for the inter-process vault locks."""
+
+import multiprocessing
+import threading
+
+import pytest
+
+from pathlog.locking import InterProcessLock, interprocess_locking_available
+
+pytestmark = pytest.mark.skipif(
+    not interprocess_locking_available() or "fork" not in multiprocessing.get_all_start_methods(),
+    reason="needs fcntl and fork",
+)
+
+
+def _try_lock(path, results):
+    import fcntl
+
+    with open(path, "a+b") as handle:
+        try:
+            fcntl.flock(handle.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            results.put("blocked")
+        else:
+            results.put("acquired")
+
+
+def _probe(path):
+    context = multiprocessing.get_context("fork")
+    results = context.Queue()
+    process = context.Process(target=_try_lock, args=(path, results))
+    process.start()
+    process.join(10)
+    return results.get(timeout=10)
+
+
+class TestInterProcessLock:
+    """Test re-entrancy and exclusion across threads and processes."""
+
+    def test_lock_excludes_other_processes_until_fully_released(self, tmp_path):
+        """Test the file lock is held while any nested acquisition is open."""
+        lock = InterProcessLock(tmp_path / "user" / ".lock")
+
+        with lock:
+            with lock:
+                nested = _probe(lock.path)
+            outer = _probe(lock.path)
+        released = _probe(lock.path)
+
+        assert (nested, outer, released) == ("blocked", "blocked", "acquired")
+
+    def test_lock_excludes_other_threads(self, tmp_path):
+        """Test a second thread waits until the holder releases."""
+        lock = InterProcessLock(tmp_path / ".lock")
+        order = []
+        lock.acquire()
+        waiter = threading.Thread(target=lambda: (lock.acquire(), order.append("thread")))
+        waiter.start()
+        waiter.join(0.2)
+        order.append("main")
+        lock.release()
+        waiter.join(5)
+
+        assert order == ["main", "thread"]
@@ -0,0 +1,134 @@
+"""Unit tests for the bounded crypto offload pool."""
+
+import asyncio
+import threading
+
+import pytest
+
+from pathlog.offload import OffloadRejected, Offloader
+
+
+@pytest.fixture
+def offloader():
+    """Yield a one-worker pool admitting two jobs."""
+    pool = Offloader(workers=1, max_pending=2)
+    yield pool
+    pool.close()
+
+
+def _blocked(pool, gate):
+    started = threading.Event()
+
+    def job():
+        started.set()
+        gate.wait(5)
+        return "done"
+
+    return pool.submit(job), started
+
+
+class TestOffloader:
+    """Test admission control, results and metrics."""
+
+    def test_run_returns_results_and_raises_errors(self, offloader):
+        """Test awaited calls pass arguments through and re-raise exceptions."""
+
+        async def scenario():
+            total = await offloader.run(sum, [1, 2], start=3)
+            with pytest.raises(ValueError):
+                await offloader.run(int, "not a number")
+            return total
+
+        assert asyncio.run(scenario()) == 6
+        assert offloader.metrics()["completed"] == 2
+
+    def test_full_queue_rejects_and_reports_depth(self, offloader):
+        """Test calls beyond max_pending are refused while queue depth is reported."""
+        gate = threading.Event()
+        running, started = _blocked(offloader, gate)
+        started.wait(5)
+        queued, _ = _blocked(offloader, gate)
+
+        with pytest.raises(OffloadRejected):
+            offloader.submit(lambda: "rejected")
+        busy = offloader.metrics()
+        gate.set()
+        results = [running.result(5), queued.result(5)]
+
+        assert busy["running"] == 1 and busy["queued"] == 1 and busy["rejected"] == 1
+        assert results == ["done", "done"]
+        assert offloader.metrics()["completed"] == 2
+        assert offloader.submit(lambda: "admitted again").result(5) == "admitted again"
+
+    def test_cancelled_job_frees_its_slot_without_running(self, offloader):
+        """Test a job cancelled while queued never runs and releases admission."""
+        gate = threading.Event()
+        running, started = _blocked(offloader, gate)
+        started.wait(5)
+        ran = []
+        queued = offloader.submit(lambda: ran.append(True))
+
+        assert queued.cancel()
+        assert offloader.metrics()["queued"] == 0
+        gate.set()
+        running.result(5)
+        assert ran == []
+
+
+class TestOffloadedApi:
+    """Test the API sheds crypto load while cheap endpoints stay available."""
+
+    def test_saturated_pool_answers_503_but_health_responds(self, monkeypatch):
+        """Test crypto endpoints get 503 with Retry-After while /healthz still answers."""
+        from fastapi.testclient import TestClient
+
+        from pathlog import api
+
+        pool = Offloader(workers=1, max_pending=1)
+        gate = threading.Event()
+        blocker, started = _blocked(pool, gate)
+        started.wait(5)
+        monkeypatch.setattr(api, "offloader", pool)
+        client = TestClient(api.app)
+
+        try:
+            unlock = client.post("/unlock", json={"user_id": "user", "passphrase": "pw"})
+            health = client.get("/healthz")
+            metrics = client.get("/metrics/offload").json()
+        finally:
+            gate.set()
+            blocker.result(5)
+            pool.close()
+
+        assert unlock.status_code == 503 and unlock.headers["retry-after"] == "1"
+        assert health.status_code == 200
+        assert metrics["running"] == 1 and metrics["rejected"] == 1
+
+    def test_streamed_export_chunks_run_on_the_pool(self, monkeypatch):
+        """Test every chunk of a streamed export is produced by an offload worker."""
+        from fastapi.testclient import TestClient
+
+        from pathlog import api
+
+        producers = []
+
+        class _Service:
+            def export_stream(self, user_id, **_):
+                for index in range(3):
+                    producers.append(threading.current_thread().name)
+                    yield f'{{"chunk": {index}}}\n'.encode()
+
+        pool = Offloader(workers=1, max_pending=4, thread_name_prefix="stream-test")
+        monkeypatch.setattr(api, "offloader", pool)
+        monkeypatch.setattr(api, "service", _Service())
+        try:
+            response = TestClient(api.app).get("/export/user/stream")
+            completed = pool.metrics()["completed"]
+        finally:
+            pool.close()
+
+        assert response.status_code == 200 and response.text.count("chunk") == 3
+        assert len(producers) == 3
+        assert all(name.startswith("stream-test") for name in producers)
+        # One job opens the stream, then one per chunk plus the final exhausted next().
+        assert completed == 5
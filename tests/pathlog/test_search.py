@@ -0,0 +1,93 @@
+"""Unit tests for the encrypted full-text search index."""
+
+import pytest
+
+from pathlog import search
+from pathlog.blind_index import generate_index_key
+from pathlog.search import SearchIndex, document_terms, tokenize
+from pathlog.storage import FileStorage
+
+
+def _document(event_id, prompt, response="ok"):
+    return event_id, document_terms({"tool_name": "Claude", "prompt": prompt, "response": response})
+
+
+@pytest.fixture
+def index(tmp_path):
+    """Return an empty search index over file storage."""
+    return SearchIndex(
+        FileStorage(tmp_path), "user", 1, generate_index_key(), algorithm="aes-256-gcm"
+    )
+
+
+class TestSearchIndex:
+    """Test indexing, BM25 ranking and sealing."""
+
+    def test_tokenize(self):
+        """Test tokens are lowercased words without punctuation or single characters."""
+        assert tokenize("Claude's insight, May 3rd: a_b!") == ["claude", "insight", "may", "3rd"]
+
+    def test_ranking_prefers_rarer_and_denser_matches(self, index):
+        """Test BM25 ranks documents by term rarity and frequency."""
+        index.rebuild(
+            [
+                _document("evt-0", "pricing pricing pricing experiment"),
+                _document("evt-1", "pricing review"),
+                _document("evt-2", "hiring plan"),
+            ]
+        )
+
+        hits = index.search("pricing experiment", 10)
+
+        assert [event_id for event_id, _ in hits] == ["evt-0", "evt-1"]
+        assert hits[0][1] > hits[1][1] > 0
+        assert index.search("nothing matches", 10) == []
+
+    def test_pending_buffer_merges_into_shards(self, index, monkeypatch):
+        """Test added documents are searchable before and after a merge."""
+        monkeypatch.setattr(search, "SEARCH_MERGE_DOCS", 2)
+        index.rebuild([_document("evt-0", "roadmap")])
+
+        index.add([_document("evt-1", "roadmap launch")])
+        pending = index.meta["pending_docs"]
+        index.add([_document("evt-2", "launch")])
+
+        assert pending == 1 and index.meta["pending_docs"] == 0
+        assert {event_id for event_id, _ in index.search("launch", 10)} == {"evt-1", "evt-2"}
+        assert len(index.search("roadmap", 10)) == 2
+
+    def test_removed_documents_are_skipped(self, index):
+        """Test removal hides a document and updates the collection statistics."""
+        index.rebuild([_document("evt-0", "outage"), _document("evt-1", "outage rollback")])
+
+        assert index.remove("evt-1", document_terms({"prompt": "outage rollback"}))
+        assert not index.remove("evt-1", document_terms({"prompt": "outage rollback"}))
+        assert [event_id for event_id, _ in index.search("outage", 10)] == ["evt-0"]
+        assert index.meta["documents"] == 1
+
+    def test_index_is_sealed_and_reopens(self, index, tmp_path):
+        """Test stored blobs hide terms and event ids, and reopen only with the right key."""
+        index.rebuild([_document("evt-secret", "confidential merger")])
+        blobs = b"".join(path.read_bytes() for path in tmp_path.rglob("search_*.bin"))
+
+        reopened = SearchIndex.open(
+            index.storage, "user", {1: index.index_key}, algorithm="aes-256-gcm"
+        )
+
+        assert b"merger" not in blobs and b"evt-secret" not in blobs
+        assert reopened.search("merger", 1)[0][0] == "evt-secret"
+        assert SearchIndex.open(index.storage, "user", {2: b"k" * 32}, algorithm="x") is None
+
+    def test_pure_python_ranking_matches_numpy(self, index, monkeypatch):
+        """Test the fallback scorer ranks exactly like the vectorised one."""
+        index.rebuild(
+            [_document(f"evt-{n}", "sprint " * (n % 4 + 1) + f"topic{n % 3}") for n in range(30)]
+        )
+        index.remove("evt-5", document_terms({"prompt": "sprint sprint topic2"}))
+        vectorised = index.search("sprint topic1", 5)
+
+        monkeypatch.setattr(search, "numpy", None)
+        fallback = index.search("sprint topic1", 5)
+
+        assert [event_id for event_id, _ in fallback] == [event_id for event_id, _ in vectorised]
+        assert [score for _, score in fallback] == pytest.approx([score for _, score in vectorised])
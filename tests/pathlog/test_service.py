@@ -0,0 +1,794 @@
+"""Unit tests for PathLogService."""
+
+import io
+import json
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor
+from itertools import cycle
+from unittest.mock import patch
+
+import pytest
+
+from pathlog.config import PathLogConfig
+from pathlog.crypto import encrypt_payload, unwrap_master_key
+from pathlog.service import AccessDenied, PathLogService, ProfileConflict
+from pathlog.storage import FileStorage
+
+
+@pytest.fixture(params=["file", "sqlite"])
+def service(request, tmp_path):
+    """Yield a service backed by each storage backend in a temporary directory."""
+    return PathLogService(PathLogConfig(storage_backend=request.param, data_dir=tmp_path))
+
+
+@pytest.fixture
+def user_id(service):
+    """Register a passphrase-protected user."""
+    result = service.register_user(email="pilot@pathlog.local", accept_terms=True, passphrase="pw")
+    return result["user_id"]
+
+
+def _capture(service, user_id, tool_name="ChatGPT", prompt="hello"):
+    return service.capture_event(
+        user_id=user_id,
+        tool_name=tool_name,
+        prompt=prompt,
+        response="world",
+        metadata={"channel": "web"},
+        passphrase="pw",
+    )
+
+
+class TestPathLogService:
+    """Test end-to-end vault operations."""
+
+    def test_capture_and_timeline(self, service, user_id):
+        """Test captured events decrypt back into the timeline."""
+        first = _capture(service, user_id, prompt="one")
+        second = _capture(service, user_id, prompt="two")
+
+        events = service.fetch_timeline(user_id, "pw")
+
+        assert [event["event_id"] for event in events] == [first["event_id"], second["event_id"]]
+        assert events[0]["prompt"] == "one"
+
+    def test_wrong_passphrase_rejected(self, service, user_id):
+        """Test an invalid passphrase is refused."""
+        with pytest.raises(ValueError):
+            service.fetch_timeline(user_id, "nope")
+
+    def test_stats_counts_by_tool(self, service, user_id):
+        """Test stats aggregate captured events per tool."""
+        _capture(service, user_id, tool_name="ChatGPT")
+        _capture(service, user_id, tool_name="Claude")
+        _capture(service, user_id, tool_name="Claude")
+
+        stats = service.stats(user_id, "pw")
+
+        assert stats["total_events"] == 3
+        assert stats["by_tool"] == {"ChatGPT": 1, "Claude": 2}
+
+    def test_rotate_key_keeps_history_readable(self, service, user_id):
+        """Test rotation re-encrypts history under the new key."""
+        _capture(service, user_id, prompt="before")
+
+        rotated = service.rotate_key(user_id, "pw")
+        events = service.fetch_timeline(user_id, "pw")
+
+        assert service.storage.load_profile(user_id)["current_key_id"] == rotated["key_id"]
+        assert [event["prompt"] for event in events] == ["before"]
+        assert service.stats(user_id, "pw")["total_events"] == 1
+
+    def test_export_import_round_trip(self, service, user_id):
+        """Test an exported bundle restores into a new user id."""
+        _capture(service, user_id)
+
+        result = service.import_bundle(service.export_bundle(user_id), "restored")
+
+        assert result == {"user_id": "restored", "imported_events": 1}
+        assert len(service.fetch_timeline("restored", "pw")) == 1
+
+    def test_export_with_decrypt(self, service, user_id):
+        """Test a decrypting export carries the plaintext history next to the ciphertext."""
+        _capture(service, user_id, prompt="one")
+        _capture(service, user_id, prompt="two")
+
+        bundle = service.export_bundle(user_id, decrypt=True, passphrase="pw")
+
+        assert [event["prompt"] for event in bundle["decrypted_events"]] == ["one", "two"]
+        assert len(bundle["events"]) == 2
+        with pytest.raises(ValueError):
+            service.export_bundle(user_id, decrypt=True, passphrase="nope")
+
+    def test_streamed_export_import_round_trip(self, service, user_id):
+        """Test an NDJSON export restores events, keys and stats into a new user id."""
+        for prompt in ("one", "two", "three"):
+            _capture(service, user_id, prompt=prompt)
+
+        chunks = list(service.export_stream(user_id))
+        result = service.import_stream(io.BytesIO(b"".join(chunks)), "restored")
+
+        assert result == {"user_id": "restored", "imported_events": 3}
+        assert [event["prompt"] for event in service.fetch_timeline("restored", "pw")] == [
+            "one",
+            "two",
+            "three",
+        ]
+        assert service.stats("restored", "pw")["total_events"] == 3
+        assert service.storage.load_profile("restored")["user_id"] == "restored"
+
+    def test_streamed_export_resumes_on_other_threads(self, service, user_id, monkeypatch):
+        """Test every chunk of a streamed export can be produced on a different thread."""
+        monkeypatch.setattr("pathlog.bundle.BUNDLE_CHUNK_BYTES", 1)
+        monkeypatch.setattr("pathlog.crypto_engine.CryptoEngine.batch_size", 1)
+        for prompt in ("one", "two", "three"):
+            _capture(service, user_id, prompt=prompt)
+        chunks = service.export_stream(user_id)
+        data = []
+
+        with ThreadPoolExecutor(max_workers=1) as first, ThreadPoolExecutor(max_workers=1) as other:
+            pools = cycle([first, other])
+            while (chunk := next(pools).submit(next, chunks, None).result()) is not None:
+                data.append(chunk)
+
+        result = service.import_stream(io.BytesIO(b"".join(data)), "restored")
+        assert result["imported_events"] == 3
+
+    def test_streamed_export_decrypts_and_bad_imports_write_nothing(self, service, user_id):
+        """Test decrypting exports carry payloads and a truncated upload is rejected untouched."""
+        _capture(service, user_id, prompt="secret")
+
+        data = b"".join(service.export_stream(user_id, decrypt=True, passphrase="pw"))
+        lines = data.splitlines(keepends=True)
+
+        assert json.loads(lines[-2])["payload"]["prompt"] == "secret"
+        with pytest.raises(ValueError):
+            service.import_stream(io.BytesIO(b"".join(lines[:-1])), "restored")
+        with pytest.raises(FileNotFoundError):
+            service.storage.load_profile("restored")
+        with pytest.raises(FileNotFoundError):
+            service.export_stream("missing")
+
+
+def _backup(service, user_id, since=None):
+    backup, chunks = service.backup_stream(user_id, since=since, passphrase="pw")
+    data = b"".join(chunks)
+    return backup, data, [json.loads(line) for line in data.splitlines()]
+
+
+class TestIncrementalBackups:
+    """Test delta backups against a watermark and restoring full + delta chains."""
+
+    def test_delta_carries_only_changes_and_chain_restores(self, service, user_id):
+        """Test a delta holds just the new events and keys and replays onto the full backup."""
+        for prompt in ("one", "two"):
+            _capture(service, user_id, prompt=prompt)
+        full, full_data, _ = _backup(service, user_id)
+        _capture(service, user_id, prompt="three")
+        rotated = service.rotate_key(user_id, "pw")
+        _capture(service, user_id, prompt="four")
+
+        delta, delta_data, records = _backup(service, user_id, since="latest")
+        _, _, empty = _backup(service, user_id, since=delta["backup_id"])
+
+        assert (full["kind"], delta["kind"]) == ("full", "delta")
+        assert delta["parent"] == full["backup_id"]
+        assert [record["key_id"] for record in records if record["type"] == "key"] == [
+            rotated["key_id"]
+        ]
+        assert sum(record["type"] == "event" for record in records) == 2
+        assert {record["type"] for record in empty} == {"manifest", "state", "end"}
+        assert service.import_stream(io.BytesIO(full_data), "restored")["imported_events"] == 2
+        assert service.import_stream(io.BytesIO(delta_data), "restored")["imported_events"] == 2
+        assert [event["prompt"] for event in service.fetch_timeline("restored", "pw")] == [
+            "one",
+            "two",
+            "three",
+            "four",
+        ]
+        assert service.stats("restored", "pw")["total_events"] == 4
+        assert [backup["backup_id"] for backup in service.backup_chain("restored")["backups"]] == [
+            full["backup_id"],
+            delta["backup_id"],
+        ]
+
+    def test_broken_chains_are_refused_and_rewrites_force_full(self, service, user_id):
+        """Test deltas must follow their parent and deletes make the next backup full."""
+        _capture(service, user_id, prompt="one")
+        _, full_data, _ = _backup(service, user_id)
+        _capture(service, user_id, prompt="two")
+        _backup(service, user_id, since="latest")
+        event_id = _capture(service, user_id, prompt="three")["event_id"]
+        _, second_data, _ = _backup(service, user_id, since="latest")
+
+        with pytest.raises(FileNotFoundError):
+            service.import_stream(io.BytesIO(second_data), "restored")
+        service.import_stream(io.BytesIO(full_data), "restored")
+        with pytest.raises(ValueError, match="restore backup"):
+            service.import_stream(io.BytesIO(second_data), "restored")
+        with pytest.raises(ValueError, match="Unknown backup"):
+            service.backup_stream(user_id, since="missing", passphrase="pw")
+        service.delete_event(user_id, event_id, "pw")
+        assert _backup(service, user_id, since="latest")[0]["kind"] == "full"
+        assert [event["prompt"] for event in service.fetch_timeline("restored", "pw")] == ["one"]
+
+    def test_backup_endpoint_needs_credentials_to_touch_the_chain(
+        self, service, user_id, monkeypatch
+    ):
+        """Test an unauthenticated backup is refused and leaves the delta chain intact."""
+        from fastapi.testclient import TestClient
+
+        from pathlog import api
+
+        monkeypatch.setattr(api, "service", service)
+        client = TestClient(api.app)
+        _capture(service, user_id, prompt="one")
+        full, _, _ = _backup(service, user_id)
+        token = service.unlock(user_id, "pw")["session_token"]
+
+        anonymous = client.get(f"/backup/{user_id}/stream")
+        wrong = client.get(f"/backup/{user_id}/stream", params={"passphrase": "nope"})
+        delta = client.get(
+            f"/backup/{user_id}/stream",
+            params={"since": full["backup_id"], "session_token": token},
+        )
+
+        assert [anonymous.status_code, wrong.status_code] == [403, 403]
+        assert delta.status_code == 200 and delta.headers["x-pathlog-backup-kind"] == "delta"
+        assert [backup["kind"] for backup in service.backup_chain(user_id)["backups"]] == [
+            "full",
+            "delta",
+        ]
+
+
+class TestKeyRotation:
+    """Test envelope key rotation and resumable full re-encryption."""
+
+    def test_rotation_only_rewraps_data_keys(self, service, user_id):
+        """Test rotation leaves event ciphertext untouched and re-wraps data keys."""
+        _capture(service, user_id, prompt="before")
+        stored = list(service.storage.iter_event_entries(user_id))
+
+        rotated = service.rotate_key(user_id, "pw")
+
+        assert list(service.storage.iter_event_entries(user_id)) == stored
+        data_keys = json.loads(service.storage.read_blob(user_id, "data_keys"))
+        assert {item["master_key_id"] for item in data_keys["keys"].values()} == {rotated["key_id"]}
+        assert [event["prompt"] for event in service.fetch_timeline(user_id, "pw")] == ["before"]
+
+    def test_data_keys_are_wrapped(self, service, user_id):
+        """Test events reference a data key whose record holds no raw key material."""
+        _capture(service, user_id)
+        entry = next(service.storage.iter_event_entries(user_id))
+        profile = service.storage.load_profile(user_id)
+
+        data_keys = json.loads(service.storage.read_blob(user_id, "data_keys"))
+
+        assert entry["key_id"] in data_keys["keys"]
+        assert entry["key_id"] not in profile["keys"]
+
+    def test_reencrypt_reports_progress(self, service, user_id):
+        """Test a full re-encryption moves events to fresh data keys and reports completion."""
+        for index in range(3):
+            _capture(service, user_id, prompt=str(index))
+        old_key_ids = {entry["key_id"] for entry in service.storage.iter_event_entries(user_id)}
+        assert service.rotation_status(user_id)["status"] == "idle"
+
+        service.rotate_key(user_id, "pw", reencrypt=True)
+        status = service.rotation_status(user_id)
+
+        assert status["status"] == "completed"
+        assert status["processed"] == status["total"] == 3
+        new_key_ids = {entry["key_id"] for entry in service.storage.iter_event_entries(user_id)}
+        assert not new_key_ids & old_key_ids
+        data_keys = json.loads(service.storage.read_blob(user_id, "data_keys"))
+        assert set(data_keys["keys"]) == new_key_ids
+        assert service.stats(user_id, "pw")["total_events"] == 3
+
+    def test_interrupted_reencryption_resumes(self, tmp_path):
+        """Test a re-encryption that crashes mid-way resumes in the same generation."""
+        service = PathLogService(
+            PathLogConfig(data_dir=tmp_path, crypto_workers=1),
+            backend=FileStorage(tmp_path, segment_max_bytes=200),
+        )
+        user_id = service.register_user(email="a@b.c", accept_terms=True, passphrase="pw")[
+            "user_id"
+        ]
+        for index in range(6):
+            _capture(service, user_id, prompt=str(index))
+
+        calls = {"count": 0}
+
+        def flaky_encrypt(key, payload, **kwargs):
+            calls["count"] += 1
+            if calls["count"] == 4:
+                raise OSError("power loss")
+            return encrypt_payload(key, payload, **kwargs)
+
+        with patch("pathlog.crypto_engine.encrypt_payload", side_effect=flaky_encrypt):
+            with pytest.raises(OSError):
+                service.reencrypt_events(user_id, "pw")
+        interrupted = service.rotation_status(user_id)
+
+        result = service.reencrypt_events(user_id, "pw")
+        status = service.rotation_status(user_id)
+
+        assert interrupted["status"] == "running"
+        assert 0 < interrupted["processed"] < 6
+        assert "resumed" in result["message"]
+        assert status["generation"] == interrupted["generation"]
+        assert status["processed"] == 6
+        assert [event["prompt"] for event in service.fetch_timeline(user_id, "pw")] == [
+            str(index) for index in range(6)
+        ]
+
+
+class TestTimelinePagination:
+    """Test cursor-paginated and filtered timeline reads."""
+
+    def test_pages_follow_cursor(self, service, user_id):
+        """Test successive pages cover every event exactly once."""
+        ids = [_capture(service, user_id, prompt=str(index))["event_id"] for index in range(5)]
+
+        first = service.fetch_timeline_page(user_id, "pw", limit=2)
+        second = service.fetch_timeline_page(user_id, "pw", limit=2, cursor=first["next_cursor"])
+        third = service.fetch_timeline_page(user_id, "pw", limit=2, cursor=second["next_cursor"])
+
+        seen = [event["event_id"] for page in (first, second, third) for event in page["events"]]
+        assert seen == ids
+        assert third["next_cursor"] is None
+
+    def test_newest_first(self, service, user_id):
+        """Test descending order returns the latest events first."""
+        ids = [_capture(service, user_id, prompt=str(index))["event_id"] for index in range(3)]
+
+        page = service.fetch_timeline_page(user_id, "pw", limit=2, newest_first=True)
+        rest = service.fetch_timeline_page(
+            user_id, "pw", limit=2, cursor=page["next_cursor"], newest_first=True
+        )
+
+        assert [event["event_id"] for event in page["events"]] == ids[:0:-1]
+        assert [event["event_id"] for event in rest["events"]] == ids[:1]
+
+    def test_seek_after_event_id(self, service, user_id):
+        """Test a page can start just past a given event in either order."""
+        ids = [_capture(service, user_id, prompt=str(index))["event_id"] for index in range(4)]
+
+        forward = service.fetch_timeline_page(user_id, "pw", after_event_id=ids[1])
+        backward = service.fetch_timeline_page(
+            user_id, "pw", after_event_id=ids[2], newest_first=True
+        )
+
+        assert ids == sorted(ids)
+        assert [event["event_id"] for event in forward["events"]] == ids[2:]
+        assert [event["event_id"] for event in backward["events"]] == ids[1::-1]
+        with pytest.raises(ValueError, match="Unknown event id"):
+            service.fetch_timeline_page(user_id, "pw", after_event_id="missing")
+
+    def test_tool_filter(self, service, user_id):
+        """Test tool_name filters the returned events."""
+        _capture(service, user_id, tool_name="ChatGPT")
+        claude = _capture(service, user_id, tool_name="Claude")
+
+        page = service.fetch_timeline_page(user_id, "pw", tool_name="Claude")
+
+        assert [event["event_id"] for event in page["events"]] == [claude["event_id"]]
+
+    def test_invalid_cursor_rejected(self, service, user_id):
+        """Test a malformed or mismatched cursor raises ValueError."""
+        for index in range(3):
+            _capture(service, user_id, prompt=str(index))
+        page = service.fetch_timeline_page(user_id, "pw", limit=1)
+
+        with pytest.raises(ValueError):
+            service.fetch_timeline_page(user_id, "pw", cursor="not-a-cursor")
+        with pytest.raises(ValueError):
+            service.fetch_timeline_page(
+                user_id, "pw", cursor=page["next_cursor"], newest_first=True
+            )
+
+
+class TestAggregates:
+    """Test incrementally maintained encrypted stats."""
+
+    def test_stats_do_not_decrypt_history(self, service, user_id, monkeypatch):
+        """Test stats read the aggregates record instead of the event log."""
+        _capture(service, user_id, tool_name="Claude")
+        monkeypatch.setattr(
+            service.storage,
+            "iter_event_entries",
+            lambda *args, **kwargs: pytest.fail("stats scanned the event log"),
+        )
+
+        stats = service.stats(user_id, "pw")
+
+        assert stats["total_events"] == 1
+        assert sum(stats["by_day"].values()) == 1
+
+    def test_aggregates_are_encrypted(self, service, user_id):
+        """Test the stored aggregates record carries no plaintext tool names."""
+        _capture(service, user_id, tool_name="SecretTool")
+
+        raw = service.storage.read_blob(user_id, "aggregates")
+
+        assert b"SecretTool" not in raw
+
+    def test_delete_updates_aggregates(self, service, user_id):
+        """Test deleting an event removes it from the timeline and stats."""
+        kept = _capture(service, user_id, tool_name="ChatGPT")
+        dropped = _capture(service, user_id, tool_name="Claude")
+
+        service.delete_event(user_id, dropped["event_id"], "pw")
+
+        assert [event["event_id"] for event in service.fetch_timeline(user_id, "pw")] == [
+            kept["event_id"]
+        ]
+        assert service.stats(user_id, "pw")["by_tool"] == {"ChatGPT": 1}
+        with pytest.raises(KeyError):
+            service.delete_event(user_id, dropped["event_id"], "pw")
+
+    def test_import_without_aggregates_rebuilds(self, service, user_id):
+        """Test bundles lacking aggregates are recounted on the next stats read."""
+        _capture(service, user_id, tool_name="Claude")
+        bundle = service.export_bundle(user_id)
+        bundle.pop("aggregates")
+
+        service.import_bundle(bundle, "restored")
+
+        assert service.stats("restored", "pw")["by_tool"] == {"Claude": 1}
+
+
+class TestCompression:
+    """Test compress-then-encrypt and per-user dictionaries."""
+
+    def test_dictionary_survives_rotation_and_backup(self, service, user_id):
+        """Test dictionary-compressed events stay readable after rotation and restore."""
+        prompt = "Plan the quarterly roadmap review with the platform team. " * 12
+        for index in range(3):
+            _capture(service, user_id, prompt=f"{prompt}{index}")
+        trained = service.train_compression_dictionary(user_id, "pw", samples=2)
+        captured = _capture(service, user_id, prompt=f"{prompt}4")
+
+        service.rotate_key(user_id, "pw")
+        service.import_bundle(json.loads(json.dumps(service.export_bundle(user_id))), "restored")
+
+        stored = service.storage.get_event_entry(user_id, captured["event_id"])["ciphertext"]
+        assert trained["dictionary_id"] == 1 and trained["samples"] == 2
+        assert stored[5] & 0x04  # header flags mark a dictionary-compressed record
+        assert len(service.fetch_timeline("restored", "pw")) == 4
+        assert service.stats("restored", "pw")["total_events"] == 4
+
+    def test_training_needs_events(self, service, user_id):
+        """Test an empty vault cannot train a dictionary."""
+        with pytest.raises(ValueError):
+            service.train_compression_dictionary(user_id, "pw")
+
+
+class TestBlindIndex:
+    """Test blind-index tags used to filter events before decryption."""
+
+    @staticmethod
+    def _capture_on(service, user_id, tool_name, channel):
+        return service.capture_event(
+            user_id=user_id,
+            tool_name=tool_name,
+            prompt="hello",
+            response="world",
+            metadata={"channel": channel},
+            passphrase="pw",
+        )
+
+    def test_filters_decrypt_only_candidates(self, service, user_id):
+        """Test tool and channel filters pick events by tag before decrypting them."""
+        self._capture_on(service, user_id, "ChatGPT", "web")
+        self._capture_on(service, user_id, "Claude", "web")
+        self._capture_on(service, user_id, "ChatGPT", "slack")
+        day = next(service.storage.iter_event_entries(user_id))["created_at"][:10]
+
+        decrypt_many = service.crypto.decrypt_many
+        decrypted = []
+
+        def counting_decrypt(items, **kwargs):
+            items = list(items)
+            decrypted.extend(items)
+            return decrypt_many(items, **kwargs)
+
+        with patch.object(service.crypto, "decrypt_many", side_effect=counting_decrypt):
+            page = service.fetch_timeline_page(user_id, "pw", tool_name="ChatGPT", channel="slack")
+
+        assert [event["metadata"]["channel"] for event in page["events"]] == ["slack"]
+        assert len(decrypted) == 1
+        assert service.stats(user_id, "pw", tool_name="ChatGPT")["total_events"] == 2
+        by_tool = service.stats(user_id, "pw", channel="web")["by_tool"]
+        assert by_tool == {"ChatGPT": 1, "Claude": 1}
+        assert service.stats(user_id, "pw", day=day)["total_events"] == 3
+        assert service.stats(user_id, "pw", day="1999-01-01")["total_events"] == 0
+        tags = [
+            tag for entry in service.storage.iter_event_entries(user_id) for tag in entry["tags"]
+        ]
+        assert not any("ChatGPT" in tag or "web" in tag for tag in tags)
+
+    def test_rotation_keeps_tags_and_reencryption_renews_them(self, service, user_id):
+        """Test rotation re-wraps the index key while re-encryption retags every event."""
+        self._capture_on(service, user_id, "ChatGPT", "web")
+        tags = [entry["tags"] for entry in service.storage.iter_event_entries(user_id)]
+
+        rotated = service.rotate_key(user_id, "pw")
+        rewrapped = json.loads(service.storage.read_blob(user_id, "index_keys"))
+        rotated_tags = [entry["tags"] for entry in service.storage.iter_event_entries(user_id)]
+        service.reencrypt_events(user_id, "pw")
+        renewed = json.loads(service.storage.read_blob(user_id, "index_keys"))
+        renewed_tags = [entry["tags"] for entry in service.storage.iter_event_entries(user_id)]
+
+        assert rotated_tags == tags
+        assert rewrapped["keys"]["1"]["master_key_id"] == rotated["key_id"]
+        assert renewed["generation"] == 2 and list(renewed["keys"]) == ["2"]
+        assert not set(renewed_tags[0]) & set(tags[0])
+        assert len(service.fetch_timeline_page(user_id, "pw", channel="web")["events"]) == 1
+
+    def test_untagged_events_are_retagged(self, service, user_id):
+        """Test events restored without an index key are tagged on first use."""
+        self._capture_on(service, user_id, "ChatGPT", "web")
+        self._capture_on(service, user_id, "Claude", "web")
+        bundle = service.export_bundle(user_id)
+        bundle.pop("index_keys")
+
+        service.import_bundle(bundle, "restored")
+        page = service.fetch_timeline_page("restored", "pw", tool_name="Claude")
+
+        assert [event["tool_name"] for event in page["events"]] == ["Claude"]
+        assert all(entry.get("tags") for entry in service.storage.iter_event_entries("restored"))
+
+
+class TestSearch:
+    """Test full-text search over the encrypted vault."""
+
+    def test_search_ranks_and_decrypts_top_hits(self, service, user_id):
+        """Test search returns the best matches, decrypted, and follows new captures."""
+        _capture(service, user_id, tool_name="Claude", prompt="insight on pricing experiments")
+        _capture(service, user_id, prompt="weekly hiring plan")
+        first = service.search(user_id, "pw", "pricing insight")
+        _capture(service, user_id, tool_name="Claude", prompt="pricing pricing pricing insight")
+
+        result = service.search(user_id, "pw", "pricing insight", limit=1)
+
+        assert [hit["prompt"] for hit in first["results"]] == ["insight on pricing experiments"]
+        assert [hit["prompt"] for hit in result["results"]] == ["pricing pricing pricing insight"]
+        assert result["results"][0]["score"] > 0
+        assert service.search(user_id, "pw", "nothing")["results"] == []
+
+    def test_deleted_events_leave_results(self, service, user_id):
+        """Test deleting an event removes it from search results."""
+        captured = _capture(service, user_id, prompt="incident postmortem")
+        service.search(user_id, "pw", "postmortem")
+
+        service.delete_event(user_id, captured["event_id"], "pw")
+
+        assert service.search(user_id, "pw", "postmortem")["results"] == []
+
+    def test_reencryption_rebuilds_the_index(self, service, user_id):
+        """Test the index follows the renewed index key and restored vaults rebuild it."""
+        _capture(service, user_id, prompt="launch checklist")
+        service.search(user_id, "pw", "launch")
+
+        service.reencrypt_events(user_id, "pw")
+        service.import_bundle(json.loads(json.dumps(service.export_bundle(user_id))), "restored")
+
+        assert len(service.search(user_id, "pw", "launch")["results"]) == 1
+        assert len(service.search("restored", "pw", "checklist")["results"]) == 1
+        with pytest.raises(ValueError):
+            service.search(user_id, "pw", "launch", limit=0)
+
+
+class TestRecall:
+    """Test semantic recall over the encrypted vector index."""
+
+    def test_recall_returns_closest_events(self, service, user_id):
+        """Test recall ranks by similarity, follows captures and honours deletes."""
+        _capture(service, user_id, prompt="database outage postmortem and rollback")
+        _capture(service, user_id, prompt="pricing experiment for the premium plan")
+        first = service.recall(user_id, "pw", "outage rollback")
+        captured = _capture(service, user_id, prompt="pricing premium plan churn")
+
+        pricing = service.recall(user_id, "pw", "premium pricing plan", limit=2, mode="ivf")
+        service.delete_event(user_id, captured["event_id"], "pw")
+        after_delete = service.recall(user_id, "pw", "premium pricing plan", mode="exact")
+
+        assert first["results"][0]["prompt"] == "database outage postmortem and rollback"
+        assert {hit["prompt"] for hit in pricing["results"]} == {
+            "pricing experiment for the premium plan",
+            "pricing premium plan churn",
+        }
+        assert captured["event_id"] not in {hit["event_id"] for hit in after_delete["results"]}
+        assert 0 < pricing["results"][0]["score"] <= 1
+
+    def test_recall_index_is_rebuilt_after_reencryption(self, service, user_id):
+        """Test the vector index follows the renewed index key and validates its input."""
+        _capture(service, user_id, prompt="quarterly roadmap review")
+        service.recall(user_id, "pw", "roadmap")
+
+        service.reencrypt_events(user_id, "pw")
+
+        assert len(service.recall(user_id, "pw", "roadmap review")["results"]) == 1
+        with pytest.raises(ValueError):
+            service.recall(user_id, "pw", "roadmap", mode="approximate")
+
+
+class TestSessions:
+    """Test unlocked-vault sessions at the service level."""
+
+    def test_session_skips_key_derivation(self, service, user_id):
+        """Test calls carrying a session token never run the KDFs."""
+        session = service.unlock(user_id, "pw")
+        with (
+            patch("pathlog.service.hash_passphrase") as pbkdf2,
+            patch("pathlog.service.unwrap_master_key") as scrypt,
+        ):
+            captured = service.capture_event(
+                user_id=user_id,
+                tool_name="Claude",
+                prompt="hi",
+                response="there",
+                metadata={},
+                passphrase=None,
+                session_token=session["session_token"],
+            )
+            events = service.fetch_timeline(user_id, None, session["session_token"])
+            stats = service.stats(user_id, None, session["session_token"])
+
+        pbkdf2.assert_not_called()
+        scrypt.assert_not_called()
+        assert [event["event_id"] for event in events] == [captured["event_id"]]
+        assert stats["total_events"] == 1
+
+    def test_locked_session_is_rejected(self, service, user_id):
+        """Test a token stops working after lock."""
+        session = service.unlock(user_id, "pw")
+        assert service.lock(user_id, session["session_token"]) is True
+
+        with pytest.raises(ValueError):
+            service.fetch_timeline(user_id, None, session["session_token"])
+
+    def test_lock_and_evict_check_credentials(self, service, user_id):
+        """Test sessions cannot be ended without the user's passphrase or one of its tokens."""
+        other = service.register_user(email="b@pathlog.local", accept_terms=True, passphrase="x")
+        session = service.unlock(user_id, "pw")
+        token = session["session_token"]
+
+        with pytest.raises(AccessDenied):
+            service.lock(other["user_id"], token)
+        for passphrase, other_token in ((None, None), ("nope", None), (None, "forged")):
+            with pytest.raises(AccessDenied):
+                service.evict_sessions(user_id, passphrase, other_token)
+        assert service.fetch_timeline(user_id, None, token) == []
+        assert service.evict_sessions(user_id, session_token=token) == 1
+
+    def test_lock_and_evict_endpoints_answer_403(self, service, user_id, monkeypatch):
+        """Test the API refuses /evict and /lock with wrong credentials and keeps the session."""
+        from fastapi.testclient import TestClient
+
+        from pathlog import api
+
+        monkeypatch.setattr(api, "service", service)
+        client = TestClient(api.app)
+        token = service.unlock(user_id, "pw")["session_token"]
+
+        anonymous = client.post("/evict", json={"user_id": user_id})
+        wrong = client.post("/evict", json={"user_id": user_id, "passphrase": "nope"})
+        foreign = client.post("/lock", json={"user_id": "someone-else", "session_token": token})
+        still_open = service.fetch_timeline(user_id, None, token)
+        evicted = client.post("/evict", json={"user_id": user_id, "passphrase": "pw"})
+
+        assert [anonymous.status_code, wrong.status_code, foreign.status_code] == [403] * 3
+        assert still_open == []
+        assert evicted.json() == {"user_id": user_id, "evicted": 1}
+
+    def test_session_follows_rotation(self, service, user_id):
+        """Test open sessions can use a key created by rotation."""
+        session = service.unlock(user_id, "pw")
+        service.rotate_key(user_id, "pw")
+
+        captured = service.capture_event(
+            user_id=user_id,
+            tool_name="Claude",
+            prompt="after",
+            response="rotation",
+            metadata={},
+            passphrase=None,
+            session_token=session["session_token"],
+        )
+
+        events = service.fetch_timeline(user_id, None, session["session_token"])
+        assert [event["event_id"] for event in events] == [captured["event_id"]]
+
+
+class TestBatchCapture:
+    """Test capturing several events in one call."""
+
+    def test_batch_reports_per_item_results(self, service, user_id):
+        """Test valid items are stored and invalid ones report an error."""
+        batch = [
+            {"tool_name": "ChatGPT", "prompt": "a", "response": "b"},
+            {"tool_name": "Claude", "prompt": None, "response": "b"},
+            {"tool_name": "Claude", "prompt": "c", "response": "d", "metadata": {"k": 1}},
+        ]
+
+        results = service.capture_events(user_id=user_id, events=batch, passphrase="pw")
+
+        assert [item["index"] for item in results] == [0, 1, 2]
+        assert results[1]["event_id"] is None and "prompt" in results[1]["error"]
+        stored = [event["event_id"] for event in service.fetch_timeline(user_id, "pw")]
+        assert stored == [results[0]["event_id"], results[2]["event_id"]]
+        assert service.stats(user_id, "pw")["by_tool"] == {"ChatGPT": 1, "Claude": 1}
+
+    def test_batch_unwraps_key_once(self, service, user_id):
+        """Test the passphrase KDFs run once per batch, not per item."""
+        batch = [{"tool_name": "ChatGPT", "prompt": str(i), "response": ""} for i in range(5)]
+
+        with patch("pathlog.service.unwrap_master_key", wraps=unwrap_master_key) as scrypt:
+            service.capture_events(user_id=user_id, events=batch, passphrase="pw")
+
+        assert scrypt.call_count == 1
+
+
+def _connect_tools(backend, data_dir, user_id, worker):
+    service = PathLogService(PathLogConfig(storage_backend=backend, data_dir=data_dir))
+    for index in range(10):
+        service.connect_tool(user_id, f"tool-{worker}-{index}")
+        _capture(service, user_id, prompt=f"worker {worker} event {index}")
+    service.close()
+
+
+class TestConcurrentWorkers:
+    """Test several worker processes sharing one vault."""
+
+    @pytest.mark.skipif("fork" not in multiprocessing.get_all_start_methods(), reason="needs fork")
+    def test_parallel_workers_lose_no_updates(self, service, user_id):
+        """Test concurrent profile updates and captures from four processes all land."""
+        backend = service.config.storage_backend
+        context = multiprocessing.get_context("fork")
+        workers = [
+            context.Process(
+                target=_connect_tools, args=(backend, service.config.data_dir, user_id, worker)
+            )
+            for worker in range(4)
+        ]
+        for process in workers:
+            process.start()
+        for process in workers:
+            process.join(60)
+
+        profile = service.storage.load_profile(user_id)
+        prompts = {event["prompt"] for event in service.fetch_timeline(user_id, "pw")}
+
+        assert [process.exitcode for process in workers] == [0, 0, 0, 0]
+        assert len(profile["connected_tools"]) == 40
+        assert len(prompts) == 40
+        assert service.stats(user_id, "pw")["total_events"] == 40
+
+    def test_update_retries_after_a_lost_swap(self, service, user_id):
+        """Test an update re-applies itself on top of a concurrent write."""
+        swap = service.storage.swap_profile
+        calls = []
+
+        def racing_swap(uid, profile, expected_version):
+            if not calls:
+                current = service.storage.load_profile(uid)
+                service.storage.save_profile(uid, {**current, "connected_tools": ["Claude"]})
+            calls.append(expected_version)
+            return swap(uid, profile, expected_version)
+
+        with patch.object(service.storage, "swap_profile", side_effect=racing_swap):
+            tools = service.connect_tool(user_id, "ChatGPT")
+
+        assert tools == ["Claude", "ChatGPT"]
+        assert calls == [1, 2]
+
+    def test_update_gives_up_with_profile_conflict(self, service, user_id):
+        """Test a swap that never succeeds raises ProfileConflict."""
+        with (
+            patch.object(service.storage, "swap_profile", return_value=False),
+            patch("pathlog.service.time.sleep"),
+        ):
+            with pytest.raises(ProfileConflict):
+                service.connect_tool(user_id, "ChatGPT")
@@ -0,0 +1,65 @@
+"""Unit tests for the PathLog session cache."""
+
+from unittest.mock import patch
+
+import pytest
+
+from pathlog.sessions import SessionCache
+
+
+class TestSessionCache:
+    """Test TTL and size bounds of unlocked-vault sessions."""
+
+    def test_open_and_get(self):
+        """Test a token returns the cached keys for its user only."""
+        cache = SessionCache()
+        token, _ = cache.open("user", {"key-1": b"secret"})
+
+        assert cache.get(token, "user") == {"key-1": b"secret"}
+        assert cache.get(token, "someone-else") is None
+        assert cache.get("unknown", "user") is None
+
+    def test_expired_sessions_are_dropped(self):
+        """Test sessions stop resolving once their TTL elapses."""
+        cache = SessionCache(ttl_seconds=10)
+        with patch("pathlog.sessions.time.monotonic", return_value=100.0):
+            token, _ = cache.open("user", {"key-1": b"secret"})
+        with patch("pathlog.sessions.time.monotonic", return_value=111.0):
+            assert cache.get(token, "user") is None
+            assert len(cache) == 0
+
+    def test_requested_ttl_is_capped(self):
+        """Test callers cannot extend a session beyond the configured TTL."""
+        cache = SessionCache(ttl_seconds=10)
+        with patch("pathlog.sessions.time.monotonic", return_value=0.0):
+            _, session = cache.open("user", {}, ttl_seconds=3600)
+
+        assert session.expires_at == 10.0
+
+    def test_least_recently_used_is_evicted(self):
+        """Test the cache never holds more than max_sessions tokens."""
+        cache = SessionCache(max_sessions=2)
+        first, _ = cache.open("a", {})
+        second, _ = cache.open("b", {})
+        cache.get(first, "a")
+        cache.open("c", {})
+
+        assert cache.get(first, "a") == {}
+        assert cache.get(second, "b") is None
+
+    def test_close_and_evict_user(self):
+        """Test explicit lock and per-user eviction."""
+        cache = SessionCache()
+        token, _ = cache.open("user", {})
+        cache.open("user", {})
+        other, _ = cache.open("other", {})
+
+        assert cache.close(token) is True
+        assert cache.close(token) is False
+        assert cache.evict_user("user") == 1
+        assert cache.get(other, "other") == {}
+
+    def test_invalid_size_rejected(self):
+        """Test a zero-sized cache is refused."""
+        with pytest.raises(ValueError):
+            SessionCache(max_sessions=0)
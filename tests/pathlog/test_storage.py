@@ -0,0 +1,396 @@
+"""Unit tests for PathLog storage backends."""
+
+import json
+from datetime import timedelta
+
+import pytest
+
+from pathlog.config import PathLogConfig
+from pathlog.ids import new_event_id
+from pathlog.sqlite_storage import SQLiteStorage
+from pathlog.storage import FileStorage, create_backend
+
+
+@pytest.fixture(params=["file", "sqlite"])
+def backend(request, tmp_path):
+    """Yield each storage backend rooted in a temporary directory."""
+    if request.param == "sqlite":
+        return SQLiteStorage(tmp_path / "pathlog.db")
+    return FileStorage(tmp_path)
+
+
+def _entry(index, created_at=None):
+    entry = {"event_id": f"evt-{index}", "key_id": "key-1", "ciphertext": f"token-{index}"}
+    if created_at:
+        entry["created_at"] = created_at
+    return entry
+
+
+class TestStorageBackends:
+    """Test behaviour shared by every storage backend."""
+
+    def test_profile_round_trip(self, backend):
+        """Test profiles are saved and loaded with a version counter."""
+        backend.save_profile("user", {"user_id": "user", "keys": {}})
+
+        assert backend.load_profile("user") == {"user_id": "user", "keys": {}, "version": 1}
+        with pytest.raises(FileNotFoundError):
+            backend.load_profile("missing")
+
+    def test_profile_compare_and_swap(self, backend):
+        """Test a swap against a stale version is refused and a current one bumps it."""
+        backend.save_profile("user", {"user_id": "user", "tools": []})
+        stale = backend.load_profile("user")
+        backend.save_profile("user", {**stale, "tools": ["ChatGPT"]})
+
+        refused = backend.swap_profile("user", {**stale, "tools": ["Claude"]}, 1)
+        current = backend.load_profile("user")
+        accepted = backend.swap_profile("user", {**current, "tools": ["ChatGPT", "Claude"]}, 2)
+
+        assert not refused and accepted
+        assert backend.load_profile("user")["tools"] == ["ChatGPT", "Claude"]
+        assert backend.load_profile("user")["version"] == 3
+
+    def test_append_and_range_read(self, backend):
+        """Test entries come back in append order and honour created_at bounds."""
+        days = ["2025-05-01", "2025-05-03", "2025-05-05"]
+        for index, day in enumerate(days):
+            backend.append_event("user", _entry(index, f"{day}T10:00:00+00:00"))
+
+        everything = list(backend.iter_event_entries("user"))
+        bounded = list(
+            backend.iter_event_entries(
+                "user", since="2025-05-02T00:00:00+00:00", until="2025-05-04T00:00:00+00:00"
+            )
+        )
+
+        assert [entry["event_id"] for entry in everything] == ["evt-0", "evt-1", "evt-2"]
+        assert [entry["event_id"] for entry in bounded] == ["evt-1"]
+        assert [entry["event_id"] for entry in backend.iter_event_entries("user", limit=2)] == [
+            "evt-0",
+            "evt-1",
+        ]
+        assert backend.get_event_entry("user", "evt-2")["ciphertext"] == "token-2"
+
+    def test_bundle_round_trip(self, backend):
+        """Test an exported bundle imports into another user."""
+        backend.save_profile("user", {"user_id": "user"})
+        backend.write_key_file("user", "key-1", {"key_id": "key-1"})
+        backend.append_event("user", _entry(0))
+
+        backend.import_bundle(backend.export_bundle("user"), "copy")
+
+        assert backend.load_key_files("copy") == {"key-1": {"key_id": "key-1"}}
+        assert [entry["event_id"] for entry in backend.iter_event_entries("copy")] == ["evt-0"]
+
+    def test_binary_ciphertext_round_trip(self, backend):
+        """Test binary envelopes come back as bytes and bundles carry them as text."""
+        envelope = b"\x89PL\x01\x01\x00" + bytes(range(40))
+        backend.save_profile("user", {"user_id": "user"})
+        backend.append_events("user", [{**_entry(0), "ciphertext": envelope}, _entry(1)])
+
+        bundle = backend.export_bundle("user")
+        backend.import_bundle(json.loads(json.dumps(bundle)), "copy")
+
+        stored = [entry["ciphertext"] for entry in backend.iter_event_entries("copy")]
+        assert stored == [envelope, "token-1"]
+        assert backend.get_event_entry("user", "evt-0")["ciphertext"] == envelope
+
+    def test_rewrite_event_chunks(self, backend):
+        """Test chunked rewrites apply the transform, keep seqs and resume after a seq."""
+        backend.append_events("user", [_entry(index) for index in range(4)])
+
+        def rekey(batch):
+            return [
+                None if entry["event_id"] == "evt-1" else {**entry, "key_id": "key-2"}
+                for entry in batch
+            ]
+
+        checkpoints = list(backend.rewrite_event_chunks("user", rekey))
+        resumed = list(
+            backend.rewrite_event_chunks(
+                "user", lambda batch: pytest.fail("rewrote"), after_seq=checkpoints[-1]
+            )
+        )
+
+        entries = list(backend.iter_event_entries("user"))
+        assert [entry["seq"] for entry in entries] == [1, 2, 3, 4]
+        assert [entry["key_id"] for entry in entries] == ["key-2", "key-1", "key-2", "key-2"]
+        assert checkpoints[-1] == 4 and resumed == []
+        assert backend.count_events("user") == 4
+
+    def test_tag_filter(self, backend):
+        """Test tag groups select entries by tag and follow rewritten tags."""
+        tags = [["tool-a", "day-1"], ["tool-b", "day-1"], ["tool-a", "day-2"]]
+        backend.append_events(
+            "user", [{**_entry(index), "tags": tag} for index, tag in enumerate(tags)]
+        )
+
+        def event_ids(groups):
+            return [entry["event_id"] for entry in backend.iter_event_entries("user", tags=groups)]
+
+        assert event_ids([{"tool-a"}]) == ["evt-0", "evt-2"]
+        assert event_ids([{"tool-a"}, {"day-1"}]) == ["evt-0"]
+        assert event_ids([{"tool-a", "tool-b"}, {"day-1"}]) == ["evt-0", "evt-1"]
+        assert event_ids([{"missing"}]) == []
+
+        list(
+            backend.rewrite_event_chunks(
+                "user", lambda batch: [{**entry, "tags": ["tool-c"]} for entry in batch]
+            )
+        )
+
+        assert event_ids([{"tool-a"}]) == []
+        assert event_ids([{"tool-c"}]) == ["evt-0", "evt-1", "evt-2"]
+
+    def test_create_backend_from_config(self, tmp_path):
+        """Test the configured backend name selects the implementation."""
+        file_backend = create_backend(PathLogConfig(storage_backend="file", data_dir=tmp_path))
+        sqlite_backend = create_backend(PathLogConfig(storage_backend="sqlite", data_dir=tmp_path))
+
+        assert isinstance(file_backend, FileStorage)
+        assert isinstance(sqlite_backend, SQLiteStorage)
+        assert sqlite_backend.db_path == tmp_path / "pathlog.db"
+        with pytest.raises(ValueError):
+            create_backend(PathLogConfig(storage_backend="nope", data_dir=tmp_path))
+
+
+class TestSegmentedLog:
+    """Test segment rolling and indexed reads in the file backend."""
+
+    def test_append_assigns_sequence_in_order(self, tmp_path):
+        """Test appended entries are read back in append order with sequence numbers."""
+        storage = FileStorage(tmp_path)
+        for index in range(3):
+            storage.append_event("user", _entry(index))
+
+        entries = list(storage.iter_event_entries("user"))
+
+        assert [entry["event_id"] for entry in entries] == ["evt-0", "evt-1", "evt-2"]
+        assert [entry["seq"] for entry in entries] == [1, 2, 3]
+
+    def test_segments_roll_at_size_bound(self, tmp_path):
+        """Test a new segment is opened once the size bound is reached."""
+        storage = FileStorage(tmp_path, segment_max_bytes=200)
+        for index in range(10):
+            storage.append_event("user", _entry(index))
+
+        segments = storage.list_segments("user")
+
+        assert len(segments) > 1
+        assert sum(segment["count"] for segment in segments) == 10
+        assert len(list(storage.iter_event_entries("user"))) == 10
+
+    def test_appends_recover_the_active_segment_from_its_index(self, tmp_path):
+        """Test appends leave the manifest alone until rollover and a reopen sees every row."""
+        storage = FileStorage(tmp_path, segment_max_bytes=200)
+        storage.append_event("user", _entry(0))
+        manifest_path = tmp_path / "user" / "segments" / "manifest.json"
+        written = manifest_path.read_text(encoding="utf-8")
+        storage.append_event("user", _entry(1))
+        unchanged = manifest_path.read_text(encoding="utf-8") == written
+        for index in range(2, 10):
+            storage.append_event("user", _entry(index))
+        index_path = tmp_path / "user" / "segments" / (storage.list_segments("user")[-1]["name"])
+        with open(f"{index_path}.idx", "a", encoding="utf-8") as handle:
+            handle.write('{"seq": 11, "event_id": "torn')
+
+        reopened = FileStorage(tmp_path, segment_max_bytes=200)
+        reopened.append_event("user", _entry(10))
+        entries = list(reopened.iter_event_entries("user"))
+
+        assert unchanged
+        assert [entry["seq"] for entry in entries] == list(range(1, 12))
+        assert sum(segment["count"] for segment in reopened.list_segments("user")) == 11
+        assert reopened.get_event_entry("user", "evt-10")["seq"] == 11
+
+    def test_torn_record_tail_is_ignored_and_trimmed(self, tmp_path):
+        """Test bytes written after the last indexed record are skipped, then cut off on append."""
+        storage = FileStorage(tmp_path)
+        for index in range(2):
+            storage.append_event("user", _entry(index))
+        seg_path = tmp_path / "user" / "segments" / "00000001.seg"
+        with seg_path.open("ab") as handle:
+            handle.write(b"\x00\x00\x00\x10\x00\x00")
+
+        torn = [entry["event_id"] for entry in storage.iter_event_entries("user")]
+        storage.append_event("user", _entry(2))
+        trimmed = seg_path.stat().st_size == storage.list_segments("user")[-1]["bytes"]
+        storage.delete_event("user", "evt-0")
+        list(storage.rewrite_event_chunks("user", lambda batch: [None] * len(batch)))
+        entries = list(FileStorage(tmp_path).iter_event_entries("user"))
+
+        assert torn == ["evt-0", "evt-1"]
+        assert trimmed
+        assert [entry["event_id"] for entry in entries] == ["evt-1", "evt-2"]
+        assert [entry["seq"] for entry in entries] == [2, 3]
+
+    def test_segments_roll_at_age_bound(self, tmp_path):
+        """Test a new segment is opened when entries span more than the age bound."""
+        storage = FileStorage(tmp_path, segment_max_age=timedelta(days=1))
+        storage.append_event("user", _entry(0, "2025-05-01T10:00:00+00:00"))
+        storage.append_event("user", _entry(1, "2025-05-01T11:00:00+00:00"))
+        storage.append_event("user", _entry(2, "2025-05-03T10:00:00+00:00"))
+
+        segments = storage.list_segments("user")
+
+        assert [segment["count"] for segment in segments] == [2, 1]
+
+    def test_range_read_skips_segments(self, tmp_path):
+        """Test created_at bounds only return matching entries."""
+        storage = FileStorage(tmp_path)
+        days = ["2025-05-01", "2025-05-03", "2025-05-05"]
+        for index, day in enumerate(days):
+            storage.append_event("user", _entry(index, f"{day}T10:00:00+00:00"))
+
+        entries = list(
+            storage.iter_event_entries(
+                "user", since="2025-05-02T00:00:00+00:00", until="2025-05-04T00:00:00+00:00"
+            )
+        )
+
+        assert [entry["event_id"] for entry in entries] == ["evt-1"]
+
+    def test_point_lookup(self, tmp_path):
+        """Test an entry can be fetched by event id."""
+        storage = FileStorage(tmp_path, segment_max_bytes=200)
+        for index in range(6):
+            storage.append_event("user", _entry(index))
+
+        entry = storage.get_event_entry("user", "evt-4")
+
+        assert entry["ciphertext"] == "token-4"
+        assert storage.get_event_entry("user", "missing") is None
+
+    def test_time_ordered_ids_are_found_in_one_segment(self, tmp_path, monkeypatch):
+        """Test an id lookup reads a single segment index and bisects it."""
+        storage = FileStorage(tmp_path, segment_max_bytes=200)
+        ids = [new_event_id() for _ in range(12)]
+        for event_id in ids:
+            storage.append_event("user", {**_entry(0), "event_id": event_id})
+        read = []
+        original = storage._segment_index
+        monkeypatch.setattr(
+            storage,
+            "_segment_index",
+            lambda seg_dir, segment: read.append(segment["name"]) or original(seg_dir, segment),
+        )
+
+        entry = storage.get_event_entry("user", ids[3])
+
+        assert entry["event_id"] == ids[3] and entry["seq"] == 4
+        assert len(read) == 1
+        assert all(segment["id_ordered"] for segment in storage.list_segments("user"))
+        assert storage.get_event_entry("user", new_event_id()) is None
+
+    def test_reindex_restores_seek_metadata_of_old_segments(self, tmp_path):
+        """Test segments lacking id ranges are scanned until reindexed, then bisected."""
+        storage = FileStorage(tmp_path, segment_max_bytes=200)
+        for index in range(8):
+            storage.append_event("user", _entry(index, f"2025-05-0{index + 1}T10:00:00+00:00"))
+        manifest_path = tmp_path / "user" / "segments" / "manifest.json"
+        manifest = json.loads(manifest_path.read_text(encoding="utf-8"))
+        for segment in manifest["segments"]:
+            for field in ("min_event_id", "max_event_id", "time_ordered", "id_ordered"):
+                del segment[field]
+        manifest_path.write_text(json.dumps(manifest), encoding="utf-8")
+
+        before = storage.get_event_entry("user", "evt-5")
+        storage.append_event("user", _entry(8, "2025-05-09T10:00:00+00:00"))
+        stale = storage.list_segments("user")[0]
+        reindexed = storage.reindex_events("user")
+        segments = storage.list_segments("user")
+        ranged = storage.iter_event_entries("user", since="2025-05-04T00:00:00+00:00", after_seq=5)
+
+        assert before["ciphertext"] == "token-5"
+        assert "min_event_id" not in stale and not stale.get("time_ordered")
+        assert reindexed == len(segments) > 1
+        assert all(segment["time_ordered"] for segment in segments)
+        assert segments[0]["min_event_id"] == "evt-0"
+        assert [entry["event_id"] for entry in ranged] == ["evt-5", "evt-6", "evt-7", "evt-8"]
+        assert storage.get_event_entry("user", "evt-8")["seq"] == 9
+
+    def test_write_events_replaces_log(self, tmp_path):
+        """Test write_events rewrites the full log."""
+        storage = FileStorage(tmp_path)
+        storage.append_event("user", _entry(0))
+        storage.write_events("user", [_entry(5), _entry(6)])
+
+        entries = list(storage.iter_event_entries("user"))
+
+        assert [entry["event_id"] for entry in entries] == ["evt-5", "evt-6"]
+
+    def test_legacy_log_is_migrated(self, tmp_path):
+        """Test a pre-segmentation events.jsonl is migrated on first read."""
+        storage = FileStorage(tmp_path)
+        user_dir = tmp_path / "user"
+        user_dir.mkdir()
+        lines = [json.dumps(_entry(index, "2025-05-01T10:00:00+00:00")) for index in range(2)]
+        (user_dir / "events.jsonl").write_text("\n".join(lines) + "\n", encoding="utf-8")
+
+        entries = list(storage.iter_event_entries("user"))
+
+        assert [entry["event_id"] for entry in entries] == ["evt-0", "evt-1"]
+        assert not (user_dir / "events.jsonl").exists()
+        assert len(list(storage.iter_event_entries("user"))) == 2
+
+    def test_binary_segments_store_raw_ciphertext(self, tmp_path):
+        """Test new segments are length-prefixed and hold envelopes without base64."""
+        storage = FileStorage(tmp_path)
+        envelope = b"\x89PL\x01\x01\x00" + bytes(range(40))
+        storage.append_event("user", {**_entry(0), "ciphertext": envelope})
+
+        data = (tmp_path / "user" / "segments" / "00000001.seg").read_bytes()
+
+        assert envelope in data
+        assert storage.list_segments("user")[0]["format"] == "binary"
+
+    def test_legacy_jsonl_segment_stays_readable(self, tmp_path):
+        """Test a pre-binary jsonl segment is read, rewritten in place and never appended to."""
+        storage = FileStorage(tmp_path)
+        storage.ensure_user_dirs("user")
+        seg_dir = tmp_path / "user" / "segments"
+        created_at = "2025-05-01T10:00:00+00:00"
+        lines, rows, offset = [], [], 0
+        for index in range(2):
+            line = json.dumps({**_entry(index, created_at), "seq": index + 1}) + "\n"
+            rows.append(
+                {
+                    "seq": index + 1,
+                    "event_id": f"evt-{index}",
+                    "created_at": created_at,
+                    "offset": offset,
+                    "length": len(line),
+                }
+            )
+            lines.append(line)
+            offset += len(line)
+        (seg_dir / "00000001.jsonl").write_text("".join(lines), encoding="utf-8")
+        (seg_dir / "00000001.idx").write_text(
+            "".join(json.dumps(row) + "\n" for row in rows), encoding="utf-8"
+        )
+        segment = {
+            "id": 1,
+            "name": "00000001",
+            "opened_at": created_at,
+            "count": 2,
+            "bytes": offset,
+            "first_seq": 1,
+            "last_seq": 2,
+            "min_created_at": created_at,
+            "max_created_at": created_at,
+        }
+        (seg_dir / "manifest.json").write_text(
+            json.dumps({"version": 1, "next_seq": 3, "segments": [segment]}), encoding="utf-8"
+        )
+
+        storage.append_event("user", _entry(2, created_at))
+        storage.delete_event("user", "evt-0")
+
+        segments = storage.list_segments("user")
+        assert [entry["event_id"] for entry in storage.iter_event_entries("user")] == [
+            "evt-1",
+            "evt-2",
+        ]
+        assert storage.get_event_entry("user", "evt-1")["ciphertext"] == "token-1"
+        assert [item.get("format") for item in segments] == [None, "binary"]
@@ -0,0 +1,114 @@
+"""Unit tests for local embeddings and the encrypted vector index."""
+
+import numpy
+import pytest
+
+from pathlog import vectors
+from pathlog.blind_index import generate_index_key
+from pathlog.storage import FileStorage
+from pathlog.vectors import HashingEmbedder, LoadedVectors, VectorIndex
+
+TOPICS = [
+    "pricing experiment for the premium plan and churn",
+    "database outage postmortem and rollback of the deploy",
+    "hiring plan for the platform team interviews",
+]
+
+
+@pytest.fixture
+def embedder():
+    """Return a small embedder."""
+    return HashingEmbedder(64)
+
+
+class TestHashingEmbedder:
+    """Test the network-free hashing vectorizer."""
+
+    def test_vectors_are_unit_length_and_deterministic(self, embedder):
+        """Test equal text embeds identically and vectors are normalised."""
+        vector = embedder.embed_text(TOPICS[0])
+
+        assert vector.dtype == numpy.float32 and vector.shape == (64,)
+        assert numpy.linalg.norm(vector) == pytest.approx(1.0)
+        assert numpy.array_equal(vector, embedder.embed_text(TOPICS[0]))
+        assert not embedder.embed_text("!!").any()
+
+    def test_related_text_scores_higher(self, embedder):
+        """Test overlapping wording gives a higher cosine than unrelated text."""
+        query = embedder.embed_text("postmortem for the outage")
+
+        related = query @ embedder.embed_text(TOPICS[1])
+        unrelated = query @ embedder.embed_text(TOPICS[2])
+
+        assert related > unrelated
+
+
+class TestLoadedVectors:
+    """Test exact and IVF top-k search over mapped vectors."""
+
+    def test_exact_search_ranks_and_skips_deleted(self, embedder):
+        """Test exact search orders by cosine and ignores deleted rows."""
+        loaded = LoadedVectors(embedder.dim, 1)
+        loaded.append(
+            [f"evt-{index}" for index in range(3)], [embedder.embed_text(t) for t in TOPICS]
+        )
+        query = embedder.embed_text("outage rollback")
+
+        hits = loaded.search(query, 2, mode="exact")
+        loaded.deleted.add(1)
+
+        assert hits[0][0] == "evt-1" and len(loaded.event_ids) == 3
+        assert "evt-1" not in [event_id for event_id, _ in loaded.search(query, 2, mode="exact")]
+        with pytest.raises(ValueError):
+            loaded.search(query, 2, mode="fast")
+
+    def test_ivf_finds_the_exact_best_match(self, embedder):
+        """Test IVF probing returns the same best hit, including rows added later."""
+        rng = numpy.random.default_rng(1)
+        noise = rng.normal(size=(500, embedder.dim)).astype(numpy.float32)
+        noise /= numpy.linalg.norm(noise, axis=1, keepdims=True)
+        loaded = LoadedVectors(embedder.dim)
+        loaded.append([f"noise-{index}" for index in range(500)], noise)
+        loaded.search(noise[0], 1, mode="ivf")
+        loaded.append(["target"], embedder.embed_text(TOPICS[0])[None, :])
+
+        hits = loaded.search(embedder.embed_text(TOPICS[0]), 1, mode="ivf")
+
+        assert hits[0][0] == "target"
+        assert loaded.search(noise[7], 1, mode="ivf", nprobe=1000)[0][0] == "noise-7"
+
+    def test_auto_mode_stays_exact(self, embedder):
+        """Test auto never builds IVF clusters and returns the exact ranking."""
+        rng = numpy.random.default_rng(2)
+        rows = rng.normal(size=(2000, embedder.dim)).astype(numpy.float32)
+        rows /= numpy.linalg.norm(rows, axis=1, keepdims=True)
+        loaded = LoadedVectors(embedder.dim)
+        loaded.append([f"row-{index}" for index in range(2000)], rows)
+
+        hits = loaded.search(rows[3], 10)
+
+        assert hits == loaded.search(rows[3], 10, mode="exact")
+        assert loaded._centroids is None
+
+
+class TestVectorIndex:
+    """Test sealed vector blocks."""
+
+    def test_blocks_round_trip_sealed(self, embedder, tmp_path, monkeypatch):
+        """Test vectors survive a reopen across several blocks and are not stored in clear."""
+        monkeypatch.setattr(vectors, "VECTOR_BLOCK", 2)
+        storage = FileStorage(tmp_path)
+        key = generate_index_key()
+        index = VectorIndex(storage, "user", 1, key, algorithm="aes-256-gcm", dim=embedder.dim)
+        items = [(f"evt-secret-{n}", embedder.embed_text(text)) for n, text in enumerate(TOPICS)]
+        index.rebuild(items[:2])
+        index.add(items[2:])
+
+        reopened = VectorIndex.open(storage, "user", {1: key}, algorithm="x", dim=embedder.dim)
+        loaded = reopened.load()
+        blobs = b"".join(path.read_bytes() for path in tmp_path.rglob("vectors_*.bin"))
+
+        assert loaded.event_ids == [event_id for event_id, _ in items]
+        assert numpy.allclose(loaded.matrix, numpy.stack([vector for _, vector in items]))
+        assert b"evt-secret" not in blobs
+        assert VectorIndex.open(storage, "user", {1: key}, algorithm="x", dim=32) is None